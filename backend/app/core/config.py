@@ -5,7 +5,7 @@ Uses pydantic-settings to load configuration from environment variables.
 """
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import List
+from typing import Any, Dict, List
 
 
 class Settings(BaseSettings):
@@ -28,6 +28,138 @@ class Settings(BaseSettings):
     CLAUDE_TEMPERATURE: float = 0.1
     CLAUDE_MAX_TOKENS: int = 2048
 
+    # LLM transport used by Vanna: "in_process" calls LLMService directly,
+    # "http" POSTs to CLAUDE_AGENT_ENDPOINT (for split deployments)
+    LLM_TRANSPORT: str = "in_process"
+    CLAUDE_AGENT_ENDPOINT: str = "http://localhost:8000/generate"
+    LLM_REQUEST_TIMEOUT: float = 30.0
+
+    # HTTP transport resilience (LLM_TRANSPORT=http)
+    LLM_HTTP_POOL_SIZE: int = 10
+    LLM_CONNECT_TIMEOUT: float = 5.0
+    LLM_MAX_RETRIES: int = 2
+    LLM_RETRY_BACKOFF: float = 0.5
+    LLM_CIRCUIT_FAILURE_THRESHOLD: int = 5
+    LLM_CIRCUIT_RESET_SECONDS: float = 30.0
+
+    # Worker threads for blocking retrieval/SQLite work in QueryService
+    QUERY_EXECUTOR_WORKERS: int = 4
+    QUERY_STREAM_ROW_BATCH: int = 200
+
+    # Token budget for retrieved context (Q&A pairs, DDL, docs) in the SQL
+    # prompt; 0 keeps Vanna's own character-based limits
+    SQL_CONTEXT_TOKEN_BUDGET: int = 3000
+
+    # Answer questions that match a trained question up to case, punctuation,
+    # width and spacing with its stored SQL, skipping the LLM call
+    SQL_FAST_PATH_ENABLED: bool = True
+    SQL_FAST_PATH_MIN_SIMILARITY: float = 0.9
+
+    # Parameterized SQL templates mined from Q&A pairs; questions worded
+    # exactly like one (apart from slot values) are answered by slot
+    # filling without the LLM
+    SQL_TEMPLATES_ENABLED: bool = True
+    SQL_TEMPLATE_MAX_VALUES: int = 1000  # Distinct values a slot column may have
+    SQL_TEMPLATE_VALUES_TTL_SECONDS: float = 300.0  # Reload slot column values (0 = never)
+
+    # Process-wide LRU of question embeddings shared by the retrieval
+    # collections (0 disables)
+    EMBEDDING_CACHE_SIZE: int = 1024
+
+    # Embedding model runtime: "default" (Chroma's), "onnx" (same model and
+    # vectors, batch-length padding and tuned session) or "onnx-int8" (int8
+    # weights; needs the onnx package and a re-embedded vector store)
+    EMBEDDING_BACKEND: str = "onnx"
+    EMBEDDING_THREADS: int = 0  # 0 = ONNX Runtime default
+    EMBEDDING_WARMUP_ENABLED: bool = True  # Load and benchmark on startup
+
+    # Concurrent SQL/DDL/documentation lookups; a lookup slower than the
+    # timeout is left out of the prompt (0 = no timeout)
+    RETRIEVAL_WORKERS: int = 6
+    RETRIEVAL_TIMEOUT_SECONDS: float = 5.0
+
+    # Retrieved context per normalized question, reused until the next
+    # training change (0 disables)
+    RETRIEVAL_CACHE_SIZE: int = 512
+
+    # Answer top-k from in-memory NumPy snapshots of the collections,
+    # rebuilt after training changes (ChromaDB stays the source of truth)
+    VECTOR_SNAPSHOT_ENABLED: bool = True
+    VECTOR_SNAPSHOT_DTYPE: str = "float32"  # or "float16"
+
+    # Documents per embedding call when bulk-loading training data
+    TRAINING_BATCH_SIZE: int = 64
+
+    # Training files synced into the vector store on startup through a
+    # content-hash manifest (only new or changed items are embedded); the
+    # watch mode also syncs edits while the server runs
+    TRAINING_DATA_DIR: str = "training_data/chinook"
+    TRAINING_WATCH_ENABLED: bool = False
+    TRAINING_WATCH_INTERVAL: float = 2.0  # Seconds between checks for changed files
+
+    # Expand retrieved DDL along the foreign-key graph: the top-ranked
+    # tables are joined through their shortest paths (bridge tables
+    # included), up to a cap on tables sent to the LLM
+    DDL_GRAPH_ENABLED: bool = True
+    DDL_GRAPH_SEED_TABLES: int = 3
+    DDL_GRAPH_MAX_TABLES: int = 6
+
+    # Hybrid retrieval: an in-memory BM25 ranking (exact names, identifiers,
+    # Japanese bigrams) fused with the vector ranking by reciprocal rank
+    HYBRID_SEARCH_ENABLED: bool = True
+    HYBRID_LEXICAL_WEIGHT: float = 1.0  # Relative to 1.0 for the vector ranking
+
+    # Claude Agent SDK client pool
+    LLM_POOL_MAX_SIZE: int = 4  # Per model
+    LLM_POOL_MIN_SIZE: int = 1  # Pre-started on startup
+    LLM_POOL_MAX_AGE_SECONDS: float = 600.0
+    LLM_POOL_MAX_USES: int = 25
+    LLM_POOL_ACQUIRE_TIMEOUT: float = 30.0
+
+    # Prompt-response cache for /generate (memory LRU + SQLite)
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_PATH: str = "data/llm_cache.db"  # Empty keeps the cache in memory only
+    LLM_CACHE_MEMORY_SIZE: int = 256
+    LLM_CACHE_MAX_ENTRIES: int = 10000
+    LLM_CACHE_TTL_SECONDS: float = 604800.0  # 7 days
+    LLM_CACHE_MAX_TEMPERATURE: float = 0.2
+
+    # LLM admission control: priority classes sql > plotly > questions > followup
+    LLM_SCHEDULER_ENABLED: bool = True
+    LLM_MAX_CONCURRENCY: int = 4
+    LLM_CLASS_LIMITS: Dict[str, int] = {"sql": 4, "plotly": 2, "questions": 1, "followup": 1}
+    LLM_QUEUE_MAX_SIZE: int = 32
+    LLM_QUEUE_TIMEOUT: float = 10.0  # Seconds before a queued call is shed with 429
+
+    # /generate/batch limits
+    LLM_BATCH_MAX_SIZE: int = 50
+    LLM_BATCH_MAX_CONCURRENCY: int = 8
+
+    # Model routing per call purpose (sql, plotly, questions, followup), e.g.
+    # {"plotly": {"model": "claude-haiku-4-5-20251001", "max_tokens": 1024}}
+    LLM_MODEL_ROUTES: Dict[str, Dict[str, Any]] = {}
+    # Opt-in downgrade: a faster (smaller) model used while a routed model's
+    # p95 or error rate is too high, e.g. "claude-haiku-4-5-20251001". SQL
+    # then comes from that model without notice, so it's off by default
+    # ("" disables fallback)
+    LLM_FALLBACK_MODEL: str = ""
+    LLM_FALLBACK_P95_MS: float = 15000.0
+    LLM_FALLBACK_ERROR_RATE: float = 0.5
+    LLM_ROUTE_WINDOW_SECONDS: float = 300.0
+    LLM_ROUTE_MIN_SAMPLES: int = 5
+
+    # Hedged LLM requests (async Vanna calls): send a duplicate when a call
+    # is slower than this percentile of recent latency, within a budget
+    LLM_HEDGE_ENABLED: bool = False
+    LLM_HEDGE_PERCENTILE: float = 0.95
+    LLM_HEDGE_BUDGET: float = 0.1  # Max hedges as a share of calls
+    LLM_HEDGE_MIN_SAMPLES: int = 20
+    LLM_HEDGE_MIN_DELAY: float = 1.0
+
+    # Per-call LLM metrics (/generate/metrics)
+    LLM_METRICS_WINDOW_SECONDS: float = 900.0  # Rolling window summarized into histograms
+    LLM_METRICS_MAX_RECORDS: int = 5000
+
     # Database
     DATABASE_PATH: str = "data/chinook.db"
     VECTOR_DB_PATH: str = "./detomo_vectordb"
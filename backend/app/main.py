@@ -13,12 +13,16 @@ from .core.config import settings
 from .routers import auth, query, training, health, llm
 from .services.query_service import query_service
 from .services.training_service import training_service
-from .services.auto_train import auto_load_training_data
+from .services.llm_service import llm_service
+from .services.auto_train import auto_load_training_data, make_training_sync
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Watches training_data/ when TRAINING_WATCH_ENABLED
+training_watcher = None
+
 # Create FastAPI app
 app = FastAPI(
     title=settings.APP_NAME,
@@ -97,14 +101,45 @@ async def startup_event():
 
         logger.info("✓ DetomoVanna initialized successfully")
         
-        # Auto-load training data if empty
-        logger.info("Checking training data...")
+        # Sync new, changed and removed training files
+        logger.info("Syncing training data...")
         auto_load_training_data(query_service.vn)
-        
+
     except Exception as e:
         logger.error(f"✗ Failed to initialize DetomoVanna: {e}")
         raise
 
+    # Load the embedding model now so the first question doesn't pay for it
+    if settings.EMBEDDING_WARMUP_ENABLED:
+        try:
+            report = query_service.vn.warm_up_embeddings()
+            logger.info(
+                f"✓ Embedding model warmed ({settings.EMBEDDING_BACKEND}, {report['warm_up_ms']}ms, "
+                f"{report['benchmark']['single_per_second']} questions/s)"
+            )
+        except Exception as e:
+            logger.warning(f"Could not warm up embedding model: {e}")
+
+    # Mine parameterized SQL templates from the Q&A pairs
+    try:
+        mined = query_service.vn.load_sql_templates()
+        logger.info(f"✓ SQL templates mined ({mined})")
+    except Exception as e:
+        logger.warning(f"Could not mine SQL templates: {e}")
+
+    # Apply edits to the training files live
+    if settings.TRAINING_WATCH_ENABLED:
+        global training_watcher
+        training_watcher = make_training_sync(query_service.vn)
+        training_watcher.start_watching(settings.TRAINING_WATCH_INTERVAL)
+
+    # Pre-start Claude clients so the first query skips the agent handshake
+    try:
+        spawned = await llm_service.warm_up()
+        logger.info(f"✓ Claude client pool warmed ({spawned} clients)")
+    except Exception as e:
+        logger.warning(f"Could not warm Claude client pool: {e}")
+
     logger.info("="*50)
     logger.info(f"Server ready at http://localhost:8000")
     logger.info(f"API docs at http://localhost:8000/docs")
@@ -116,9 +151,19 @@ async def shutdown_event():
     """Cleanup on application shutdown."""
     logger.info("Shutting down Detomo SQL AI...")
 
+    if training_watcher is not None:
+        training_watcher.stop_watching()
+
+    # Disconnect pooled Claude clients
+    await llm_service.shutdown()
+    logger.info("Claude client pool closed")
+
     # Shutdown thread pool executor
     if query_service.executor:
         query_service.executor.shutdown(wait=True)
         logger.info("Thread pool executor shut down")
 
+    if query_service.vn is not None:
+        query_service.vn.retriever.shutdown()
+
     logger.info("Shutdown complete")
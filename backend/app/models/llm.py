@@ -3,6 +3,7 @@ LLM endpoint models (internal /generate endpoint for Vanna).
 """
 
 from pydantic import BaseModel, Field
+from typing import Dict, Any, List, Optional
 
 
 class GenerateRequest(BaseModel):
@@ -11,9 +12,56 @@ class GenerateRequest(BaseModel):
     model: str = Field(default="claude-sonnet-4-5", description="Claude model to use")
     temperature: float = Field(default=0.1, ge=0.0, le=1.0, description="Temperature for generation")
     max_tokens: int = Field(default=2048, gt=0, description="Maximum tokens to generate")
+    purpose: Optional[str] = Field(default=None, description="Call purpose for admission priority: sql, plotly, questions or followup")
+    coalesce: bool = Field(default=True, description="Share an identical in-flight call (false for hedged calls, so the loser can be cancelled)")
 
 
 class GenerateResponse(BaseModel):
     """Response from LLM generation."""
     text: str = Field(..., description="Generated text from Claude")
     model: str = Field(..., description="Model used for generation")
+
+
+class GenerateBatchRequest(BaseModel):
+    """Request for generating several prompts at once."""
+    prompts: List[str] = Field(..., min_length=1, description="Prompts to send to Claude")
+    model: str = Field(default="claude-sonnet-4-5", description="Claude model to use")
+    temperature: float = Field(default=0.1, ge=0.0, le=1.0, description="Temperature for generation")
+    max_tokens: int = Field(default=2048, gt=0, description="Maximum tokens to generate")
+    purpose: Optional[str] = Field(default=None, description="Call purpose for admission priority: sql, plotly, questions or followup")
+    max_concurrency: Optional[int] = Field(default=None, gt=0, description="Prompts in flight at once (capped by the server)")
+
+
+class GenerateBatchItem(BaseModel):
+    """Result for one prompt of a batch."""
+    index: int = Field(..., description="Position of the prompt in the request")
+    text: Optional[str] = Field(None, description="Generated text, if the prompt succeeded")
+    error: Optional[str] = Field(None, description="Error message, if the prompt failed")
+    retry_after: Optional[float] = Field(None, description="Seconds to wait before retrying a shed prompt")
+
+
+class GenerateBatchResponse(BaseModel):
+    """Response from batch LLM generation."""
+    results: List[GenerateBatchItem] = Field(..., description="Per-prompt results in request order")
+    model: str = Field(..., description="Model used for generation")
+    succeeded: int = Field(..., description="Number of prompts that succeeded")
+    failed: int = Field(..., description="Number of prompts that failed")
+
+
+class LLMStatsResponse(BaseModel):
+    """Metrics for the internal LLM layer."""
+    pool: Dict[str, Any] = Field(..., description="Claude client pool metrics")
+    cache: Dict[str, Any] = Field(..., description="Prompt-response cache metrics")
+    single_flight: Dict[str, Any] = Field(..., description="Coalescing of identical in-flight prompts")
+    scheduler: Dict[str, Any] = Field(..., description="Admission control queue depth and wait times")
+    client: Dict[str, Any] = Field(default_factory=dict, description="Vanna-side LLM client metrics")
+
+
+class LLMMetricsResponse(BaseModel):
+    """Per-call LLM latency and prompt-size histograms."""
+    window_seconds: float = Field(..., description="Rolling window summarized below")
+    total_calls: int = Field(..., description="Calls recorded since startup")
+    overall: Dict[str, Any] = Field(..., description="Summary across all calls in the window")
+    by_purpose: Dict[str, Dict[str, Any]] = Field(..., description="Summaries per call purpose")
+    by_model: Dict[str, Dict[str, Any]] = Field(..., description="Summaries per model")
+    recent: List[Dict[str, Any]] = Field(..., description="Most recent call records")
@@ -25,6 +25,8 @@ class QueryResponse(BaseModel):
     columns: List[str]
     visualization: Optional[Dict[str, Any]] = None
     row_count: int
+    context: Optional[Dict[str, Any]] = Field(default=None, description="SQL prompt context packing report (token usage and dropped items)")
+    from_template: bool = Field(default=False, description="True when the SQL came from a trained question or mined SQL template without calling the LLM")
 
 
 # ============================================
@@ -46,6 +48,8 @@ class GenerateSQLResponse(BaseModel):
     id: str = Field(..., description="Cache ID for this query")
     question: str
     sql: str
+    context: Optional[Dict[str, Any]] = Field(default=None, description="SQL prompt context packing report (token usage and dropped items)")
+    from_template: bool = Field(default=False, description="True when the SQL came from a trained question or mined SQL template without calling the LLM")
 
 
 class RunSQLRequest(BaseModel):
@@ -109,3 +113,22 @@ class QuestionHistoryItem(BaseModel):
 class GetQuestionHistoryResponse(BaseModel):
     """Response with question history."""
     history: List[QuestionHistoryItem]
+
+
+class RetrievalStatsResponse(BaseModel):
+    """Metrics for the vector retrieval stage of SQL generation."""
+    embedding_cache: Dict[str, Any] = Field(..., description="Question embedding LRU hit/miss counters and embedding time")
+    retrieval: Dict[str, Any] = Field(..., description="Concurrent lookup pool with per-stage outcomes and latency")
+    vector_snapshot: Dict[str, Any] = Field(..., description="In-memory vector snapshot sizes and rebuild counts")
+    ddl_graph: Dict[str, Any] = Field(
+        default_factory=dict, description="Foreign-key DDL expansion: graph size and DDL retrieved vs sent"
+    )
+    lexical: Dict[str, Any] = Field(
+        default_factory=dict, description="BM25 index sizes and average query time"
+    )
+    embedding_backend: Dict[str, Any] = Field(
+        default_factory=dict, description="Embedding backend, startup warm-up time and embeddings per second"
+    )
+    retrieval_cache: Dict[str, Any] = Field(
+        default_factory=dict, description="Retrieved-context cache hit/miss counters and the training generation"
+    )
@@ -18,12 +18,15 @@ class TrainResponse(BaseModel):
     """Response after adding training data."""
     status: str
     message: str
+    training_generation: Optional[int] = Field(None, description="Training generation after the change")
 
 
 class GetTrainingDataResponse(BaseModel):
-    """Response with all training data."""
+    """Response with a page of training data."""
     training_data: List[Dict[str, Any]]
     count: int
+    total: Optional[int] = Field(None, description="Items matching the filters, across all pages")
+    next_cursor: Optional[str] = Field(None, description="Cursor of the next page (None on the last page)")
 
 
 class RemoveTrainingDataRequest(BaseModel):
@@ -35,3 +38,11 @@ class RemoveTrainingDataResponse(BaseModel):
     """Response after removing training data."""
     status: str
     message: str
+    training_generation: Optional[int] = Field(None, description="Training generation after the change")
+
+
+class GetSQLTemplatesResponse(BaseModel):
+    """Response with the mined SQL templates."""
+    enabled: bool
+    count: int
+    templates: List[Dict[str, Any]]
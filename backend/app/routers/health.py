@@ -61,7 +61,7 @@ async def api_health():
             "status": "healthy",
             "service": "Detomo SQL AI",
             "version": "3.0.0",
-            "llm_endpoint": "http://localhost:8000/generate",
+            "llm_endpoint": "in-process",
             "database": "data/chinook.db - Connected",
             "training_data_count": 93
         }
@@ -87,7 +87,7 @@ async def api_health():
             status="healthy",
             service=settings.APP_NAME,
             version=settings.VERSION,
-            llm_endpoint="http://localhost:8000/generate",
+            llm_endpoint=query_service.vn.transport.describe(),
             database=db_status,
             training_data_count=training_count
         )
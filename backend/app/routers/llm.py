@@ -4,30 +4,74 @@ LLM router for internal Vanna endpoint.
 Provides the /generate endpoint used by Vanna's ClaudeAgentChat class.
 """
 
+import asyncio
 import logging
-from fastapi import APIRouter, HTTPException
-from ..models.llm import GenerateRequest, GenerateResponse
-from ..services.llm_service import LLMService
+from typing import Any, Awaitable
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from src.sse import format_sse
+from src.llm_scheduler import LLMOverloadedError
+from ..core.config import settings
+from ..models.llm import (
+    GenerateRequest, GenerateResponse,
+    GenerateBatchRequest, GenerateBatchResponse, GenerateBatchItem,
+    LLMStatsResponse, LLMMetricsResponse
+)
+from ..services.llm_service import llm_service
+from ..services.query_service import query_service
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["llm"])
 
+# Seconds between checks for a client that went away mid-call
+DISCONNECT_POLL_SECONDS = 0.5
+
+
+async def _cancel_on_disconnect(http_request: Request, awaitable: Awaitable[Any]) -> Any:
+    """
+    Await a call, cancelling it if the client disconnects first.
+
+    A hedging client drops the losing request; without this the handler
+    would keep running the LLM call, holding its scheduler slot and pooled
+    client, for an answer nobody reads.
+
+    Raises:
+        HTTPException 499: If the client disconnected
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                logger.info("Client disconnected, cancelling LLM call")
+                raise HTTPException(status_code=499, detail="Client closed request")
+    finally:
+        if not task.done():
+            task.cancel()
+
 
 @router.post("/generate", response_model=GenerateResponse)
-async def generate(request: GenerateRequest):
+async def generate(request: GenerateRequest, http_request: Request):
     """
     LLM endpoint for Vanna using Claude Agent SDK.
 
     Receives prompt from Vanna, uses Claude Agent SDK, returns text.
-    No database access, no tools, just simple LLM inference.
+    No database access, no tools, just simple LLM inference. The call is
+    cancelled if the client disconnects (e.g. it lost a hedge race).
 
     Args:
         request (GenerateRequest): LLM generation request
+        http_request (Request): Raw request, watched for disconnects
 
     Returns:
         GenerateResponse: Generated text from Claude
 
+    Raises:
+        HTTPException 429: If admission control shed the call (with Retry-After)
+
     Example:
         POST /generate
         {
@@ -49,16 +93,225 @@ async def generate(request: GenerateRequest):
     logger.info(f"Received request - Model: {request.model}, Prompt length: {len(request.prompt)}")
 
     try:
-        result = await LLMService.call_claude_agent(
+        result = await _cancel_on_disconnect(http_request, llm_service.call_claude_agent(
             request.prompt,
             request.model,
             request.temperature,
-            request.max_tokens
-        )
+            request.max_tokens,
+            purpose=request.purpose,
+            coalesce=request.coalesce
+        ))
 
         logger.info(f"Generated response - Length: {len(result['text'])}")
         return GenerateResponse(**result)
 
+    except HTTPException:
+        raise
+    except LLMOverloadedError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": e.retry_after_header})
     except Exception as e:
         logger.error(f"Error generating response: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/generate/stream")
+async def generate_stream(request: GenerateRequest):
+    """
+    Streaming variant of /generate using Server-Sent Events.
+
+    Events:
+        token: {"text": "..."} for each generated chunk
+        done:  {"text": "<full text>", "model": "..."} when generation ends
+        error: {"detail": "..."} if generation fails mid-stream
+               (plus "retry_after" when the call was shed)
+
+    Args:
+        request (GenerateRequest): LLM generation request
+
+    Returns:
+        StreamingResponse: text/event-stream response
+
+    Example:
+        POST /generate/stream
+        {"prompt": "Generate SQL for: How many customers?"}
+
+        Response:
+        event: token
+        data: {"text": "SELECT COUNT(*)"}
+
+        event: token
+        data: {"text": " FROM Customer"}
+
+        event: done
+        data: {"text": "SELECT COUNT(*) FROM Customer", "model": "claude-sonnet-4-5"}
+    """
+    if not request.prompt:
+        raise HTTPException(status_code=400, detail="Missing prompt")
+
+    logger.info(f"Received stream request - Model: {request.model}, Prompt length: {len(request.prompt)}")
+
+    async def event_stream():
+        text = ""
+        try:
+            async for chunk in llm_service.stream_claude_agent(
+                request.prompt,
+                request.model,
+                request.temperature,
+                request.max_tokens,
+                purpose=request.purpose
+            ):
+                text += chunk
+                yield format_sse("token", {"text": chunk})
+
+            yield format_sse("done", {"text": text.strip(), "model": request.model})
+
+        except LLMOverloadedError as e:
+            yield format_sse("error", {"detail": str(e), "retry_after": e.retry_after})
+        except Exception as e:
+            logger.error(f"Error streaming response: {str(e)}")
+            yield format_sse("error", {"detail": str(e)})
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+@router.post("/generate/batch", response_model=GenerateBatchResponse)
+async def generate_batch(request: GenerateBatchRequest):
+    """
+    Generate text for several prompts in one request.
+
+    Prompts run concurrently up to max_concurrency (capped by
+    LLM_BATCH_MAX_CONCURRENCY). A failing prompt is reported in its own
+    result item instead of failing the whole batch.
+
+    Args:
+        request (GenerateBatchRequest): Prompts and generation settings
+
+    Returns:
+        GenerateBatchResponse: Per-prompt results in request order
+
+    Example:
+        POST /generate/batch
+        {
+            "prompts": ["Generate SQL for: How many customers?", "Generate SQL for: How many albums?"],
+            "max_concurrency": 4
+        }
+
+        Response:
+        {
+            "results": [
+                {"index": 0, "text": "SELECT COUNT(*) FROM Customer", "error": null},
+                {"index": 1, "text": "SELECT COUNT(*) FROM Album", "error": null}
+            ],
+            "model": "claude-sonnet-4-5",
+            "succeeded": 2,
+            "failed": 0
+        }
+    """
+    if len(request.prompts) > settings.LLM_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many prompts: {len(request.prompts)} (max {settings.LLM_BATCH_MAX_SIZE})"
+        )
+    if any(not prompt for prompt in request.prompts):
+        raise HTTPException(status_code=400, detail="Missing prompt")
+
+    logger.info(f"Received batch request - Model: {request.model}, Prompts: {len(request.prompts)}")
+
+    results = await llm_service.call_claude_agent_batch(
+        request.prompts,
+        request.model,
+        request.temperature,
+        request.max_tokens,
+        purpose=request.purpose,
+        max_concurrency=request.max_concurrency
+    )
+
+    failed = sum(1 for item in results if item["error"] is not None)
+    logger.info(f"Batch complete - {len(results) - failed} succeeded, {failed} failed")
+
+    return GenerateBatchResponse(
+        results=[GenerateBatchItem(**item) for item in results],
+        model=request.model,
+        succeeded=len(results) - failed,
+        failed=failed
+    )
+
+
+@router.get("/generate/stats", response_model=LLMStatsResponse)
+async def generate_stats():
+    """
+    Metrics for the internal LLM layer.
+
+    Returns:
+        LLMStatsResponse: Client pool size, waiters and spawn timings;
+            response cache hit/miss counters; coalesced call counts;
+            scheduler queue depth and wait times
+
+    Example:
+        GET /generate/stats
+
+        Response:
+        {
+            "pool": {
+                "max_size": 4,
+                "max_age": 600.0,
+                "max_uses": 25,
+                "models": {
+                    "claude-sonnet-4-5": {"size": 2, "idle": 1, "in_use": 1, "waiters": 0, ...}
+                }
+            },
+            "cache": {"hits": 12, "misses": 3, "hit_rate": 0.8, "entries": 15, ...},
+            "single_flight": {"calls": 15, "coalesced": 9, "in_flight": 0},
+            "scheduler": {"active": 4, "queue_depth": 2, "classes": {"sql": {"avg_wait_ms": 12.5, ...}, ...}},
+            "client": {
+                "transport": {},
+                "single_flight": {"threaded": {...}, "async": {...}},
+                "router": {"decisions": [{"purpose": "sql", "model": "claude-sonnet-4-5", "reason": "default", "count": 12}], ...}
+            }
+        }
+    """
+    stats = llm_service.get_stats()
+    if query_service.vn is not None:
+        stats["client"] = query_service.vn.llm_stats()
+    return LLMStatsResponse(**stats)
+
+
+@router.get("/generate/metrics", response_model=LLMMetricsResponse)
+async def generate_metrics():
+    """
+    Per-call latency and prompt-size histograms for the LLM layer.
+
+    Each summary has call counts by outcome (ok, cache_hit, coalesced,
+    shed, error, cancelled) and histograms with p50/p95/p99 for total
+    latency, time-to-first-token, queue wait, prompt characters and
+    estimated prompt tokens. Latency and TTFT only count calls that
+    reached the model.
+
+    Returns:
+        LLMMetricsResponse: Rolling-window summaries overall, per purpose
+            and per model
+
+    Example:
+        GET /generate/metrics
+
+        Response:
+        {
+            "window_seconds": 900.0,
+            "total_calls": 42,
+            "overall": {"calls": 42, "outcomes": {"ok": 30, "cache_hit": 12}, ...},
+            "by_purpose": {
+                "sql": {
+                    "calls": 20,
+                    "latency_ms": {"count": 14, "p50": 2100.0, "p95": 4800.0, ...},
+                    "ttft_ms": {...},
+                    "queue_wait_ms": {...},
+                    "prompt_tokens": {"p50": 1800.0, ...},
+                    ...
+                },
+                "plotly": {...}
+            },
+            "by_model": {"claude-sonnet-4-5": {...}},
+            "recent": [{"purpose": "sql", "latency_ms": 2104.3, "outcome": "ok", ...}]
+        }
+    """
+    return LLMMetricsResponse(**llm_service.get_metrics())
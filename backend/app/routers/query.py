@@ -16,9 +16,12 @@ from ..models.query import (
     GeneratePlotlyFigureRequest, GeneratePlotlyFigureResponse,
     GenerateFollowupQuestionsRequest, GenerateFollowupQuestionsResponse,
     LoadQuestionRequest, LoadQuestionResponse,
-    GetQuestionHistoryResponse, QuestionHistoryItem
+    GetQuestionHistoryResponse, QuestionHistoryItem,
+    RetrievalStatsResponse
 )
 from ..services.query_service import query_service
+from src.sse import format_sse
+from src.llm_scheduler import LLMOverloadedError
 
 logger = logging.getLogger(__name__)
 
@@ -57,12 +60,22 @@ async def query(request: QueryRequest):
             "results": [{"COUNT(*)": 59}],
             "columns": ["COUNT(*)"],
             "visualization": {...},
-            "row_count": 1
+            "row_count": 1,
+            "context": {
+                "budget_tokens": 3000,
+                "used_tokens": 1840,
+                "dropped_tokens": 2210,
+                "kept": {"question_sql": 6, "ddl": 4, "documentation": 1},
+                "dropped": [{"kind": "documentation", "rank": 1, "score": 0.21, "tokens": 1650, "preview": "..."}, ...]
+            },
+            "from_template": false
         }
     """
     try:
         result = await query_service.query(request.question, request.language)
         return QueryResponse(**result)
+    except LLMOverloadedError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": e.retry_after_header})
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -70,6 +83,53 @@ async def query(request: QueryRequest):
         raise HTTPException(status_code=500, detail=f"Query failed: {str(e)}")
 
 
+@router.post("/stream")
+async def query_stream(request: QueryRequest):
+    """
+    Streaming variant of the all-in-one query endpoint (Server-Sent Events).
+
+    SQL tokens are forwarded as the LLM produces them, then rows are sent
+    in batches and the visualization last.
+
+    Events:
+        sql_token: {"text": "..."}
+        sql:       {"id": "...", "sql": "...", "context": {...} or null, "from_template": false}
+        rows:      {"columns": [...], "rows": [...]}
+        figure:    {"figure": {...} | null}
+        done:      {"id": "...", "row_count": 1}
+        error:     {"detail": "..."}
+
+    Args:
+        request (QueryRequest): Query request with question
+
+    Returns:
+        StreamingResponse: text/event-stream response
+
+    Example:
+        POST /api/v0/query/stream
+        {
+            "question": "How many customers are there?",
+            "language": "en"
+        }
+    """
+    try:
+        events = query_service.query_stream(request.question)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def event_stream():
+        try:
+            async for event, data in events:
+                yield format_sse(event, data)
+        except LLMOverloadedError as e:
+            yield format_sse("error", {"detail": str(e), "retry_after": e.retry_after})
+        except Exception as e:
+            logger.error(f"Error streaming query: {str(e)}")
+            yield format_sse("error", {"detail": f"Query failed: {str(e)}"})
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
 # ============================================
 # MULTI-STEP WORKFLOW ENDPOINTS
 # ============================================
@@ -125,12 +185,16 @@ async def generate_sql(request: GenerateSQLRequest):
         {
             "id": "abc-123-def",
             "question": "How many customers are there?",
-            "sql": "SELECT COUNT(*) FROM Customer"
+            "sql": "SELECT COUNT(*) FROM Customer",
+            "context": {"budget_tokens": 3000, "used_tokens": 1840, "dropped": [...], ...},
+            "from_template": false
         }
     """
     try:
         result = await query_service.generate_sql(request.question)
         return GenerateSQLResponse(**result)
+    except LLMOverloadedError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": e.retry_after_header})
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -240,6 +304,8 @@ async def generate_followup_questions(request: GenerateFollowupQuestionsRequest)
             request.df
         )
         return GenerateFollowupQuestionsResponse(questions=questions)
+    except LLMOverloadedError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": e.retry_after_header})
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -311,6 +377,75 @@ async def get_question_history():
         raise HTTPException(status_code=500, detail=f"Failed to get question history: {str(e)}")
 
 
+@router.get("/retrieval_stats", response_model=RetrievalStatsResponse)
+async def get_retrieval_stats():
+    """
+    Metrics for the retrieval stage of SQL generation.
+
+    Returns:
+        RetrievalStatsResponse: Question embedding cache metrics and
+            per-stage (embedding, sql, ddl, documentation) outcomes and
+            latency, to spot the slowest store; vector snapshot sizes;
+            DDL documents retrieved vs sent after foreign-key expansion;
+            BM25 index sizes and query time; embedding backend warm-up
+            and throughput; retrieval cache hits and training generation
+
+    Example:
+        GET /api/v0/query/retrieval_stats
+
+        Response:
+        {
+            "embedding_cache": {
+                "hits": 40, "misses": 12, "hit_rate": 0.769, "entries": 12,
+                "max_size": 1024, "evictions": 0, "embed_ms_total": 310.4, "embed_ms_avg": 25.87
+            },
+            "retrieval": {
+                "workers": 6,
+                "timeout": 5.0,
+                "stages": {
+                    "ddl": {
+                        "outcomes": {"ok": 52, "error": 0, "timeout": 0, "cancelled": 0},
+                        "latency_ms": {"count": 52, "p50": 4.1, "p95": 9.8, ...}
+                    },
+                    "documentation": {...},
+                    "embedding": {...},
+                    "sql": {...}
+                }
+            },
+            "vector_snapshot": {
+                "dtype": "float32",
+                "rebuilds": 3,
+                "queries": 156,
+                "collections": {"ddl": {"items": 12, "bytes": 18432, "built_at": 1760000000.0, "stale": false}, ...}
+            },
+            "ddl_graph": {
+                "seed_tables": 3, "max_tables": 6, "tables": 11, "foreign_keys": 11, "rebuilds": 1,
+                "expansions": 52, "bridges_added": 31, "ddl_retrieved_avg": 10.0, "ddl_sent_avg": 4.6
+            },
+            "lexical": {
+                "rebuilds": 3, "queries": 156, "query_ms_avg": 0.04,
+                "collections": {"sql": {"items": 70, "terms": 269, "stale": false}, ...}
+            },
+            "embedding_backend": {
+                "backend": "onnx", "warmed_up": true, "warm_up_ms": 812.4,
+                "benchmark": {"texts": 8, "rounds": 3, "single_per_second": 212.4, "single_ms": 4.71,
+                              "batch_per_second": 655.0, "batch_ms": 1.53}
+            },
+            "retrieval_cache": {
+                "hits": 31, "misses": 21, "hit_rate": 0.596, "stale": 2, "entries": 19,
+                "max_size": 512, "evictions": 0, "training_generation": 95
+            }
+        }
+    """
+    try:
+        return RetrievalStatsResponse(**query_service.get_retrieval_stats())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error getting retrieval stats: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get retrieval stats: {str(e)}")
+
+
 @router.get("/download_csv/{id}")
 async def download_csv(id: str):
     """
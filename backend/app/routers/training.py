@@ -3,10 +3,11 @@ Training router for managing Vanna training data.
 """
 
 import logging
-from fastapi import APIRouter, HTTPException
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
 from ..models.training import (
     TrainRequest, TrainResponse,
-    GetTrainingDataResponse,
+    GetTrainingDataResponse, GetSQLTemplatesResponse,
     RemoveTrainingDataRequest, RemoveTrainingDataResponse
 )
 from ..services.training_service import training_service
@@ -67,27 +68,50 @@ async def train(request: TrainRequest):
 
 
 @router.get("", response_model=GetTrainingDataResponse)
-async def get_training_data():
+async def get_training_data(
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size (omit for all items)"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    type: Optional[str] = Query(None, description="sql, ddl or documentation"),
+    q: Optional[str] = Query(None, description="Case-insensitive substring of question or content"),
+    fields: Optional[str] = Query(None, description="Comma-separated subset of id,training_data_type,question,content")
+):
     """
-    Get all training data.
+    Get training data, optionally paginated, filtered and projected.
+
+    Without query parameters every item is returned.
+
+    Args:
+        limit (int, optional): Page size
+        cursor (str, optional): next_cursor of the previous page
+        type (str, optional): Training data type filter
+        q (str, optional): Text search over question and content
+        fields (str, optional): Fields to return
 
     Returns:
-        GetTrainingDataResponse: All training data with count
+        GetTrainingDataResponse: Training data with count, total and next_cursor
 
     Example:
-        GET /api/v0/training
+        GET /api/v0/training?type=sql&q=customer&fields=id,question&limit=2
 
         Response:
         {
             "training_data": [
-                {"id": "1", "training_data_type": "sql", ...},
-                {"id": "2", "training_data_type": "ddl", ...}
+                {"id": "0c4e...-sql", "question": "How many customers are from USA?"},
+                {"id": "1a9f...-sql", "question": "Top 5 customers by total spending"}
             ],
-            "count": 93
+            "count": 2,
+            "total": 14,
+            "next_cursor": "WzAsICIxYTlm..."
         }
     """
     try:
-        result = training_service.get_training_data()
+        result = training_service.get_training_data(
+            limit=limit,
+            cursor=cursor,
+            training_data_type=type,
+            search=q,
+            fields=fields
+        )
         return GetTrainingDataResponse(**result)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -96,6 +120,42 @@ async def get_training_data():
         raise HTTPException(status_code=500, detail=f"Failed to get training data: {str(e)}")
 
 
+@router.get("/templates", response_model=GetSQLTemplatesResponse)
+async def get_sql_templates():
+    """
+    Get the parameterized SQL templates mined from the Q&A pairs.
+
+    Returns:
+        GetSQLTemplatesResponse: Templates with their slots
+
+    Example:
+        GET /api/v0/training/templates
+
+        Response:
+        {
+            "enabled": true,
+            "count": 9,
+            "templates": [
+                {
+                    "id": "...-sql",
+                    "question": "How many customers are from USA?",
+                    "skeleton": "how many customers are from {}",
+                    "slots": [{"kind": "text", "table": "customers", "column": "Country"}]
+                },
+                ...
+            ]
+        }
+    """
+    try:
+        result = training_service.get_sql_templates()
+        return GetSQLTemplatesResponse(**result)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error getting SQL templates: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to get SQL templates: {str(e)}")
+
+
 @router.delete("/{id}", response_model=RemoveTrainingDataResponse)
 async def remove_training_data(id: str):
     """
@@ -1,122 +1,66 @@
 """
 Auto-training service for loading training data on startup.
 
-Automatically loads training data from filesystem into ChromaDB
-if the database is empty.
+Syncs the training files into ChromaDB through a content-hash manifest:
+only new or changed items are embedded and removed items are deleted.
+With TRAINING_WATCH_ENABLED the files are watched and synced live.
 """
 
 import logging
-import json
 from pathlib import Path
-from typing import Optional
 from src.detomo_vanna import DetomoVanna
+from src.training_sync import TrainingSync
+from ..core.config import settings
 
 logger = logging.getLogger(__name__)
 
+MANIFEST_NAME = "training_manifest.json"
+
+
+def make_training_sync(vn: DetomoVanna) -> TrainingSync:
+    """
+    Build the sync of TRAINING_DATA_DIR into a Vanna instance.
+
+    The manifest lives inside the vector store directory, so deleting the
+    store deletes the manifest with it.
+
+    Args:
+        vn: DetomoVanna instance
+
+    Returns:
+        TrainingSync: The sync
+    """
+    return TrainingSync(vn, settings.TRAINING_DATA_DIR, Path(settings.VECTOR_DB_PATH) / MANIFEST_NAME)
+
 
 def auto_load_training_data(vn: DetomoVanna, force: bool = False) -> int:
     """
-    Automatically load training data if ChromaDB is empty.
-    
+    Sync training data from the filesystem into ChromaDB.
+
     Args:
         vn: DetomoVanna instance
-        force: Force reload even if data exists
-    
+        force: Ignore the manifest and check every item against the store
+
     Returns:
-        int: Number of training items loaded
+        int: Number of training items in the database
     """
     try:
-        # Check existing data
-        existing_data = vn.get_training_data()
-        existing_count = len(existing_data)
-        
-        if existing_count > 0 and not force:
-            logger.info(f"✓ Training data already exists ({existing_count} items)")
-            return existing_count
-        
-        logger.info("=" * 60)
-        logger.info("AUTO-LOADING TRAINING DATA")
-        logger.info("=" * 60)
-        
-        total_loaded = 0
-        
-        # Load DDL files
-        ddl_dir = Path("training_data/chinook/ddl")
-        if ddl_dir.exists():
-            logger.info(f"\n[1/3] Loading DDL files...")
-            ddl_count = 0
-            for ddl_file in sorted(ddl_dir.glob("*.sql")):
-                try:
-                    with open(ddl_file, 'r', encoding='utf-8') as f:
-                        ddl_content = f.read()
-                        vn.train(ddl=ddl_content)
-                        ddl_count += 1
-                        logger.info(f"  ✓ {ddl_file.name}")
-                except Exception as e:
-                    logger.error(f"  ✗ Failed to load {ddl_file.name}: {e}")
-            
-            logger.info(f"✓ Loaded {ddl_count} DDL files")
-            total_loaded += ddl_count
-        else:
-            logger.warning(f"DDL directory not found: {ddl_dir}")
-        
-        # Load Documentation files
-        doc_dir = Path("training_data/chinook/documentation")
-        if doc_dir.exists():
-            logger.info(f"\n[2/3] Loading documentation files...")
-            doc_count = 0
-            for doc_file in sorted(doc_dir.glob("*.md")):
-                try:
-                    with open(doc_file, 'r', encoding='utf-8') as f:
-                        doc_content = f.read()
-                        vn.train(documentation=doc_content)
-                        doc_count += 1
-                        logger.info(f"  ✓ {doc_file.name}")
-                except Exception as e:
-                    logger.error(f"  ✗ Failed to load {doc_file.name}: {e}")
-            
-            logger.info(f"✓ Loaded {doc_count} documentation files")
-            total_loaded += doc_count
-        else:
-            logger.warning(f"Documentation directory not found: {doc_dir}")
-        
-        # Load Q&A pairs
-        qa_dir = Path("training_data/chinook/questions")
-        if qa_dir.exists():
-            logger.info(f"\n[3/3] Loading Q&A pairs...")
-            qa_count = 0
-            for qa_file in sorted(qa_dir.glob("*.json")):
-                try:
-                    with open(qa_file, 'r', encoding='utf-8') as f:
-                        qa_pairs = json.load(f)
-                        for pair in qa_pairs:
-                            if "question" not in pair or "sql" not in pair:
-                                logger.warning(f"Skipping invalid pair in {qa_file.name}")
-                                continue
-                            vn.train(
-                                question=pair["question"],
-                                sql=pair["sql"]
-                            )
-                            qa_count += 1
-                        logger.info(f"  ✓ {qa_file.name}: {len(qa_pairs)} pairs")
-                except Exception as e:
-                    logger.error(f"  ✗ Failed to load {qa_file.name}: {e}")
-            
-            logger.info(f"✓ Loaded {qa_count} Q&A pairs")
-            total_loaded += qa_count
-        else:
-            logger.warning(f"Questions directory not found: {qa_dir}")
-        
-        # Verify
-        logger.info("\n" + "=" * 60)
-        final_data = vn.get_training_data()
-        final_count = len(final_data)
-        logger.info(f"✅ AUTO-LOAD COMPLETE: {final_count} items in database")
-        logger.info("=" * 60)
-        
+        training_dir = Path(settings.TRAINING_DATA_DIR)
+        if not training_dir.exists():
+            logger.warning(f"Training data directory not found: {training_dir}")
+
+        report = make_training_sync(vn).sync(force=force)
+        if report["failed_files"]:
+            logger.warning(f"Unreadable training files kept as before: {', '.join(report['failed_files'])}")
+
+        final_count = vn.list_training_data(limit=1, fields="id")["total"]
+        logger.info(
+            f"✓ Training data synced: {report['added']} added ({report['embedded']} embedded), "
+            f"{report['removed']} removed, {report['unchanged']} unchanged in {report['total_ms']}ms; "
+            f"{final_count} items in database"
+        )
         return final_count
-        
+
     except Exception as e:
         logger.error(f"❌ Auto-load training data failed: {e}")
         return 0
-
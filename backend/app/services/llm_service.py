@@ -1,86 +1,378 @@
 """
 LLM service for calling Claude Agent SDK.
 
-Provides the internal /generate endpoint for Vanna.
+Provides the internal /generate endpoint for Vanna. Agent clients are kept
+in a warm pool so steady-state calls skip the subprocess startup, and
+responses can be streamed token by token. Low-temperature responses are
+served from a persistent prompt-response cache when possible, identical
+concurrent prompts share a single in-flight call, and calls that do reach
+the model are admitted by a priority scheduler. Every call is recorded
+with its purpose, prompt size, queue wait, time-to-first-token, latency and
+outcome in rolling metrics.
 """
 
+import asyncio
 import logging
-from claude_agent_sdk import ClaudeSDKClient, ClaudeAgentOptions, AssistantMessage, TextBlock
-from typing import Dict, Any
+import uuid
+from contextlib import nullcontext
+from claude_agent_sdk import ClaudeSDKClient, ClaudeAgentOptions, AssistantMessage, TextBlock, StreamEvent
+from typing import Dict, Any, AsyncIterator, List, Optional
+from src.llm_pool import ClaudeClientPool
+from src.llm_cache import ResponseCache, make_cache_key
+from src.single_flight import AsyncSingleFlight
+from src.llm_scheduler import LLMScheduler, LLMOverloadedError
+from src.llm_metrics import (
+    LLMMetrics, OUTCOME_OK, OUTCOME_CACHE_HIT, OUTCOME_COALESCED,
+    OUTCOME_SHED, OUTCOME_ERROR, OUTCOME_CANCELLED
+)
+from ..core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Simple system prompt for SQL generation
+SQL_SYSTEM_PROMPT = """You are a SQL expert. Generate accurate SQL queries based on the given context.
+
+Rules:
+- Generate ONLY the SQL query, no explanation
+- Use proper SQL syntax
+- Follow the database schema provided in the prompt
+- Use similar examples as reference when provided"""
+
+
+def create_agent_client(model: str) -> ClaudeSDKClient:
+    """
+    Create an unconnected Agent SDK client for the pool.
+
+    Uses minimal configuration - no tools, no complex system prompt.
+    API key is automatically obtained from Claude Code environment.
+
+    Args:
+        model (str): Claude model to use
+
+    Returns:
+        ClaudeSDKClient: Client configured for single-turn generation
+    """
+    options = ClaudeAgentOptions(
+        system_prompt=SQL_SYSTEM_PROMPT,
+        model=model,
+        max_turns=1,  # Single turn - just generate SQL
+        permission_mode="bypassPermissions",  # No permission prompts needed
+        include_partial_messages=True  # Emit StreamEvents for token streaming
+    )
+    return ClaudeSDKClient(options=options)
+
 
 class LLMService:
     """Service for LLM generation using Claude Agent SDK."""
 
-    @staticmethod
+    def __init__(self):
+        """Initialize LLM service with a warm client pool and response cache."""
+        self.pool = ClaudeClientPool(
+            client_factory=create_agent_client,
+            max_size=settings.LLM_POOL_MAX_SIZE,
+            max_age=settings.LLM_POOL_MAX_AGE_SECONDS,
+            max_uses=settings.LLM_POOL_MAX_USES,
+            acquire_timeout=settings.LLM_POOL_ACQUIRE_TIMEOUT
+        )
+        self.cache: Optional[ResponseCache] = None
+        if settings.LLM_CACHE_ENABLED:
+            self.cache = ResponseCache(
+                path=settings.LLM_CACHE_PATH or None,
+                memory_size=settings.LLM_CACHE_MEMORY_SIZE,
+                max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+                ttl=settings.LLM_CACHE_TTL_SECONDS,
+                max_temperature=settings.LLM_CACHE_MAX_TEMPERATURE
+            )
+        self.single_flight = AsyncSingleFlight()
+        self.scheduler: Optional[LLMScheduler] = None
+        if settings.LLM_SCHEDULER_ENABLED:
+            self.scheduler = LLMScheduler(
+                max_concurrency=settings.LLM_MAX_CONCURRENCY,
+                class_limits=settings.LLM_CLASS_LIMITS,
+                max_queue=settings.LLM_QUEUE_MAX_SIZE,
+                queue_timeout=settings.LLM_QUEUE_TIMEOUT
+            )
+        self.metrics = LLMMetrics(
+            window=settings.LLM_METRICS_WINDOW_SECONDS,
+            max_records=settings.LLM_METRICS_MAX_RECORDS
+        )
+
+    def _cache_key(self, prompt: str, model: str, temperature: float, max_tokens: int) -> Optional[str]:
+        """Get the cache key for a request, or None if it must not be cached."""
+        if self.cache is None:
+            return None
+        if not self.cache.is_cacheable(temperature):
+            self.cache.record_bypass()
+            return None
+        return make_cache_key(prompt, model, temperature, max_tokens)
+
     async def call_claude_agent(
+        self,
         prompt: str,
         model: str = "claude-sonnet-4-5",
         temperature: float = 0.1,
-        max_tokens: int = 2048
+        max_tokens: int = 2048,
+        purpose: Optional[str] = None,
+        coalesce: bool = True
     ) -> Dict[str, Any]:
         """
         Call Claude Agent SDK to generate SQL.
 
-        Uses minimal configuration - no tools, no complex system prompt.
-        Just basic LLM inference for Vanna.
+        Uses a pooled client for the requested model. Each call runs under
+        its own session id so pooled clients don't carry conversation
+        history from one prompt to the next. Identical low-temperature
+        prompts are answered from the response cache, and identical prompts
+        arriving while one is in flight wait for its result instead of
+        starting another call.
 
         Args:
             prompt (str): The prompt to send to Claude
             model (str): Claude model to use
             temperature (float): Temperature for generation
             max_tokens (int): Maximum tokens to generate
+            purpose (str): Call purpose ('sql', 'plotly', 'questions',
+                'followup'); sets the admission priority
+            coalesce (bool): Share an identical in-flight call; hedged
+                calls pass False so each attempt runs on its own and the
+                loser can really be cancelled
 
         Returns:
             dict: Response with 'text' and 'model' keys
 
+        Raises:
+            LLMOverloadedError: If the scheduler shed the call
+
         Note:
             API key is automatically obtained from Claude Code environment.
             No need to set ANTHROPIC_API_KEY in .env file.
 
         Example:
-            >>> result = await LLMService.call_claude_agent(
+            >>> result = await llm_service.call_claude_agent(
             ...     "Generate SQL for: How many customers?"
             ... )
             >>> print(result['text'])
             SELECT COUNT(*) FROM Customer
         """
-        # Simple system prompt for SQL generation
-        system_prompt = """You are a SQL expert. Generate accurate SQL queries based on the given context.
+        if not coalesce:
+            return await self._generate(prompt, model, temperature, max_tokens, purpose)
 
-Rules:
-- Generate ONLY the SQL query, no explanation
-- Use proper SQL syntax
-- Follow the database schema provided in the prompt
-- Use similar examples as reference when provided"""
+        key = make_cache_key(prompt, model, temperature, max_tokens)
+        # The leading call is recorded by stream_claude_agent(); followers
+        # only wait, so they get a record of their own
+        record = self.metrics.start(purpose, model, prompt) if self.single_flight.in_flight(key) else None
+        try:
+            result = await self.single_flight.do(
+                key,
+                lambda: self._generate(prompt, model, temperature, max_tokens, purpose)
+            )
+        except BaseException:
+            if record is not None:
+                record.finish(OUTCOME_ERROR)
+            raise
+        if record is not None:
+            record.finish(OUTCOME_COALESCED)
+        # Coalesced callers share the result; hand each its own copy
+        return dict(result)
+
+    async def call_claude_agent_batch(
+        self,
+        prompts: List[str],
+        model: str = "claude-sonnet-4-5",
+        temperature: float = 0.1,
+        max_tokens: int = 2048,
+        purpose: Optional[str] = None,
+        max_concurrency: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Generate text for several prompts concurrently.
+
+        Each prompt goes through call_claude_agent(), so the cache,
+        coalescing and admission control apply per item. A failing prompt
+        does not fail the batch.
+
+        Args:
+            prompts (list): Prompts to send
+            model (str): Claude model to use
+            temperature (float): Temperature for generation
+            max_tokens (int): Maximum tokens to generate
+            purpose (str): Call purpose for admission priority
+            max_concurrency (int): Prompts in flight at once (capped at
+                LLM_BATCH_MAX_CONCURRENCY)
+
+        Returns:
+            list: One dict per prompt, in order, with 'index', 'text' and
+                'error' keys ('retry_after' too when the item was shed)
+
+        Example:
+            >>> results = await llm_service.call_claude_agent_batch(
+            ...     ["Generate SQL for: How many customers?", "Generate SQL for: How many albums?"]
+            ... )
+            >>> [r['text'] for r in results]
+            ['SELECT COUNT(*) FROM Customer', 'SELECT COUNT(*) FROM Album']
+        """
+        limit = min(max_concurrency or settings.LLM_BATCH_MAX_CONCURRENCY, settings.LLM_BATCH_MAX_CONCURRENCY)
+        semaphore = asyncio.Semaphore(max(1, limit))
+
+        async def run(index: int, prompt: str) -> Dict[str, Any]:
+            async with semaphore:
+                try:
+                    result = await self.call_claude_agent(prompt, model, temperature, max_tokens, purpose)
+                    return {"index": index, "text": result["text"], "error": None}
+                except LLMOverloadedError as e:
+                    return {"index": index, "text": None, "error": str(e), "retry_after": e.retry_after}
+                except Exception as e:
+                    logger.error(f"Batch item {index} failed: {str(e)}")
+                    return {"index": index, "text": None, "error": str(e)}
 
-        # Configure Agent SDK with minimal options
-        # Note: API key is automatically obtained from Claude Code environment
-        options = ClaudeAgentOptions(
-            system_prompt=system_prompt,
-            model=model,
-            max_turns=1,  # Single turn - just generate SQL
-            permission_mode="bypassPermissions"  # No permission prompts needed
+        return list(await asyncio.gather(*[run(i, prompt) for i, prompt in enumerate(prompts)]))
+
+    async def _generate(
+        self,
+        prompt: str,
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        purpose: Optional[str]
+    ) -> Dict[str, Any]:
+        """Collect a full response from stream_claude_agent()."""
+        response_text = ""
+        async for chunk in self.stream_claude_agent(prompt, model, temperature, max_tokens, purpose):
+            response_text += chunk
+
+        return {
+            "text": response_text.strip(),
+            "model": model
+        }
+
+    async def stream_claude_agent(
+        self,
+        prompt: str,
+        model: str = "claude-sonnet-4-5",
+        temperature: float = 0.1,
+        max_tokens: int = 2048,
+        purpose: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream generated text from Claude Agent SDK as it arrives.
+
+        Yields text deltas from partial-message StreamEvents. If the SDK
+        delivers no deltas, the final AssistantMessage text is yielded
+        instead. Closing the iterator early discards the pooled client,
+        since the rest of its response would otherwise leak into the next
+        query.
+
+        Args:
+            prompt (str): The prompt to send to Claude
+            model (str): Claude model to use
+            temperature (float): Temperature for generation
+            max_tokens (int): Maximum tokens to generate
+            purpose (str): Call purpose; sets the admission priority
+
+        Yields:
+            str: Text chunks in generation order (a cache hit is yielded as
+                a single chunk)
+        """
+        record = self.metrics.start(purpose, model, prompt)
+        cache_key = self._cache_key(prompt, model, temperature, max_tokens)
+        if cache_key is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"LLM cache hit - Model: {model}, Prompt length: {len(prompt)}")
+                record.finish(OUTCOME_CACHE_HIT)
+                yield cached
+                return
+
+        chunks = []
+        admission = self.scheduler.slot(purpose) if self.scheduler is not None else nullcontext()
+        try:
+            async with admission as waited:
+                record.mark_queued(waited)
+                async for chunk in self._stream_from_pool(prompt, model):
+                    record.mark_first_token()
+                    chunks.append(chunk)
+                    yield chunk
+        except LLMOverloadedError:
+            record.finish(OUTCOME_SHED)
+            raise
+        except (asyncio.CancelledError, GeneratorExit):
+            record.finish(OUTCOME_CANCELLED)
+            raise
+        except Exception:
+            record.finish(OUTCOME_ERROR)
+            raise
+
+        record.finish(OUTCOME_OK)
+        logger.debug(
+            f"LLM call - Purpose: {record.purpose}, Model: {model}, Prompt tokens: ~{record.prompt_tokens}, "
+            f"Queue: {record.queue_wait_ms:.0f}ms, TTFT: {record.ttft_ms or 0:.0f}ms, Total: {record.latency_ms:.0f}ms"
         )
 
-        # Use Agent SDK (API key from Claude Code environment)
-        async with ClaudeSDKClient(options=options) as client:
+        # Only complete responses are stored; an aborted stream raises above
+        if cache_key is not None and chunks:
+            self.cache.set(cache_key, "".join(chunks), model)
+
+    async def _stream_from_pool(self, prompt: str, model: str) -> AsyncIterator[str]:
+        """Run one query on a pooled client, yielding text as it arrives."""
+        async with self.pool.client(model) as client:
             # Send query to agent
-            await client.query(prompt)
+            await client.query(prompt, session_id=str(uuid.uuid4()))
 
-            # Collect response
-            response_text = ""
+            streamed = False
             async for message in client.receive_response():
-                # Check if it's an AssistantMessage
-                if isinstance(message, AssistantMessage):
+                if isinstance(message, StreamEvent):
+                    event = message.event
+                    if event.get("type") == "content_block_delta":
+                        delta = event.get("delta", {})
+                        if delta.get("type") == "text_delta" and delta.get("text"):
+                            streamed = True
+                            yield delta["text"]
+
+                # Full message arrives after the deltas; only use it when
+                # nothing was streamed
+                elif isinstance(message, AssistantMessage) and not streamed:
                     for block in message.content:
                         # Extract text from TextBlock
                         if isinstance(block, TextBlock):
-                            response_text += block.text
+                            yield block.text
+
+    async def warm_up(self) -> int:
+        """
+        Pre-start pooled clients for the default model.
+
+        Returns:
+            int: Number of clients spawned
+        """
+        return await self.pool.warm_up(settings.CLAUDE_MODEL, settings.LLM_POOL_MIN_SIZE)
+
+    async def shutdown(self) -> None:
+        """Disconnect all pooled clients and close the response cache."""
+        await self.pool.close()
+        if self.cache is not None:
+            self.cache.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get LLM layer metrics.
+
+        Returns:
+            dict: Metrics grouped by component
+        """
+        return {
+            "pool": self.pool.stats(),
+            "cache": self.cache.stats() if self.cache is not None else {"enabled": False},
+            "single_flight": self.single_flight.stats(),
+            "scheduler": self.scheduler.stats() if self.scheduler is not None else {"enabled": False}
+        }
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Get per-call latency and prompt-size histograms.
+
+        Returns:
+            dict: Rolling-window summaries overall, per purpose and per model
+        """
+        return self.metrics.snapshot()
+
 
-            return {
-                "text": response_text.strip(),
-                "model": model
-            }
+# Global LLM service instance
+llm_service = LLMService()
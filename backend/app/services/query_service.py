@@ -7,15 +7,21 @@ Integrates with Vanna AI and manages query caching.
 import logging
 import asyncio
 import json
+import os
 import numpy as np
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, AsyncIterator, Tuple
 from concurrent.futures import ThreadPoolExecutor
 from src.detomo_vanna import DetomoVanna
 from src.cache import MemoryCache
+from src.llm_transport import LLMTransport, HTTPTransport, InProcessTransport
 from ..core.config import settings
+from .llm_service import llm_service
 
 logger = logging.getLogger(__name__)
 
+# Training change counters inside the vector store, shared by all workers
+GENERATION_FILE = "training_generation.json"
+
 
 def decode_plotly_bdata(obj):
     """
@@ -71,7 +77,44 @@ class QueryService:
         """Initialize query service."""
         self.vn: Optional[DetomoVanna] = None
         self.cache = MemoryCache()
-        self.executor = ThreadPoolExecutor(max_workers=4)
+        # Only CPU/SQLite work (retrieval, run_sql, plotly exec) uses threads;
+        # LLM calls are awaited on the event loop
+        self.executor = ThreadPoolExecutor(max_workers=settings.QUERY_EXECUTOR_WORKERS)
+
+    def create_llm_transport(self) -> LLMTransport:
+        """
+        Create the transport Vanna uses to reach the LLM.
+
+        In-process mode must be created while the server event loop is
+        running, since LLM calls are scheduled onto that loop.
+
+        Returns:
+            LLMTransport: Transport selected by settings.LLM_TRANSPORT
+
+        Raises:
+            ValueError: If LLM_TRANSPORT is not a known mode
+        """
+        if settings.LLM_TRANSPORT == "http":
+            return HTTPTransport(
+                settings.CLAUDE_AGENT_ENDPOINT,
+                timeout=settings.LLM_REQUEST_TIMEOUT,
+                connect_timeout=settings.LLM_CONNECT_TIMEOUT,
+                pool_size=settings.LLM_HTTP_POOL_SIZE,
+                max_retries=settings.LLM_MAX_RETRIES,
+                retry_backoff=settings.LLM_RETRY_BACKOFF,
+                circuit_failure_threshold=settings.LLM_CIRCUIT_FAILURE_THRESHOLD,
+                circuit_reset_timeout=settings.LLM_CIRCUIT_RESET_SECONDS
+            )
+
+        if settings.LLM_TRANSPORT == "in_process":
+            return InProcessTransport(
+                llm_service.call_claude_agent,
+                loop=asyncio.get_event_loop(),
+                timeout=settings.LLM_REQUEST_TIMEOUT,
+                stream_fn=llm_service.stream_claude_agent
+            )
+
+        raise ValueError(f"Unknown LLM_TRANSPORT: {settings.LLM_TRANSPORT}")
 
     def initialize_vanna(self):
         """
@@ -82,11 +125,50 @@ class QueryService:
         try:
             logger.info("Initializing DetomoVanna...")
 
+            transport = self.create_llm_transport()
+
             self.vn = DetomoVanna(
                 config={
                     "api_key": settings.ANTHROPIC_API_KEY,
                     "model": settings.CLAUDE_MODEL,
-                    "path": settings.VECTOR_DB_PATH
+                    "model_routes": settings.LLM_MODEL_ROUTES,
+                    "fallback_model": settings.LLM_FALLBACK_MODEL or None,
+                    "fallback_p95_ms": settings.LLM_FALLBACK_P95_MS,
+                    "fallback_error_rate": settings.LLM_FALLBACK_ERROR_RATE,
+                    "route_window": settings.LLM_ROUTE_WINDOW_SECONDS,
+                    "route_min_samples": settings.LLM_ROUTE_MIN_SAMPLES,
+                    "hedge": settings.LLM_HEDGE_ENABLED,
+                    "hedge_percentile": settings.LLM_HEDGE_PERCENTILE,
+                    "hedge_budget": settings.LLM_HEDGE_BUDGET,
+                    "hedge_min_samples": settings.LLM_HEDGE_MIN_SAMPLES,
+                    "hedge_min_delay": settings.LLM_HEDGE_MIN_DELAY,
+                    "path": settings.VECTOR_DB_PATH,
+                    "agent_endpoint": settings.CLAUDE_AGENT_ENDPOINT,
+                    "transport": transport,
+                    "executor": self.executor,
+                    "context_token_budget": settings.SQL_CONTEXT_TOKEN_BUDGET or None,
+                    "fast_path_similarity": (
+                        settings.SQL_FAST_PATH_MIN_SIMILARITY if settings.SQL_FAST_PATH_ENABLED else None
+                    ),
+                    "sql_templates": settings.SQL_TEMPLATES_ENABLED,
+                    "template_max_values": settings.SQL_TEMPLATE_MAX_VALUES,
+                    "template_values_ttl": settings.SQL_TEMPLATE_VALUES_TTL_SECONDS,
+                    "embedding_cache_size": settings.EMBEDDING_CACHE_SIZE,
+                    "embedding_backend": settings.EMBEDDING_BACKEND,
+                    "embedding_threads": settings.EMBEDDING_THREADS,
+                    "retrieval_workers": settings.RETRIEVAL_WORKERS,
+                    "retrieval_timeout": settings.RETRIEVAL_TIMEOUT_SECONDS or None,
+                    "retrieval_cache_size": settings.RETRIEVAL_CACHE_SIZE,
+                    "shared_generation_path": os.path.join(settings.VECTOR_DB_PATH, GENERATION_FILE),
+                    "vector_snapshot": settings.VECTOR_SNAPSHOT_ENABLED,
+                    "vector_snapshot_dtype": settings.VECTOR_SNAPSHOT_DTYPE,
+                    "ingest_batch_size": settings.TRAINING_BATCH_SIZE,
+                    "ddl_graph_seed_tables": settings.DDL_GRAPH_SEED_TABLES,
+                    "ddl_graph_max_tables": (
+                        settings.DDL_GRAPH_MAX_TABLES if settings.DDL_GRAPH_ENABLED else None
+                    ),
+                    "lexical_search": settings.HYBRID_SEARCH_ENABLED,
+                    "lexical_weight": settings.HYBRID_LEXICAL_WEIGHT
                 }
             )
 
@@ -94,6 +176,7 @@ class QueryService:
             self.vn.connect_to_sqlite(settings.DATABASE_PATH)
 
             logger.info(f"DetomoVanna initialized successfully")
+            logger.info(f"LLM transport: {transport.describe()}")
             logger.info(f"Vector DB: {settings.VECTOR_DB_PATH}")
             logger.info(f"Database: {settings.DATABASE_PATH}")
 
@@ -137,34 +220,19 @@ class QueryService:
 
         logger.info(f"Received query: {question}")
 
-        # Run blocking Vanna calls in thread pool
+        # LLM stages are awaited; blocking SQLite/CPU work runs in the thread pool
         loop = asyncio.get_event_loop()
 
         # Generate SQL
-        sql = await loop.run_in_executor(self.executor, self.vn.generate_sql, question)
-        logger.info(f"Generated SQL: {sql}")
+        details = await self.vn.generate_sql_details_async(question)
+        sql = details["sql"]
+        logger.info(f"Generated SQL{' (from template)' if details['from_template'] else ''}: {sql}")
 
         # Execute SQL
         df = await loop.run_in_executor(self.executor, self.vn.run_sql, sql)
 
         # Generate visualization (optional)
-        fig_json = None
-        try:
-            plotly_code = await loop.run_in_executor(
-                self.executor,
-                self.vn.generate_plotly_code,
-                question,
-                sql,
-                df
-            )
-            fig = await loop.run_in_executor(self.executor, self.vn.get_plotly_figure, plotly_code, df)
-            if fig:
-                # Convert figure to dict, then recursively convert numpy arrays to lists
-                # This prevents binary encoding (bdata) in the JSON response
-                fig_dict = fig.to_plotly_json()
-                fig_json = decode_plotly_bdata(fig_dict)
-        except Exception as e:
-            logger.warning(f"Could not generate visualization: {e}")
+        fig_json = await self._build_figure(question, sql, df)
 
         # Convert DataFrame to dict
         results = df.to_dict(orient='records')
@@ -189,9 +257,108 @@ class QueryService:
             "results": results,
             "columns": columns,
             "visualization": fig_json,
-            "row_count": len(results)
+            "row_count": len(results),
+            "context": details["context"],
+            "from_template": details["from_template"]
         }
 
+    def query_stream(self, question: str) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Streaming variant of query().
+
+        Validation happens eagerly so callers can reject bad requests before
+        the response starts; the returned iterator then yields events:
+
+        - ("sql_token", {"text"}) for each LLM chunk
+        - ("sql", {"id", "sql", "context", "from_template"}) once the SQL
+          is final (no sql_token events precede it on the training fast path)
+        - ("rows", {"columns", "rows"}) in batches of QUERY_STREAM_ROW_BATCH
+        - ("figure", {"figure"}) (figure may be None)
+        - ("done", {"id", "row_count"})
+
+        Args:
+            question (str): Natural language question
+
+        Returns:
+            AsyncIterator: (event, data) tuples
+
+        Raises:
+            ValueError: If question is empty or Vanna not initialized
+        """
+        if not self.vn:
+            raise ValueError("DetomoVanna not initialized")
+
+        if not question or len(question.strip()) == 0:
+            raise ValueError("Missing or empty 'question' field")
+
+        return self._query_stream(question)
+
+    async def _query_stream(self, question: str) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """Event generator behind query_stream()."""
+        logger.info(f"Received streaming query: {question}")
+
+        loop = asyncio.get_event_loop()
+
+        sql = ""
+        context_report = None
+        from_template = False
+        async for kind, value in self.vn.stream_sql_async(question):
+            if kind == "token":
+                yield "sql_token", {"text": value}
+            elif kind == "context":
+                context_report = value
+            elif kind == "template":
+                from_template = True
+            else:
+                sql = value
+        logger.info(f"Generated SQL: {sql}")
+
+        cache_id = self.cache.generate_id()
+        self.cache.set(cache_id, "question", question)
+        self.cache.set(cache_id, "sql", sql)
+        yield "sql", {"id": cache_id, "sql": sql, "context": context_report, "from_template": from_template}
+
+        # Execute SQL
+        df = await loop.run_in_executor(self.executor, self.vn.run_sql, sql)
+
+        results = df.to_dict(orient='records')
+        columns = df.columns.tolist()
+        self.cache.set(cache_id, "df", df)
+        self.cache.set(cache_id, "results", results)
+        self.cache.set(cache_id, "columns", columns)
+
+        batch_size = max(1, settings.QUERY_STREAM_ROW_BATCH)
+        for start in range(0, max(len(results), 1), batch_size):
+            yield "rows", {"columns": columns, "rows": results[start:start + batch_size]}
+
+        fig_json = await self._build_figure(question, sql, df)
+        if fig_json:
+            self.cache.set(cache_id, "figure", fig_json)
+        yield "figure", {"figure": fig_json}
+
+        logger.info(f"Streaming query successful - {len(results)} rows returned")
+        yield "done", {"id": cache_id, "row_count": len(results)}
+
+    async def _build_figure(self, question: str, sql: str, df) -> Optional[Dict[str, Any]]:
+        """
+        Generate a Plotly figure for query results.
+
+        Returns:
+            dict or None: JSON-safe figure, or None if generation failed
+        """
+        loop = asyncio.get_event_loop()
+        try:
+            plotly_code = await self.vn.generate_plotly_code_async(question, sql, df)
+            fig = await loop.run_in_executor(self.executor, self.vn.get_plotly_figure, plotly_code, df)
+            if fig:
+                # Convert figure to dict, then recursively convert numpy arrays to lists
+                # This prevents binary encoding (bdata) in the JSON response
+                fig_dict = fig.to_plotly_json()
+                return decode_plotly_bdata(fig_dict)
+        except Exception as e:
+            logger.warning(f"Could not generate visualization: {e}")
+        return None
+
     async def generate_questions(self) -> List[str]:
         """
         Generate suggested questions based on training data.
@@ -218,7 +385,9 @@ class QueryService:
             question (str): Natural language question
 
         Returns:
-            dict: Response with id, question, and sql
+            dict: Response with id, question, sql, context report and
+                from_template (True when a trained question or SQL template
+                answered without the LLM)
         """
         if not self.vn:
             raise ValueError("DetomoVanna not initialized")
@@ -226,10 +395,9 @@ class QueryService:
         if not question or len(question.strip()) == 0:
             raise ValueError("Missing or empty 'question' field")
 
-        loop = asyncio.get_event_loop()
-
         # Generate SQL
-        sql = await loop.run_in_executor(self.executor, self.vn.generate_sql, question)
+        details = await self.vn.generate_sql_details_async(question)
+        sql = details["sql"]
 
         # Cache the result
         cache_id = self.cache.generate_id()
@@ -241,7 +409,9 @@ class QueryService:
         return {
             "id": cache_id,
             "question": question,
-            "sql": sql
+            "sql": sql,
+            "context": details["context"],
+            "from_template": details["from_template"]
         }
 
     async def run_sql(self, cache_id: str) -> Dict[str, Any]:
@@ -309,26 +479,9 @@ class QueryService:
         if not all([question, sql, df is not None]):
             raise ValueError("Incomplete data in cache. Run generate_sql and run_sql first.")
 
-        loop = asyncio.get_event_loop()
-
-        fig_json = None
-        try:
-            plotly_code = await loop.run_in_executor(
-                self.executor,
-                self.vn.generate_plotly_code,
-                question,
-                sql,
-                df
-            )
-            fig = await loop.run_in_executor(self.executor, self.vn.get_plotly_figure, plotly_code, df)
-            if fig:
-                # Convert figure to dict, then recursively convert numpy arrays to lists
-                # This prevents binary encoding (bdata) in the JSON response
-                fig_dict = fig.to_plotly_json()
-                fig_json = decode_plotly_bdata(fig_dict)
-                self.cache.set(cache_id, "figure", fig_json)
-        except Exception as e:
-            logger.warning(f"Could not generate visualization: {e}")
+        fig_json = await self._build_figure(question, sql, df)
+        if fig_json:
+            self.cache.set(cache_id, "figure", fig_json)
 
         return {
             "id": cache_id,
@@ -355,19 +508,11 @@ class QueryService:
         if not self.vn:
             raise ValueError("DetomoVanna not initialized")
 
-        loop = asyncio.get_event_loop()
-
         # Convert df_data back to DataFrame if provided
         import pandas as pd
         df = pd.DataFrame(df_data) if df_data else None
 
-        questions = await loop.run_in_executor(
-            self.executor,
-            self.vn.generate_followup_questions,
-            question,
-            sql,
-            df
-        )
+        questions = await self.vn.generate_followup_questions_async(question, sql, df)
 
         if not isinstance(questions, list):
             questions = []
@@ -415,6 +560,21 @@ class QueryService:
 
         return history
 
+    def get_retrieval_stats(self) -> Dict[str, Any]:
+        """
+        Get retrieval metrics from the Vanna instance.
+
+        Returns:
+            dict: Embedding cache, per-stage retrieval, vector snapshot, DDL graph, BM25, embedding backend and retrieval cache metrics
+
+        Raises:
+            ValueError: If Vanna not initialized
+        """
+        if not self.vn:
+            raise ValueError("DetomoVanna not initialized")
+
+        return self.vn.retrieval_stats()
+
     async def download_csv(self, cache_id: str) -> str:
         """
         Generate CSV data from cached results.
@@ -48,8 +48,12 @@ class TrainingService:
             question (str, optional): Example question
             sql (str, optional): Example SQL query
 
+        Every change bumps the training generation (in DetomoVanna's
+        training methods), which retires cached retrieval results.
+
         Returns:
-            dict: Response with status and message
+            dict: Response with status, message and the new training
+                generation
 
         Raises:
             ValueError: If Vanna not initialized or invalid data
@@ -57,13 +61,13 @@ class TrainingService:
         Examples:
             >>> service = TrainingService(vn)
             >>> service.add_training(ddl="CREATE TABLE customers (...)")
-            {'status': 'success', 'message': 'DDL added to training data'}
+            {'status': 'success', 'message': 'DDL added to training data', 'training_generation': 1}
 
             >>> service.add_training(
             ...     question="How many customers?",
             ...     sql="SELECT COUNT(*) FROM Customer"
             ... )
-            {'status': 'success', 'message': 'Q&A pair added to training data'}
+            {'status': 'success', 'message': 'Q&A pair added to training data', 'training_generation': 2}
         """
         if not self.vn:
             raise ValueError("DetomoVanna not initialized")
@@ -72,21 +76,24 @@ class TrainingService:
             self.vn.train(ddl=ddl)
             return {
                 "status": "success",
-                "message": "DDL added to training data"
+                "message": "DDL added to training data",
+                "training_generation": self.vn.training_generation.value
             }
 
         elif documentation:
             self.vn.train(documentation=documentation)
             return {
                 "status": "success",
-                "message": "Documentation added to training data"
+                "message": "Documentation added to training data",
+                "training_generation": self.vn.training_generation.value
             }
 
         elif question and sql:
             self.vn.train(question=question, sql=sql)
             return {
                 "status": "success",
-                "message": "Q&A pair added to training data"
+                "message": "Q&A pair added to training data",
+                "training_generation": self.vn.training_generation.value
             }
 
         else:
@@ -94,45 +101,55 @@ class TrainingService:
                 "Invalid training data format. Provide 'ddl', 'documentation', or ('question' + 'sql')"
             )
 
-    def get_training_data(self) -> Dict[str, Any]:
+    def get_training_data(
+        self,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        training_data_type: Optional[str] = None,
+        search: Optional[str] = None,
+        fields: Optional[str] = None
+    ) -> Dict[str, Any]:
         """
-        Get all training data.
+        Get training data, optionally a filtered, projected page of it.
+
+        Without arguments every item is returned, as before.
+
+        Args:
+            limit (int, optional): Page size
+            cursor (str, optional): next_cursor of the previous page
+            training_data_type (str, optional): "sql", "ddl" or "documentation"
+            search (str, optional): Case-insensitive substring of question or content
+            fields (str, optional): Comma-separated fields to return
 
         Returns:
-            dict: Training data with count
+            dict: Training data with count, total matches and next_cursor
 
         Raises:
-            ValueError: If Vanna not initialized
+            ValueError: If Vanna not initialized or a parameter is invalid
         """
         if not self.vn:
             raise ValueError("DetomoVanna not initialized")
 
-        training_data = self.vn.get_training_data()
-
-        # Convert DataFrame to list of dicts if needed
-        if hasattr(training_data, 'to_dict'):
-            # It's a DataFrame
-            training_data_list = training_data.to_dict(orient='records')
-        elif isinstance(training_data, list):
-            # It's already a list
-            training_data_list = training_data
-        else:
-            training_data_list = []
-
-        return {
-            "training_data": training_data_list,
-            "count": len(training_data_list)
-        }
+        return self.vn.list_training_data(
+            limit=limit,
+            cursor=cursor,
+            training_data_type=training_data_type,
+            search=search,
+            fields=fields
+        )
 
     def remove_training_data(self, training_id: str) -> Dict[str, str]:
         """
         Remove training data by ID.
 
+        Bumps the training generation like add_training().
+
         Args:
             training_id (str): Training data ID to remove
 
         Returns:
-            dict: Response with status and message
+            dict: Response with status, message and the new training
+                generation
 
         Raises:
             ValueError: If Vanna not initialized
@@ -144,12 +161,29 @@ class TrainingService:
             self.vn.remove_training_data(id=training_id)
             return {
                 "status": "success",
-                "message": f"Training data {training_id} removed"
+                "message": f"Training data {training_id} removed",
+                "training_generation": self.vn.training_generation.value
             }
         except Exception as e:
             logger.error(f"Error removing training data: {e}")
             raise ValueError(f"Failed to remove training data: {str(e)}")
 
+    def get_sql_templates(self) -> Dict[str, Any]:
+        """
+        Get the SQL templates mined from the Q&A pairs.
+
+        Returns:
+            dict: Whether templates are enabled, count, confidence
+                threshold and each template's skeleton and slots
+
+        Raises:
+            ValueError: If Vanna not initialized
+        """
+        if not self.vn:
+            raise ValueError("DetomoVanna not initialized")
+
+        return self.vn.sql_template_stats()
+
 
 # Global training service instance (will be initialized with vn on startup)
 training_service = TrainingService()
@@ -6,11 +6,13 @@ from pydantic import BaseModel, Field
 from claude_agent_sdk import ClaudeSDKClient, ClaudeAgentOptions, AssistantMessage, TextBlock
 from src.detomo_vanna import DetomoVanna
 from src.cache import MemoryCache
+from src.llm_pool import ClaudeClientPool
 import logging
 import uvicorn
 from typing import Optional, Dict, Any, List
 import json
 import asyncio
+import uuid
 from concurrent.futures import ThreadPoolExecutor
 import io
 import pandas as pd
@@ -220,15 +222,12 @@ async def generate(request: GenerateRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-async def call_claude_agent(prompt: str, model: str, temperature: float, max_tokens: int):
+def create_agent_client(model: str) -> ClaudeSDKClient:
     """
-    Call Claude Agent SDK to generate SQL.
+    Create an unconnected Agent SDK client for the warm pool.
 
     Uses minimal configuration - no tools, no complex system prompt.
     Just basic LLM inference for Vanna.
-
-    Note: API key is automatically obtained from Claude Code environment.
-    No need to set ANTHROPIC_API_KEY in .env file.
     """
 
     # Simple system prompt for SQL generation
@@ -249,11 +248,29 @@ Rules:
         permission_mode="bypassPermissions"  # No permission prompts needed
     )
 
+    return ClaudeSDKClient(options=options)
+
+
+# Warm pool of connected Agent SDK clients, reused across /generate calls
+llm_pool = ClaudeClientPool(client_factory=create_agent_client)
+
+
+async def call_claude_agent(prompt: str, model: str, temperature: float, max_tokens: int):
+    """
+    Call Claude Agent SDK to generate SQL.
+
+    Uses a pooled client so the agent subprocess handshake is only paid
+    when the pool grows or recycles a client.
+
+    Note: API key is automatically obtained from Claude Code environment.
+    No need to set ANTHROPIC_API_KEY in .env file.
+    """
+
     # Use Agent SDK (API key from Claude Code environment)
-    async with ClaudeSDKClient(options=options) as client:
+    async with llm_pool.client(model) as client:
 
-        # Send query to agent
-        await client.query(prompt)
+        # Send query to agent (fresh session id per prompt)
+        await client.query(prompt, session_id=str(uuid.uuid4()))
 
         # Collect response
         response_text = ""
@@ -985,6 +1002,12 @@ async def startup_event():
         raise
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Disconnect pooled Claude clients"""
+    await llm_pool.close()
+
+
 if __name__ == "__main__":
     logger.info("Starting Claude Agent SDK server on http://localhost:8000")
     logger.info("API key will be obtained automatically from Claude Code environment")
@@ -0,0 +1,124 @@
+"""
+Embedding Backend Benchmark
+
+Compares the embedding backends DetomoVanna can use on the training
+questions: warm-up (model load) time, embeddings per second one question
+at a time (query path) and in batches (ingestion path), and how closely
+each backend's vectors agree with Chroma's default.
+
+Usage:
+    python scripts/benchmark_embeddings.py [--threads N] [--rounds N] [--backends default,onnx,onnx-int8]
+
+Prerequisites:
+    - Training data in training_data/chinook/questions/
+    - The embedding model is downloaded on first use (onnx-int8 also
+      needs `pip install onnx`)
+"""
+
+import argparse
+import json
+import logging
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.embeddings import (  # noqa: E402
+    BACKEND_DEFAULT, BACKEND_ONNX, BACKEND_ONNX_INT8, benchmark, make_embedding_function, warm_up
+)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def load_questions(qa_dir: Path = Path("training_data/chinook/questions")) -> list:
+    """
+    Read every training question.
+
+    Returns:
+        list: Question texts
+    """
+    questions = []
+    for qa_file in sorted(qa_dir.glob("*.json")):
+        with open(qa_file, 'r', encoding='utf-8') as f:
+            questions.extend(pair["question"] for pair in json.load(f) if "question" in pair)
+    return questions
+
+
+def agreement(reference: list, candidate: list) -> float:
+    """Lowest cosine similarity between matching vectors of two backends."""
+    a = np.asarray(reference, dtype=np.float32)
+    b = np.asarray(candidate, dtype=np.float32)
+    cosine = (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+    return float(cosine.min())
+
+
+def run(backends: list, threads: int, rounds: int) -> list:
+    """
+    Benchmark each backend on the training questions.
+
+    Returns:
+        list: One result dict per backend that could run
+    """
+    questions = load_questions()
+    if not questions:
+        raise FileNotFoundError("No training questions found in training_data/chinook/questions")
+    logger.info(f"Benchmarking {len(backends)} backends on {len(questions)} questions, {rounds} rounds")
+
+    results = []
+    reference = None
+    for backend in backends:
+        try:
+            ef = make_embedding_function(backend, threads=threads)
+            warm_seconds = warm_up(ef)
+            stats = benchmark(ef, questions, rounds=rounds)
+            vectors = ef(questions)
+        except Exception as e:
+            logger.error(f"  ✗ {backend}: {e}")
+            continue
+        if reference is None:
+            reference = vectors
+        results.append({
+            "backend": backend,
+            "warm_up_ms": round(warm_seconds * 1000, 1),
+            **stats,
+            "min_cosine_vs_first": round(agreement(reference, vectors), 4),
+        })
+        logger.info(f"  ✓ {backend}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark embedding backends")
+    parser.add_argument("--threads", type=int, default=0, help="Inference threads (0 = runtime default)")
+    parser.add_argument("--rounds", type=int, default=3, help="Passes over the questions")
+    parser.add_argument(
+        "--backends",
+        default=",".join([BACKEND_DEFAULT, BACKEND_ONNX, BACKEND_ONNX_INT8]),
+        help="Comma-separated backends; the first is the baseline"
+    )
+    args = parser.parse_args()
+
+    results = run([b.strip() for b in args.backends.split(",") if b.strip()], args.threads, args.rounds)
+    if not results:
+        logger.error("❌ No backend could run")
+        sys.exit(1)
+
+    baseline = results[0]
+    print()
+    print(f"{'backend':<12} {'warm-up ms':>10} {'single/s':>10} {'batch/s':>10} {'speedup':>8} {'min cos':>8}")
+    for result in results:
+        speedup = result["single_per_second"] / baseline["single_per_second"] if baseline["single_per_second"] else 0.0
+        print(
+            f"{result['backend']:<12} {result['warm_up_ms']:>10} {result['single_per_second']:>10} "
+            f"{result['batch_per_second']:>10} {speedup:>7.2f}x {result['min_cosine_vs_first']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
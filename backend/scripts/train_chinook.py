@@ -36,7 +36,8 @@ def train_chinook_database():
     3. Loads DDL files (table schemas)
     4. Loads documentation files (table descriptions)
     5. Loads Q&A pairs (training examples)
-    6. Verifies all data was loaded successfully
+    6. Embeds and stores everything in batches (vn.train_bulk)
+    7. Verifies all data was loaded successfully
 
     Returns:
         int: Total number of training items loaded into ChromaDB
@@ -69,6 +70,9 @@ def train_chinook_database():
         vn.connect_to_sqlite(db_path)
         logger.info(f"✓ Connected to {db_path}")
 
+        # Read everything first, then embed and store it in batches
+        items = []
+
         # Train DDL (Table Schemas)
         logger.info("\n[3/5] Loading DDL files (table schemas)...")
         ddl_dir = Path("training_data/chinook/ddl")
@@ -78,8 +82,7 @@ def train_chinook_database():
         ddl_count = 0
         for ddl_file in sorted(ddl_dir.glob("*.sql")):
             with open(ddl_file, 'r', encoding='utf-8') as f:
-                ddl_content = f.read()
-                vn.train(ddl=ddl_content)
+                items.append({"ddl": f.read()})
                 ddl_count += 1
                 logger.info(f"  ✓ {ddl_file.name}")
         logger.info(f"✓ Loaded {ddl_count} DDL files")
@@ -93,8 +96,7 @@ def train_chinook_database():
         doc_count = 0
         for doc_file in sorted(doc_dir.glob("*.md")):
             with open(doc_file, 'r', encoding='utf-8') as f:
-                doc_content = f.read()
-                vn.train(documentation=doc_content)
+                items.append({"documentation": f.read()})
                 doc_count += 1
                 logger.info(f"  ✓ {doc_file.name}")
         logger.info(f"✓ Loaded {doc_count} documentation files")
@@ -113,14 +115,18 @@ def train_chinook_database():
                     if "question" not in pair or "sql" not in pair:
                         logger.warning(f"Skipping invalid pair in {qa_file.name}")
                         continue
-                    vn.train(
-                        question=pair["question"],
-                        sql=pair["sql"]
-                    )
+                    items.append({"question": pair["question"], "sql": pair["sql"]})
                     total_pairs += 1
                 logger.info(f"  ✓ {qa_file.name}: {len(qa_pairs)} pairs")
         logger.info(f"✓ Loaded {total_pairs} Q&A pairs")
 
+        # Embed in batches and write each collection once
+        report = vn.train_bulk(items)
+        logger.info(
+            f"✓ Stored {report['total_added']} items "
+            f"({sum(report['skipped'].values())} already present) in {report['total_ms']}ms"
+        )
+
         # Verify training data
         logger.info("\n" + "=" * 60)
         logger.info("VERIFICATION")
@@ -132,6 +138,7 @@ def train_chinook_database():
         logger.info(f"Documentation:      {doc_count}")
         logger.info(f"Q&A pairs:          {total_pairs}")
         logger.info(f"Total items in DB:  {total_items}")
+        logger.info(f"Throughput:         {report['items_per_second']} items/s")
 
         logger.info("\n" + "=" * 60)
         logger.info("✅ TRAINING COMPLETED SUCCESSFULLY!")
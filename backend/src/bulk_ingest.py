@@ -0,0 +1,204 @@
+"""
+Bulk ingestion of training data.
+
+`vn.train()` embeds one document and writes it to ChromaDB per call, so
+loading a training corpus costs one model forward pass and one SQLite
+transaction per item. Bulk ingestion groups items by collection, skips
+the ones already stored, embeds the rest in batches and writes each
+collection with a single add call.
+
+Items get the same deterministic IDs and stored documents as Vanna's
+`add_ddl` / `add_documentation` / `add_question_sql`, so both paths can be
+mixed on one vector store.
+"""
+
+import json
+import logging
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from vanna.utils import deterministic_uuid
+
+logger = logging.getLogger(__name__)
+
+# Item kinds, named after the collections they go to
+KIND_SQL = "sql"
+KIND_DDL = "ddl"
+KIND_DOCUMENTATION = "documentation"
+KINDS = (KIND_SQL, KIND_DDL, KIND_DOCUMENTATION)
+
+# Training data ID suffixes used by Vanna's ChromaDB store
+ID_SUFFIXES = {KIND_SQL: "-sql", KIND_DDL: "-ddl", KIND_DOCUMENTATION: "-doc"}
+
+DEFAULT_BATCH_SIZE = 64
+
+
+class TrainingItem:
+    """One DDL statement, documentation text or Q&A pair to store."""
+
+    def __init__(self, kind: str, document: str, question: Optional[str] = None, sql: Optional[str] = None):
+        self.kind = kind
+        self.document = document
+        self.question = question
+        self.sql = sql
+        self.id = deterministic_uuid(document) + ID_SUFFIXES[kind]
+
+    @classmethod
+    def from_dict(cls, item: Dict[str, Any]) -> "TrainingItem":
+        """
+        Build an item from `vn.train()`-style keyword arguments.
+
+        Args:
+            item (dict): {"ddl": ...}, {"documentation": ...} or
+                {"question": ..., "sql": ...}
+
+        Returns:
+            TrainingItem: The item
+
+        Raises:
+            ValueError: If the dict isn't exactly one of those shapes
+        """
+        if item.get("sql"):
+            if not item.get("question"):
+                raise ValueError("Q&A items need both question and sql")
+            document = json.dumps({"question": item["question"], "sql": item["sql"]}, ensure_ascii=False)
+            return cls(KIND_SQL, document, question=item["question"], sql=item["sql"])
+        if item.get("ddl"):
+            return cls(KIND_DDL, item["ddl"])
+        if item.get("documentation"):
+            return cls(KIND_DOCUMENTATION, item["documentation"])
+        raise ValueError(f"Training item needs ddl, documentation or question+sql: {sorted(item)}")
+
+
+class IngestReport:
+    """Counts and timings of one bulk ingestion."""
+
+    def __init__(self, batch_size: int):
+        self.batch_size = batch_size
+        self.added = {kind: 0 for kind in KINDS}
+        self.skipped = {kind: 0 for kind in KINDS}
+        self.embed_batches = 0
+        self.embed_seconds = 0.0
+        self.write_seconds = 0.0
+        self.total_seconds = 0.0
+        # Added items, for callers that post-process them (e.g. template mining)
+        self.items: List[TrainingItem] = []
+
+    @property
+    def total_added(self) -> int:
+        return sum(self.added.values())
+
+    @property
+    def items_per_second(self) -> float:
+        return self.total_added / self.total_seconds if self.total_seconds > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Summarize the run.
+
+        Returns:
+            dict: Per-kind added/skipped counts, batch count and size, and
+                embedding, write and total time with items per second
+        """
+        return {
+            "added": dict(self.added),
+            "skipped": dict(self.skipped),
+            "total_added": self.total_added,
+            "batch_size": self.batch_size,
+            "embed_batches": self.embed_batches,
+            "embed_ms": round(self.embed_seconds * 1000, 1),
+            "write_ms": round(self.write_seconds * 1000, 1),
+            "total_ms": round(self.total_seconds * 1000, 1),
+            "items_per_second": round(self.items_per_second, 1),
+        }
+
+
+def ingest(
+    items: Iterable[Any],
+    collections: Dict[str, Any],
+    embed: Callable[[List[str]], List[Any]],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    max_write_size: Optional[int] = None,
+    skip_existing: bool = True
+) -> IngestReport:
+    """
+    Embed and store many training items.
+
+    Args:
+        items: TrainingItem objects or `vn.train()`-style dicts
+        collections (dict): Kind -> ChromaDB collection
+        embed: Embeds a list of texts (a Chroma embedding function)
+        batch_size (int): Texts per embedding call
+        max_write_size (int): Largest add the store accepts; bigger
+            collections are written in chunks of this size
+        skip_existing (bool): Leave out items whose ID is already stored,
+            without embedding them
+
+    Returns:
+        IngestReport: What was added and how long it took
+
+    Raises:
+        ValueError: If batch_size is not positive or an item is malformed
+
+    Example:
+        >>> report = ingest(
+        ...     [{"ddl": "CREATE TABLE a (id INT)"}, {"question": "How many a?", "sql": "SELECT COUNT(*) FROM a"}],
+        ...     {"sql": vn.sql_collection, "ddl": vn.ddl_collection, "documentation": vn.documentation_collection},
+        ...     vn.embedding_function,
+        ... )
+        >>> report.to_dict()["total_added"]
+        2
+    """
+    if batch_size <= 0:
+        raise ValueError("batch_size must be positive")
+
+    start = time.perf_counter()
+    report = IngestReport(batch_size)
+
+    # Group by collection; an ID seen twice is the same document
+    grouped: Dict[str, Dict[str, TrainingItem]] = {kind: {} for kind in KINDS}
+    for item in items:
+        if not isinstance(item, TrainingItem):
+            item = TrainingItem.from_dict(item)
+        if item.id in grouped[item.kind]:
+            report.skipped[item.kind] += 1
+        else:
+            grouped[item.kind][item.id] = item
+
+    for kind, by_id in grouped.items():
+        if not by_id:
+            continue
+        collection = collections[kind]
+
+        if skip_existing:
+            existing = set(collection.get(ids=list(by_id), include=[])["ids"])
+            report.skipped[kind] += len(existing)
+            pending = [item for item_id, item in by_id.items() if item_id not in existing]
+        else:
+            pending = list(by_id.values())
+        if not pending:
+            continue
+
+        embeddings: List[Any] = []
+        for offset in range(0, len(pending), batch_size):
+            batch_start = time.perf_counter()
+            embeddings.extend(embed([item.document for item in pending[offset:offset + batch_size]]))
+            report.embed_seconds += time.perf_counter() - batch_start
+            report.embed_batches += 1
+
+        write_start = time.perf_counter()
+        chunk = max_write_size or len(pending)
+        for offset in range(0, len(pending), chunk):
+            part = pending[offset:offset + chunk]
+            collection.add(
+                ids=[item.id for item in part],
+                documents=[item.document for item in part],
+                embeddings=embeddings[offset:offset + chunk],
+            )
+        report.write_seconds += time.perf_counter() - write_start
+
+        report.added[kind] += len(pending)
+        report.items.extend(pending)
+
+    report.total_seconds = time.perf_counter() - start
+    return report
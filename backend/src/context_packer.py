@@ -0,0 +1,242 @@
+"""
+Token-budgeted context packing for the SQL prompt.
+
+Retrieval returns up to n_results similar Q&A pairs, DDL statements and
+documentation chunks per question. Instead of concatenating them until a
+character limit is hit, the packer scores every item by relevance to the
+question, estimates its tokens offline and fills a token budget with the
+best items. What didn't fit is reported so the accuracy/latency trade-off
+stays visible.
+
+Reports for the current request can be collected with
+capture_context_reports(), in the same way llm_purpose() tags LLM calls.
+"""
+
+import contextvars
+import re
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Set
+
+from .llm_metrics import estimate_tokens
+
+# Item kinds, matching the lists Vanna's get_sql_prompt() takes
+KIND_QUESTION_SQL = "question_sql"
+KIND_DDL = "ddl"
+KIND_DOCUMENTATION = "documentation"
+KINDS = (KIND_QUESTION_SQL, KIND_DDL, KIND_DOCUMENTATION)
+
+DEFAULT_KIND_WEIGHTS = {KIND_QUESTION_SQL: 1.0, KIND_DDL: 1.0, KIND_DOCUMENTATION: 0.8}
+DEFAULT_MIN_ITEMS = {KIND_QUESTION_SQL: 1, KIND_DDL: 1}
+
+# Per-item prompt framing (section separators, chat message wrapping)
+ITEM_OVERHEAD_TOKENS = 4
+PREVIEW_CHARS = 80
+
+_WORD_RE = re.compile(r"[a-z0-9_]{2,}")
+_CJK_RE = re.compile(r"[\u3040-\u30ff\u3400-\u9fff\uff66-\uff9f]+")
+
+_current_reports: contextvars.ContextVar = contextvars.ContextVar("context_reports", default=None)
+
+
+@contextmanager
+def capture_context_reports():
+    """
+    Collect packing reports produced inside the block.
+
+    Yields:
+        list: Reports appended by ContextPacker.pack(), in order
+
+    Example:
+        >>> with capture_context_reports() as reports:
+        ...     sql = await vn.generate_sql_async(question)
+        >>> reports[-1]["dropped_tokens"]
+    """
+    reports: List[Dict[str, Any]] = []
+    token = _current_reports.set(reports)
+    try:
+        yield reports
+    finally:
+        _current_reports.reset(token)
+
+
+def terms(text: str) -> Set[str]:
+    """
+    Extract match terms from text.
+
+    ASCII words are lowercased; Japanese runs are split into character
+    bigrams since they have no spaces.
+
+    Args:
+        text (str): Question or context text
+
+    Returns:
+        set: Terms
+    """
+    lowered = text.lower()
+    result = set(_WORD_RE.findall(lowered))
+    for run in _CJK_RE.findall(lowered):
+        if len(run) == 1:
+            result.add(run)
+        result.update(run[i:i + 2] for i in range(len(run) - 1))
+    return result
+
+
+class ContextItem:
+    """One retrieved item with its score and token estimate."""
+
+    def __init__(self, kind: str, rank: int, value: Any, text: str, score: float):
+        self.kind = kind
+        self.rank = rank
+        self.value = value
+        self.text = text
+        self.score = score
+        self.tokens = estimate_tokens(text) + ITEM_OVERHEAD_TOKENS
+
+    def to_report(self) -> Dict[str, Any]:
+        preview = " ".join(self.text.split())
+        if len(preview) > PREVIEW_CHARS:
+            preview = preview[:PREVIEW_CHARS - 3] + "..."
+        return {
+            "kind": self.kind,
+            "rank": self.rank,
+            "score": round(self.score, 3),
+            "tokens": self.tokens,
+            "preview": preview,
+        }
+
+
+class ContextPacker:
+    """
+    Fill a token budget with the most relevant retrieved context.
+
+    Relevance blends the retrieval rank (the vector store already orders
+    results by distance) with the share of question terms an item
+    contains, weighted per kind. The top min_items of each kind are
+    reserved first so the prompt never loses its best example or table.
+    Kept items stay in retrieval order, so identical questions still
+    produce identical prompts for the response cache.
+
+    Example:
+        >>> packer = ContextPacker(budget_tokens=3000)
+        >>> packed = packer.pack(question, question_sql_list, ddl_list, doc_list)
+        >>> packed["ddl_list"], packed["report"]["dropped"]
+    """
+
+    def __init__(
+        self,
+        budget_tokens: int = 3000,
+        kind_weights: Optional[Dict[str, float]] = None,
+        min_items: Optional[Dict[str, int]] = None,
+        rank_weight: float = 0.5
+    ):
+        """
+        Initialize the packer.
+
+        Args:
+            budget_tokens (int): Estimated tokens available for retrieved context
+            kind_weights (dict): Score multiplier per kind
+            min_items (dict): Top items per kind kept whenever they fit
+            rank_weight (float): Share of the score taken from retrieval
+                rank (the rest comes from term overlap)
+        """
+        if budget_tokens < 1:
+            raise ValueError("budget_tokens must be at least 1")
+
+        self.budget_tokens = budget_tokens
+        self.kind_weights = {**DEFAULT_KIND_WEIGHTS, **(kind_weights or {})}
+        self.min_items = {**DEFAULT_MIN_ITEMS, **(min_items or {})}
+        self.rank_weight = rank_weight
+
+    def score(self, kind: str, rank: int, question_terms: Set[str], text: str) -> float:
+        """
+        Score an item's relevance to the question.
+
+        Args:
+            kind (str): Item kind
+            rank (int): Position in the retrieval results (0 = closest)
+            question_terms (set): terms() of the question
+            text (str): Item text
+
+        Returns:
+            float: Relevance in [0, kind weight]
+        """
+        rank_score = 1.0 / (1 + rank)
+        overlap = len(question_terms & terms(text)) / len(question_terms) if question_terms else 0.0
+        blended = self.rank_weight * rank_score + (1 - self.rank_weight) * overlap
+        return self.kind_weights.get(kind, 1.0) * blended
+
+    def _items(self, question: str, question_sql_list: list, ddl_list: list, doc_list: list) -> List[ContextItem]:
+        question_terms = terms(question)
+        items = []
+        for rank, example in enumerate(question_sql_list):
+            if not example or "question" not in example or "sql" not in example:
+                continue
+            text = f"{example['question']}\n{example['sql']}"
+            items.append(ContextItem(
+                KIND_QUESTION_SQL, rank, example, text, self.score(KIND_QUESTION_SQL, rank, question_terms, text)
+            ))
+        for kind, values in ((KIND_DDL, ddl_list), (KIND_DOCUMENTATION, doc_list)):
+            for rank, text in enumerate(values):
+                if not text:
+                    continue
+                items.append(ContextItem(kind, rank, text, text, self.score(kind, rank, question_terms, text)))
+        return items
+
+    def pack(self, question: str, question_sql_list: list, ddl_list: list, doc_list: list) -> Dict[str, Any]:
+        """
+        Select the context that fits the budget.
+
+        Args:
+            question (str): User question
+            question_sql_list (list): Similar {"question", "sql"} pairs
+            ddl_list (list): Related DDL statements
+            doc_list (list): Related documentation chunks
+
+        Returns:
+            dict: "question_sql_list", "ddl_list" and "doc_list" with the
+                kept items, plus a "report" of usage and dropped items
+        """
+        items = self._items(question, question_sql_list, ddl_list, doc_list)
+
+        kept: List[ContextItem] = []
+        used = 0
+
+        def take(item: ContextItem) -> None:
+            nonlocal used
+            if item not in kept and used + item.tokens <= self.budget_tokens:
+                kept.append(item)
+                used += item.tokens
+
+        # Reserved items first, best rank first
+        for kind in KINDS:
+            reserved = sorted((i for i in items if i.kind == kind), key=lambda i: i.rank)
+            for item in reserved[:self.min_items.get(kind, 0)]:
+                take(item)
+
+        # Then everything else by score; smaller items may still fit after a skip
+        for item in sorted(items, key=lambda i: (-i.score, i.tokens)):
+            take(item)
+
+        dropped = [i for i in items if i not in kept]
+        report = {
+            "budget_tokens": self.budget_tokens,
+            "used_tokens": used,
+            "candidate_tokens": sum(i.tokens for i in items),
+            "dropped_tokens": sum(i.tokens for i in dropped),
+            "kept": {kind: sum(1 for i in kept if i.kind == kind) for kind in KINDS},
+            "dropped": [i.to_report() for i in sorted(dropped, key=lambda i: -i.score)],
+        }
+
+        reports = _current_reports.get()
+        if reports is not None:
+            reports.append(report)
+
+        def kept_values(kind: str) -> list:
+            return [i.value for i in sorted(kept, key=lambda i: i.rank) if i.kind == kind]
+
+        return {
+            "question_sql_list": kept_values(KIND_QUESTION_SQL),
+            "ddl_list": kept_values(KIND_DDL),
+            "doc_list": kept_values(KIND_DOCUMENTATION),
+            "report": report,
+        }
@@ -7,9 +7,34 @@ as the LLM backend instead of direct OpenAI/Anthropic API calls.
 
 from vanna.base import VannaBase
 from vanna.chromadb import ChromaDB_VectorStore
-import requests
+import asyncio
+import json
 import logging
-from typing import List, Dict, Any, Optional
+import re
+import threading
+import time
+from typing import List, Dict, Any, AsyncIterator, Iterator, Optional, Tuple, Union
+from .llm_transport import LLMTransport, HTTPTransport
+from .llm_cache import make_cache_key
+from .single_flight import SingleFlight, AsyncSingleFlight
+from .llm_scheduler import (
+    llm_purpose, current_purpose, LLMOverloadedError,
+    PURPOSE_SQL, PURPOSE_PLOTLY, PURPOSE_FOLLOWUP, PURPOSE_QUESTIONS
+)
+from .llm_router import ModelRouter
+from .hedging import Hedger
+from .context_packer import ContextPacker, capture_context_reports
+from .question_match import find_training_match
+from .sql_templates import TemplateStore
+from .embedding_cache import EmbeddingCache, embedding_namespace, shared_embedding_cache
+from .retrieval import ParallelRetriever
+from .vector_index import VectorIndex
+from .bulk_ingest import DEFAULT_BATCH_SIZE, KIND_SQL, ingest
+from .schema_graph import DDLExpander
+from .lexical_index import LexicalIndex, fuse_rankings
+from .embeddings import benchmark, make_embedding_function, warm_up
+from .retrieval_cache import COLLECTIONS, RetrievalCache, SharedGeneration, TrainingGeneration
+from .training_index import TrainingIndex, TrainingRow
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +45,15 @@ class ClaudeAgentChat(VannaBase):
 
     This class implements Vanna's LLM interface to use Claude Agent SDK
     as the LLM backend instead of OpenAI/Anthropic API directly.
+
+    Prompts are delivered through an LLMTransport: HTTP to a /generate
+    endpoint by default, or an InProcessTransport passed as
+    config["transport"] when running inside the FastAPI server. Identical
+    prompts submitted concurrently share one call (config["single_flight"]).
+    Each call's model and max_tokens come from a ModelRouter keyed by call
+    purpose, which falls back to a faster model when the routed one is slow
+    or failing. Async calls can be hedged (config["hedge"]): a slow call
+    gets an identical backup request and the first answer wins.
     """
 
     def __init__(self, config: Optional[Dict[str, Any]] = None):
@@ -31,7 +65,49 @@ class ClaudeAgentChat(VannaBase):
         self.temperature = config.get("temperature", 0.1)
         self.max_tokens = config.get("max_tokens", 2048)
 
-        logger.info(f"Initialized ClaudeAgentChat with endpoint: {self.agent_endpoint}")
+        # Transport used to reach the LLM
+        self.transport: LLMTransport = config.get("transport") or HTTPTransport(
+            self.agent_endpoint,
+            timeout=config.get("timeout", 30),
+            connect_timeout=config.get("connect_timeout", 5),
+            pool_size=config.get("http_pool_size", 10),
+            max_retries=config.get("max_retries", 2),
+            retry_backoff=config.get("retry_backoff", 0.5),
+            circuit_failure_threshold=config.get("circuit_failure_threshold", 5),
+            circuit_reset_timeout=config.get("circuit_reset_timeout", 30.0)
+        )
+
+        # Fan-out for submit_prompts()
+        self.batch_concurrency = config.get("batch_concurrency", 8)
+
+        # Coalesce identical concurrent prompts (threads and event loop)
+        self.single_flight = config.get("single_flight", True)
+        self._flight = SingleFlight()
+        self._async_flight = AsyncSingleFlight()
+
+        # Per-purpose model/max_tokens routing with latency-aware fallback
+        self.router = ModelRouter(
+            self.model,
+            self.max_tokens,
+            routes=config.get("model_routes"),
+            fallback_model=config.get("fallback_model"),
+            p95_threshold_ms=config.get("fallback_p95_ms", 15000.0),
+            error_rate_threshold=config.get("fallback_error_rate", 0.5),
+            window=config.get("route_window", 300.0),
+            min_samples=config.get("route_min_samples", 5)
+        )
+
+        # Opt-in request hedging for the async submit path
+        self.hedger: Optional[Hedger] = None
+        if config.get("hedge", False):
+            self.hedger = Hedger(
+                percentile=config.get("hedge_percentile", 0.95),
+                budget=config.get("hedge_budget", 0.1),
+                min_samples=config.get("hedge_min_samples", 20),
+                min_delay=config.get("hedge_min_delay", 1.0)
+            )
+
+        logger.info(f"Initialized ClaudeAgentChat with transport: {self.transport.describe()}")
 
     def system_message(self, message: str) -> Dict[str, str]:
         """Format system message (Vanna interface)"""
@@ -45,7 +121,7 @@ class ClaudeAgentChat(VannaBase):
         """Format assistant message (Vanna interface)"""
         return {"role": "assistant", "content": message}
 
-    def submit_prompt(self, prompt: Any, **kwargs) -> str:
+    def submit_prompt(self, prompt: Any, purpose: Optional[str] = None, **kwargs) -> str:
         """
         Send prompt to Claude Agent SDK endpoint.
 
@@ -53,13 +129,15 @@ class ClaudeAgentChat(VannaBase):
 
         Args:
             prompt: List of message dicts or string
+            purpose (str): Call purpose for admission priority (default:
+                the enclosing llm_purpose() block)
             **kwargs: Additional arguments (unused, for Vanna compatibility)
 
         Returns:
             str: Generated SQL or text from Claude
 
         Raises:
-            Exception: If API call fails
+            Exception: If the transport call fails
 
         Example:
             >>> chat = ClaudeAgentChat(config={"agent_endpoint": "http://localhost:8000/generate"})
@@ -68,45 +146,296 @@ class ClaudeAgentChat(VannaBase):
             SELECT COUNT(*) FROM Customer
         """
 
-        # Convert prompt to string if it's a list of messages
-        if isinstance(prompt, list):
-            # Extract just the content from messages
-            prompt_text = "\n\n".join([
-                f"{msg.get('role', 'user')}: {msg.get('content', '')}"
-                for msg in prompt
-            ])
-        else:
-            prompt_text = str(prompt)
+        prompt_text = self._prompt_to_text(prompt)
+        purpose = purpose or current_purpose()
+        model, max_tokens = self.router.select(purpose)
+
+        logger.info(f"Submitting prompt to {self.transport.describe()} (model: {model}, length: {len(prompt_text)})")
+        start = time.perf_counter()
 
-        logger.info(f"Submitting prompt to {self.agent_endpoint} (length: {len(prompt_text)})")
+        # Call Claude Agent SDK through the configured transport
+        def call():
+            return self.transport.generate(
+                prompt_text,
+                model,
+                self.temperature,
+                max_tokens,
+                purpose=purpose
+            )
 
-        # Call Claude Agent SDK endpoint
         try:
-            response = requests.post(
-                self.agent_endpoint,
-                json={
-                    "prompt": prompt_text,
-                    "model": self.model,
-                    "temperature": self.temperature,
-                    "max_tokens": self.max_tokens
-                },
-                timeout=30
+            if self.single_flight:
+                generated_text = self._flight.do(self._prompt_key(prompt_text, model, max_tokens), call)
+            else:
+                generated_text = call()
+        except Exception as e:
+            self._record_route(model, start, e)
+            raise
+        self._record_route(model, start)
+
+        logger.info(
+            f"Received {purpose or 'untagged'} response "
+            f"(length: {len(generated_text)}, {(time.perf_counter() - start) * 1000:.0f}ms)"
+        )
+        return generated_text
+
+    async def submit_prompt_async(self, prompt: Any, purpose: Optional[str] = None, **kwargs) -> str:
+        """
+        Async counterpart of submit_prompt().
+
+        Awaits the transport instead of blocking a thread for the whole
+        LLM round trip. With hedging enabled, a call still unanswered at the
+        hedge percentile of recent latency gets a duplicate request; the
+        slower one is cancelled. Hedged calls bypass server-side coalescing,
+        since cancelling a shared call only detaches from it and would leave
+        the loser running.
+
+        Args:
+            prompt: List of message dicts or string
+            purpose (str): Call purpose for admission priority (default:
+                the enclosing llm_purpose() block)
+            **kwargs: Additional arguments (unused, for Vanna compatibility)
+
+        Returns:
+            str: Generated SQL or text from Claude
+        """
+        prompt_text = self._prompt_to_text(prompt)
+        purpose = purpose or current_purpose()
+        model, max_tokens = self.router.select(purpose)
+
+        logger.info(f"Submitting prompt to {self.transport.describe()} (model: {model}, length: {len(prompt_text)})")
+        start = time.perf_counter()
+
+        def attempt(hedged: bool = False):
+            return self.transport.agenerate(
+                prompt_text,
+                model,
+                self.temperature,
+                max_tokens,
+                purpose=purpose,
+                coalesce=self.hedger is None
             )
-            response.raise_for_status()
 
-            result = response.json()
-            generated_text = result.get("text", "")
+        def call():
+            if self.hedger is not None:
+                return self.hedger.run(attempt, key=purpose or "")
+            return attempt()
 
-            logger.info(f"Received response (length: {len(generated_text)})")
-            return generated_text
+        try:
+            if self.single_flight:
+                generated_text = await self._async_flight.do(self._prompt_key(prompt_text, model, max_tokens), call)
+            else:
+                generated_text = await call()
+        except Exception as e:
+            self._record_route(model, start, e)
+            raise
+        self._record_route(model, start)
+
+        logger.info(
+            f"Received {purpose or 'untagged'} response "
+            f"(length: {len(generated_text)}, {(time.perf_counter() - start) * 1000:.0f}ms)"
+        )
+        return generated_text
+
+    def submit_prompts(
+        self,
+        prompts: List[Any],
+        max_concurrency: Optional[int] = None,
+        return_exceptions: bool = False,
+        purpose: Optional[str] = None,
+        **kwargs
+    ) -> List[Union[str, Exception]]:
+        """
+        Send several prompts at once and wait for all of them.
+
+        The prompts run concurrently (up to max_concurrency), so a bulk job
+        takes roughly as long as its slowest prompt rather than the sum.
+
+        Args:
+            prompts (list): Prompts, each a list of message dicts or string
+            max_concurrency (int): Prompts in flight at once
+                (default: config["batch_concurrency"])
+            return_exceptions (bool): Put failures in the result list instead
+                of raising the first one
+            purpose (str): Call purpose for admission priority
+            **kwargs: Additional arguments (unused, for Vanna compatibility)
+
+        Returns:
+            list: Generated text per prompt, in order
 
-        except requests.exceptions.Timeout:
-            logger.error(f"Timeout calling {self.agent_endpoint}")
-            raise Exception(f"Claude Agent SDK timeout after 30s")
+        Example:
+            >>> chat.submit_prompts(["Count customers", "Count albums"])
+            ['SELECT COUNT(*) FROM Customer', 'SELECT COUNT(*) FROM Album']
+        """
+        prompt_texts = [self._prompt_to_text(prompt) for prompt in prompts]
+        purpose = purpose or current_purpose()
+        model, max_tokens = self.router.select(purpose)
+
+        logger.info(f"Submitting {len(prompt_texts)} prompts to {self.transport.describe()} (model: {model})")
+
+        results = self.transport.generate_batch(
+            prompt_texts,
+            model,
+            self.temperature,
+            max_tokens,
+            purpose=purpose,
+            max_concurrency=max_concurrency or self.batch_concurrency
+        )
+        return self._batch_outcome(model, results, return_exceptions)
+
+    async def submit_prompts_async(
+        self,
+        prompts: List[Any],
+        max_concurrency: Optional[int] = None,
+        return_exceptions: bool = False,
+        purpose: Optional[str] = None,
+        **kwargs
+    ) -> List[Union[str, Exception]]:
+        """Async counterpart of submit_prompts()."""
+        prompt_texts = [self._prompt_to_text(prompt) for prompt in prompts]
+        purpose = purpose or current_purpose()
+        model, max_tokens = self.router.select(purpose)
+
+        logger.info(f"Submitting {len(prompt_texts)} prompts to {self.transport.describe()} (model: {model})")
+
+        results = await self.transport.agenerate_batch(
+            prompt_texts,
+            model,
+            self.temperature,
+            max_tokens,
+            purpose=purpose,
+            max_concurrency=max_concurrency or self.batch_concurrency
+        )
+        return self._batch_outcome(model, results, return_exceptions)
+
+    def _batch_outcome(
+        self,
+        model: str,
+        results: List[Union[str, Exception]],
+        return_exceptions: bool
+    ) -> List[Union[str, Exception]]:
+        """Record item outcomes, then raise the first failure unless the caller asked for per-item errors."""
+        # Items share one wall clock, so only their success counts toward model health
+        for result in results:
+            if not isinstance(result, LLMOverloadedError):
+                self.router.record(model, ok=not isinstance(result, BaseException))
+
+        failed = [r for r in results if isinstance(r, BaseException)]
+        logger.info(f"Batch finished ({len(results) - len(failed)} succeeded, {len(failed)} failed)")
+        if failed and not return_exceptions:
+            raise failed[0]
+        return results
+
+    def stream_prompt(self, prompt: Any, purpose: Optional[str] = None, **kwargs) -> Iterator[str]:
+        """
+        Stream the response to a prompt chunk by chunk.
+
+        Args:
+            prompt: List of message dicts or string
+            purpose (str): Call purpose for admission priority (default:
+                the enclosing llm_purpose() block)
+            **kwargs: Additional arguments (unused, for Vanna compatibility)
+
+        Yields:
+            str: Text chunks as the transport delivers them
+        """
+        prompt_text = self._prompt_to_text(prompt)
+        purpose = purpose or current_purpose()
+        model, max_tokens = self.router.select(purpose)
+
+        logger.info(f"Streaming prompt to {self.transport.describe()} (model: {model}, length: {len(prompt_text)})")
+        start = time.perf_counter()
+
+        try:
+            yield from self.transport.stream(
+                prompt_text,
+                model,
+                self.temperature,
+                max_tokens,
+                purpose=purpose
+            )
+        except Exception as e:
+            self._record_route(model, start, e)
+            raise
+        self._record_route(model, start)
+
+    async def stream_prompt_async(self, prompt: Any, purpose: Optional[str] = None, **kwargs) -> AsyncIterator[str]:
+        """
+        Async counterpart of stream_prompt().
+
+        Args:
+            prompt: List of message dicts or string
+            purpose (str): Call purpose for admission priority (default:
+                the enclosing llm_purpose() block)
+            **kwargs: Additional arguments (unused, for Vanna compatibility)
+
+        Yields:
+            str: Text chunks as the transport delivers them
+        """
+        prompt_text = self._prompt_to_text(prompt)
+        purpose = purpose or current_purpose()
+        model, max_tokens = self.router.select(purpose)
+
+        logger.info(f"Streaming prompt to {self.transport.describe()} (model: {model}, length: {len(prompt_text)})")
+        start = time.perf_counter()
+
+        try:
+            async for chunk in self.transport.astream(
+                prompt_text,
+                model,
+                self.temperature,
+                max_tokens,
+                purpose=purpose
+            ):
+                yield chunk
+        except Exception as e:
+            self._record_route(model, start, e)
+            raise
+        self._record_route(model, start)
+
+    def _prompt_key(self, prompt_text: str, model: str, max_tokens: int) -> str:
+        """Coalescing key for a prompt under the routed generation settings."""
+        return make_cache_key(prompt_text, model, self.temperature, max_tokens)
+
+    def _record_route(self, model: str, start: float, error: Optional[BaseException] = None) -> None:
+        """Report a call's latency or failure to the router (shed calls say nothing about the model)."""
+        if isinstance(error, LLMOverloadedError):
+            return
+        if error is not None:
+            self.router.record(model, ok=False)
+        else:
+            self.router.record(model, (time.perf_counter() - start) * 1000)
+
+    def llm_stats(self) -> Dict[str, Any]:
+        """
+        Get client-side LLM metrics.
+
+        Returns:
+            dict: Transport stats, single-flight counters for the threaded
+                and async submit paths, model routing decisions and hedging
+                counters
+        """
+        return {
+            "transport": self.transport.stats(),
+            "single_flight": {
+                "threaded": self._flight.stats(),
+                "async": self._async_flight.stats(),
+            },
+            "router": self.router.stats(),
+            "hedging": self.hedger.stats() if self.hedger is not None else {"enabled": False},
+        }
 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Error calling Claude Agent SDK: {str(e)}")
-            raise Exception(f"Error calling Claude Agent SDK: {str(e)}")
+    @staticmethod
+    def _prompt_to_text(prompt: Any) -> str:
+        """Flatten a list of role/content messages into a single prompt string."""
+        # Convert prompt to string if it's a list of messages
+        if isinstance(prompt, list):
+            # Extract just the content from messages
+            return "\n\n".join([
+                f"{msg.get('role', 'user')}: {msg.get('content', '')}"
+                for msg in prompt
+            ])
+        return str(prompt)
 
 
 class DetomoVanna(ChromaDB_VectorStore, ClaudeAgentChat):
@@ -135,13 +464,1029 @@ class DetomoVanna(ChromaDB_VectorStore, ClaudeAgentChat):
             config (dict): Configuration dictionary with keys:
                 - path: ChromaDB storage path (default: "./detomo_vectordb")
                 - client: ChromaDB client type (default: "persistent")
-                - embedding_function: Embedding model name (optional)
+                - embedding_function: Chroma embedding function (optional;
+                  overrides embedding_backend)
+                - embedding_backend: "default" (Chroma's), "onnx" (tuned
+                  ONNX Runtime) or "onnx-int8" (plus int8 weights)
+                  (default: None, Chroma's)
+                - embedding_threads: Inference threads for the tuned
+                  backends (default: 0, runtime default)
+                - retrieval_cache_size: Questions whose retrieved context is
+                  cached until the next training change (default: 0,
+                  disabled)
+                - shared_generation_path: File of training change counters
+                  shared by every process using the vector store; each
+                  lookup checks it, so changes made by another process
+                  retire this one's caches and indexes (default: None,
+                  only this process's changes are seen)
                 - agent_endpoint: Claude Agent SDK endpoint URL
+                - transport: LLMTransport instance (default: HTTP to agent_endpoint)
+                - timeout: HTTP read timeout in seconds (default: 30)
+                - connect_timeout: HTTP connect timeout in seconds (default: 5)
+                - http_pool_size: Keep-alive connections to the endpoint (default: 10)
+                - max_retries: Retries for transient HTTP failures (default: 2)
+                - retry_backoff: Base retry backoff in seconds (default: 0.5)
+                - circuit_failure_threshold: Failures that open the circuit (default: 5)
+                - circuit_reset_timeout: Seconds before probing an open circuit (default: 30)
                 - model: Claude model name (default: "claude-sonnet-4-5")
                 - temperature: LLM temperature (default: 0.1)
                 - max_tokens: Max tokens for LLM (default: 2048)
+                - single_flight: Coalesce identical concurrent prompts (default: True)
+                - batch_concurrency: Fan-out for submit_prompts() (default: 8)
+                - model_routes: Per-purpose {"model", "max_tokens"} overrides
+                - fallback_model: Faster model used while a routed model is
+                  slow or failing (default: None, no fallback)
+                - fallback_p95_ms: p95 latency that triggers fallback (default: 15000)
+                - fallback_error_rate: Error share that triggers fallback (default: 0.5)
+                - route_window: Seconds of samples for model health (default: 300)
+                - route_min_samples: Samples before a model is judged (default: 5)
+                - hedge: Hedge slow async calls (default: False)
+                - hedge_percentile: Recent-latency percentile that triggers a
+                  hedge (default: 0.95)
+                - hedge_budget: Maximum hedges as a share of calls (default: 0.1)
+                - hedge_min_samples: Latencies needed before hedging (default: 20)
+                - hedge_min_delay: Minimum seconds before a hedge (default: 1.0)
+                - executor: Executor for blocking work in the async methods
+                - context_token_budget: Token budget for retrieved SQL prompt
+                  context (default: None, Vanna's own character limits)
+                - fast_path_similarity: Answer questions that match a trained
+                  question up to normalization noise with its stored SQL, at
+                  this surface similarity or above (default: None, disabled)
+                - sql_templates: Answer questions that match a SQL template
+                  mined from the Q&A pairs by filling its slots (default:
+                  False)
+                - template_max_values: Distinct values a column may have to
+                  be a template slot (default: 1000)
+                - template_values_ttl: Seconds before slot column values are
+                  reloaded from the database (default: 300, 0 = never)
+                - embedding_cache_size: Capacity of the process-wide question
+                  embedding LRU (default: 1024, 0 disables)
+                - retrieval_workers: Threads running the three collection
+                  lookups concurrently (default: 6, 0 runs them in turn)
+                - retrieval_timeout: Seconds a lookup may take before the
+                  prompt is built without it (default: 5.0, None waits)
+                - vector_snapshot: Answer lookups from in-memory NumPy
+                  snapshots of the collections (default: False)
+                - vector_snapshot_dtype: Snapshot matrix type, "float32" or
+                  "float16" (default: "float32")
+                - ingest_batch_size: Documents per embedding call in
+                  train_bulk() (default: 64)
+                - ddl_graph_max_tables: Expand retrieved DDL along the
+                  foreign-key graph, sending at most this many tables
+                  (default: None, plain vector ranking)
+                - ddl_graph_seed_tables: Top-ranked retrieved tables the
+                  expansion connects (default: 3)
+                - lexical_search: Fuse an in-memory BM25 ranking with the
+                  vector ranking of every collection (default: False)
+                - lexical_weight: Weight of the BM25 ranking in the fusion,
+                  relative to 1.0 for the vector ranking (default: 1.0)
         """
+        backend = (config or {}).get("embedding_backend")
+        if backend and "embedding_function" not in config:
+            config = {
+                **config,
+                "embedding_function": make_embedding_function(backend, threads=config.get("embedding_threads", 0)),
+            }
+        self.embedding_backend = backend or "default"
+        self.embedding_report: Dict[str, Any] = {"backend": self.embedding_backend, "warmed_up": False}
+
         ChromaDB_VectorStore.__init__(self, config=config)
         ClaudeAgentChat.__init__(self, config=config)
 
+        # Executor for blocking retrieval and SQLite work in the async pipeline
+        # (None uses the event loop's default executor)
+        self.executor = (config or {}).get("executor")
+
+        # Relevance-ranked, token-budgeted context for SQL prompts
+        budget = (config or {}).get("context_token_budget")
+        self.context_packer: Optional[ContextPacker] = ContextPacker(budget_tokens=budget) if budget else None
+
+        # Skip the LLM for near-verbatim training questions
+        self.fast_path_similarity: Optional[float] = (config or {}).get("fast_path_similarity")
+
+        # Parameterized templates mined from Q&A pairs, slots checked against live columns
+        self.template_max_values = (config or {}).get("template_max_values", 1000)
+        self.sql_templates: Optional[TemplateStore] = TemplateStore(
+            value_loader=self._load_column_values,
+            values_ttl=(config or {}).get("template_values_ttl", 300.0)
+        ) if (config or {}).get("sql_templates", False) else None
+
+        # One question embedding serves all three collections; repeats hit the shared LRU
+        cache_size = (config or {}).get("embedding_cache_size", 1024)
+        self.embedding_cache: Optional[EmbeddingCache] = shared_embedding_cache(cache_size) if cache_size else None
+
+        # Collection lookups run side by side; a slow or failing one is left out
+        self.retriever = ParallelRetriever(
+            workers=(config or {}).get("retrieval_workers", 6),
+            timeout=(config or {}).get("retrieval_timeout", 5.0)
+        )
+
+        # Contiguous matrices per collection for top-k; ChromaDB stays the source of truth
+        self.vector_index: Optional[VectorIndex] = VectorIndex(
+            dtype=(config or {}).get("vector_snapshot_dtype", "float32")
+        ) if (config or {}).get("vector_snapshot") else None
+
+        # Bulk training embeds this many documents per forward pass
+        self.ingest_batch_size = (config or {}).get("ingest_batch_size", DEFAULT_BATCH_SIZE)
+
+        # Seed tables from vector ranking, joined through their shortest foreign-key paths
+        graph_max_tables = (config or {}).get("ddl_graph_max_tables")
+        self.ddl_expander: Optional[DDLExpander] = DDLExpander(
+            seed_tables=(config or {}).get("ddl_graph_seed_tables", 3),
+            max_tables=graph_max_tables
+        ) if graph_max_tables else None
+
+        # Exact identifiers and names via BM25, fused with the vector ranking
+        self.lexical_index: Optional[LexicalIndex] = LexicalIndex() if (config or {}).get("lexical_search") else None
+        self.lexical_weight = (config or {}).get("lexical_weight", 1.0)
+
+        # Retrieved context per normalized question, valid for one training generation
+        self.training_generation = TrainingGeneration()
+        shared_path = (config or {}).get("shared_generation_path")
+        self.shared_generation: Optional[SharedGeneration] = SharedGeneration(shared_path) if shared_path else None
+        self._seen_counters = self.shared_generation.read() if self.shared_generation is not None else None
+        self._freshness_lock = threading.Lock()
+        cache_size = (config or {}).get("retrieval_cache_size", 0)
+        self.retrieval_cache: Optional[RetrievalCache] = RetrievalCache(max_size=cache_size) if cache_size else None
+
+        # Sorted listing rows of the training data, rebuilt per training generation
+        self.training_index = TrainingIndex()
+
         logger.info("Initialized DetomoVanna with ChromaDB + ClaudeAgentChat")
+
+    # Tag the LLM calls Vanna's sync pipeline makes so the scheduler can
+    # prioritize interactive SQL over the rest
+
+    def generate_sql(self, question: str, allow_llm_to_see_data: bool = False, **kwargs) -> str:
+        # Vanna's pipeline with concurrent retrieval and the template fast paths
+        initial_prompt = self.config.get("initial_prompt", None) if self.config is not None else None
+
+        match, question_sql_list, ddl_list, doc_list = self._retrieve_sql_context(question)
+        if match is not None:
+            return match["sql"]
+
+        prompt = self.get_sql_prompt(
+            initial_prompt=initial_prompt,
+            question=question,
+            question_sql_list=question_sql_list,
+            ddl_list=ddl_list,
+            doc_list=doc_list,
+            **kwargs,
+        )
+        self.log(title="SQL Prompt", message=prompt)
+        llm_response = self.submit_prompt(prompt, purpose=PURPOSE_SQL, **kwargs)
+        self.log(title="LLM Response", message=llm_response)
+
+        if 'intermediate_sql' in llm_response:
+            if not allow_llm_to_see_data:
+                return "The LLM is not allowed to see the data in your database. Your question requires database introspection to generate the necessary SQL. Please set allow_llm_to_see_data=True to enable this."
+
+            intermediate_sql = self.extract_sql(llm_response)
+
+            try:
+                self.log(title="Running Intermediate SQL", message=intermediate_sql)
+                df = self.run_sql(intermediate_sql)
+
+                prompt = self.get_sql_prompt(
+                    initial_prompt=initial_prompt,
+                    question=question,
+                    question_sql_list=question_sql_list,
+                    ddl_list=ddl_list,
+                    doc_list=doc_list + [f"The following is a pandas DataFrame with the results of the intermediate SQL query {intermediate_sql}: \n" + df.to_markdown()],
+                    **kwargs,
+                )
+                self.log(title="Final SQL Prompt", message=prompt)
+                llm_response = self.submit_prompt(prompt, purpose=PURPOSE_SQL, **kwargs)
+                self.log(title="LLM Response", message=llm_response)
+            except Exception as e:
+                return f"Error running intermediate SQL: {e}"
+
+        return self.extract_sql(llm_response)
+
+    def generate_plotly_code(self, question: str = None, sql: str = None, df_metadata: str = None, **kwargs) -> str:
+        with llm_purpose(PURPOSE_PLOTLY):
+            return super().generate_plotly_code(question=question, sql=sql, df_metadata=df_metadata, **kwargs)
+
+    def generate_followup_questions(self, question: str, sql: str, df, n_questions: int = 5, **kwargs) -> list:
+        with llm_purpose(PURPOSE_FOLLOWUP):
+            return super().generate_followup_questions(question, sql, df, n_questions=n_questions, **kwargs)
+
+    def generate_summary(self, question: str, df, **kwargs) -> str:
+        with llm_purpose(PURPOSE_FOLLOWUP):
+            return super().generate_summary(question, df, **kwargs)
+
+    def generate_questions(self, **kwargs) -> List[str]:
+        with llm_purpose(PURPOSE_QUESTIONS):
+            return super().generate_questions(**kwargs)
+
+    def generate_question(self, sql: str, **kwargs) -> str:
+        with llm_purpose(PURPOSE_QUESTIONS):
+            return super().generate_question(sql, **kwargs)
+
+    def get_sql_prompt(
+        self,
+        initial_prompt: str,
+        question: str,
+        question_sql_list: list,
+        ddl_list: list,
+        doc_list: list,
+        **kwargs,
+    ):
+        """
+        Build the SQL prompt, packing retrieved context into the token budget.
+
+        Without a context_token_budget this is Vanna's prompt unchanged.
+        The packing report is available through capture_context_reports().
+        """
+        if self.context_packer is not None:
+            packed = self.context_packer.pack(question, question_sql_list, ddl_list, doc_list)
+            question_sql_list = packed["question_sql_list"]
+            ddl_list = packed["ddl_list"]
+            doc_list = packed["doc_list"]
+
+            report = packed["report"]
+            logger.info(
+                f"Packed SQL context: {report['used_tokens']}/{report['budget_tokens']} tokens, "
+                f"dropped {len(report['dropped'])} items (~{report['dropped_tokens']} tokens)"
+            )
+
+        return super().get_sql_prompt(
+            initial_prompt=initial_prompt,
+            question=question,
+            question_sql_list=question_sql_list,
+            ddl_list=ddl_list,
+            doc_list=doc_list,
+            **kwargs,
+        )
+
+    # Packed context is already within budget; Vanna's character cap (based
+    # on the generation max_tokens) would otherwise drop more of it
+
+    def add_ddl_to_prompt(self, initial_prompt: str, ddl_list: list, max_tokens: int = 14000) -> str:
+        if self.context_packer is not None:
+            max_tokens = float("inf")
+        return super().add_ddl_to_prompt(initial_prompt, ddl_list, max_tokens=max_tokens)
+
+    def add_documentation_to_prompt(self, initial_prompt: str, documentation_list: list, max_tokens: int = 14000) -> str:
+        if self.context_packer is not None:
+            max_tokens = float("inf")
+        return super().add_documentation_to_prompt(initial_prompt, documentation_list, max_tokens=max_tokens)
+
+    def generate_sql_batch(
+        self,
+        questions: List[str],
+        max_concurrency: Optional[int] = None,
+        **kwargs
+    ) -> List[Union[str, Exception]]:
+        """
+        Generate SQL for many questions with one concurrent LLM batch.
+
+        Retrieval runs per question, then all prompts go out together via
+        submit_prompts(). Questions answered by a SQL template or a
+        verbatim trained question are left out of the batch.
+        Intermediate-SQL introspection is not supported.
+
+        Args:
+            questions (list): Natural language questions
+            max_concurrency (int): Prompts in flight at once
+
+        Returns:
+            list: SQL per question, in order; a failed question gets its
+                exception instead
+
+        Example:
+            >>> vn.generate_sql_batch(["How many customers?", "How many albums?"])
+            ['SELECT COUNT(*) FROM Customer', 'SELECT COUNT(*) FROM Album']
+        """
+        initial_prompt = self.config.get("initial_prompt", None) if self.config is not None else None
+
+        results: List[Union[str, Exception, None]] = [None] * len(questions)
+        pending = []
+        prompts = []
+        for index, question in enumerate(questions):
+            match, question_sql_list, ddl_list, doc_list = self._retrieve_sql_context(question)
+            if match is not None:
+                results[index] = match["sql"]
+                continue
+            pending.append(index)
+            prompts.append(self.get_sql_prompt(
+                initial_prompt=initial_prompt,
+                question=question,
+                question_sql_list=question_sql_list,
+                ddl_list=ddl_list,
+                doc_list=doc_list,
+                **kwargs,
+            ))
+
+        if prompts:
+            responses = self.submit_prompts(
+                prompts,
+                max_concurrency=max_concurrency,
+                return_exceptions=True,
+                purpose=PURPOSE_SQL
+            )
+            for index, response in zip(pending, responses):
+                results[index] = response if isinstance(response, Exception) else self.extract_sql(response)
+
+        return results
+
+    async def _run_blocking(self, func, *args):
+        """Run CPU/SQLite-bound work on the executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    def match_training_sql(self, question: str, question_sql_list: Optional[list] = None) -> Optional[Dict[str, Any]]:
+        """
+        Find a trained Q&A pair whose question matches up to normalization noise.
+
+        Args:
+            question (str): Natural language question
+            question_sql_list (list): Similar Q&A pairs already retrieved for
+                the question (fetched if omitted)
+
+        Returns:
+            dict or None: {"question", "sql", "similarity"} when the fast
+                path is enabled and a pair matches
+
+        Example:
+            >>> vn.match_training_sql("how many customers are there")
+            {'question': 'How many customers are there?', 'sql': 'SELECT COUNT(*) FROM Customer', 'similarity': 0.966}
+        """
+        if self.fast_path_similarity is None:
+            return None
+        if question_sql_list is None:
+            question_sql_list = self.get_similar_question_sql(question)
+
+        match = find_training_match(question, question_sql_list or [], self.fast_path_similarity)
+        if match is not None:
+            logger.info(f"Training fast path hit (similarity {match['similarity']}): {match['question']}")
+        return match
+
+    def embed_question(self, question: str) -> Any:
+        """
+        Embed a question for retrieval, through the shared LRU.
+
+        Args:
+            question (str): Natural language question
+
+        Returns:
+            Embedding vector
+        """
+        if self.embedding_cache is None:
+            return self.generate_embedding(question)
+        return self.embedding_cache.embed(
+            question, self.generate_embedding, namespace=embedding_namespace(self.embedding_function)
+        )
+
+    def warm_up_embeddings(self, run_benchmark: bool = True) -> Dict[str, Any]:
+        """
+        Load the embedding model now instead of on the first question.
+
+        Args:
+            run_benchmark (bool): Also measure embeddings per second
+
+        Returns:
+            dict: Backend, warm-up time and benchmark results
+
+        Example:
+            >>> vn.warm_up_embeddings()
+            {'backend': 'onnx', 'warmed_up': True, 'warm_up_ms': 812.4,
+             'benchmark': {'single_per_second': 212.4, 'batch_per_second': 655.0, ...}}
+        """
+        report: Dict[str, Any] = {"backend": self.embedding_backend, "warmed_up": False}
+        report["warm_up_ms"] = round(warm_up(self.embedding_function) * 1000, 1)
+        report["warmed_up"] = True
+        if run_benchmark:
+            report["benchmark"] = benchmark(self.embedding_function)
+        self.embedding_report = report
+        logger.info(f"Embedding backend {self.embedding_backend} warmed up: {report}")
+        return report
+
+    def _query_collection(self, name: str, collection: Any, question: str, embedding: Any, n_results: int) -> list:
+        """Top-n documents of a collection, from the snapshot and fused with BM25 when enabled."""
+        self._check_training_freshness()
+        if embedding is None:
+            embedding = self.embed_question(question)
+        if self.vector_index is not None:
+            documents = self.vector_index.query(name, collection, embedding, n_results)
+        else:
+            documents = collection.query(query_embeddings=[embedding], n_results=n_results)["documents"][0]
+        if self.lexical_index is not None:
+            lexical = self.lexical_index.query(name, collection, question, n_results)
+            documents = fuse_rankings([documents, lexical], [1.0, self.lexical_weight], n_results)
+        return ChromaDB_VectorStore._extract_documents({"documents": [documents]})
+
+    def get_similar_question_sql(self, question: str, embedding: Any = None, **kwargs) -> list:
+        return self._query_collection("sql", self.sql_collection, question, embedding, self.n_results_sql)
+
+    def get_related_ddl(self, question: str, embedding: Any = None, **kwargs) -> list:
+        ddl_list = self._query_collection("ddl", self.ddl_collection, question, embedding, self.n_results_ddl)
+        if self.ddl_expander is not None:
+            ddl_list = self.ddl_expander.expand(ddl_list, self._load_ddl_documents)
+        return ddl_list
+
+    def _load_ddl_documents(self) -> List[str]:
+        return self.ddl_collection.get(include=["documents"])["documents"] or []
+
+    def get_related_documentation(self, question: str, embedding: Any = None, **kwargs) -> list:
+        return self._query_collection(
+            "documentation", self.documentation_collection, question, embedding, self.n_results_documentation
+        )
+
+    def retrieval_stats(self) -> Dict[str, Any]:
+        """
+        Get retrieval metrics.
+
+        Returns:
+            dict: Question embedding cache metrics, plus the retrieval pool
+                with per-stage (embedding, sql, ddl, documentation) outcomes
+                and latency, the vector snapshot sizes, the DDL graph
+                expansion counters, the BM25 index sizes and query time and
+                the embedding backend's warm-up and benchmark, and the
+                retrieval cache with the current training generation
+        """
+        return {
+            "embedding_cache": self.embedding_cache.stats() if self.embedding_cache is not None else {"enabled": False},
+            "retrieval": self.retriever.stats(),
+            "vector_snapshot": self.vector_index.stats() if self.vector_index is not None else {"enabled": False},
+            "ddl_graph": self.ddl_expander.stats() if self.ddl_expander is not None else {"enabled": False},
+            "lexical": self.lexical_index.stats() if self.lexical_index is not None else {"enabled": False},
+            "embedding_backend": self.embedding_report,
+            "retrieval_cache": {
+                **(self.retrieval_cache.stats() if self.retrieval_cache is not None else {"enabled": False}),
+                "training_generation": self.training_generation.value,
+                "shared_generation": dict(self._seen_counters) if self._seen_counters is not None else None,
+            },
+        }
+
+    # Training changes bump the training generation, retiring cached
+    # retrievals, and mark the matching snapshot and BM25 index (and, for
+    # DDL, the schema graph) stale; they are rebuilt on the next lookup.
+    # With a shared generation file the change is recorded there, and every
+    # process applies it on its next lookup via _check_training_freshness
+
+    def _training_changed(self, name: Optional[str] = None) -> None:
+        if self.shared_generation is not None:
+            self.shared_generation.bump(name)
+            self._check_training_freshness()
+        else:
+            self._invalidate_training(COLLECTIONS if name is None else (name,))
+
+    def _invalidate_training(self, names) -> None:
+        self.training_generation.bump()
+        for name in names:
+            if self.vector_index is not None:
+                self.vector_index.invalidate(name)
+            if self.lexical_index is not None:
+                self.lexical_index.invalidate(name)
+        if self.ddl_expander is not None and "ddl" in names:
+            self.ddl_expander.invalidate()
+        if self.sql_templates is not None:
+            self.sql_templates.refresh_values()
+
+    def _check_training_freshness(self) -> int:
+        """
+        Apply training changes recorded in the shared generation file.
+
+        Collections whose counter moved since the last check (in this or
+        any other process) are invalidated locally.
+
+        Returns:
+            int: The local training generation to key caches on
+        """
+        if self.shared_generation is not None:
+            counters = self.shared_generation.read()
+            with self._freshness_lock:
+                changed = [name for name in COLLECTIONS if counters[name] != self._seen_counters[name]]
+                if changed:
+                    self._seen_counters = counters
+                    self._invalidate_training(changed)
+        return self.training_generation.value
+
+    def add_ddl(self, ddl: str, **kwargs) -> str:
+        id = super().add_ddl(ddl, **kwargs)
+        self._training_changed("ddl")
+        return id
+
+    def add_documentation(self, documentation: str, **kwargs) -> str:
+        id = super().add_documentation(documentation, **kwargs)
+        self._training_changed("documentation")
+        return id
+
+    def remove_collection(self, collection_name: str) -> bool:
+        removed = super().remove_collection(collection_name)
+        self._training_changed()
+        return removed
+
+    def add_question_sql(self, question: str, sql: str, **kwargs) -> str:
+        id = super().add_question_sql(question, sql, **kwargs)
+        self._training_changed("sql")
+        if self.sql_templates is not None and self.run_sql_is_set:
+            template = self.sql_templates.add(question, sql, source_id=id)
+            if template is not None:
+                logger.info(f"Mined SQL template: {template.to_dict()['skeleton']}")
+        return id
+
+    def remove_training_data(self, id: str, **kwargs) -> bool:
+        removed = super().remove_training_data(id, **kwargs)
+        self._training_changed()
+        if self.sql_templates is not None:
+            self.sql_templates.remove(id)
+        return removed
+
+    def train_bulk(
+        self,
+        items: List[Dict[str, Any]],
+        batch_size: Optional[int] = None,
+        skip_existing: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Store many training items with batched embedding and one write per collection.
+
+        Items already in the vector store are skipped without being
+        embedded, so re-running a load only pays for what's new.
+
+        Args:
+            items (list): `train()`-style dicts: {"ddl": ...},
+                {"documentation": ...} or {"question": ..., "sql": ...}
+            batch_size (int): Documents per embedding call (default:
+                the ingest_batch_size config)
+            skip_existing (bool): Skip items whose ID is already stored
+
+        Returns:
+            dict: Per-kind added/skipped counts and embedding, write and
+                total time with items per second
+
+        Raises:
+            ValueError: If an item is malformed or batch_size is not positive
+
+        Example:
+            >>> vn.train_bulk([
+            ...     {"ddl": "CREATE TABLE customers (...)"},
+            ...     {"question": "How many customers?", "sql": "SELECT COUNT(*) FROM customers"},
+            ... ])["items_per_second"]
+            412.7
+        """
+        get_max_batch_size = getattr(self.chroma_client, "get_max_batch_size", None)
+        report = ingest(
+            items,
+            {
+                "sql": self.sql_collection,
+                "ddl": self.ddl_collection,
+                "documentation": self.documentation_collection,
+            },
+            self.embedding_function,
+            batch_size=batch_size or self.ingest_batch_size,
+            max_write_size=get_max_batch_size() if get_max_batch_size else None,
+            skip_existing=skip_existing
+        )
+
+        for kind, added in report.added.items():
+            if added:
+                self._training_changed(kind)
+        if self.sql_templates is not None and self.run_sql_is_set:
+            for item in report.items:
+                if item.kind == KIND_SQL:
+                    self.sql_templates.add(item.question, item.sql, source_id=item.id)
+
+        stats = report.to_dict()
+        logger.info(
+            f"Bulk training stored {stats['total_added']} items "
+            f"({sum(stats['skipped'].values())} skipped) in {stats['total_ms']}ms "
+            f"({stats['items_per_second']} items/s, {stats['embed_batches']} embedding batches)"
+        )
+        return stats
+
+    def _load_training_rows(self) -> List[TrainingRow]:
+        """Read every training item's id and text, without embeddings."""
+        rows = []
+        for training_type, collection in (
+            ("sql", self.sql_collection),
+            ("ddl", self.ddl_collection),
+            ("documentation", self.documentation_collection),
+        ):
+            data = collection.get(include=["documents"])
+            for item_id, document in zip(data["ids"], data["documents"] or []):
+                if training_type == "sql":
+                    pair = json.loads(document)
+                    rows.append(TrainingRow(training_type, item_id, pair.get("question"), pair.get("sql", "")))
+                else:
+                    rows.append(TrainingRow(training_type, item_id, None, document))
+        return rows
+
+    def list_training_data(
+        self,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        training_data_type: Optional[str] = None,
+        search: Optional[str] = None,
+        fields: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        List training data a page at a time, from the listing index.
+
+        The index is rebuilt from the collections only after training
+        changed (in this or another process sharing the generation file),
+        so repeated listings don't rescan the vector store.
+
+        Args:
+            limit (int): Page size (None returns every match)
+            cursor (str): next_cursor of the previous page
+            training_data_type (str): "sql", "ddl" or "documentation"
+            search (str): Case-insensitive substring of question or content
+            fields (str): Comma-separated subset of id, training_data_type,
+                question and content
+
+        Returns:
+            dict: "training_data", "count", "total" and "next_cursor"
+
+        Raises:
+            ValueError: If a filter, the fields or the cursor are invalid
+
+        Example:
+            >>> page = vn.list_training_data(limit=2, training_data_type="ddl", fields="id")
+            >>> page["training_data"], page["total"]
+            ([{'id': '0b1f...-ddl'}, {'id': '1c9a...-ddl'}], 12)
+        """
+        return self.training_index.list(
+            self._load_training_rows,
+            self._check_training_freshness(),
+            limit=limit,
+            cursor=cursor,
+            training_data_type=training_data_type,
+            search=search,
+            fields=fields
+        )
+
+    def _load_column_values(self, table: str, column: str) -> Optional[List[Any]]:
+        """Distinct values of a live column, or None if there are too many to be a slot."""
+        if not self.run_sql_is_set:
+            return None
+        df = self.run_sql(
+            f'SELECT DISTINCT "{column}" FROM "{table}" WHERE "{column}" IS NOT NULL '
+            f'LIMIT {self.template_max_values + 1}'
+        )
+        if len(df) > self.template_max_values:
+            return None
+        return df.iloc[:, 0].tolist()
+
+    def load_sql_templates(self) -> int:
+        """
+        Mine SQL templates from every trained Q&A pair.
+
+        Needs a database connection, since slot values are validated
+        against the live columns.
+
+        Returns:
+            int: Templates mined (0 when templates are disabled or the
+                database isn't connected)
+
+        Example:
+            >>> vn.connect_to_sqlite("data/chinook.db")
+            >>> vn.load_sql_templates()
+            9
+        """
+        if self.sql_templates is None:
+            return 0
+        if not self.run_sql_is_set:
+            logger.warning("SQL templates need a database connection; skipping")
+            return 0
+
+        self.sql_templates.clear()
+        training_data = self.get_training_data()
+        if len(training_data) == 0:
+            return 0
+        pairs = training_data[training_data["training_data_type"] == "sql"]
+        for row in pairs.itertuples():
+            self.sql_templates.add(row.question, row.content, source_id=row.id)
+
+        logger.info(f"Mined {len(self.sql_templates)} SQL templates from {len(pairs)} Q&A pairs")
+        return len(self.sql_templates)
+
+    def match_sql_template(self, question: str) -> Optional[Dict[str, Any]]:
+        """
+        Answer a question by filling the slots of a mined SQL template.
+
+        Args:
+            question (str): Natural language question
+
+        Returns:
+            dict or None: {"question", "sql", "template", "slots"} when
+                templates are enabled and one matches
+
+        Example:
+            >>> vn.match_sql_template("How many customers are from Germany?")["sql"]
+            "SELECT COUNT(*) FROM customers WHERE Country = 'Germany'"
+        """
+        if self.sql_templates is None:
+            return None
+        match = self.sql_templates.match(question)
+        if match is not None:
+            logger.info(f"SQL template hit: {match['template']} {match['slots']}")
+        return match
+
+    def sql_template_stats(self) -> Dict[str, Any]:
+        """
+        Get the mined SQL templates.
+
+        Returns:
+            dict: "enabled", template count and templates
+        """
+        if self.sql_templates is None:
+            return {"enabled": False, "count": 0, "templates": []}
+        return {"enabled": True, **self.sql_templates.stats()}
+
+    def _retrieve_sql_context(self, question: str) -> Tuple[Optional[Dict[str, Any]], list, list, list]:
+        """
+        Fetch similar Q&A pairs, related DDL and documentation for a question.
+
+        Training changes made by other processes are applied first, so
+        neither the templates nor the retrieval cache answer from before
+        them. Mined SQL templates are tried first, then the retrieval cache.
+        Otherwise the question is embedded once and the three collections
+        are searched concurrently; a lookup that fails or times out
+        contributes an empty list. The Q&A pairs are checked for a verbatim
+        training match, in which case the other lookups are abandoned.
+        Only complete retrievals are cached (for a training match, just
+        the Q&A pairs).
+
+        Returns:
+            tuple: (training_match, question_sql_list, ddl_list, doc_list)
+        """
+        generation = self._check_training_freshness()
+        match = self.match_sql_template(question)
+        if match is not None:
+            return match, [], [], []
+
+        if self.retrieval_cache is not None:
+            cached = self.retrieval_cache.get(question, generation)
+            if cached is not None:
+                question_sql_list, ddl_list, doc_list = cached
+                match = self.match_training_sql(question, question_sql_list)
+                if match is not None:
+                    return match, list(question_sql_list), [], []
+                # Entries from a fast-path hit have no DDL/documentation; retrieve them below
+                if ddl_list is not None:
+                    return None, list(question_sql_list), list(ddl_list), list(doc_list)
+
+        start = time.perf_counter()
+        embedding = self.embed_question(question)
+        self.retriever.record("embedding", (time.perf_counter() - start) * 1000)
+
+        run = self.retriever.submit({
+            "sql": lambda: self.get_similar_question_sql(question, embedding=embedding),
+            "ddl": lambda: self.get_related_ddl(question, embedding=embedding),
+            "documentation": lambda: self.get_related_documentation(question, embedding=embedding),
+        })
+        question_sql_list = run.result("sql", default=[])
+        match = self.match_training_sql(question, question_sql_list)
+        if match is not None:
+            run.cancel()
+            if self.retrieval_cache is not None:
+                self.retrieval_cache.set(question, generation, (list(question_sql_list), None, None))
+            return match, question_sql_list, [], []
+        ddl_list = run.result("ddl", default=[])
+        doc_list = run.result("documentation", default=[])
+        if self.retrieval_cache is not None and run.all_ok():
+            self.retrieval_cache.set(question, generation, (list(question_sql_list), list(ddl_list), list(doc_list)))
+        return None, question_sql_list, ddl_list, doc_list
+
+    async def generate_sql_async(self, question: str, allow_llm_to_see_data: bool = False, **kwargs) -> str:
+        """
+        Async counterpart of generate_sql().
+
+        Retrieval runs on the executor (embedding + ChromaDB are CPU/SQLite
+        bound); the LLM call is awaited so no thread is held while waiting.
+
+        Args:
+            question (str): Natural language question
+            allow_llm_to_see_data (bool): Allow running intermediate SQL
+
+        Returns:
+            str: Generated SQL
+        """
+        details = await self.generate_sql_details_async(question, allow_llm_to_see_data=allow_llm_to_see_data, **kwargs)
+        return details["sql"]
+
+    async def generate_sql_details_async(
+        self,
+        question: str,
+        allow_llm_to_see_data: bool = False,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """
+        Generate SQL and report how it was produced.
+
+        Args:
+            question (str): Natural language question
+            allow_llm_to_see_data (bool): Allow running intermediate SQL
+
+        Returns:
+            dict: "sql", "from_template" (True when a mined SQL template or
+                the stored SQL of a verbatim training question was used
+                without an LLM call), "template" (the match or None) and
+                "context" (the context packing report or None)
+
+        Example:
+            >>> details = await vn.generate_sql_details_async("how many customers are there")
+            >>> details["sql"], details["from_template"]
+            ('SELECT COUNT(*) FROM Customer', True)
+        """
+        with capture_context_reports() as reports:
+            match, sql = await self._generate_sql_async(question, allow_llm_to_see_data, **kwargs)
+        return {
+            "sql": sql,
+            "from_template": match is not None,
+            "template": match,
+            "context": reports[-1] if reports else None,
+        }
+
+    async def _generate_sql_async(
+        self,
+        question: str,
+        allow_llm_to_see_data: bool,
+        **kwargs
+    ) -> Tuple[Optional[Dict[str, Any]], str]:
+        """Pipeline behind generate_sql_details_async(); returns (training_match, sql)."""
+        initial_prompt = self.config.get("initial_prompt", None) if self.config is not None else None
+
+        match, question_sql_list, ddl_list, doc_list = await self._run_blocking(
+            self._retrieve_sql_context, question
+        )
+        if match is not None:
+            return match, match["sql"]
+
+        prompt = self.get_sql_prompt(
+            initial_prompt=initial_prompt,
+            question=question,
+            question_sql_list=question_sql_list,
+            ddl_list=ddl_list,
+            doc_list=doc_list,
+            **kwargs,
+        )
+        self.log(title="SQL Prompt", message=prompt)
+        llm_response = await self.submit_prompt_async(prompt, purpose=PURPOSE_SQL, **kwargs)
+        self.log(title="LLM Response", message=llm_response)
+
+        if 'intermediate_sql' in llm_response:
+            if not allow_llm_to_see_data:
+                return None, "The LLM is not allowed to see the data in your database. Your question requires database introspection to generate the necessary SQL. Please set allow_llm_to_see_data=True to enable this."
+
+            intermediate_sql = self.extract_sql(llm_response)
+
+            try:
+                self.log(title="Running Intermediate SQL", message=intermediate_sql)
+                df = await self._run_blocking(self.run_sql, intermediate_sql)
+
+                prompt = self.get_sql_prompt(
+                    initial_prompt=initial_prompt,
+                    question=question,
+                    question_sql_list=question_sql_list,
+                    ddl_list=ddl_list,
+                    doc_list=doc_list + [f"The following is a pandas DataFrame with the results of the intermediate SQL query {intermediate_sql}: \n" + df.to_markdown()],
+                    **kwargs,
+                )
+                self.log(title="Final SQL Prompt", message=prompt)
+                llm_response = await self.submit_prompt_async(prompt, purpose=PURPOSE_SQL, **kwargs)
+                self.log(title="LLM Response", message=llm_response)
+            except Exception as e:
+                return None, f"Error running intermediate SQL: {e}"
+
+        return None, self.extract_sql(llm_response)
+
+    async def _build_sql_prompt_async(self, question: str, **kwargs) -> Tuple[Optional[Dict[str, Any]], Optional[list]]:
+        """
+        Retrieve context on the executor and build the SQL prompt.
+
+        Returns:
+            tuple: (training_match, prompt); the prompt is None on a match
+        """
+        initial_prompt = self.config.get("initial_prompt", None) if self.config is not None else None
+
+        match, question_sql_list, ddl_list, doc_list = await self._run_blocking(
+            self._retrieve_sql_context, question
+        )
+        if match is not None:
+            return match, None
+        return None, self.get_sql_prompt(
+            initial_prompt=initial_prompt,
+            question=question,
+            question_sql_list=question_sql_list,
+            ddl_list=ddl_list,
+            doc_list=doc_list,
+            **kwargs,
+        )
+
+    async def stream_sql_async(self, question: str, **kwargs) -> AsyncIterator[Tuple[str, str]]:
+        """
+        Generate SQL, streaming the LLM output as it arrives.
+
+        Intermediate-SQL introspection is not supported while streaming; a
+        response asking for it is finalized like any other.
+
+        Args:
+            question (str): Natural language question
+
+        Yields:
+            tuple: ("template", match) when a SQL template or verbatim
+                training question answers it (then straight to "sql"), ("context", report)
+                when the context was packed into a token budget,
+                ("token", chunk) for each chunk, then ("sql", extracted_sql)
+
+        Example:
+            >>> async for kind, value in vn.stream_sql_async("How many albums?"):
+            ...     print(kind, value)
+        """
+        with capture_context_reports() as reports:
+            match, prompt = await self._build_sql_prompt_async(question, **kwargs)
+        if match is not None:
+            yield "template", match
+            yield "sql", match["sql"]
+            return
+
+        self.log(title="SQL Prompt", message=prompt)
+        if reports:
+            yield "context", reports[-1]
+
+        chunks = []
+        async for chunk in self.stream_prompt_async(prompt, purpose=PURPOSE_SQL, **kwargs):
+            chunks.append(chunk)
+            yield "token", chunk
+
+        llm_response = "".join(chunks)
+        self.log(title="LLM Response", message=llm_response)
+        yield "sql", self.extract_sql(llm_response)
+
+    async def generate_plotly_code_async(
+        self,
+        question: str = None,
+        sql: str = None,
+        df_metadata: str = None,
+        **kwargs
+    ) -> str:
+        """
+        Async counterpart of generate_plotly_code().
+
+        Args:
+            question (str): Question the data answers
+            sql (str): SQL that produced the data
+            df_metadata (str): Description of the DataFrame
+
+        Returns:
+            str: Python plotly code
+        """
+        if question is not None:
+            system_msg = f"The following is a pandas DataFrame that contains the results of the query that answers the question the user asked: '{question}'"
+        else:
+            system_msg = "The following is a pandas DataFrame "
+
+        if sql is not None:
+            system_msg += f"\n\nThe DataFrame was produced using this query: {sql}\n\n"
+
+        system_msg += f"The following is information about the resulting pandas DataFrame 'df': \n{df_metadata}"
+
+        message_log = [
+            self.system_message(system_msg),
+            self.user_message(
+                "Can you generate the Python plotly code to chart the results of the dataframe? Assume the data is in a pandas dataframe called 'df'. If there is only one value in the dataframe, use an Indicator. Respond with only Python code. Do not answer with any explanations -- just the code."
+            ),
+        ]
+
+        plotly_code = await self.submit_prompt_async(message_log, purpose=PURPOSE_PLOTLY, **kwargs)
+
+        return self._sanitize_plotly_code(self._extract_python_code(plotly_code))
+
+    async def generate_followup_questions_async(
+        self,
+        question: str,
+        sql: str,
+        df,
+        n_questions: int = 5,
+        **kwargs
+    ) -> list:
+        """
+        Async counterpart of generate_followup_questions().
+
+        Args:
+            question (str): Original question
+            sql (str): SQL that answered it
+            df (pd.DataFrame): Query results
+            n_questions (int): Number of questions to generate
+
+        Returns:
+            list: Followup questions
+        """
+        message_log = [
+            self.system_message(
+                f"You are a helpful data assistant. The user asked the question: '{question}'\n\nThe SQL query for this question was: {sql}\n\nThe following is a pandas DataFrame with the results of the query: \n{df.head(25).to_markdown()}\n\n"
+            ),
+            self.user_message(
+                f"Generate a list of {n_questions} followup questions that the user might ask about this data. Respond with a list of questions, one per line. Do not answer with any explanations -- just the questions. Remember that there should be an unambiguous SQL query that can be generated from the question. Prefer questions that are answerable outside of the context of this conversation. Prefer questions that are slight modifications of the SQL query that was generated that allow digging deeper into the data. Each question will be turned into a button that the user can click to generate a new SQL query so don't use 'example' type questions. Each question must have a one-to-one correspondence with an instantiated SQL query." +
+                self._response_language()
+            ),
+        ]
+
+        llm_response = await self.submit_prompt_async(message_log, purpose=PURPOSE_FOLLOWUP, **kwargs)
+
+        numbers_removed = re.sub(r"^\d+\.\s*", "", llm_response, flags=re.MULTILINE)
+        return numbers_removed.split("\n")
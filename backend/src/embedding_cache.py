@@ -0,0 +1,186 @@
+"""
+Process-wide LRU of question embeddings.
+
+Retrieval embeds the question once per collection it searches, and the
+same questions come back again and again (suggested questions, retries,
+dashboards). Embeddings are cached per embedding function, so a question
+costs one forward pass the first time and none after that.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_SIZE = 1024
+
+
+def embedding_namespace(embedding_function: Any) -> str:
+    """
+    Identify an embedding function for cache keying.
+
+    Args:
+        embedding_function: Chroma-style callable embedding a list of texts
+
+    Returns:
+        str: Class path plus model name when the function exposes one
+    """
+    cls = type(embedding_function)
+    model = ""
+    for attr in ("model_name", "_model_name", "MODEL_NAME"):
+        value = getattr(embedding_function, attr, None)
+        if isinstance(value, str):
+            model = value
+            break
+    return f"{cls.__module__}.{cls.__qualname__}:{model}"
+
+
+class EmbeddingCache:
+    """
+    Thread-safe LRU of text embeddings.
+
+    Example:
+        >>> cache = EmbeddingCache(max_size=1024)
+        >>> vector = cache.embed("How many customers?", embed_fn, namespace="minilm")
+        >>> cache.stats()["hits"]
+        0
+    """
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE):
+        """
+        Initialize the cache.
+
+        Args:
+            max_size (int): Embeddings kept before evicting the least
+                recently used
+        """
+        self.max_size = max_size
+
+        self._entries: "OrderedDict[Tuple[str, str], Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.embed_seconds = 0.0
+
+    def get(self, text: str, namespace: str = "") -> Optional[Any]:
+        """
+        Look up an embedding.
+
+        Args:
+            text (str): Embedded text
+            namespace (str): Embedding function identity
+
+        Returns:
+            Embedding or None
+        """
+        key = (namespace, text)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def set(self, text: str, vector: Any, namespace: str = "") -> None:
+        """
+        Store an embedding, evicting the least recently used if full.
+
+        Args:
+            text (str): Embedded text
+            vector: Embedding
+            namespace (str): Embedding function identity
+        """
+        key = (namespace, text)
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def embed(self, text: str, embed: Callable[[str], Any], namespace: str = "") -> Any:
+        """
+        Return the cached embedding of text, computing it on a miss.
+
+        Args:
+            text (str): Text to embed
+            embed: Computes one embedding
+            namespace (str): Embedding function identity
+
+        Returns:
+            Embedding
+        """
+        vector = self.get(text, namespace)
+        if vector is not None:
+            return vector
+
+        start = time.perf_counter()
+        vector = embed(text)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.embed_seconds += elapsed
+        self.set(text, vector, namespace)
+        return vector
+
+    def resize(self, max_size: int) -> None:
+        """Change the capacity, evicting entries that no longer fit."""
+        with self._lock:
+            self.max_size = max_size
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Remove all embeddings."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache metrics.
+
+        Returns:
+            dict: Hit/miss counters, size and time spent computing embeddings
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_size": self.max_size,
+                "evictions": self.evictions,
+                "embed_ms_total": round(self.embed_seconds * 1000, 1),
+                "embed_ms_avg": round(self.embed_seconds * 1000 / self.misses, 2) if self.misses else 0.0,
+            }
+
+
+_shared: Optional[EmbeddingCache] = None
+_shared_lock = threading.Lock()
+
+
+def shared_embedding_cache(max_size: Optional[int] = None) -> EmbeddingCache:
+    """
+    Get the process-wide embedding cache, creating it on first use.
+
+    Args:
+        max_size (int): Capacity to apply (None keeps the current one)
+
+    Returns:
+        EmbeddingCache: The shared cache
+    """
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = EmbeddingCache(max_size=max_size or DEFAULT_MAX_SIZE)
+        elif max_size is not None and max_size != _shared.max_size:
+            _shared.resize(max_size)
+        return _shared
@@ -0,0 +1,233 @@
+"""
+Embedding backends for the vector store.
+
+ChromaDB's default embedding function runs all-MiniLM-L6-v2 through
+ONNX Runtime. It has three costs:
+
+- It downloads and loads the model on the first call, so the first
+  question after a deploy pays for it.
+- It pads every input to 256 tokens, even a ten-token question.
+- It leaves the session's threading and graph optimization at their
+  defaults.
+
+The tuned backends run the same model:
+
+- "onnx": pads each batch only to its longest input, sorts batches by
+  length, enables full graph optimization and takes an explicit thread
+  count. Embeddings match the default backend to float rounding, so
+  vectors already stored stay comparable.
+- "onnx-int8": as "onnx", plus dynamic int8 quantization of the weights.
+  The quantized model is built once next to the original. Vectors differ
+  slightly from fp32 ones, so re-embed the store after switching. This
+  needs the `onnx` package.
+
+warm_up() loads everything before the first request. benchmark()
+measures embeddings per second for single questions and for batches.
+"""
+
+import logging
+import os
+import time
+from functools import cached_property
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
+from chromadb.utils.embedding_functions.onnx_mini_lm_l6_v2 import ONNXMiniLM_L6_V2
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DEFAULT = "default"
+BACKEND_ONNX = "onnx"
+BACKEND_ONNX_INT8 = "onnx-int8"
+
+QUANTIZED_FILENAME = "model.int8.onnx"
+
+# Short questions like the ones users type, for warm-up and benchmarks
+BENCHMARK_TEXTS = (
+    "How many customers are there?",
+    "Show the top 10 best-selling tracks",
+    "Total revenue by country",
+    "Which employees support the most customers?",
+    "List all albums by AC/DC",
+    "顧客は何人いますか？",
+    "国別の売上",
+    "Average invoice total per customer in 2009",
+)
+
+
+class TunedONNXMiniLM(ONNXMiniLM_L6_V2):
+    """
+    all-MiniLM-L6-v2 on ONNX Runtime with length-aware batching.
+
+    Example:
+        >>> ef = TunedONNXMiniLM(threads=4, quantize=True)
+        >>> ef.warm_up()
+        >>> len(ef(["How many customers are there?"])[0])
+        384
+    """
+
+    def __init__(self, threads: int = 0, quantize: bool = False, batch_size: int = 32, max_length: int = 256):
+        """
+        Initialize the backend (the model loads on warm_up() or first use).
+
+        Args:
+            threads (int): ONNX Runtime intra-op threads (0 lets the runtime
+                decide, usually one per core)
+            quantize (bool): Run dynamically int8-quantized weights
+            batch_size (int): Texts per forward pass
+            max_length (int): Tokens kept per text
+        """
+        super().__init__(preferred_providers=["CPUExecutionProvider"])
+        self.threads = threads
+        self.quantize = quantize
+        self.batch_size = batch_size
+        self.max_length = max_length
+        # Part of the embedding cache key: int8 vectors differ from fp32 ones
+        self.model_name = f"{self.MODEL_NAME}:{'int8' if quantize else 'fp32'}"
+
+    @property
+    def _model_dir(self) -> str:
+        return os.path.join(self.DOWNLOAD_PATH, self.EXTRACTED_FOLDER_NAME)
+
+    @cached_property
+    def tokenizer(self) -> Any:
+        tokenizer = self.Tokenizer.from_file(os.path.join(self._model_dir, "tokenizer.json"))
+        tokenizer.enable_truncation(max_length=self.max_length)
+        # Pad to the longest text of each batch, not to max_length
+        tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+        return tokenizer
+
+    @cached_property
+    def model(self) -> Any:
+        options = self.ort.SessionOptions()
+        options.log_severity_level = 3
+        options.graph_optimization_level = self.ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if self.threads:
+            options.intra_op_num_threads = self.threads
+            options.inter_op_num_threads = 1
+        path = self._quantized_model() if self.quantize else os.path.join(self._model_dir, "model.onnx")
+        return self.ort.InferenceSession(path, providers=["CPUExecutionProvider"], sess_options=options)
+
+    def _quantized_model(self) -> str:
+        """Path of the int8 model, quantizing the fp32 one on first use."""
+        target = os.path.join(self._model_dir, QUANTIZED_FILENAME)
+        if os.path.exists(target):
+            return target
+        try:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+        except ImportError:
+            raise ValueError("The onnx-int8 embedding backend needs the onnx package: pip install onnx")
+
+        start = time.perf_counter()
+        partial = target + ".tmp"
+        quantize_dynamic(os.path.join(self._model_dir, "model.onnx"), partial, weight_type=QuantType.QInt8)
+        os.replace(partial, target)
+        logger.info(f"Quantized embedding model to int8 in {time.perf_counter() - start:.1f}s: {target}")
+        return target
+
+    def __call__(self, input: List[str]) -> Any:
+        self._download_model_if_not_exists()
+        if len(input) <= 1:
+            return self._forward(input, batch_size=self.batch_size)
+        # Batch texts of similar length together so little padding is computed
+        order = sorted(range(len(input)), key=lambda i: len(input[i]))
+        embeddings = self._forward([input[i] for i in order], batch_size=self.batch_size)
+        result = [None] * len(input)
+        for position, index in enumerate(order):
+            result[index] = embeddings[position]
+        return result
+
+    def warm_up(self) -> None:
+        """Download if needed, load the tokenizer and session and run one forward pass."""
+        self([BENCHMARK_TEXTS[0]])
+
+
+def make_embedding_function(backend: str, threads: int = 0) -> Any:
+    """
+    Build the embedding function for a backend name.
+
+    Args:
+        backend (str): "default", "onnx" or "onnx-int8"
+        threads (int): Inference threads for the tuned backends (0 = runtime default)
+
+    Returns:
+        Chroma-compatible embedding function
+
+    Raises:
+        ValueError: If the backend is unknown
+    """
+    if backend == BACKEND_DEFAULT:
+        return DefaultEmbeddingFunction()
+    if backend == BACKEND_ONNX:
+        return TunedONNXMiniLM(threads=threads)
+    if backend == BACKEND_ONNX_INT8:
+        return TunedONNXMiniLM(threads=threads, quantize=True)
+    raise ValueError(
+        f"Unknown embedding backend {backend!r}; use one of "
+        f"{(BACKEND_DEFAULT, BACKEND_ONNX, BACKEND_ONNX_INT8)}"
+    )
+
+
+def warm_up(embedding_function: Callable[[List[str]], Any]) -> float:
+    """
+    Load an embedding function's model ahead of the first request.
+
+    Args:
+        embedding_function: Chroma-style embedding function
+
+    Returns:
+        float: Seconds it took
+    """
+    start = time.perf_counter()
+    warm = getattr(embedding_function, "warm_up", None)
+    if callable(warm):
+        warm()
+    else:
+        embedding_function([BENCHMARK_TEXTS[0]])
+    return time.perf_counter() - start
+
+
+def benchmark(
+    embedding_function: Callable[[List[str]], Any],
+    texts: Optional[Sequence[str]] = None,
+    rounds: int = 3
+) -> Dict[str, Any]:
+    """
+    Measure embedding throughput of a warmed-up embedding function.
+
+    Args:
+        embedding_function: Chroma-style embedding function
+        texts: Texts to embed (default: typical questions)
+        rounds (int): Passes over texts
+
+    Returns:
+        dict: Embeddings per second and milliseconds per embedding, for
+            one text per call (query path) and all texts per call
+            (ingestion path)
+
+    Example:
+        >>> benchmark(make_embedding_function("onnx"))
+        {'texts': 8, 'rounds': 3, 'single_per_second': 212.4, 'single_ms': 4.71, ...}
+    """
+    texts = list(texts or BENCHMARK_TEXTS)
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in texts:
+            embedding_function([text])
+    single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        embedding_function(texts)
+    batch = time.perf_counter() - start
+
+    count = len(texts) * rounds
+    return {
+        "texts": len(texts),
+        "rounds": rounds,
+        "single_per_second": round(count / single, 1) if single > 0 else 0.0,
+        "single_ms": round(single * 1000 / count, 2),
+        "batch_per_second": round(count / batch, 1) if batch > 0 else 0.0,
+        "batch_ms": round(batch * 1000 / count, 2),
+    }
@@ -0,0 +1,182 @@
+"""
+Hedged requests for LLM tail latency.
+
+Most Agent SDK responses arrive in a few seconds, but an occasional slow
+one sets the p99. A hedger starts the call, and if no answer has arrived
+by a chosen percentile of recent latency it sends an identical second
+request. The first successful answer wins and the other call is
+cancelled. Both attempts must own their call: cancelling a call shared
+through single flight only detaches from it, so hedged attempts skip
+coalescing.
+
+Hedges cost real LLM capacity, so they are capped by a budget: every call
+earns a fraction of a hedge token and each hedge spends a whole one, which
+keeps hedges at or below that fraction of traffic.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Hedger:
+    """
+    Percentile-triggered request hedging with a traffic budget.
+
+    Latency is tracked per key (e.g. call purpose), since SQL and chart
+    prompts have very different normal latencies.
+
+    Example:
+        >>> hedger = Hedger(percentile=0.95, budget=0.1)
+        >>> text = await hedger.run(
+        ...     lambda hedged: transport.agenerate(prompt, model, 0.1, 2048, coalesce=False),
+        ...     key="sql"
+        ... )
+    """
+
+    def __init__(
+        self,
+        percentile: float = 0.95,
+        budget: float = 0.1,
+        min_samples: int = 20,
+        min_delay: float = 1.0,
+        max_samples: int = 200
+    ):
+        """
+        Initialize the hedger.
+
+        Args:
+            percentile (float): Recent-latency percentile after which a
+                hedge is sent
+            budget (float): Maximum hedges as a share of calls
+            min_samples (int): Latencies needed per key before hedging
+            min_delay (float): Never hedge sooner than this (seconds)
+            max_samples (int): Latencies kept per key
+        """
+        if not 0 < percentile < 1:
+            raise ValueError("percentile must be between 0 and 1")
+
+        self.percentile = percentile
+        self.budget = budget
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.max_samples = max_samples
+
+        self._latencies: Dict[str, Deque[float]] = {}
+        # Start with one hedge available; never bank more than a few
+        self._tokens = 1.0
+        self._max_tokens = 10.0
+
+        self.calls = 0
+        self.fired = 0
+        self.won = 0
+        self.skipped_budget = 0
+
+    def delay(self, key: str = "") -> Optional[float]:
+        """
+        Seconds to wait before hedging a call for key.
+
+        Args:
+            key (str): Latency class
+
+        Returns:
+            float or None: Delay, or None while too few samples are known
+        """
+        samples = self._latencies.get(key)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, max(0, math.ceil(self.percentile * len(ordered)) - 1))
+        return max(self.min_delay, ordered[index])
+
+    def _record(self, key: str, latency: float) -> None:
+        samples = self._latencies.get(key)
+        if samples is None:
+            samples = self._latencies[key] = deque(maxlen=self.max_samples)
+        samples.append(latency)
+
+    def _take_token(self) -> bool:
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            return True
+        return False
+
+    async def run(self, call: Callable[[bool], Awaitable[Any]], key: str = "") -> Any:
+        """
+        Run call(False), hedging with call(True) if it is slow.
+
+        Args:
+            call: Takes hedged=True for the duplicate request and returns
+                an awaitable
+            key (str): Latency class used for the hedge delay
+
+        Returns:
+            The first successful result
+
+        Raises:
+            The primary call's exception if every attempt failed
+        """
+        self.calls += 1
+        self._tokens = min(self._max_tokens, self._tokens + self.budget)
+
+        start = time.monotonic()
+        delay = self.delay(key)
+        primary = asyncio.ensure_future(call(False))
+        tasks = {primary}
+
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done:
+                    if self._take_token():
+                        self.fired += 1
+                        logger.info(f"Hedging {key or 'LLM'} call after {delay:.2f}s")
+                        tasks.add(asyncio.ensure_future(call(True)))
+                    else:
+                        self.skipped_budget += 1
+
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((t for t in done if not t.cancelled() and t.exception() is None), None)
+                if winner is not None:
+                    if winner is not primary:
+                        self.won += 1
+                    self._record(key, time.monotonic() - start)
+                    return winner.result()
+
+            # Everything failed: surface the primary's error
+            return primary.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            # Mark exceptions of failed attempts as retrieved
+            for task in tasks:
+                if task.done() and not task.cancelled():
+                    task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get hedging metrics.
+
+        Returns:
+            dict: Calls, hedges fired/won/skipped for budget, and the
+                current hedge delay per key
+        """
+        return {
+            "percentile": self.percentile,
+            "budget": self.budget,
+            "calls": self.calls,
+            "fired": self.fired,
+            "won": self.won,
+            "skipped_budget": self.skipped_budget,
+            "hedge_rate": round(self.fired / self.calls, 3) if self.calls else 0.0,
+            "win_rate": round(self.won / self.fired, 3) if self.fired else 0.0,
+            "delays": {key or "default": self.delay(key) for key in self._latencies},
+        }
@@ -0,0 +1,282 @@
+"""
+In-memory BM25 index of the training collections, for hybrid retrieval.
+
+Embeddings place "Albums by AC/DC" near any question about albums and
+artists, so the pair that actually names AC/DC, or the DDL that has the
+exact column, can rank below looser matches. An inverted index scores exact
+term overlap with BM25. Its ranking is fused with the vector ranking by
+weighted reciprocal rank, so an item found by both methods rises to the
+top and an item only one method finds still gets in.
+
+Tokenization needs no dictionary. Text is NFKC-folded first. ASCII
+identifiers are kept whole and also split at camelCase, underscores and
+symbols ("BillingCountry" gives billingcountry, billing, country;
+"AC/DC" gives ac/dc, ac, dc). Japanese text is cut where the script
+changes (kanji, hiragana, katakana) and each run becomes character
+bigrams. "顧客は何人" therefore gives 顧客, は and 何人.
+
+Like the vector snapshot, an index is rebuilt from its ChromaDB
+collection on the first lookup after training changes, including changes
+made by another worker sharing the store.
+"""
+
+import json
+import logging
+import math
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Reciprocal rank fusion constant: damps how much the very top ranks dominate
+RRF_K = 60
+
+_WORD_RE = re.compile(r"[A-Za-z0-9_]+(?:[/.&'\-][A-Za-z0-9_]+)*")
+_CAMEL_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+# Kanji (incl. the 々 iteration mark), hiragana, katakana (incl. ー)
+_JA_RUN_RE = re.compile(r"[㐀-䶿一-鿿々]+|[ぁ-ゟ]+|[゠-ヿㇰ-ㇿ]+")
+
+
+def _fold_plural(token: str) -> str:
+    # Crude English plural folding so "customer" finds "customers"
+    if len(token) > 3 and token.isalpha() and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into BM25 terms.
+
+    Args:
+        text (str): Question, DDL or documentation text
+
+    Returns:
+        list: Terms, with repeats (term frequency matters)
+
+    Example:
+        >>> tokenize("Albums by AC/DC")
+        ['album', 'by', 'ac/dc', 'ac', 'dc']
+        >>> tokenize("顧客は何人いますか")
+        ['顧客', 'は', '何人', 'いま', 'ます', 'すか']
+    """
+    text = unicodedata.normalize("NFKC", text)
+    tokens: List[str] = []
+
+    for match in _WORD_RE.finditer(text):
+        word = match.group()
+        whole = _fold_plural(word.casefold())
+        tokens.append(whole)
+        parts = [
+            _fold_plural(part.casefold())
+            for chunk in re.split(r"[/.&'\-_]+", word) if chunk
+            for part in _CAMEL_RE.findall(chunk)
+        ]
+        if len(parts) > 1:
+            tokens.extend(parts)
+
+    for match in _JA_RUN_RE.finditer(text):
+        run = match.group()
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+class BM25:
+    """
+    Okapi BM25 over a fixed set of documents.
+
+    Example:
+        >>> bm25 = BM25(["CREATE TABLE artists (...)", "CREATE TABLE albums (...)"])
+        >>> bm25.search("artist names", k=1)
+        [(0, 0.6931)]
+    """
+
+    def __init__(self, texts: Sequence[str], k1: float = 1.5, b: float = 0.75):
+        """
+        Index documents.
+
+        Args:
+            texts: Document texts; results refer to them by position
+            k1 (float): Term frequency saturation
+            b (float): Document length normalization
+        """
+        self.k1 = k1
+        self.b = b
+        self.size = len(texts)
+
+        # term -> [(doc, tf)]
+        self._postings: Dict[str, List[Tuple[int, int]]] = {}
+        lengths = []
+        for doc, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self._postings.setdefault(term, []).append((doc, tf))
+        average = (sum(lengths) / len(lengths)) if lengths else 0.0
+        # Per-document length factor of the BM25 denominator, precomputed
+        self._norms = [k1 * (1 - b + b * length / average) if average else k1 for length in lengths]
+        self._idf = {
+            term: math.log(1 + (self.size - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self._postings.items()
+        }
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """
+        Best-scoring documents for a query.
+
+        Args:
+            query (str): Query text
+            k (int): Results wanted
+
+        Returns:
+            list: (document position, score) pairs, best first; documents
+                sharing no term with the query are left out
+        """
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = self._idf[term]
+            k1 = self.k1
+            for doc, tf in postings:
+                scores[doc] = scores.get(doc, 0.0) + idf * tf * (k1 + 1) / (tf + self._norms[doc])
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [(doc, round(score, 4)) for doc, score in ranked[:k]]
+
+
+def _index_text(document: str) -> str:
+    # Q&A pairs are stored as JSON; index their question and SQL, not the keys
+    if document.startswith("{"):
+        try:
+            pair = json.loads(document)
+        except ValueError:
+            return document
+        if isinstance(pair, dict) and "question" in pair:
+            return f"{pair.get('question', '')}\n{pair.get('sql', '')}"
+    return document
+
+
+def fuse_rankings(rankings: Sequence[List[str]], weights: Sequence[float], k: int) -> List[str]:
+    """
+    Merge rankings of the same documents by weighted reciprocal rank.
+
+    Args:
+        rankings: Document lists, each best first
+        weights: Weight of each ranking
+        k (int): Results wanted
+
+    Returns:
+        list: Top-k documents by fused score (ties keep first-seen order)
+    """
+    scores: Dict[str, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, document in enumerate(ranking):
+            scores[document] = scores.get(document, 0.0) + weight / (RRF_K + rank + 1)
+    return sorted(scores, key=lambda document: -scores[document])[:k]
+
+
+class LexicalIndex:
+    """
+    BM25 indexes of several collections, rebuilt lazily after changes.
+
+    Example:
+        >>> index = LexicalIndex()
+        >>> index.query("sql", vn.sql_collection, "Albums by AC/DC", 10)
+        ['{"question": "Show all albums by AC/DC", ...}', ...]
+        >>> index.invalidate("sql")  # after training
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # name -> (documents, BM25)
+        self._indexes: Dict[str, Tuple[List[str], BM25]] = {}
+        self._stale: Dict[str, bool] = {}
+
+        self.rebuilds = 0
+        self.queries = 0
+        self.query_seconds = 0.0
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        """
+        Mark a collection's index stale (all collections if name is None).
+
+        Args:
+            name (str): Collection name
+        """
+        with self._lock:
+            names = [name] if name is not None else list(self._indexes)
+            for key in names:
+                self._stale[key] = True
+
+    def _index(self, name: str, collection: Any) -> Tuple[List[str], BM25]:
+        entry = self._indexes.get(name)
+        if entry is not None and not self._stale.get(name):
+            return entry
+        with self._lock:
+            entry = self._indexes.get(name)
+            if entry is None or self._stale.get(name):
+                # Clear the flag first: a change during the build marks it stale again
+                self._stale[name] = False
+                start = time.perf_counter()
+                documents = list(collection.get(include=["documents"]).get("documents") or [])
+                entry = (documents, BM25([_index_text(document) for document in documents]))
+                self._indexes[name] = entry
+                self.rebuilds += 1
+                logger.info(
+                    f"Built {name} BM25 index: {len(documents)} items, {len(entry[1]._postings)} terms "
+                    f"({(time.perf_counter() - start) * 1000:.1f}ms)"
+                )
+            return entry
+
+    def query(self, name: str, collection: Any, text: str, k: int) -> List[str]:
+        """
+        Top-k documents of a collection by BM25.
+
+        Args:
+            name (str): Collection name
+            collection: ChromaDB collection it mirrors
+            text (str): Query text
+            k (int): Results wanted
+
+        Returns:
+            list: Documents sharing terms with the query, best first
+        """
+        documents, bm25 = self._index(name, collection)
+        start = time.perf_counter()
+        hits = bm25.search(text, k)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.queries += 1
+            self.query_seconds += elapsed
+        return [documents[doc] for doc, _ in hits]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get index metrics.
+
+        Returns:
+            dict: Rebuild/query counters, average query time and
+                per-collection document and term counts
+        """
+        with self._lock:
+            return {
+                "rebuilds": self.rebuilds,
+                "queries": self.queries,
+                "query_ms_avg": round(self.query_seconds * 1000 / self.queries, 3) if self.queries else 0.0,
+                "collections": {
+                    name: {
+                        "items": len(documents),
+                        "terms": len(bm25._postings),
+                        "stale": bool(self._stale.get(name)),
+                    }
+                    for name, (documents, bm25) in self._indexes.items()
+                },
+            }
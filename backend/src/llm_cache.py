@@ -0,0 +1,311 @@
+"""
+Prompt-response cache for LLM generations.
+
+Vanna builds byte-identical prompts for repeated questions, so answering
+them from a cache skips the full LLM round trip. Entries live in two tiers:
+
+- an in-memory LRU for the hottest prompts
+- a SQLite table that survives restarts, with TTL and size-based eviction
+
+Only low-temperature generations are cached; above the threshold the
+response is meant to vary and every call goes to the model.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    Normalize a prompt for cache keying.
+
+    Collapses runs of whitespace so prompts differing only in indentation
+    or trailing newlines share an entry.
+
+    Args:
+        prompt (str): Raw prompt text
+
+    Returns:
+        str: Normalized prompt
+    """
+    return " ".join(prompt.split())
+
+
+def make_cache_key(prompt: str, model: str, temperature: float, max_tokens: int) -> str:
+    """
+    Build the cache key for a generation request.
+
+    Args:
+        prompt (str): Prompt text (normalized before hashing)
+        model (str): Model name
+        temperature (float): Sampling temperature
+        max_tokens (int): Maximum tokens to generate
+
+    Returns:
+        str: SHA-256 hex digest
+
+    Example:
+        >>> make_cache_key("SELECT  1", "m", 0.1, 10) == make_cache_key("SELECT 1", "m", 0.1, 10)
+        True
+    """
+    raw = json.dumps(
+        [normalize_prompt(prompt), model, round(float(temperature), 4), int(max_tokens)],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Two-tier (memory LRU + SQLite) cache of LLM responses.
+
+    Thread-safe: the async /generate path and worker threads share one
+    instance.
+
+    Example:
+        >>> cache = ResponseCache(path="data/llm_cache.db")
+        >>> key = make_cache_key("How many customers?", "claude-sonnet-4-5", 0.1, 2048)
+        >>> cache.set(key, "SELECT COUNT(*) FROM Customer")
+        >>> cache.get(key)
+        'SELECT COUNT(*) FROM Customer'
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        memory_size: int = 256,
+        max_entries: int = 10000,
+        ttl: float = 604800.0,
+        max_temperature: float = 0.2
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            path (str): SQLite file for the persistent tier (None keeps the
+                cache in memory only)
+            memory_size (int): Entries held in the in-memory LRU
+            max_entries (int): Entries kept in SQLite before evicting the
+                least recently used
+            ttl (float): Seconds an entry stays valid (0 disables expiry)
+            max_temperature (float): Highest temperature whose responses
+                are cached
+        """
+        self.path = path
+        self.memory_size = memory_size
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_temperature = max_temperature
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.stores = 0
+        self.evictions = 0
+        self.expired = 0
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        """Open the SQLite tier on first use. Caller must hold the lock."""
+        if self._conn is not None or not self.path:
+            return self._conn
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                model TEXT,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_access ON llm_cache(last_access)")
+        conn.commit()
+        self._conn = conn
+
+        self._purge_expired()
+        return conn
+
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        return bool(self.ttl) and now - created_at > self.ttl
+
+    def _remember(self, key: str, response: str, created_at: float) -> None:
+        """Insert into the memory LRU. Caller must hold the lock."""
+        self._memory[key] = (response, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def is_cacheable(self, temperature: float) -> bool:
+        """
+        Check whether responses at this temperature may be cached.
+
+        Args:
+            temperature (float): Sampling temperature
+
+        Returns:
+            bool: True if temperature <= max_temperature
+        """
+        return temperature <= self.max_temperature
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a response, promoting disk hits into memory.
+
+        Args:
+            key (str): Key from make_cache_key()
+
+        Returns:
+            str or None: Cached response text
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                response, created_at = entry
+                if not self._is_expired(created_at, now):
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return response
+                del self._memory[key]
+
+            conn = self._connect()
+            if conn is not None:
+                row = conn.execute(
+                    "SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    response, created_at = row
+                    if self._is_expired(created_at, now):
+                        conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                        conn.commit()
+                        self.expired += 1
+                    else:
+                        conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+                        conn.commit()
+                        self._remember(key, response, created_at)
+                        self.disk_hits += 1
+                        return response
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, response: str, model: Optional[str] = None) -> None:
+        """
+        Store a response in both tiers, evicting the oldest entries if full.
+
+        Args:
+            key (str): Key from make_cache_key()
+            response (str): Generated text
+            model (str): Model name (informational)
+        """
+        now = time.time()
+        with self._lock:
+            self._remember(key, response, now)
+            self.stores += 1
+
+            conn = self._connect()
+            if conn is None:
+                return
+
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, response, model, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, response, model, now, now)
+            )
+
+            count = conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            overflow = count - self.max_entries
+            if overflow > 0:
+                conn.execute(
+                    "DELETE FROM llm_cache WHERE key IN "
+                    "(SELECT key FROM llm_cache ORDER BY last_access ASC LIMIT ?)",
+                    (overflow,)
+                )
+                self.evictions += overflow
+            conn.commit()
+
+    def record_bypass(self) -> None:
+        """Count a request that skipped the cache (temperature too high)."""
+        with self._lock:
+            self.bypassed += 1
+
+    def _purge_expired(self) -> int:
+        """Delete expired rows from SQLite. Caller must hold the lock."""
+        if not self.ttl or self._conn is None:
+            return 0
+        cursor = self._conn.execute(
+            "DELETE FROM llm_cache WHERE created_at < ?", (time.time() - self.ttl,)
+        )
+        self._conn.commit()
+        self.expired += cursor.rowcount
+        return cursor.rowcount
+
+    def clear(self) -> None:
+        """Remove all entries from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            conn = self._connect()
+            if conn is not None:
+                conn.execute("DELETE FROM llm_cache")
+                conn.commit()
+
+    def close(self) -> None:
+        """Close the SQLite connection."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache metrics.
+
+        Returns:
+            dict: Hit/miss counters, tier sizes and configuration
+        """
+        with self._lock:
+            entries = 0
+            conn = self._connect()
+            if conn is not None:
+                entries = conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "hits": hits,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "expired": self.expired,
+                "memory_entries": len(self._memory),
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "max_temperature": self.max_temperature,
+            }
@@ -0,0 +1,243 @@
+"""
+Per-call LLM instrumentation.
+
+Every LLM call is recorded with its purpose, model, prompt size, queue
+wait, time-to-first-token, total latency and outcome. Records are kept in
+a bounded rolling window and summarized on demand into histograms per
+purpose and per model, so the metrics endpoint shows which prompt types
+drive p95.
+"""
+
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Sequence
+
+# Histogram bucket upper bounds
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+SIZE_BUCKETS_CHARS = (500, 1000, 2000, 4000, 8000, 16000, 32000)
+SIZE_BUCKETS_TOKENS = (125, 250, 500, 1000, 2000, 4000, 8000)
+
+# Outcomes
+OUTCOME_OK = "ok"
+OUTCOME_CACHE_HIT = "cache_hit"
+OUTCOME_COALESCED = "coalesced"
+OUTCOME_SHED = "shed"
+OUTCOME_ERROR = "error"
+OUTCOME_CANCELLED = "cancelled"
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Roughly estimate the token count of a prompt.
+
+    Uses ~4 ASCII characters per token and ~1 token per non-ASCII
+    character, which is close enough for Japanese and English prompts to
+    compare prompt types.
+
+    Args:
+        text (str): Prompt text
+
+    Returns:
+        int: Estimated tokens
+
+    Example:
+        >>> estimate_tokens("SELECT * FROM Customer")
+        6
+    """
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return math.ceil(ascii_chars / 4 + (len(text) - ascii_chars))
+
+
+def summarize(values: Sequence[float], buckets: Iterable[float]) -> Dict[str, Any]:
+    """
+    Build a histogram summary of a list of samples.
+
+    Args:
+        values: Samples
+        buckets: Ascending bucket upper bounds (an overflow bucket is added)
+
+    Returns:
+        dict: count, mean, p50, p95, p99, max and cumulative-free bucket
+            counts keyed by upper bound ("+Inf" for the overflow)
+    """
+    bounds = list(buckets)
+    counts = {str(b): 0 for b in bounds}
+    counts["+Inf"] = 0
+    for value in values:
+        for bound in bounds:
+            if value <= bound:
+                counts[str(bound)] += 1
+                break
+        else:
+            counts["+Inf"] += 1
+
+    if not values:
+        return {"count": 0, "mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0, "buckets": counts}
+
+    ordered = sorted(values)
+
+    def percentile(q: float) -> float:
+        index = min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))
+        return round(ordered[index], 1)
+
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered), 1),
+        "p50": percentile(0.50),
+        "p95": percentile(0.95),
+        "p99": percentile(0.99),
+        "max": round(ordered[-1], 1),
+        "buckets": counts,
+    }
+
+
+class CallRecord:
+    """Timing and size data for one LLM call."""
+
+    def __init__(self, metrics: "LLMMetrics", purpose: Optional[str], model: str, prompt: str):
+        self.metrics = metrics
+        self.purpose = purpose or "unknown"
+        self.model = model
+        self.prompt_chars = len(prompt)
+        self.prompt_tokens = estimate_tokens(prompt)
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.queue_wait_ms: Optional[float] = None
+        self.ttft_ms: Optional[float] = None
+        self.latency_ms: Optional[float] = None
+        self.outcome: Optional[str] = None
+
+    def mark_queued(self, waited: Optional[float]) -> None:
+        """Record seconds spent waiting for admission."""
+        self.queue_wait_ms = (waited or 0.0) * 1000
+
+    def mark_first_token(self) -> None:
+        """Record time-to-first-token (only the first call counts)."""
+        if self.ttft_ms is None:
+            self.ttft_ms = (time.perf_counter() - self._start) * 1000
+
+    def finish(self, outcome: str) -> None:
+        """Close the record and hand it to the metrics window (idempotent)."""
+        if self.outcome is not None:
+            return
+        self.outcome = outcome
+        self.latency_ms = (time.perf_counter() - self._start) * 1000
+        self.metrics.add(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        def ms(value):
+            return round(value, 1) if value is not None else None
+
+        return {
+            "timestamp": self.started_at,
+            "purpose": self.purpose,
+            "model": self.model,
+            "prompt_chars": self.prompt_chars,
+            "prompt_tokens": self.prompt_tokens,
+            "queue_wait_ms": ms(self.queue_wait_ms),
+            "ttft_ms": ms(self.ttft_ms),
+            "latency_ms": ms(self.latency_ms),
+            "outcome": self.outcome,
+        }
+
+
+class LLMMetrics:
+    """
+    Rolling window of LLM call records.
+
+    Example:
+        >>> metrics = LLMMetrics(window=900)
+        >>> record = metrics.start("sql", "claude-sonnet-4-5", prompt)
+        >>> record.mark_first_token()
+        >>> record.finish(OUTCOME_OK)
+        >>> metrics.snapshot()["by_purpose"]["sql"]["latency_ms"]["p95"]
+    """
+
+    def __init__(self, window: float = 900.0, max_records: int = 5000, recent: int = 20):
+        """
+        Initialize the metrics window.
+
+        Args:
+            window (float): Seconds of history summarized by snapshot()
+            max_records (int): Hard cap on retained records
+            recent (int): Latest records included verbatim in snapshot()
+        """
+        self.window = window
+        self.recent = recent
+        self._records: Deque[CallRecord] = deque(maxlen=max_records)
+        self._lock = threading.Lock()
+        self.total_calls = 0
+
+    def start(self, purpose: Optional[str], model: str, prompt: str) -> CallRecord:
+        """
+        Begin recording a call.
+
+        Args:
+            purpose (str): Call purpose
+            model (str): Model name
+            prompt (str): Prompt text (only its size is kept)
+
+        Returns:
+            CallRecord: Record to mark and finish()
+        """
+        return CallRecord(self, purpose, model, prompt)
+
+    def add(self, record: CallRecord) -> None:
+        """Append a finished record."""
+        with self._lock:
+            self._records.append(record)
+            self.total_calls += 1
+
+    def _window_records(self) -> List[CallRecord]:
+        cutoff = time.time() - self.window
+        with self._lock:
+            return [r for r in self._records if r.started_at >= cutoff]
+
+    @staticmethod
+    def _group_summary(records: List[CallRecord]) -> Dict[str, Any]:
+        outcomes: Dict[str, int] = {}
+        for record in records:
+            outcomes[record.outcome] = outcomes.get(record.outcome, 0) + 1
+
+        # Cache hits and coalesced calls never reach the model; keep them out
+        # of the model-time histograms so they don't hide the real p95
+        model_calls = [r for r in records if r.outcome in (OUTCOME_OK, OUTCOME_ERROR)]
+
+        return {
+            "calls": len(records),
+            "outcomes": outcomes,
+            "latency_ms": summarize([r.latency_ms for r in model_calls], LATENCY_BUCKETS_MS),
+            "ttft_ms": summarize([r.ttft_ms for r in model_calls if r.ttft_ms is not None], LATENCY_BUCKETS_MS),
+            "queue_wait_ms": summarize(
+                [r.queue_wait_ms for r in records if r.queue_wait_ms is not None], LATENCY_BUCKETS_MS
+            ),
+            "prompt_chars": summarize([r.prompt_chars for r in records], SIZE_BUCKETS_CHARS),
+            "prompt_tokens": summarize([r.prompt_tokens for r in records], SIZE_BUCKETS_TOKENS),
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Summarize the rolling window.
+
+        Returns:
+            dict: Overall, per-purpose and per-model summaries plus the most
+                recent call records
+        """
+        records = self._window_records()
+
+        by_purpose: Dict[str, List[CallRecord]] = {}
+        by_model: Dict[str, List[CallRecord]] = {}
+        for record in records:
+            by_purpose.setdefault(record.purpose, []).append(record)
+            by_model.setdefault(record.model, []).append(record)
+
+        return {
+            "window_seconds": self.window,
+            "total_calls": self.total_calls,
+            "overall": self._group_summary(records),
+            "by_purpose": {name: self._group_summary(group) for name, group in sorted(by_purpose.items())},
+            "by_model": {name: self._group_summary(group) for name, group in sorted(by_model.items())},
+            "recent": [r.to_dict() for r in records[-self.recent:]],
+        }
@@ -0,0 +1,437 @@
+"""
+Warm pool of reusable Claude Agent SDK clients.
+
+Opening a ClaudeSDKClient spawns and handshakes an agent subprocess, which
+costs far more than the prompt itself for short SQL generations. This module
+keeps a bounded set of connected clients per model so steady-state calls
+skip the startup cost entirely.
+
+The pool is SDK-agnostic: it only needs a factory returning objects with
+async ``connect()`` / ``disconnect()`` methods, which keeps it usable from
+both the FastAPI app and the legacy ``claude_agent_server``.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled client becomes available within the acquire timeout."""
+
+
+class PoolClosedError(Exception):
+    """Raised when a client is requested from a closed pool."""
+
+
+def transport_is_ready(client: Any) -> bool:
+    """
+    Default health check for pooled clients.
+
+    ClaudeSDKClient keeps its subprocess transport in ``_transport``; a client
+    whose transport is gone or reports not-ready cannot serve another query.
+    Clients without a transport attribute are assumed healthy.
+
+    Args:
+        client: Pooled client instance
+
+    Returns:
+        bool: True if the client can be reused
+    """
+    if not hasattr(client, "_transport"):
+        return True
+    transport = client._transport
+    if transport is None:
+        return False
+    is_ready = getattr(transport, "is_ready", None)
+    return bool(is_ready()) if callable(is_ready) else True
+
+
+class PooledClient:
+    """A connected client plus the bookkeeping the recycle policy needs."""
+
+    def __init__(self, client: Any, model: str, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.client = client
+        self.model = model
+        # Loop the client was connected on; it can't be reused on another
+        self.loop = loop
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.uses = 0
+
+    @property
+    def age(self) -> float:
+        """Seconds since the client was connected."""
+        return time.monotonic() - self.created_at
+
+
+class _SubPool:
+    """Per-model pool state. All mutation happens under ``cond``."""
+
+    def __init__(self):
+        self.idle: Deque[PooledClient] = deque()
+        self.cond = asyncio.Condition()
+        self.size = 0
+        self.in_use = 0
+        self.waiters = 0
+        self.spawned = 0
+        self.recycled = 0
+        self.acquired = 0
+        self.reused = 0
+        self.timeouts = 0
+        self.spawn_time_total = 0.0
+        self.last_spawn_time = 0.0
+
+
+class ClaudeClientPool:
+    """
+    Bounded, per-model pool of pre-connected agent clients.
+
+    Clients are recycled once they exceed ``max_age`` seconds or ``max_uses``
+    queries, fail the health check, or raise while in use.
+
+    Example:
+        >>> pool = ClaudeClientPool(lambda model: ClaudeSDKClient(options=...))
+        >>> await pool.warm_up("claude-sonnet-4-5", 2)
+        >>> async with pool.client("claude-sonnet-4-5") as client:
+        ...     await client.query("SELECT 1")
+    """
+
+    def __init__(
+        self,
+        client_factory: Callable[[str], Any],
+        max_size: int = 4,
+        max_age: float = 600.0,
+        max_uses: int = 25,
+        acquire_timeout: float = 30.0,
+        health_check: Optional[Callable[[Any], bool]] = transport_is_ready
+    ):
+        """
+        Initialize the pool.
+
+        Args:
+            client_factory: Callable taking a model name and returning an
+                unconnected client
+            max_size (int): Maximum live clients per model
+            max_age (float): Seconds after which a client is recycled
+            max_uses (int): Queries after which a client is recycled
+            acquire_timeout (float): Seconds to wait for a free client
+            health_check: Callable returning False for clients that must not
+                be reused (None disables the check)
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+
+        self.client_factory = client_factory
+        self.max_size = max_size
+        self.max_age = max_age
+        self.max_uses = max_uses
+        self.acquire_timeout = acquire_timeout
+        self.health_check = health_check
+
+        self._pools: Dict[str, _SubPool] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._closed = False
+        # Disconnects of clients dropped with an old event loop
+        self._orphan_closes: set = set()
+
+    def _subpool(self, model: str) -> _SubPool:
+        """Get the sub-pool for a model, resetting state if the event loop changed."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Connected clients and conditions are bound to the loop that
+            # created them, so a new loop (tests, reloads) starts from
+            # scratch; the idle clients left behind are disconnected.
+            orphans = [pooled for sub in self._pools.values() for pooled in sub.idle]
+            for pooled in orphans:
+                self._close_orphan(pooled)
+            self._pools = {}
+            self._loop = loop
+
+        if model not in self._pools:
+            self._pools[model] = _SubPool()
+        return self._pools[model]
+
+    def _is_reusable(self, pooled: PooledClient) -> bool:
+        """Apply the recycle policy and health check to an idle client."""
+        if self.max_age and pooled.age >= self.max_age:
+            return False
+        if self.max_uses and pooled.uses >= self.max_uses:
+            return False
+        if self.health_check is not None:
+            try:
+                return self.health_check(pooled.client)
+            except Exception as e:
+                logger.warning(f"Pooled client health check failed: {e}")
+                return False
+        return True
+
+    async def _spawn(self, model: str, sub: _SubPool) -> PooledClient:
+        """Create and connect a new client, recording spawn time."""
+        start = time.perf_counter()
+        client = self.client_factory(model)
+        await client.connect()
+        elapsed = time.perf_counter() - start
+
+        sub.spawned += 1
+        sub.spawn_time_total += elapsed
+        sub.last_spawn_time = elapsed
+        logger.info(f"Spawned pooled Claude client for {model} in {elapsed * 1000:.0f}ms")
+        return PooledClient(client, model, asyncio.get_running_loop())
+
+    async def _close_client(self, pooled: PooledClient) -> None:
+        """Disconnect a client, ignoring errors from an already-dead transport."""
+        try:
+            await pooled.client.disconnect()
+        except Exception as e:
+            logger.debug(f"Error disconnecting pooled client: {e}")
+
+    def _close_orphan(self, pooled: PooledClient) -> None:
+        """Disconnect a client from another event loop, on that loop if it still runs."""
+        old_loop = pooled.loop
+        if old_loop is not None and old_loop.is_running() and not old_loop.is_closed():
+            asyncio.run_coroutine_threadsafe(self._close_client(pooled), old_loop)
+            return
+        task = asyncio.get_running_loop().create_task(self._close_client(pooled))
+        self._orphan_closes.add(task)
+        task.add_done_callback(self._orphan_closes.discard)
+
+    async def acquire(self, model: str) -> PooledClient:
+        """
+        Check out a client for a model, spawning one if the pool has room.
+
+        Args:
+            model (str): Model the client must be configured for
+
+        Returns:
+            PooledClient: Checked-out client; must be passed back to release()
+
+        Raises:
+            PoolTimeoutError: If no client frees up within acquire_timeout
+            PoolClosedError: If the pool was closed
+        """
+        if self._closed:
+            raise PoolClosedError("Claude client pool is closed")
+        sub = self._subpool(model)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.acquire_timeout
+        stale = []
+
+        async with sub.cond:
+            while True:
+                if self._closed:
+                    raise PoolClosedError("Claude client pool is closed")
+                pooled = None
+                while sub.idle:
+                    candidate = sub.idle.pop()
+                    if self._is_reusable(candidate):
+                        pooled = candidate
+                        break
+                    sub.size -= 1
+                    sub.recycled += 1
+                    stale.append(candidate)
+
+                if pooled is not None:
+                    sub.in_use += 1
+                    sub.acquired += 1
+                    sub.reused += 1
+                    break
+
+                if sub.size < self.max_size:
+                    # Reserve the slot now, connect outside the lock
+                    sub.size += 1
+                    break
+
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    sub.timeouts += 1
+                    raise PoolTimeoutError(
+                        f"No Claude client available for {model} after {self.acquire_timeout}s"
+                    )
+
+                sub.waiters += 1
+                try:
+                    await asyncio.wait_for(sub.cond.wait(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    pass
+                finally:
+                    sub.waiters -= 1
+
+        for candidate in stale:
+            await self._close_client(candidate)
+
+        if pooled is not None:
+            return pooled
+
+        try:
+            pooled = await self._spawn(model, sub)
+        except BaseException:
+            async with sub.cond:
+                sub.size -= 1
+                sub.cond.notify()
+            raise
+
+        async with sub.cond:
+            if self._closed:
+                # Closed while connecting: don't hand out a client close() missed
+                sub.size -= 1
+                closed = True
+            else:
+                sub.in_use += 1
+                sub.acquired += 1
+                closed = False
+        if closed:
+            await self._close_client(pooled)
+            raise PoolClosedError("Claude client pool is closed")
+        return pooled
+
+    async def release(self, pooled: PooledClient, discard: bool = False) -> None:
+        """
+        Return a client to the pool.
+
+        Args:
+            pooled (PooledClient): Client obtained from acquire()
+            discard (bool): Close the client instead of reusing it (e.g. after
+                an error left the session in an unknown state)
+        """
+        if pooled.loop is not None and pooled.loop is not asyncio.get_running_loop():
+            # Checked out before the loop changed; its sub-pool is gone
+            await self._close_client(pooled)
+            return
+
+        sub = self._subpool(pooled.model)
+        pooled.uses += 1
+        pooled.last_used = time.monotonic()
+
+        async with sub.cond:
+            sub.in_use = max(0, sub.in_use - 1)
+            keep = not discard and not self._closed and self._is_reusable(pooled)
+            if keep:
+                sub.idle.append(pooled)
+            else:
+                sub.size = max(0, sub.size - 1)
+                sub.recycled += 1
+            sub.cond.notify()
+
+        if not keep:
+            await self._close_client(pooled)
+
+    @asynccontextmanager
+    async def client(self, model: str):
+        """
+        Context manager yielding a pooled client.
+
+        The client is discarded rather than reused if the body raises or is
+        cancelled, since a half-read response would leak into the next query.
+
+        Args:
+            model (str): Model name
+
+        Yields:
+            The connected client object
+        """
+        pooled = await self.acquire(model)
+        discard = False
+        try:
+            yield pooled.client
+        except BaseException:
+            discard = True
+            raise
+        finally:
+            await self.release(pooled, discard=discard)
+
+    async def warm_up(self, model: str, count: int = 1) -> int:
+        """
+        Pre-start clients so the first requests don't pay the spawn cost.
+
+        Args:
+            model (str): Model to warm
+            count (int): Target number of idle clients (capped at max_size)
+
+        Returns:
+            int: Number of clients spawned
+        """
+        sub = self._subpool(model)
+        spawned = 0
+
+        while True:
+            async with sub.cond:
+                if sub.size >= min(count, self.max_size) or self._closed:
+                    break
+                sub.size += 1
+
+            try:
+                pooled = await self._spawn(model, sub)
+            except BaseException:
+                async with sub.cond:
+                    sub.size -= 1
+                    sub.cond.notify()
+                raise
+
+            async with sub.cond:
+                closed = self._closed
+                if closed:
+                    sub.size -= 1
+                else:
+                    sub.idle.append(pooled)
+                    sub.cond.notify()
+            if closed:
+                await self._close_client(pooled)
+                break
+            spawned += 1
+
+        return spawned
+
+    async def close(self) -> None:
+        """
+        Disconnect all idle clients; in-use clients are closed on release.
+
+        Later acquire() calls raise PoolClosedError.
+        """
+        self._closed = True
+        to_close = []
+        for sub in self._pools.values():
+            async with sub.cond:
+                while sub.idle:
+                    to_close.append(sub.idle.pop())
+                    sub.size -= 1
+                sub.cond.notify_all()
+
+        for pooled in to_close:
+            await self._close_client(pooled)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get pool metrics per model.
+
+        Returns:
+            dict: Pool configuration plus size, idle, in_use, waiters and
+                spawn timings for each model sub-pool
+        """
+        models = {}
+        for model, sub in self._pools.items():
+            models[model] = {
+                "size": sub.size,
+                "idle": len(sub.idle),
+                "in_use": sub.in_use,
+                "waiters": sub.waiters,
+                "spawned": sub.spawned,
+                "recycled": sub.recycled,
+                "acquired": sub.acquired,
+                "reused": sub.reused,
+                "timeouts": sub.timeouts,
+                "avg_spawn_ms": round(sub.spawn_time_total / sub.spawned * 1000, 1) if sub.spawned else 0.0,
+                "last_spawn_ms": round(sub.last_spawn_time * 1000, 1),
+            }
+
+        return {
+            "max_size": self.max_size,
+            "max_age": self.max_age,
+            "max_uses": self.max_uses,
+            "models": models,
+        }
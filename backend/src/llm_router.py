@@ -0,0 +1,208 @@
+"""
+Purpose-based model routing with latency-aware fallback.
+
+SQL generation, chart code, follow-up questions and question suggestions
+don't need the same model or output length. The router maps each call
+purpose to a (model, max_tokens) route and watches how every model is
+doing: when a model's recent p95 latency goes over a threshold, or its
+error rate does, calls for it are sent to a faster fallback model until
+its window of bad samples ages out.
+
+Every decision is counted and the latest ones are kept for the stats
+endpoint.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from .llm_metrics import summarize, LATENCY_BUCKETS_MS
+
+logger = logging.getLogger(__name__)
+
+# Decision reasons
+REASON_DEFAULT = "default"
+REASON_ROUTE = "route"
+REASON_FALLBACK_LATENCY = "fallback_latency"
+REASON_FALLBACK_ERRORS = "fallback_errors"
+
+
+class ModelHealth:
+    """Rolling latency and error samples for one model."""
+
+    def __init__(self, window: float, max_samples: int = 500):
+        self.window = window
+        # (timestamp, latency_ms or None, ok)
+        self._samples: Deque[Tuple[float, Optional[float], bool]] = deque(maxlen=max_samples)
+
+    def add(self, latency_ms: Optional[float], ok: bool) -> None:
+        self._samples.append((time.time(), latency_ms, ok))
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Sample count, error rate and p95 latency within the window."""
+        cutoff = time.time() - self.window
+        samples = [s for s in self._samples if s[0] >= cutoff]
+        latencies = [latency for _, latency, ok in samples if ok and latency is not None]
+        errors = sum(1 for _, _, ok in samples if not ok)
+        return {
+            "samples": len(samples),
+            "errors": errors,
+            "error_rate": round(errors / len(samples), 3) if samples else 0.0,
+            "p95_ms": summarize(latencies, LATENCY_BUCKETS_MS)["p95"],
+        }
+
+
+class ModelRouter:
+    """
+    Pick a model and max_tokens for each LLM call.
+
+    Example:
+        >>> router = ModelRouter(
+        ...     "claude-sonnet-4-5", 2048,
+        ...     routes={"plotly": {"model": "claude-haiku-4-5", "max_tokens": 1024}},
+        ...     fallback_model="claude-haiku-4-5",
+        ...     p95_threshold_ms=15000
+        ... )
+        >>> model, max_tokens = router.select("sql")
+        >>> router.record(model, latency_ms=2300, ok=True)
+    """
+
+    def __init__(
+        self,
+        default_model: str,
+        default_max_tokens: int,
+        routes: Optional[Dict[str, Dict[str, Any]]] = None,
+        fallback_model: Optional[str] = None,
+        p95_threshold_ms: float = 15000.0,
+        error_rate_threshold: float = 0.5,
+        window: float = 300.0,
+        min_samples: int = 5,
+        recent: int = 50
+    ):
+        """
+        Initialize the router.
+
+        Args:
+            default_model (str): Model for purposes without a route
+            default_max_tokens (int): max_tokens for purposes without a route
+            routes (dict): Per-purpose {"model", "max_tokens"} overrides
+                (either key may be omitted)
+            fallback_model (str): Faster model used while the routed one is
+                unhealthy (None disables fallback)
+            p95_threshold_ms (float): p95 latency above which a model is
+                considered too slow
+            error_rate_threshold (float): Error share above which a model
+                is considered failing
+            window (float): Seconds of samples used for health checks
+            min_samples (int): Samples needed before a model can be judged
+            recent (int): Decisions kept for stats()
+        """
+        self.default_model = default_model
+        self.default_max_tokens = default_max_tokens
+        self.routes = routes or {}
+        self.fallback_model = fallback_model or None
+        self.p95_threshold_ms = p95_threshold_ms
+        self.error_rate_threshold = error_rate_threshold
+        self.window = window
+        self.min_samples = min_samples
+
+        self._lock = threading.Lock()
+        self._health: Dict[str, ModelHealth] = {}
+        self._decisions: Dict[Tuple[str, str, str], int] = {}
+        self._recent: Deque[Dict[str, Any]] = deque(maxlen=recent)
+
+    def _health_for(self, model: str) -> ModelHealth:
+        """Get a model's health tracker. Caller must hold the lock."""
+        health = self._health.get(model)
+        if health is None:
+            health = self._health[model] = ModelHealth(self.window)
+        return health
+
+    def _unhealthy_reason(self, model: str) -> Optional[str]:
+        """Why a model should be avoided right now, if it should. Caller must hold the lock."""
+        health = self._health.get(model)
+        if health is None:
+            return None
+        snapshot = health.snapshot()
+        if snapshot["samples"] < self.min_samples:
+            return None
+        if snapshot["error_rate"] > self.error_rate_threshold:
+            return REASON_FALLBACK_ERRORS
+        if snapshot["p95_ms"] > self.p95_threshold_ms:
+            return REASON_FALLBACK_LATENCY
+        return None
+
+    def select(self, purpose: Optional[str]) -> Tuple[str, int]:
+        """
+        Route a call and record the decision.
+
+        Args:
+            purpose (str): Call purpose (None uses the defaults)
+
+        Returns:
+            tuple: (model, max_tokens)
+        """
+        route = self.routes.get(purpose or "", {})
+        model = route.get("model") or self.default_model
+        max_tokens = route.get("max_tokens") or self.default_max_tokens
+        reason = REASON_ROUTE if route else REASON_DEFAULT
+
+        with self._lock:
+            if self.fallback_model and model != self.fallback_model:
+                unhealthy = self._unhealthy_reason(model)
+                if unhealthy is not None:
+                    logger.info(f"Routing {purpose or 'untagged'} call from {model} to {self.fallback_model} ({unhealthy})")
+                    model, reason = self.fallback_model, unhealthy
+
+            key = (purpose or "untagged", model, reason)
+            self._decisions[key] = self._decisions.get(key, 0) + 1
+            self._recent.append({
+                "timestamp": time.time(),
+                "purpose": purpose or "untagged",
+                "model": model,
+                "max_tokens": max_tokens,
+                "reason": reason,
+            })
+
+        return model, max_tokens
+
+    def record(self, model: str, latency_ms: Optional[float] = None, ok: bool = True) -> None:
+        """
+        Feed the outcome of a call back into the model's health.
+
+        Args:
+            model (str): Model that served the call
+            latency_ms (float): Call latency (None when not meaningful,
+                e.g. a batch item)
+            ok (bool): False if the call failed
+        """
+        with self._lock:
+            self._health_for(model).add(latency_ms, ok)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get routing metrics.
+
+        Returns:
+            dict: Routes, per-model health, decision counts by
+                (purpose, model, reason) and the latest decisions
+        """
+        with self._lock:
+            return {
+                "default_model": self.default_model,
+                "fallback_model": self.fallback_model,
+                "p95_threshold_ms": self.p95_threshold_ms,
+                "error_rate_threshold": self.error_rate_threshold,
+                "routes": self.routes,
+                "models": {
+                    model: {**health.snapshot(), "unhealthy": self._unhealthy_reason(model)}
+                    for model, health in self._health.items()
+                },
+                "decisions": [
+                    {"purpose": purpose, "model": model, "reason": reason, "count": count}
+                    for (purpose, model, reason), count in sorted(self._decisions.items())
+                ],
+                "recent": list(self._recent),
+            }
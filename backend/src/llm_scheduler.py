@@ -0,0 +1,312 @@
+"""
+Priority-aware admission control for LLM calls.
+
+SQL generation, plotly code, follow-up questions and question suggestions
+all need the same LLM capacity. The scheduler gives each call a purpose,
+maps purposes to priority classes with their own concurrency limits, and
+keeps a bounded wait queue. Calls that cannot be admitted within the queue
+timeout (or arrive when the queue is full) are shed with
+LLMOverloadedError so the API can answer 429 with Retry-After instead of
+piling up.
+
+The current purpose travels with the caller in a context variable set by
+DetomoVanna's generate_* methods (see llm_purpose()).
+"""
+
+import asyncio
+import contextvars
+import itertools
+import logging
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Call purposes, in priority order (interactive SQL first)
+PURPOSE_SQL = "sql"
+PURPOSE_PLOTLY = "plotly"
+PURPOSE_QUESTIONS = "questions"
+PURPOSE_FOLLOWUP = "followup"
+PURPOSES = (PURPOSE_SQL, PURPOSE_PLOTLY, PURPOSE_QUESTIONS, PURPOSE_FOLLOWUP)
+
+DEFAULT_PURPOSE = PURPOSE_SQL
+
+_current_purpose: contextvars.ContextVar = contextvars.ContextVar("llm_purpose", default=None)
+
+
+@contextmanager
+def llm_purpose(purpose: str):
+    """
+    Tag LLM calls made inside the block with a purpose.
+
+    Args:
+        purpose (str): One of PURPOSES
+
+    Example:
+        >>> with llm_purpose(PURPOSE_PLOTLY):
+        ...     vn.submit_prompt(message_log)
+    """
+    token = _current_purpose.set(purpose)
+    try:
+        yield
+    finally:
+        _current_purpose.reset(token)
+
+
+def current_purpose() -> Optional[str]:
+    """Get the purpose set by the innermost llm_purpose() block, if any."""
+    return _current_purpose.get()
+
+
+class LLMOverloadedError(Exception):
+    """
+    Raised when an LLM call is shed by admission control.
+
+    Attributes:
+        retry_after (float): Suggested seconds before retrying
+    """
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        """Retry-After header value (whole seconds, at least 1)."""
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class PriorityClass:
+    """Per-purpose admission state."""
+
+    def __init__(self, name: str, priority: int, limit: int):
+        self.name = name
+        self.priority = priority
+        self.limit = limit
+        self.active = 0
+        self.admitted = 0
+        self.shed = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+
+class _Waiter:
+    """A queued call waiting for admission."""
+
+    __slots__ = ("cls", "seq", "future", "enqueued_at")
+
+    def __init__(self, cls: PriorityClass, seq: int, future: asyncio.Future):
+        self.cls = cls
+        self.seq = seq
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+    def sort_key(self):
+        return (self.cls.priority, self.seq)
+
+
+class LLMScheduler:
+    """
+    Priority scheduler with per-class limits and a bounded wait queue.
+
+    Waiters are admitted in (priority, arrival) order; a waiter whose class
+    is at its limit is skipped so a lower class with spare capacity can run.
+
+    Example:
+        >>> scheduler = LLMScheduler(max_concurrency=4, class_limits={"sql": 4, "followup": 1})
+        >>> async with scheduler.slot("followup") as wait:
+        ...     await generate(...)
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 4,
+        class_limits: Optional[Dict[str, int]] = None,
+        max_queue: int = 32,
+        queue_timeout: float = 10.0
+    ):
+        """
+        Initialize the scheduler.
+
+        Args:
+            max_concurrency (int): Total concurrent LLM calls
+            class_limits (dict): Concurrency limit per purpose (missing
+                purposes may use the full max_concurrency)
+            max_queue (int): Waiters allowed before new calls are shed
+            queue_timeout (float): Seconds a call may wait for admission
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+        limits = class_limits or {}
+        self.classes: Dict[str, PriorityClass] = {
+            name: PriorityClass(name, priority, limits.get(name, max_concurrency))
+            for priority, name in enumerate(PURPOSES)
+        }
+
+        self._active = 0
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+        # Recent service times feed the Retry-After estimate
+        self._service_times: Deque[float] = deque(maxlen=50)
+
+    def _class_for(self, purpose: Optional[str]) -> PriorityClass:
+        return self.classes.get(purpose or DEFAULT_PURPOSE) or self.classes[DEFAULT_PURPOSE]
+
+    def _can_admit(self, cls: PriorityClass) -> bool:
+        return self._active < self.max_concurrency and cls.active < cls.limit
+
+    def _admit(self, cls: PriorityClass, waited: float) -> None:
+        self._active += 1
+        cls.active += 1
+        cls.admitted += 1
+        cls.wait_total += waited
+        cls.wait_max = max(cls.wait_max, waited)
+
+    def _dispatch(self) -> None:
+        """Admit queued calls in priority order while capacity allows."""
+        for waiter in sorted(self._waiters, key=_Waiter.sort_key):
+            if self._active >= self.max_concurrency:
+                break
+            if waiter.future.done() or not self._can_admit(waiter.cls):
+                continue
+            self._waiters.remove(waiter)
+            self._admit(waiter.cls, time.monotonic() - waiter.enqueued_at)
+            waiter.future.set_result(None)
+
+    def _release(self, cls: PriorityClass, service_time: float) -> None:
+        self._active -= 1
+        cls.active -= 1
+        self._service_times.append(service_time)
+        self._dispatch()
+
+    def retry_after(self) -> float:
+        """
+        Estimate seconds until capacity frees up for a new call.
+
+        Returns:
+            float: Queue depth times average service time over capacity
+        """
+        if self._service_times:
+            avg = sum(self._service_times) / len(self._service_times)
+        else:
+            avg = self.queue_timeout
+        return max(1.0, avg * (len(self._waiters) + 1) / self.max_concurrency)
+
+    def _shed(self, cls: PriorityClass, reason: str) -> LLMOverloadedError:
+        cls.shed += 1
+        retry_after = self.retry_after()
+        logger.warning(f"Shedding {cls.name} LLM call: {reason} (retry after {retry_after:.1f}s)")
+        return LLMOverloadedError(f"LLM capacity exhausted: {reason}", retry_after=retry_after)
+
+    async def acquire(self, purpose: Optional[str] = None) -> float:
+        """
+        Wait for admission.
+
+        Args:
+            purpose (str): Call purpose (None means DEFAULT_PURPOSE)
+
+        Returns:
+            float: Seconds spent queued
+
+        Raises:
+            LLMOverloadedError: If the queue is full or the wait times out
+        """
+        cls = self._class_for(purpose)
+
+        # Admit straight away only if nobody of equal or higher priority is queued
+        if self._can_admit(cls) and not any(
+            w.cls.priority <= cls.priority for w in self._waiters
+        ):
+            self._admit(cls, 0.0)
+            return 0.0
+
+        if len(self._waiters) >= self.max_queue:
+            raise self._shed(cls, f"queue full ({self.max_queue} waiting)")
+
+        waiter = _Waiter(cls, next(self._seq), asyncio.get_running_loop().create_future())
+        self._waiters.append(waiter)
+        self._dispatch()
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.future.done():
+                # Admitted at the last moment
+                return time.monotonic() - waiter.enqueued_at
+            self._waiters.remove(waiter)
+            waiter.future.cancel()
+            raise self._shed(cls, f"queued longer than {self.queue_timeout}s")
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                self._release(cls, 0.0)
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+                waiter.future.cancel()
+            raise
+
+        return time.monotonic() - waiter.enqueued_at
+
+    def release(self, purpose: Optional[str] = None, service_time: float = 0.0) -> None:
+        """
+        Free a slot obtained from acquire().
+
+        Args:
+            purpose (str): Purpose passed to acquire()
+            service_time (float): Seconds the call held the slot
+        """
+        self._release(self._class_for(purpose), service_time)
+
+    @asynccontextmanager
+    async def slot(self, purpose: Optional[str] = None):
+        """
+        Context manager holding an admission slot.
+
+        Args:
+            purpose (str): Call purpose
+
+        Yields:
+            float: Seconds spent queued
+        """
+        waited = await self.acquire(purpose)
+        start = time.monotonic()
+        try:
+            yield waited
+        finally:
+            self.release(purpose, time.monotonic() - start)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get scheduler metrics.
+
+        Returns:
+            dict: Active calls, queue depth and per-class admitted/shed
+                counts and wait times
+        """
+        return {
+            "max_concurrency": self.max_concurrency,
+            "active": self._active,
+            "queue_depth": len(self._waiters),
+            "max_queue": self.max_queue,
+            "queue_timeout": self.queue_timeout,
+            "classes": {
+                name: {
+                    "priority": cls.priority,
+                    "limit": cls.limit,
+                    "active": cls.active,
+                    "queued": sum(1 for w in self._waiters if w.cls is cls),
+                    "admitted": cls.admitted,
+                    "shed": cls.shed,
+                    "avg_wait_ms": round(cls.wait_total / cls.admitted * 1000, 1) if cls.admitted else 0.0,
+                    "max_wait_ms": round(cls.wait_max * 1000, 1),
+                }
+                for name, cls in self.classes.items()
+            },
+        }
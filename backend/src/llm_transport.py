@@ -0,0 +1,935 @@
+"""
+LLM transports for ClaudeAgentChat.
+
+A transport takes a flat prompt string and returns the generated text.
+Two implementations are provided:
+
+- HTTPTransport: POSTs to a /generate endpoint, for split deployments where
+  the LLM service runs in another process or host. It keeps a pooled
+  keep-alive session, retries transient failures with jittered exponential
+  backoff and fails fast through a circuit breaker while the endpoint is
+  unhealthy.
+- InProcessTransport: calls the LLM service coroutine directly on the
+  server's event loop, skipping JSON encoding, the loopback socket and a
+  second FastAPI request cycle.
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import math
+import queue
+import random
+import threading
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from .llm_scheduler import LLMOverloadedError
+from .sse import iter_sse_events, aiter_sse_events
+
+logger = logging.getLogger(__name__)
+
+# Gateway errors mean the request never reached a healthy worker, so the
+# (side-effect free) generation can safely be retried
+RETRYABLE_STATUS_CODES = {502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised when the circuit breaker is open and calls fail fast."""
+
+
+class CircuitBreaker:
+    """
+    Thread-safe circuit breaker.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    every call fails immediately. Once ``reset_timeout`` seconds have
+    passed, a single probe call is let through (half-open); its outcome
+    closes or re-opens the circuit.
+
+    Example:
+        >>> breaker = CircuitBreaker(failure_threshold=5, reset_timeout=30)
+        >>> if breaker.allow_request():
+        ...     try:
+        ...         call()
+        ...         breaker.record_success()
+        ...     except Exception:
+        ...         breaker.record_failure()
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """
+        Initialize circuit breaker.
+
+        Args:
+            failure_threshold (int): Consecutive failures that open the circuit
+            reset_timeout (float): Seconds to stay open before probing
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """
+        Check whether a call may proceed.
+
+        Returns:
+            bool: False while the circuit is open (or a probe is in flight)
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+
+            self.rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        """Close the circuit after a successful call."""
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        """Count a failure, opening the circuit at the threshold."""
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"Circuit breaker opened after {self.failures} failures")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get breaker state and counters."""
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "rejected": self.rejected
+            }
+
+
+class LLMTransport:
+    """Base class for LLM transports used by ClaudeAgentChat."""
+
+    def generate(
+        self,
+        prompt: str,
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        purpose: Optional[str] = None,
+        coalesce: bool = True
+    ) -> str:
+        """
+        Generate text for a prompt.
+
+        Args:
+            prompt (str): Flattened prompt text
+            model (str): Claude model name
+            temperature (float): Sampling temperature
+            max_tokens (int): Maximum tokens to generate
+            purpose (str): Call purpose used for admission priority
+                (see src.llm_scheduler)
+            coalesce (bool): Let the service share an identical in-flight
+                call (False for hedged duplicates, which must run on their own)
+
+        Returns:
+            str: Generated text
+
+        Raises:
+            LLMOverloadedError: If the call was shed by admission control
+            Exception: If the call fails
+        """
+        raise NotImplementedError
+
+    async def agenerate(
+        self,
+        prompt: str,
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        purpose: Optional[str] = None,
+        coalesce: bool = True
+    ) -> str:
+        """
+        Async counterpart of generate().
+
+        The default runs generate() in a worker thread; transports with
+        native async I/O override it so waiting on the LLM holds no thread.
+        """
+        return await asyncio.to_thread(self.generate, prompt, model, temperature, max_tokens, purpose, coalesce)
+
+    def generate_batch(
+        self,
+        prompts: List[str],
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        purpose: Optional[str] = None,
+        max_concurrency: int = 8
+    ) -> List[Union[str, Exception]]:
+        """
+        Generate text for several prompts concurrently.
+
+        The default fans generate() out over a thread pool.
+
+        Args:
+            prompts (list): Flattened prompt texts
+            model (str): Claude model name
+            temperature (float): Sampling temperature
+            max_tokens (int): Maximum tokens to generate
+            purpose (str): Call purpose used for admission priority
+            max_concurrency (int): Prompts in flight at once
+
+        Returns:
+            list: Generated text per prompt, in order; a failed prompt gets
+                its exception instead of text
+        """
+        if not prompts:
+            return []
+
+        workers = max(1, min(max_concurrency, len(prompts)))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(self.generate, prompt, model, temperature, max_tokens, purpose)
+                for prompt in prompts
+            ]
+            results: List[Union[str, Exception]] = []
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    results.append(e)
+        return results
+
+    async def agenerate_batch(
+        self,
+        prompts: List[str],
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        purpose: Optional[str] = None,
+        max_concurrency: int = 8
+    ) -> List[Union[str, Exception]]:
+        """Async counterpart of generate_batch(), fanning out agenerate()."""
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+        async def one(prompt: str) -> str:
+            async with semaphore:
+                return await self.agenerate(prompt, model, temperature, max_tokens, purpose)
+
+        results = await asyncio.gather(*[one(prompt) for prompt in prompts], return_exceptions=True)
+        return list(results)
+
+    def stream(
+        self,
+        prompt: str,
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        purpose: Optional[str] = None
+    ) -> Iterator[str]:
+        """
+        Stream generated text in chunks.
+
+        The default yields the full response as a single chunk; streaming
+        transports override it to yield tokens as they arrive.
+        """
+        yield self.generate(prompt, model, temperature, max_tokens, purpose)
+
+    async def astream(
+        self,
+        prompt: str,
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        purpose: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """Async counterpart of stream()."""
+        yield await self.agenerate(prompt, model, temperature, max_tokens, purpose)
+
+    def describe(self) -> str:
+        """Human-readable target, used in logs and health checks."""
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        """Transport-specific counters (empty by default)."""
+        return {}
+
+
+class HTTPTransport(LLMTransport):
+    """
+    Transport that POSTs prompts to a /generate endpoint.
+
+    Uses one keep-alive requests.Session with a bounded connection pool,
+    separate connect/read timeouts, retries with jittered exponential
+    backoff for failures that never reached a healthy worker (connection
+    errors, connect timeouts, 502/503/504), and a circuit breaker.
+
+    agenerate() applies the same policy over an httpx.AsyncClient, sharing
+    the circuit breaker with the sync path. stream()/astream() consume the
+    SSE /generate/stream endpoint; they are not retried, since tokens may
+    already have been handed to the caller.
+    """
+
+    def __init__(
+        self,
+        endpoint: str = "http://localhost:8000/generate",
+        timeout: float = 30,
+        connect_timeout: float = 5,
+        pool_size: int = 10,
+        max_retries: int = 2,
+        retry_backoff: float = 0.5,
+        retry_backoff_max: float = 8.0,
+        circuit_failure_threshold: int = 5,
+        circuit_reset_timeout: float = 30.0,
+        stream_endpoint: Optional[str] = None,
+        batch_endpoint: Optional[str] = None
+    ):
+        """
+        Initialize HTTP transport.
+
+        Args:
+            endpoint (str): URL of the /generate endpoint
+            timeout (float): Read timeout in seconds
+            connect_timeout (float): Connect timeout in seconds
+            pool_size (int): Maximum keep-alive connections to the endpoint
+            max_retries (int): Retries after the first attempt
+            retry_backoff (float): Base backoff in seconds (doubles per retry)
+            retry_backoff_max (float): Backoff cap in seconds
+            circuit_failure_threshold (int): Consecutive failures that open the circuit
+            circuit_reset_timeout (float): Seconds before probing an open circuit
+            stream_endpoint (str): URL of the SSE endpoint
+                (default: endpoint + "/stream")
+            batch_endpoint (str): URL of the batch endpoint
+                (default: endpoint + "/batch")
+        """
+        self.endpoint = endpoint
+        self.stream_endpoint = stream_endpoint or endpoint.rstrip("/") + "/stream"
+        self.batch_endpoint = batch_endpoint or endpoint.rstrip("/") + "/batch"
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.retry_backoff_max = retry_backoff_max
+        self.retries = 0
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.breaker = CircuitBreaker(circuit_failure_threshold, circuit_reset_timeout)
+
+        # Async client is bound to the loop that created it
+        self.pool_size = pool_size
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._async_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given retry attempt."""
+        return random.uniform(0, min(self.retry_backoff_max, self.retry_backoff * (2 ** attempt)))
+
+    def _post(
+        self,
+        payload: Dict[str, Any],
+        url: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> requests.Response:
+        """POST with retries for transient failures."""
+        url = url or self.endpoint
+        attempt = 0
+        while True:
+            try:
+                response = self.session.post(
+                    url,
+                    json=payload,
+                    timeout=(self.connect_timeout, timeout or self.timeout)
+                )
+                if response.status_code not in RETRYABLE_STATUS_CODES or attempt >= self.max_retries:
+                    return response
+                reason = f"HTTP {response.status_code}"
+            except (requests.exceptions.ConnectionError, requests.exceptions.ConnectTimeout) as e:
+                if attempt >= self.max_retries:
+                    raise
+                reason = type(e).__name__
+
+            delay = self._backoff(attempt)
+            attempt += 1
+            self.retries += 1
+            logger.warning(
+                f"Retrying {url} after {reason} "
+                f"(attempt {attempt}/{self.max_retries}, backoff {delay:.2f}s)"
+            )
+            time.sleep(delay)
+
+    def _check_circuit(self) -> None:
+        """Fail fast while the circuit is open."""
+        if not self.breaker.allow_request():
+            raise CircuitOpenError(f"Claude Agent SDK endpoint unavailable (circuit open): {self.endpoint}")
+
+    def generate(
+        self,
+        prompt: str,
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        purpose: Optional[str] = None,
+        coalesce: bool = True
+    ) -> str:
+        """POST the prompt to the endpoint and return the 'text' field."""
+        result = self._call({
+            "prompt": prompt,
+            "model": model,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "purpose": purpose,
+            "coalesce": coalesce
+        })
+        return result.get("text", "")
+
+    def _call(
+        self,
+        payload: Dict[str, Any],
+        url: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """POST a payload and return the decoded JSON, mapping failures to errors."""
+        self._check_circuit()
+        url = url or self.endpoint
+
+        try:
+            response = self._post(payload, url=url, timeout=timeout)
+            response.raise_for_status()
+
+            result = response.json()
+            self.breaker.record_success()
+            return result
+
+        except requests.exceptions.Timeout:
+            self.breaker.record_failure()
+            logger.error(f"Timeout calling {url}")
+            raise Exception(f"Claude Agent SDK timeout after {timeout or self.timeout}s")
+
+        except requests.exceptions.RequestException as e:
+            # Client errors (4xx) mean the request was bad, not that the
+            # endpoint is unhealthy
+            status = getattr(e.response, "status_code", None)
+            if status == 429:
+                raise self._overloaded_error(e.response)
+            if status is None or status >= 500:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            logger.error(f"Error calling Claude Agent SDK: {str(e)}")
+            raise Exception(f"Error calling Claude Agent SDK: {str(e)}")
+
+    def _batch_request(
+        self,
+        prompts: List[str],
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        purpose: Optional[str],
+        max_concurrency: int
+    ) -> Tuple[Dict[str, Any], float]:
+        """Build the /generate/batch payload and a read timeout covering every wave."""
+        payload = {
+            "prompts": prompts,
+            "model": model,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "purpose": purpose,
+            "max_concurrency": max_concurrency
+        }
+        waves = math.ceil(len(prompts) / max(1, max_concurrency))
+        return payload, self.timeout * waves
+
+    @staticmethod
+    def _batch_results(result: Dict[str, Any]) -> List[Union[str, Exception]]:
+        """Turn per-item batch responses into text or exceptions, in order."""
+        results: List[Union[str, Exception]] = []
+        for item in sorted(result.get("results", []), key=lambda item: item.get("index", 0)):
+            error = item.get("error")
+            if error is None:
+                results.append(item.get("text") or "")
+            elif item.get("retry_after") is not None:
+                results.append(LLMOverloadedError(error, retry_after=item["retry_after"]))
+            else:
+                results.append(Exception(f"Error calling Claude Agent SDK: {error}"))
+        return results
+
+    def generate_batch(
+        self,
+        prompts: List[str],
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        purpose: Optional[str] = None,
+        max_concurrency: int = 8
+    ) -> List[Union[str, Exception]]:
+        """Send all prompts in one request to the batch endpoint."""
+        if not prompts:
+            return []
+        payload, timeout = self._batch_request(prompts, model, temperature, max_tokens, purpose, max_concurrency)
+        return self._batch_results(self._call(payload, url=self.batch_endpoint, timeout=timeout))
+
+    def _overloaded_error(self, response: Any) -> LLMOverloadedError:
+        """Map a 429 from the endpoint to LLMOverloadedError, keeping Retry-After."""
+        self.breaker.record_success()
+        try:
+            retry_after = float(response.headers.get("Retry-After", 1))
+        except (TypeError, ValueError):
+            retry_after = 1.0
+        logger.warning(f"Claude Agent SDK overloaded, retry after {retry_after}s")
+        return LLMOverloadedError("LLM capacity exhausted", retry_after=retry_after)
+
+    def _handle_stream_event(self, event: str, data: Dict[str, Any]) -> Optional[str]:
+        """Map an SSE event to a text chunk; raise on server-side errors."""
+        if event == "token":
+            return data.get("text", "")
+        if event == "error":
+            raise Exception(f"Error calling Claude Agent SDK: {data.get('detail', '')}")
+        return None
+
+    def stream(
+        self,
+        prompt: str,
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        purpose: Optional[str] = None
+    ) -> Iterator[str]:
+        """Stream tokens from the SSE endpoint."""
+        self._check_circuit()
+
+        payload = {
+            "prompt": prompt,
+            "model": model,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "purpose": purpose
+        }
+        try:
+            with self.session.post(
+                self.stream_endpoint,
+                json=payload,
+                timeout=(self.connect_timeout, self.timeout),
+                stream=True
+            ) as response:
+                response.raise_for_status()
+                self.breaker.record_success()
+
+                for event, data in iter_sse_events(response.iter_lines(decode_unicode=True)):
+                    if event == "done":
+                        return
+                    chunk = self._handle_stream_event(event, data)
+                    if chunk:
+                        yield chunk
+
+        except requests.exceptions.Timeout:
+            self.breaker.record_failure()
+            logger.error(f"Timeout streaming from {self.stream_endpoint}")
+            raise Exception(f"Claude Agent SDK timeout after {self.timeout}s")
+
+        except requests.exceptions.RequestException as e:
+            status = getattr(e.response, "status_code", None)
+            if status == 429:
+                raise self._overloaded_error(e.response)
+            if status is None or status >= 500:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            logger.error(f"Error streaming from Claude Agent SDK: {str(e)}")
+            raise Exception(f"Error calling Claude Agent SDK: {str(e)}")
+
+    async def astream(
+        self,
+        prompt: str,
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        purpose: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """Async stream of tokens from the SSE endpoint."""
+        self._check_circuit()
+
+        payload = {
+            "prompt": prompt,
+            "model": model,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "purpose": purpose
+        }
+        client = self._get_async_client()
+        try:
+            async with client.stream("POST", self.stream_endpoint, json=payload) as response:
+                response.raise_for_status()
+                self.breaker.record_success()
+
+                async for event, data in aiter_sse_events(response.aiter_lines()):
+                    if event == "done":
+                        return
+                    chunk = self._handle_stream_event(event, data)
+                    if chunk:
+                        yield chunk
+
+        except httpx.TimeoutException:
+            self.breaker.record_failure()
+            logger.error(f"Timeout streaming from {self.stream_endpoint}")
+            raise Exception(f"Claude Agent SDK timeout after {self.timeout}s")
+
+        except httpx.HTTPError as e:
+            response = getattr(e, "response", None) if isinstance(e, httpx.HTTPStatusError) else None
+            if response is not None and response.status_code == 429:
+                raise self._overloaded_error(response)
+            if response is None or response.status_code >= 500:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            logger.error(f"Error streaming from Claude Agent SDK: {str(e)}")
+            raise Exception(f"Error calling Claude Agent SDK: {str(e)}")
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        """Get the keep-alive async client for the running loop."""
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            self._async_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=self.pool_size,
+                    max_keepalive_connections=self.pool_size
+                )
+            )
+            self._async_loop = loop
+        return self._async_client
+
+    async def _apost(
+        self,
+        payload: Dict[str, Any],
+        url: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> httpx.Response:
+        """Async POST with the same retry policy as _post()."""
+        client = self._get_async_client()
+        url = url or self.endpoint
+        request_timeout = httpx.Timeout(timeout or self.timeout, connect=self.connect_timeout)
+        attempt = 0
+        while True:
+            try:
+                response = await client.post(url, json=payload, timeout=request_timeout)
+                if response.status_code not in RETRYABLE_STATUS_CODES or attempt >= self.max_retries:
+                    return response
+                reason = f"HTTP {response.status_code}"
+            except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                if attempt >= self.max_retries:
+                    raise
+                reason = type(e).__name__
+
+            delay = self._backoff(attempt)
+            attempt += 1
+            self.retries += 1
+            logger.warning(
+                f"Retrying {url} after {reason} "
+                f"(attempt {attempt}/{self.max_retries}, backoff {delay:.2f}s)"
+            )
+            await asyncio.sleep(delay)
+
+    async def agenerate(
+        self,
+        prompt: str,
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        purpose: Optional[str] = None,
+        coalesce: bool = True
+    ) -> str:
+        """Async POST of the prompt; waiting on the response holds no thread."""
+        result = await self._acall({
+            "prompt": prompt,
+            "model": model,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "purpose": purpose,
+            "coalesce": coalesce
+        })
+        return result.get("text", "")
+
+    async def _acall(
+        self,
+        payload: Dict[str, Any],
+        url: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Async counterpart of _call()."""
+        self._check_circuit()
+        url = url or self.endpoint
+
+        try:
+            response = await self._apost(payload, url=url, timeout=timeout)
+            response.raise_for_status()
+
+            result = response.json()
+            self.breaker.record_success()
+            return result
+
+        except httpx.TimeoutException:
+            self.breaker.record_failure()
+            logger.error(f"Timeout calling {url}")
+            raise Exception(f"Claude Agent SDK timeout after {timeout or self.timeout}s")
+
+        except httpx.HTTPError as e:
+            response = getattr(e, "response", None) if isinstance(e, httpx.HTTPStatusError) else None
+            if response is not None and response.status_code == 429:
+                raise self._overloaded_error(response)
+            if response is None or response.status_code >= 500:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            logger.error(f"Error calling Claude Agent SDK: {str(e)}")
+            raise Exception(f"Error calling Claude Agent SDK: {str(e)}")
+
+    async def agenerate_batch(
+        self,
+        prompts: List[str],
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        purpose: Optional[str] = None,
+        max_concurrency: int = 8
+    ) -> List[Union[str, Exception]]:
+        """Async counterpart of generate_batch()."""
+        if not prompts:
+            return []
+        payload, timeout = self._batch_request(prompts, model, temperature, max_tokens, purpose, max_concurrency)
+        return self._batch_results(await self._acall(payload, url=self.batch_endpoint, timeout=timeout))
+
+    def describe(self) -> str:
+        return self.endpoint
+
+    def stats(self) -> Dict[str, Any]:
+        """Get retry and circuit breaker counters."""
+        return {
+            "endpoint": self.endpoint,
+            "retries": self.retries,
+            "circuit": self.breaker.stats()
+        }
+
+
+class InProcessTransport(LLMTransport):
+    """
+    Transport that calls the LLM service coroutine on the server event loop.
+
+    Vanna calls submit_prompt from worker threads, so the coroutine is
+    scheduled onto the loop with run_coroutine_threadsafe and the calling
+    thread blocks on the result.
+
+    Example:
+        >>> transport = InProcessTransport(
+        ...     llm_service.call_claude_agent,
+        ...     loop=asyncio.get_running_loop()
+        ... )
+        >>> vn = DetomoVanna(config={"transport": transport})
+    """
+
+    def __init__(
+        self,
+        generate_fn: Callable[..., Awaitable[Dict[str, Any]]],
+        loop: asyncio.AbstractEventLoop,
+        timeout: float = 30,
+        stream_fn: Optional[Callable[..., AsyncIterator[str]]] = None
+    ):
+        """
+        Initialize in-process transport.
+
+        Args:
+            generate_fn: Coroutine function taking (prompt, model, temperature,
+                max_tokens, purpose=..., coalesce=...) and returning a dict
+                with a 'text' key
+            loop: Event loop the LLM service runs on
+            timeout (float): Seconds to wait for a result (per chunk when streaming)
+            stream_fn: Async generator function with the same arguments
+                yielding text chunks (optional)
+        """
+        self.generate_fn = generate_fn
+        self.stream_fn = stream_fn
+        self.loop = loop
+        self.timeout = timeout
+
+    def _check_not_on_loop(self) -> None:
+        """Blocking on the loop from its own thread would deadlock."""
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if running is self.loop:
+            raise RuntimeError(
+                "InProcessTransport.generate() called from the event loop thread; "
+                "run blocking Vanna calls in an executor"
+            )
+
+    def generate(
+        self,
+        prompt: str,
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        purpose: Optional[str] = None,
+        coalesce: bool = True
+    ) -> str:
+        """Run the LLM coroutine on the event loop and wait for its text."""
+        self._check_not_on_loop()
+
+        future = asyncio.run_coroutine_threadsafe(
+            self.generate_fn(prompt, model, temperature, max_tokens, purpose=purpose, coalesce=coalesce),
+            self.loop
+        )
+        try:
+            result = future.result(timeout=self.timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            logger.error("Timeout waiting for in-process LLM call")
+            raise Exception(f"Claude Agent SDK timeout after {self.timeout}s")
+
+        return result.get("text", "")
+
+    async def agenerate(
+        self,
+        prompt: str,
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        purpose: Optional[str] = None,
+        coalesce: bool = True
+    ) -> str:
+        """Await the LLM coroutine directly when already on the service loop."""
+        coro = self.generate_fn(prompt, model, temperature, max_tokens, purpose=purpose, coalesce=coalesce)
+
+        if asyncio.get_running_loop() is self.loop:
+            awaitable = coro
+        else:
+            awaitable = asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self.loop))
+
+        try:
+            result = await asyncio.wait_for(awaitable, timeout=self.timeout)
+        except asyncio.TimeoutError:
+            logger.error("Timeout waiting for in-process LLM call")
+            raise Exception(f"Claude Agent SDK timeout after {self.timeout}s")
+
+        return result.get("text", "")
+
+    def generate_batch(
+        self,
+        prompts: List[str],
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        purpose: Optional[str] = None,
+        max_concurrency: int = 8
+    ) -> List[Union[str, Exception]]:
+        """Fan the prompts out on the service loop instead of one thread each."""
+        self._check_not_on_loop()
+
+        future = asyncio.run_coroutine_threadsafe(
+            self.agenerate_batch(prompts, model, temperature, max_tokens, purpose, max_concurrency),
+            self.loop
+        )
+        # Each prompt is bounded by self.timeout inside agenerate()
+        return future.result()
+
+    def stream(
+        self,
+        prompt: str,
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        purpose: Optional[str] = None
+    ) -> Iterator[str]:
+        """Stream chunks from the service loop into a worker thread via a queue."""
+        if self.stream_fn is None:
+            yield from super().stream(prompt, model, temperature, max_tokens, purpose)
+            return
+
+        self._check_not_on_loop()
+        chunks: queue.Queue = queue.Queue()
+
+        async def pump():
+            try:
+                async for chunk in self.stream_fn(prompt, model, temperature, max_tokens, purpose=purpose):
+                    chunks.put(("chunk", chunk))
+                chunks.put(("done", None))
+            except BaseException as e:
+                chunks.put(("error", e))
+                raise
+
+        future = asyncio.run_coroutine_threadsafe(pump(), self.loop)
+        try:
+            while True:
+                try:
+                    kind, value = chunks.get(timeout=self.timeout)
+                except queue.Empty:
+                    logger.error("Timeout waiting for in-process LLM stream")
+                    raise Exception(f"Claude Agent SDK timeout after {self.timeout}s")
+
+                if kind == "done":
+                    return
+                if kind == "error":
+                    raise value
+                yield value
+        finally:
+            # Stops generation if the consumer bails out early
+            future.cancel()
+
+    async def astream(
+        self,
+        prompt: str,
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        purpose: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """Iterate the service stream directly when on the service loop."""
+        if self.stream_fn is None or asyncio.get_running_loop() is not self.loop:
+            async for chunk in super().astream(prompt, model, temperature, max_tokens, purpose):
+                yield chunk
+            return
+
+        iterator = self.stream_fn(prompt, model, temperature, max_tokens, purpose=purpose).__aiter__()
+        try:
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(iterator.__anext__(), timeout=self.timeout)
+                except StopAsyncIteration:
+                    return
+                except asyncio.TimeoutError:
+                    logger.error("Timeout waiting for in-process LLM stream")
+                    raise Exception(f"Claude Agent SDK timeout after {self.timeout}s")
+                yield chunk
+        finally:
+            await iterator.aclose()
+
+    def describe(self) -> str:
+        return "in-process"
@@ -0,0 +1,110 @@
+"""
+Near-exact matching of questions against trained Q&A pairs.
+
+Many questions arrive as almost verbatim copies of training questions
+("How many customers are there?" vs "how many customers are there").
+When the only differences are case, punctuation, width or whitespace, the
+stored SQL is the answer and the LLM call can be skipped.
+"""
+
+import re
+import unicodedata
+from difflib import SequenceMatcher
+from typing import Any, Dict, Iterable, Optional
+
+# Sentence punctuation and quotes (after NFKC). Comparison and math symbols
+# such as < > = % - + are not noise: "total < 10" and "total > 10" differ.
+# "." and "," inside a number ("1.99", "1,000") are kept too.
+_NOISE_RE = re.compile(
+    r"[?!;:\"'`\u3001\u3002\u300c\u300d\u300e\u300f\u2018\u2019\u201c\u201d\u2026\u30fb]"
+    r"|(?<!\d)[.,]|[.,](?!\d)"
+)
+
+
+def normalize_question(text: str) -> str:
+    """
+    Reduce a question to the parts that can change its meaning.
+
+    Applies NFKC (full-width to half-width), case folding, drops sentence
+    punctuation and quotes (ASCII and Japanese) and collapses whitespace.
+    Comparison and math symbols are kept, since they change the question.
+
+    Args:
+        text (str): Question text
+
+    Returns:
+        str: Normalized question
+
+    Example:
+        >>> normalize_question("  How many Customers are there?? ")
+        'how many customers are there'
+        >>> normalize_question("顧客は何人いますか？") == normalize_question("顧客は何人いますか")
+        True
+        >>> normalize_question("Invoices with a total < 10?")
+        'invoices with a total < 10'
+    """
+    folded = unicodedata.normalize("NFKC", text).casefold()
+    # Space out the symbols that stay, so "total<10" reads like "total < 10"
+    # (the "." and "," left are inside numbers)
+    spaced = "".join(
+        f" {ch} " if unicodedata.category(ch)[0] in ("P", "S") and ch not in ".," else ch
+        for ch in _NOISE_RE.sub(" ", folded)
+    )
+    return " ".join(spaced.split())
+
+
+def surface_similarity(a: str, b: str) -> float:
+    """
+    Character-level similarity of two questions, ignoring case and spacing.
+
+    Args:
+        a (str): First question
+        b (str): Second question
+
+    Returns:
+        float: Ratio in [0, 1] (1.0 means identical)
+    """
+    left = " ".join(unicodedata.normalize("NFKC", a).casefold().split())
+    right = " ".join(unicodedata.normalize("NFKC", b).casefold().split())
+    return SequenceMatcher(None, left, right).ratio()
+
+
+def find_training_match(
+    question: str,
+    candidates: Iterable[Any],
+    min_similarity: float
+) -> Optional[Dict[str, Any]]:
+    """
+    Find a trained Q&A pair that answers the question verbatim.
+
+    A candidate matches when its question is at least min_similarity
+    similar on the surface and identical after normalize_question(), so
+    the remaining differences are only normalization noise.
+
+    Args:
+        question (str): Incoming question
+        candidates: {"question", "sql"} dicts, nearest first (e.g. from
+            get_similar_question_sql())
+        min_similarity (float): Surface similarity threshold
+
+    Returns:
+        dict or None: {"question", "sql", "similarity"} of the best match
+    """
+    target = normalize_question(question)
+    if not target:
+        return None
+
+    best = None
+    for candidate in candidates:
+        if not isinstance(candidate, dict) or not candidate.get("question") or not candidate.get("sql"):
+            continue
+        if normalize_question(candidate["question"]) != target:
+            continue
+        similarity = surface_similarity(question, candidate["question"])
+        if similarity >= min_similarity and (best is None or similarity > best["similarity"]):
+            best = {
+                "question": candidate["question"],
+                "sql": candidate["sql"],
+                "similarity": round(similarity, 3),
+            }
+    return best
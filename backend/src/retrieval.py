@@ -0,0 +1,243 @@
+"""
+Concurrent retrieval stages with per-stage timeouts.
+
+SQL generation looks up three vector collections (Q&A pairs, DDL and
+documentation) for every question. They are independent, so they run
+side by side on a small dedicated pool and the prompt waits for the
+slowest one instead of the sum. A stage that is slow or failing is left
+out of the prompt after its timeout rather than holding the request.
+
+Every stage's latency and outcome is recorded, so the stats show which
+store is the bottleneck.
+
+With no pool (workers=0) stages run inline, one at a time, when their
+result is first asked for, so a stage nobody asks for never runs.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+from .llm_metrics import summarize
+
+logger = logging.getLogger(__name__)
+
+# Stage outcomes
+STAGE_OK = "ok"
+STAGE_ERROR = "error"
+STAGE_TIMEOUT = "timeout"
+STAGE_CANCELLED = "cancelled"
+STAGE_OUTCOMES = (STAGE_OK, STAGE_ERROR, STAGE_TIMEOUT, STAGE_CANCELLED)
+
+# Vector lookups take milliseconds, not the seconds of an LLM call
+RETRIEVAL_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+
+class RetrievalMetrics:
+    """Rolling per-stage latency samples and outcome counters."""
+
+    def __init__(self, window: float = 900.0, max_samples: int = 2000):
+        """
+        Args:
+            window (float): Seconds of latency samples summarized
+            max_samples (int): Samples kept per stage
+        """
+        self.window = window
+        self.max_samples = max_samples
+
+        self._lock = threading.Lock()
+        # stage -> (timestamp, latency_ms)
+        self._latencies: Dict[str, Deque[Tuple[float, float]]] = {}
+        self._outcomes: Dict[str, Dict[str, int]] = {}
+
+    def record_latency(self, stage: str, latency_ms: float) -> None:
+        with self._lock:
+            samples = self._latencies.get(stage)
+            if samples is None:
+                samples = self._latencies[stage] = deque(maxlen=self.max_samples)
+            samples.append((time.time(), latency_ms))
+
+    def record_outcome(self, stage: str, outcome: str) -> None:
+        with self._lock:
+            counts = self._outcomes.setdefault(stage, {o: 0 for o in STAGE_OUTCOMES})
+            counts[outcome] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Summarize every stage.
+
+        Returns:
+            dict: stage -> {"outcomes", "latency_ms"} where latency_ms has
+                count, mean, p50/p95/p99 and max over the window
+        """
+        cutoff = time.time() - self.window
+        with self._lock:
+            stages = sorted(set(self._latencies) | set(self._outcomes))
+            return {
+                stage: {
+                    "outcomes": dict(self._outcomes.get(stage, {o: 0 for o in STAGE_OUTCOMES})),
+                    "latency_ms": summarize(
+                        [latency for ts, latency in self._latencies.get(stage, ()) if ts >= cutoff],
+                        RETRIEVAL_BUCKETS_MS
+                    ),
+                }
+                for stage in stages
+            }
+
+
+class RetrievalRun:
+    """Stages of one retrieval submitted together."""
+
+    def __init__(
+        self,
+        retriever: "ParallelRetriever",
+        futures: Dict[str, Future],
+        started: float,
+        inline: Optional[Dict[str, Callable[[], Any]]] = None
+    ):
+        self._retriever = retriever
+        self._futures = futures
+        self._started = started
+        self._inline = inline or {}
+        self._stages = set(futures) | set(self._inline)
+        self._settled: Dict[str, str] = {}
+
+    def result(self, stage: str, default: Any = None) -> Any:
+        """
+        Wait for a stage, falling back to default if it fails or times out.
+
+        The timeout counts from submission, so waiting for stages one after
+        another doesn't stack their timeouts.
+
+        Args:
+            stage (str): Stage name
+            default: Value used when the stage can't deliver
+
+        Returns:
+            The stage result or default
+        """
+        timeout = self._retriever.timeout
+        try:
+            if stage in self._inline:
+                value = self._inline.pop(stage)()
+            else:
+                remaining = None if timeout is None else max(0.0, self._started + timeout - time.monotonic())
+                value = self._futures[stage].result(timeout=remaining)
+        except FutureTimeoutError:
+            self._settle(stage, STAGE_TIMEOUT)
+            logger.warning(f"Retrieval stage {stage} timed out after {timeout}s; leaving it out")
+            return default
+        except Exception as e:
+            self._settle(stage, STAGE_ERROR)
+            logger.warning(f"Retrieval stage {stage} failed; leaving it out: {e}")
+            return default
+        self._settle(stage, STAGE_OK)
+        return value
+
+    def all_ok(self) -> bool:
+        """Whether every stage has delivered (none failed, timed out, was cancelled or is pending)."""
+        return all(self._settled.get(stage) == STAGE_OK for stage in self._stages)
+
+    def cancel(self) -> None:
+        """Give up on stages nobody waited for (queued and inline ones don't run)."""
+        for stage, future in self._futures.items():
+            if stage not in self._settled:
+                future.cancel()
+                self._settle(stage, STAGE_CANCELLED)
+        for stage in list(self._inline):
+            del self._inline[stage]
+            self._settle(stage, STAGE_CANCELLED)
+
+    def _settle(self, stage: str, outcome: str) -> None:
+        if stage not in self._settled:
+            self._settled[stage] = outcome
+            self._retriever.metrics.record_outcome(stage, outcome)
+
+
+class ParallelRetriever:
+    """
+    Run retrieval stages concurrently on a dedicated pool.
+
+    Example:
+        >>> retriever = ParallelRetriever(workers=6, timeout=5.0)
+        >>> run = retriever.submit({
+        ...     "sql": lambda: vn.get_similar_question_sql(question, embedding=vector),
+        ...     "ddl": lambda: vn.get_related_ddl(question, embedding=vector),
+        ... })
+        >>> question_sql_list = run.result("sql", default=[])
+        >>> ddl_list = run.result("ddl", default=[])
+    """
+
+    def __init__(self, workers: int = 6, timeout: Optional[float] = 5.0, window: float = 900.0):
+        """
+        Initialize the retriever.
+
+        Args:
+            workers (int): Pool threads (a stage that times out keeps its
+                thread until it returns, so leave headroom); 0 runs stages
+                inline on demand
+            timeout (float): Seconds each stage may take, counted from
+                submission (None waits indefinitely; not enforced inline)
+            window (float): Seconds of latency samples in stats()
+        """
+        self.workers = workers
+        self.timeout = timeout
+        self.metrics = RetrievalMetrics(window=window)
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="retrieval"
+        ) if workers > 0 else None
+
+    def _timed(self, stage: str, func: Callable[[], Any]) -> Callable[[], Any]:
+        def run():
+            start = time.perf_counter()
+            try:
+                return func()
+            finally:
+                self.metrics.record_latency(stage, (time.perf_counter() - start) * 1000)
+        return run
+
+    def submit(self, stages: Dict[str, Callable[[], Any]]) -> RetrievalRun:
+        """
+        Start every stage at once.
+
+        Args:
+            stages (dict): Stage name -> zero-argument callable
+
+        Returns:
+            RetrievalRun: Handle to wait for each stage
+        """
+        started = time.monotonic()
+        if self._executor is None:
+            inline = {stage: self._timed(stage, func) for stage, func in stages.items()}
+            return RetrievalRun(self, {}, started, inline=inline)
+        futures = {
+            stage: self._executor.submit(self._timed(stage, func))
+            for stage, func in stages.items()
+        }
+        return RetrievalRun(self, futures, started)
+
+    def record(self, stage: str, latency_ms: float, outcome: str = STAGE_OK) -> None:
+        """Record a stage run outside the pool (e.g. embedding the question)."""
+        self.metrics.record_latency(stage, latency_ms)
+        self.metrics.record_outcome(stage, outcome)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get retrieval metrics.
+
+        Returns:
+            dict: Pool size, stage timeout and per-stage outcomes and latency
+        """
+        return {
+            "workers": self.workers,
+            "timeout": self.timeout,
+            "stages": self.metrics.snapshot(),
+        }
+
+    def shutdown(self) -> None:
+        """Stop the pool without waiting for running stages."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
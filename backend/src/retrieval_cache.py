@@ -0,0 +1,239 @@
+"""
+Cache of retrieved SQL context, keyed by normalized question.
+
+Suggested questions, retries and dashboards ask the same things again
+and again, and each time the Q&A, DDL and documentation lookups redo the
+same work. Their results are cached under the normalized question, so
+questions that differ only in case, punctuation, width or spacing share
+an entry.
+
+Entries are tagged with the training generation they were retrieved
+at. The generation is a counter bumped by every training change, so an
+entry from before a change is never served; it is simply a miss.
+
+Several worker processes can share one vector store, and each keeps its
+own caches and indexes. `SharedGeneration` keeps per-collection change
+counters in a file next to the store: writers bump it, and every read
+compares it against the counters last seen, so a change made by one
+worker retires the caches of all of them.
+"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple, Union
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows: bumps are serialized per process only
+    fcntl = None
+
+from .question_match import normalize_question
+
+logger = logging.getLogger(__name__)
+
+COLLECTIONS = ("sql", "ddl", "documentation")
+
+
+class TrainingGeneration:
+    """Monotonic counter of training data changes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._value = 0
+
+    @property
+    def value(self) -> int:
+        return self._value
+
+    def bump(self) -> int:
+        """
+        Record a training change.
+
+        Returns:
+            int: The new generation
+        """
+        with self._lock:
+            self._value += 1
+            return self._value
+
+
+class SharedGeneration:
+    """
+    Per-collection training change counters in a file shared by processes.
+
+    Writes replace the file atomically under an exclusive lock on a
+    sibling ".lock" file, so concurrent bumps from different workers are
+    never lost and readers always see a complete file. A read is one small
+    file read (~20µs), cheap enough to do on every lookup.
+
+    Example:
+        >>> shared = SharedGeneration("detomo_vectordb/training_generation.json")
+        >>> shared.bump("ddl")
+        {'sql': 0, 'ddl': 1, 'documentation': 0}
+        >>> shared.read()["ddl"]
+        1
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        """
+        Initialize the counters.
+
+        Args:
+            path (str | Path): Counter file (created on the first bump)
+        """
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def read(self) -> Dict[str, int]:
+        """
+        Get the current counters.
+
+        Returns:
+            dict: {collection: changes}; all 0 while the file doesn't exist
+        """
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return {name: int(data.get(name, 0)) for name in COLLECTIONS}
+        except FileNotFoundError:
+            return {name: 0 for name in COLLECTIONS}
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            logger.warning(f"Ignoring unreadable training generation file {self.path}: {e}")
+            return {name: 0 for name in COLLECTIONS}
+
+    def bump(self, names: Optional[Iterable[str]] = None) -> Dict[str, int]:
+        """
+        Record a training change.
+
+        Args:
+            names (str | iterable): Collection(s) that changed (all if None)
+
+        Returns:
+            dict: The counters after the bump
+        """
+        if names is None:
+            names = COLLECTIONS
+        elif isinstance(names, str):
+            names = (names,)
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock, open(self.path.with_name(self.path.name + ".lock"), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            counters = self.read()
+            for name in names:
+                counters[name] += 1
+            tmp = tempfile.NamedTemporaryFile(
+                "w", dir=self.path.parent, prefix=self.path.name, suffix=".tmp", delete=False, encoding="utf-8"
+            )
+            try:
+                with tmp:
+                    json.dump(counters, tmp)
+                os.replace(tmp.name, self.path)
+            except BaseException:
+                os.unlink(tmp.name)
+                raise
+            return counters
+
+
+class RetrievalCache:
+    """
+    LRU of retrieval results tagged with their training generation.
+
+    Example:
+        >>> cache = RetrievalCache(max_size=512)
+        >>> cache.set("How many customers?", generation.value, (question_sql_list, ddl_list, doc_list))
+        >>> cache.get("how many customers", generation.value)
+        ([...], [...], [...])
+    """
+
+    def __init__(self, max_size: int = 512):
+        """
+        Initialize the cache.
+
+        Args:
+            max_size (int): Questions kept before evicting the least
+                recently used
+        """
+        self.max_size = max_size
+
+        self._entries: "OrderedDict[str, Tuple[int, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    def get(self, question: str, generation: int) -> Optional[Any]:
+        """
+        Look up the cached retrieval for a question.
+
+        Args:
+            question (str): Question text
+            generation (int): Current training generation
+
+        Returns:
+            Cached value, or None if absent or from an older generation
+        """
+        key = normalize_question(question)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] != generation:
+                del self._entries[key]
+                self.stale += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, question: str, generation: int, value: Any) -> None:
+        """
+        Cache a retrieval, evicting the least recently used if full.
+
+        Args:
+            question (str): Question text
+            generation (int): Training generation the retrieval started at
+            value: Retrieved context
+        """
+        key = normalize_question(question)
+        with self._lock:
+            self._entries[key] = (generation, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache metrics.
+
+        Returns:
+            dict: Hit/miss counters, entries dropped for an old generation,
+                size and evictions
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "stale": self.stale,
+                "entries": len(self._entries),
+                "max_size": self.max_size,
+                "evictions": self.evictions,
+            }
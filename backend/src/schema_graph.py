@@ -0,0 +1,379 @@
+"""
+Foreign-key graph of the trained schema, for DDL retrieval.
+
+Vector search ranks each CREATE TABLE on its own, so the prompt tends to
+carry tables that merely look similar to the question while the bridge
+table a join needs (invoice_items between customers' invoices and
+tracks, playlist_track between playlists and tracks) ranks too low to
+make it in.
+
+The graph takes the best-ranked retrieved tables as seeds and connects
+them through the shortest foreign-key paths, adding only the tables on
+those paths, up to a cap. The join columns along the chosen tables are
+rendered as one short hint in place of the free-form relationship notes.
+
+Edges come from FOREIGN KEY / REFERENCES clauses and from
+"Foreign Key: a.col -> b.col" comments such as those in relationships.sql.
+The graph is rebuilt from the DDL collection on the first expansion after
+DDL training changes, including changes made by another worker sharing
+the store.
+"""
+
+import logging
+import re
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+_IDENT = r'[`"\[]?([A-Za-z_][\w$]*)[`"\]]?'
+_QUALIFIED = rf'(?:{_IDENT}\s*\.\s*)?{_IDENT}'
+
+CREATE_TABLE_RE = re.compile(rf'CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?{_QUALIFIED}', re.IGNORECASE)
+# FOREIGN KEY (col) REFERENCES table (col)
+TABLE_FK_RE = re.compile(
+    rf'FOREIGN\s+KEY\s*\(\s*{_IDENT}\s*\)\s*REFERENCES\s+{_QUALIFIED}\s*\(\s*{_IDENT}\s*\)',
+    re.IGNORECASE
+)
+# col TYPE ... REFERENCES table (col), within one column definition
+COLUMN_FK_RE = re.compile(
+    rf'(?:^|[(,])\s*{_IDENT}\s+\w+[^,\n]*?\bREFERENCES\s+{_QUALIFIED}\s*\(\s*{_IDENT}\s*\)',
+    re.IGNORECASE | re.MULTILINE
+)
+# -- Foreign Key: a.col -> b.col
+COMMENT_FK_RE = re.compile(
+    rf'Foreign\s+Key\s*:\s*{_IDENT}\s*\.\s*{_IDENT}\s*->\s*{_IDENT}\s*\.\s*{_IDENT}',
+    re.IGNORECASE
+)
+
+JOIN_HINT_HEADER = "-- Join columns between the tables above"
+
+
+class ForeignKey:
+    """One column reference from a table to another (or itself)."""
+
+    def __init__(self, table: str, column: str, ref_table: str, ref_column: str):
+        self.table = table
+        self.column = column
+        self.ref_table = ref_table
+        self.ref_column = ref_column
+
+    def key(self) -> Tuple[str, str, str, str]:
+        return (self.table, self.column.lower(), self.ref_table, self.ref_column.lower())
+
+    def __str__(self) -> str:
+        return f"{self.table}.{self.column} = {self.ref_table}.{self.ref_column}"
+
+    def __repr__(self) -> str:
+        return f"<ForeignKey {self}>"
+
+
+def _table(schema: Optional[str], name: str) -> str:
+    # Schema prefixes are dropped: the trained DDL describes one database
+    return name.lower()
+
+
+def parse_ddl(document: str) -> Tuple[Optional[str], List[ForeignKey]]:
+    """
+    Find the table a DDL document creates and the foreign keys it declares.
+
+    Args:
+        document (str): DDL text, possibly with comments
+
+    Returns:
+        tuple: (table name or None, foreign keys)
+
+    Example:
+        >>> parse_ddl("CREATE TABLE albums (ArtistId INTEGER REFERENCES artists (ArtistId))")
+        ('albums', [<ForeignKey albums.ArtistId = artists.ArtistId>])
+    """
+    created = CREATE_TABLE_RE.search(document)
+    table = _table(*created.groups()) if created else None
+
+    foreign_keys = []
+    if table is not None:
+        for column, ref_schema, ref_name, ref_column in TABLE_FK_RE.findall(document):
+            foreign_keys.append(ForeignKey(table, column, _table(ref_schema, ref_name), ref_column))
+        body = document[created.end():]
+        for column, ref_schema, ref_name, ref_column in COLUMN_FK_RE.findall(body):
+            if column.upper() not in ("FOREIGN", "CONSTRAINT"):
+                foreign_keys.append(ForeignKey(table, column, _table(ref_schema, ref_name), ref_column))
+    for src, column, ref_name, ref_column in COMMENT_FK_RE.findall(document):
+        foreign_keys.append(ForeignKey(src.lower(), column, ref_name.lower(), ref_column))
+    return table, foreign_keys
+
+
+class SchemaGraph:
+    """
+    Tables as nodes, foreign keys as undirected edges.
+
+    Example:
+        >>> graph = SchemaGraph.from_documents(ddl_documents)
+        >>> graph.shortest_path("customers", "tracks")
+        ['customers', 'invoices', 'invoice_items', 'tracks']
+        >>> graph.expand(["customers", "tracks"], max_tables=6)
+        ['customers', 'tracks', 'invoice_items', 'invoices']
+    """
+
+    def __init__(self):
+        self.documents: Dict[str, str] = {}
+        self.foreign_keys: List[ForeignKey] = []
+        self._neighbors: Dict[str, Set[str]] = {}
+        self._seen: Set[Tuple[str, str, str, str]] = set()
+
+    @classmethod
+    def from_documents(cls, documents: Iterable[str]) -> "SchemaGraph":
+        """
+        Build the graph from DDL documents.
+
+        Args:
+            documents: DDL texts; those creating a table become its node
+                document, the rest only contribute foreign keys
+
+        Returns:
+            SchemaGraph: The graph
+        """
+        graph = cls()
+        for document in documents:
+            table, foreign_keys = parse_ddl(document)
+            if table is not None:
+                graph.documents.setdefault(table, document)
+                graph._neighbors.setdefault(table, set())
+            for fk in foreign_keys:
+                graph.add_foreign_key(fk)
+        return graph
+
+    def add_foreign_key(self, fk: ForeignKey) -> None:
+        if fk.key() in self._seen:
+            return
+        self._seen.add(fk.key())
+        self.foreign_keys.append(fk)
+        self._neighbors.setdefault(fk.table, set()).add(fk.ref_table)
+        self._neighbors.setdefault(fk.ref_table, set()).add(fk.table)
+
+    def __contains__(self, table: str) -> bool:
+        return table in self.documents
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def table_of(self, document: str) -> Optional[str]:
+        """Table a retrieved DDL document creates, if it is a known node."""
+        table, _ = parse_ddl(document)
+        return table if table in self.documents else None
+
+    def shortest_path(self, start: str, targets: Any) -> Optional[List[str]]:
+        """
+        Fewest-hop path from a table to the nearest of some tables.
+
+        Only tables with a DDL document are walked through, so every table
+        on the path can be shown to the LLM.
+
+        Args:
+            start (str): Table to start from
+            targets: A table name or a set of them
+
+        Returns:
+            list or None: Tables from start to the reached target, both
+                included; None if no target is reachable
+        """
+        goals = {targets} if isinstance(targets, str) else set(targets)
+        if start in goals:
+            return [start]
+        previous: Dict[str, Optional[str]] = {start: None}
+        queue = deque([start])
+        while queue:
+            node = queue.popleft()
+            # Sorted so equally short paths resolve the same way every time
+            for neighbor in sorted(self._neighbors.get(node, ())):
+                if neighbor in previous or neighbor not in self.documents:
+                    continue
+                previous[neighbor] = node
+                if neighbor in goals:
+                    path = [neighbor]
+                    while previous[path[-1]] is not None:
+                        path.append(previous[path[-1]])
+                    return path[::-1]
+                queue.append(neighbor)
+        return None
+
+    def expand(self, seeds: List[str], max_tables: int) -> List[str]:
+        """
+        Connect seed tables through their shortest join paths.
+
+        Seeds are taken in rank order; each one is joined to the tables
+        already chosen by its shortest path, and skipped if it and its
+        bridge tables would go over the cap. Unconnected seeds are kept
+        while there is room.
+
+        Args:
+            seeds (list): Tables in relevance order
+            max_tables (int): Most tables returned
+
+        Returns:
+            list: Seeds and bridge tables, seeds first in the order they
+                were reached
+        """
+        selected: List[str] = []
+        for seed in seeds:
+            if seed not in self.documents or seed in selected:
+                continue
+            if not selected:
+                selected.append(seed)
+                continue
+            path = self.shortest_path(seed, set(selected))
+            new = [table for table in (path or [seed]) if table not in selected]
+            if len(selected) + len(new) > max_tables:
+                continue
+            selected.extend(new)
+            if len(selected) >= max_tables:
+                break
+        return selected
+
+    def join_hint(self, tables: List[str]) -> Optional[str]:
+        """
+        Join conditions among some tables, as a DDL comment block.
+
+        Args:
+            tables (list): Chosen tables
+
+        Returns:
+            str or None: Comment lines, or None if no key links them
+        """
+        chosen = set(tables)
+        lines = [
+            f"-- {fk}" for fk in self.foreign_keys
+            if fk.table in chosen and fk.ref_table in chosen
+        ]
+        if not lines:
+            return None
+        return "\n".join([JOIN_HINT_HEADER] + lines)
+
+
+class DDLExpander:
+    """
+    Graph-expanded DDL retrieval over a lazily rebuilt schema graph.
+
+    Example:
+        >>> expander = DDLExpander(seed_tables=3, max_tables=6)
+        >>> expander.expand(retrieved_ddl, lambda: vn.ddl_collection.get()["documents"])
+        ['CREATE TABLE customers (...)', ..., '-- Join columns between the tables above\n...']
+        >>> expander.invalidate()  # after DDL training
+    """
+
+    def __init__(self, seed_tables: int = 3, max_tables: int = 6):
+        """
+        Initialize the expander.
+
+        Args:
+            seed_tables (int): Top-ranked retrieved tables used as seeds
+            max_tables (int): Most tables sent, bridges included
+
+        Raises:
+            ValueError: If either limit is below 1
+        """
+        if seed_tables < 1 or max_tables < 1:
+            raise ValueError("seed_tables and max_tables must be at least 1")
+
+        self.seed_tables = seed_tables
+        self.max_tables = max_tables
+
+        self._lock = threading.Lock()
+        self._graph: Optional[SchemaGraph] = None
+        self._stale = True
+
+        self.rebuilds = 0
+        self.expansions = 0
+        self.documents_in = 0
+        self.documents_out = 0
+        self.bridges_added = 0
+
+    def invalidate(self) -> None:
+        """Rebuild the graph on the next expansion."""
+        with self._lock:
+            self._stale = True
+
+    def graph(self, load_documents: Callable[[], List[str]]) -> SchemaGraph:
+        """
+        Get the current graph, rebuilding it if stale.
+
+        Args:
+            load_documents: Returns every trained DDL document
+
+        Returns:
+            SchemaGraph: The graph
+        """
+        graph = self._graph
+        if graph is not None and not self._stale:
+            return graph
+        with self._lock:
+            if self._graph is None or self._stale:
+                # Clear the flag first: a change during the build marks it stale again
+                self._stale = False
+                self._graph = SchemaGraph.from_documents(load_documents() or [])
+                self.rebuilds += 1
+                logger.info(
+                    f"Built schema graph: {len(self._graph)} tables, "
+                    f"{len(self._graph.foreign_keys)} foreign keys"
+                )
+            return self._graph
+
+    def expand(self, ddl_list: List[str], load_documents: Callable[[], List[str]]) -> List[str]:
+        """
+        Turn vector-ranked DDL into seed tables plus their join paths.
+
+        Args:
+            ddl_list (list): Retrieved DDL documents, best first
+            load_documents: Returns every trained DDL document
+
+        Returns:
+            list: CREATE TABLE documents of the chosen tables, then a join
+                hint; ddl_list unchanged if none of it maps to a known table
+        """
+        graph = self.graph(load_documents)
+
+        seeds: List[str] = []
+        for document in ddl_list:
+            table = graph.table_of(document)
+            if table is not None and table not in seeds:
+                seeds.append(table)
+                if len(seeds) >= self.seed_tables:
+                    break
+        if not seeds:
+            return ddl_list
+
+        tables = graph.expand(seeds, self.max_tables)
+        expanded = [graph.documents[table] for table in tables]
+        hint = graph.join_hint(tables)
+        if hint is not None:
+            expanded.append(hint)
+
+        with self._lock:
+            self.expansions += 1
+            self.documents_in += len(ddl_list)
+            self.documents_out += len(expanded)
+            self.bridges_added += len([table for table in tables if table not in seeds])
+        return expanded
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get expansion metrics.
+
+        Returns:
+            dict: Limits, graph size and average DDL documents retrieved
+                versus sent per expansion
+        """
+        with self._lock:
+            graph = self._graph
+            return {
+                "seed_tables": self.seed_tables,
+                "max_tables": self.max_tables,
+                "tables": len(graph) if graph is not None else 0,
+                "foreign_keys": len(graph.foreign_keys) if graph is not None else 0,
+                "rebuilds": self.rebuilds,
+                "expansions": self.expansions,
+                "bridges_added": self.bridges_added,
+                "ddl_retrieved_avg": round(self.documents_in / self.expansions, 2) if self.expansions else 0.0,
+                "ddl_sent_avg": round(self.documents_out / self.expansions, 2) if self.expansions else 0.0,
+            }
@@ -0,0 +1,164 @@
+"""
+Single-flight coalescing of identical concurrent calls.
+
+When many users click the same suggested question at once, Vanna builds
+the same prompt for each of them. Instead of starting one LLM call per
+click, the first caller for a key runs the call and everyone arriving
+while it is in flight shares its result (or its exception).
+
+Two flavours are provided because the LLM layer is reached both from the
+event loop (/generate) and from worker threads (ClaudeAgentChat).
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Thread-based single flight.
+
+    Example:
+        >>> flight = SingleFlight()
+        >>> flight.do(key, lambda: transport.generate(prompt, model, 0.1, 2048))
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, concurrent.futures.Future] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """
+        Run fn() unless a call for key is already in flight, then share it.
+
+        Args:
+            key (str): Coalescing key
+            fn: Zero-argument callable doing the real work
+
+        Returns:
+            The result of the (possibly shared) call
+
+        Raises:
+            Whatever the shared call raised
+        """
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = concurrent.futures.Future()
+                self._inflight[key] = future
+                self.calls += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get coalescing metrics.
+
+        Returns:
+            dict: Calls started, calls coalesced onto another, and in flight
+        """
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._inflight),
+            }
+
+
+class AsyncSingleFlight:
+    """
+    Event-loop single flight.
+
+    The shared work runs in its own task, so a cancelled caller (e.g. a
+    client that disconnected) neither cancels the call for the others nor
+    loses the result for them.
+
+    Example:
+        >>> flight = AsyncSingleFlight()
+        >>> result = await flight.do(key, lambda: llm_service.call_claude_agent(prompt))
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Tuple[int, str], asyncio.Task] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Await fn() unless a call for key is already in flight, then share it.
+
+        Args:
+            key (str): Coalescing key
+            fn: Zero-argument callable returning an awaitable
+
+        Returns:
+            The result of the (possibly shared) call
+        """
+        # Tasks are loop-bound; keying by loop keeps test/reload loops apart
+        slot = (id(asyncio.get_running_loop()), key)
+        task = self._inflight.get(slot)
+
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[slot] = task
+            self.calls += 1
+            task.add_done_callback(lambda t: self._finish(slot, t))
+        else:
+            self.coalesced += 1
+
+        return await asyncio.shield(task)
+
+    def in_flight(self, key: str) -> bool:
+        """
+        Check whether a call for key is running on the current loop.
+
+        Args:
+            key (str): Coalescing key
+
+        Returns:
+            bool: True if a do() call for key would be coalesced
+        """
+        return (id(asyncio.get_running_loop()), key) in self._inflight
+
+    def _finish(self, slot: Tuple[int, str], task: asyncio.Task) -> None:
+        """Drop the finished task and mark its exception as retrieved."""
+        if self._inflight.get(slot) is task:
+            del self._inflight[slot]
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug(f"Shared call failed: {task.exception()}")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get coalescing metrics.
+
+        Returns:
+            dict: Calls started, calls coalesced onto another, and in flight
+        """
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight),
+        }
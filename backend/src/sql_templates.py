@@ -0,0 +1,463 @@
+"""
+Parameterized SQL templates mined from training Q&A pairs.
+
+Much of the traffic repeats a trained question with a different literal:
+"How many customers are from USA?" becomes "... from Germany?". When a
+training pair's SQL compares a column to a literal that also appears in
+its question, the literal is turned into a slot, provided the value
+really occurs in that live database column. A new question that has the
+same wording around a valid value for every slot can then be answered by
+filling the slots, without an LLM call.
+
+Three slot kinds are mined:
+
+- "text": col = 'value' where the column has few enough distinct values
+- "number": col = 1.99 where the number is one of the column's values
+- "limit": LIMIT n
+
+A question matches only if, once slot values are masked out on both
+sides, its normalized tokens equal the template's exactly. There is no
+fuzzy threshold: with no LLM to catch it, a one-word difference such as
+"aren't", "non-" or "except" can reverse the meaning of the SQL.
+"""
+
+import logging
+import re
+import threading
+import time
+import unicodedata
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .question_match import normalize_question
+
+logger = logging.getLogger(__name__)
+
+SLOT_TEXT = "text"
+SLOT_NUMBER = "number"
+SLOT_LIMIT = "limit"
+
+# Private-use character standing in for a slot value; survives normalize_question()
+SLOT_MARK = "\ue000"
+
+_IDENT = r"[A-Za-z_][A-Za-z0-9_]*"
+_TABLE_RE = re.compile(rf"\b(?:FROM|JOIN)\s+({_IDENT})(?:\s+(?:AS\s+)?({_IDENT}))?", re.IGNORECASE)
+_TEXT_RE = re.compile(rf"(?:({_IDENT})\.)?({_IDENT})\s*=\s*'((?:[^']|'')*)'")
+_NUMBER_RE = re.compile(rf"(?:({_IDENT})\.)?({_IDENT})\s*=\s*(\d+(?:\.\d+)?)\b")
+_LIMIT_RE = re.compile(r"\bLIMIT\s+(\d+)\b", re.IGNORECASE)
+_QUESTION_NUMBER_RE = re.compile(r"(?<![\d.])\d+(?:\.\d+)?(?![\d.])")
+
+_NOT_ALIASES = {
+    "where", "join", "left", "right", "inner", "outer", "cross", "full", "on",
+    "group", "order", "limit", "having", "union", "natural", "using",
+}
+
+# (table, column) -> distinct values, or None when the column can't be a slot
+ValueLoader = Callable[[str, str], Optional[List[Any]]]
+
+
+def fold(text: str) -> str:
+    """NFKC + case folding, the form questions are matched in."""
+    return unicodedata.normalize("NFKC", text).casefold()
+
+
+def _table_aliases(sql: str) -> Dict[str, str]:
+    """Map table names and aliases (lowercased) to table names."""
+    aliases = {}
+    for table, alias in _TABLE_RE.findall(sql):
+        aliases[table.lower()] = table
+        if alias and alias.lower() not in _NOT_ALIASES:
+            aliases[alias.lower()] = table
+    return aliases
+
+
+def _literal_pattern(value: str) -> str:
+    """Regex for a literal in a folded question, on word/number boundaries."""
+    if _QUESTION_NUMBER_RE.fullmatch(value):
+        return rf"(?<![\d.]){re.escape(value)}(?![\d.])"
+    return rf"(?<!\w){re.escape(fold(value))}(?!\w)"
+
+
+def _find_in_question(text: str, value: str) -> Optional[Tuple[int, int]]:
+    """Span of a literal in a folded question, on word/number boundaries."""
+    match = re.search(_literal_pattern(value), text)
+    return match.span() if match else None
+
+
+class ColumnValues:
+    """
+    A column's distinct values, indexed for slot validation and filling.
+
+    Text values are compiled once into a single alternation, longest
+    first, so filling a slot is one regex search instead of one per value.
+    """
+
+    def __init__(self, values: List[Any]):
+        self.values = values
+        self._set = set(values)
+        self._numbers = set()
+        for value in values:
+            try:
+                self._numbers.add(float(value))
+            except (TypeError, ValueError):
+                pass
+
+        # Folded text -> the column's own spelling (first one wins)
+        self._spelling: Dict[str, str] = {}
+        for value in sorted((v for v in values if isinstance(v, str) and v.strip()), key=len, reverse=True):
+            self._spelling.setdefault(fold(value), value)
+        alternatives = [_literal_pattern(text) for text in self._spelling]
+        self._pattern = re.compile("|".join(alternatives)) if alternatives else None
+
+    def __contains__(self, value: Any) -> bool:
+        return value in self._set
+
+    def has_number(self, value: Any) -> bool:
+        """Check whether a number equals one of the values."""
+        try:
+            return float(value) in self._numbers
+        except (TypeError, ValueError):
+            return False
+
+    def find_text(self, text: str, start: int = 0) -> Optional[Tuple[str, Tuple[int, int]]]:
+        """
+        Find the leftmost (then longest) text value in a folded question.
+
+        Args:
+            text (str): Folded question
+            start (int): Position to search from
+
+        Returns:
+            tuple or None: (value as spelled in the column, span in text)
+        """
+        if self._pattern is None:
+            return None
+        match = self._pattern.search(text, start)
+        if match is None:
+            return None
+        return self._spelling[match.group()], match.span()
+
+
+class TemplateSlot:
+    """One fillable literal of a template."""
+
+    def __init__(self, kind: str, table: Optional[str] = None, column: Optional[str] = None):
+        self.kind = kind
+        self.table = table
+        self.column = column
+
+    @property
+    def name(self) -> str:
+        return self.column or self.kind
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"kind": self.kind, "table": self.table, "column": self.column}
+
+
+class SQLTemplate:
+    """A training pair with its literals turned into slots."""
+
+    def __init__(
+        self,
+        source_id: Optional[str],
+        question: str,
+        sql: str,
+        skeleton: str,
+        slots: List[TemplateSlot],
+        sql_spans: List[Tuple[int, int, int]]
+    ):
+        """
+        Args:
+            source_id (str): Training data ID the template was mined from
+            question (str): Source question
+            sql (str): Source SQL
+            skeleton (str): Normalized question with slot values masked
+            slots (list): Slots in question order
+            sql_spans (list): (start, end, slot index) of each literal in sql
+        """
+        self.source_id = source_id
+        self.question = question
+        self.sql = sql
+        self.skeleton = skeleton
+        self.slots = slots
+        self.sql_spans = sql_spans
+
+    def render(self, values: List[Any]) -> str:
+        """Fill the slots of the source SQL with values (one per slot)."""
+        parts = []
+        cursor = 0
+        for start, end, index in sorted(self.sql_spans):
+            parts.append(self.sql[cursor:start])
+            value = values[index]
+            if self.slots[index].kind == SLOT_TEXT:
+                parts.append(str(value).replace("'", "''"))
+            else:
+                parts.append(str(value))
+            cursor = end
+        parts.append(self.sql[cursor:])
+        return "".join(parts)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.source_id,
+            "question": self.question,
+            "skeleton": self.skeleton.replace(SLOT_MARK, "{}"),
+            "slots": [slot.to_dict() for slot in self.slots],
+        }
+
+
+class TemplateStore:
+    """
+    Mine, hold and match SQL templates.
+
+    Column values are loaded per (table, column) through value_loader,
+    indexed once and reused for validation at mining and match time. They
+    are reloaded after values_ttl seconds (the live data may change) and
+    on refresh_values() (called when training data changes).
+
+    Example:
+        >>> store = TemplateStore(value_loader=load_distinct_values)
+        >>> store.add("How many customers are from USA?",
+        ...           "SELECT COUNT(*) FROM customers WHERE Country = 'USA'")
+        >>> store.match("How many customers are from Germany?")["sql"]
+        "SELECT COUNT(*) FROM customers WHERE Country = 'Germany'"
+    """
+
+    def __init__(self, value_loader: ValueLoader, max_limit: int = 1000, values_ttl: float = 300.0):
+        """
+        Initialize the store.
+
+        Args:
+            value_loader: Returns a column's distinct values, or None if the
+                column is unknown or has too many values to be a slot
+            max_limit (int): Largest LIMIT a limit slot accepts
+            values_ttl (float): Seconds before a column's values are
+                reloaded (0 = never)
+        """
+        self.value_loader = value_loader
+        self.max_limit = max_limit
+        self.values_ttl = values_ttl
+
+        self._lock = threading.Lock()
+        self._templates: List[SQLTemplate] = []
+        # (table, column) -> (loaded at, indexed values or None)
+        self._values: Dict[Tuple[str, str], Tuple[float, Optional[ColumnValues]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._templates)
+
+    def _column_values(self, table: str, column: str) -> Optional[ColumnValues]:
+        key = (table.lower(), column.lower())
+        now = time.monotonic()
+        cached = self._values.get(key)
+        if cached is not None and not (self.values_ttl and now - cached[0] >= self.values_ttl):
+            return cached[1]
+        try:
+            values = self.value_loader(table, column)
+        except Exception as e:
+            logger.warning(f"Could not load values of {table}.{column}: {e}")
+            values = None
+        indexed = ColumnValues(values) if values is not None else None
+        self._values[key] = (now, indexed)
+        return indexed
+
+    def refresh_values(self) -> None:
+        """Reload every column's values on next use."""
+        self._values = {}
+
+    def _slot_literals(self, sql: str) -> List[Tuple[Tuple[int, int], TemplateSlot, str]]:
+        """Every literal in sql that could become a slot: (sql span, slot, raw value)."""
+        aliases = _table_aliases(sql)
+        tables = set(aliases.values())
+
+        def resolve(qualifier: Optional[str]) -> Optional[str]:
+            if qualifier:
+                return aliases.get(qualifier.lower())
+            return next(iter(tables)) if len(tables) == 1 else None
+
+        literals = []
+        for match in _TEXT_RE.finditer(sql):
+            table = resolve(match.group(1))
+            if table:
+                literals.append((match.span(3), TemplateSlot(SLOT_TEXT, table, match.group(2)), match.group(3).replace("''", "'")))
+        for match in _NUMBER_RE.finditer(sql):
+            table = resolve(match.group(1))
+            if table:
+                literals.append((match.span(3), TemplateSlot(SLOT_NUMBER, table, match.group(2)), match.group(3)))
+        for match in _LIMIT_RE.finditer(sql):
+            literals.append((match.span(1), TemplateSlot(SLOT_LIMIT), match.group(1)))
+        return literals
+
+    def _valid(self, slot: TemplateSlot, value: Any) -> bool:
+        if slot.kind == SLOT_LIMIT:
+            return 0 < int(value) <= self.max_limit
+        values = self._column_values(slot.table, slot.column)
+        if values is None:
+            return False
+        if slot.kind == SLOT_NUMBER:
+            return values.has_number(value)
+        return value in values
+
+    def mine(self, question: str, sql: str, source_id: Optional[str] = None) -> Optional[SQLTemplate]:
+        """
+        Turn a training pair into a template.
+
+        A literal becomes a slot only when it appears in the question and
+        passes validation against the live column; other literals stay
+        fixed.
+
+        Args:
+            question (str): Training question
+            sql (str): Training SQL
+            source_id (str): Training data ID
+
+        Returns:
+            SQLTemplate or None: None when no literal could become a slot
+        """
+        text = fold(question)
+        question_spans: List[Tuple[int, int]] = []
+        slots: List[TemplateSlot] = []
+        sql_spans: List[Tuple[int, int, int]] = []
+        seen: Dict[Tuple[str, Optional[str], Optional[str], str], int] = {}
+
+        for sql_span, slot, value in self._slot_literals(sql):
+            key = (slot.kind, slot.table, slot.column, value)
+            if key in seen:
+                sql_spans.append((sql_span[0], sql_span[1], seen[key]))
+                continue
+            span = _find_in_question(text, value)
+            if span is None or any(span[0] < end and start < span[1] for start, end in question_spans):
+                continue
+            if not self._valid(slot, value):
+                continue
+            seen[key] = len(slots)
+            sql_spans.append((sql_span[0], sql_span[1], len(slots)))
+            question_spans.append(span)
+            slots.append(slot)
+
+        if not slots:
+            return None
+
+        # Reorder slots by where their values sit in the question
+        order = sorted(range(len(slots)), key=lambda i: question_spans[i][0])
+        position = {old: new for new, old in enumerate(order)}
+        return SQLTemplate(
+            source_id=source_id,
+            question=question,
+            sql=sql,
+            skeleton=self._skeleton(text, [question_spans[i] for i in order]),
+            slots=[slots[i] for i in order],
+            sql_spans=[(start, end, position[index]) for start, end, index in sql_spans],
+        )
+
+    @staticmethod
+    def _skeleton(text: str, spans: List[Tuple[int, int]]) -> str:
+        for start, end in sorted(spans, reverse=True):
+            text = text[:start] + f" {SLOT_MARK} " + text[end:]
+        return normalize_question(text)
+
+    def add(self, question: str, sql: str, source_id: Optional[str] = None) -> Optional[SQLTemplate]:
+        """
+        Mine a training pair and keep the template if it has slots.
+
+        Templates with the same skeleton as an existing one are skipped.
+
+        Returns:
+            SQLTemplate or None: The template added
+        """
+        template = self.mine(question, sql, source_id)
+        if template is None:
+            return None
+        with self._lock:
+            if any(t.skeleton == template.skeleton for t in self._templates):
+                return None
+            self._templates.append(template)
+        return template
+
+    def remove(self, source_id: str) -> int:
+        """
+        Drop the templates mined from a training pair.
+
+        Returns:
+            int: Templates removed
+        """
+        with self._lock:
+            before = len(self._templates)
+            self._templates = [t for t in self._templates if t.source_id != source_id]
+            return before - len(self._templates)
+
+    def clear(self) -> None:
+        """Drop all templates and cached column values."""
+        with self._lock:
+            self._templates = []
+            self._values = {}
+
+    def _fill(self, template: SQLTemplate, text: str) -> Optional[Tuple[List[Any], List[Tuple[int, int]]]]:
+        """Find a valid value for every slot, left to right."""
+        values: List[Any] = []
+        spans: List[Tuple[int, int]] = []
+        cursor = 0
+        for slot in template.slots:
+            found = None
+            if slot.kind == SLOT_TEXT:
+                candidates = self._column_values(slot.table, slot.column)
+                if candidates is not None:
+                    found = candidates.find_text(text, cursor)
+            else:
+                for match in _QUESTION_NUMBER_RE.finditer(text, cursor):
+                    raw = match.group()
+                    if slot.kind == SLOT_LIMIT and "." in raw:
+                        continue
+                    if self._valid(slot, raw):
+                        found = (raw, match.span())
+                        break
+            if found is None:
+                return None
+            value, span = found
+            values.append(value)
+            spans.append(span)
+            cursor = span[1]
+        return values, spans
+
+    def match(self, question: str) -> Optional[Dict[str, Any]]:
+        """
+        Answer a question from the template it matches.
+
+        The question's tokens, with slot values masked, must equal the
+        template's; any other difference falls back to the LLM.
+
+        Args:
+            question (str): Natural language question
+
+        Returns:
+            dict or None: {"question", "sql", "template", "slots"} when a
+                template matches; "question" is the training question it
+                was mined from
+        """
+        text = fold(question)
+        for template in list(self._templates):
+            filled = self._fill(template, text)
+            if filled is None:
+                continue
+            values, spans = filled
+            if self._skeleton(text, spans).split() != template.skeleton.split():
+                continue
+            return {
+                "question": template.question,
+                "sql": template.render(values),
+                "template": template.to_dict()["skeleton"],
+                "slots": {slot.name: value for slot, value in zip(template.slots, values)},
+            }
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the mined templates.
+
+        Returns:
+            dict: Template count and each template's skeleton and slots
+        """
+        templates = list(self._templates)
+        return {
+            "count": len(templates),
+            "templates": [t.to_dict() for t in templates],
+        }
@@ -0,0 +1,115 @@
+"""
+Server-Sent Events helpers.
+
+Used by the streaming /generate and /api/v0/query endpoints to format
+events, and by the streaming LLM transports to parse them.
+"""
+
+import json
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, Optional, Tuple
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """
+    Format one SSE event with a JSON payload.
+
+    Args:
+        event (str): Event name
+        data (dict): JSON-serializable payload
+
+    Returns:
+        str: Wire-format event terminated by a blank line
+
+    Example:
+        >>> format_sse("token", {"text": "SELECT"})
+        'event: token\\ndata: {"text": "SELECT"}\\n\\n'
+    """
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+class SSEParser:
+    """
+    Incremental SSE parser.
+
+    Feed it decoded lines (without trailing newlines); it returns a parsed
+    (event, data) tuple whenever a blank line completes an event.
+    """
+
+    def __init__(self):
+        self._event: Optional[str] = None
+        self._data: list = []
+
+    def feed(self, line: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """
+        Consume one line.
+
+        Args:
+            line (str): A single line of the stream
+
+        Returns:
+            tuple or None: (event, data) when an event is complete
+        """
+        if line == "":
+            if not self._data and self._event is None:
+                return None
+            event = self._event or "message"
+            raw = "\n".join(self._data)
+            self._event = None
+            self._data = []
+            return event, json.loads(raw) if raw else {}
+
+        if line.startswith(":"):
+            return None  # comment / keep-alive
+
+        field, _, value = line.partition(":")
+        if value.startswith(" "):
+            value = value[1:]
+
+        if field == "event":
+            self._event = value
+        elif field == "data":
+            self._data.append(value)
+        return None
+
+
+def iter_sse_events(lines: Iterable[str]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Parse SSE events from an iterable of lines.
+
+    Args:
+        lines: Decoded lines, e.g. from requests' iter_lines(decode_unicode=True)
+
+    Yields:
+        tuple: (event, data)
+    """
+    parser = SSEParser()
+    for line in lines:
+        parsed = parser.feed(line.rstrip("\r\n"))
+        if parsed is not None:
+            yield parsed
+
+    parsed = parser.feed("")
+    if parsed is not None:
+        yield parsed
+
+
+async def aiter_sse_events(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Async counterpart of iter_sse_events().
+
+    Args:
+        lines: Async iterator of decoded lines, e.g. httpx's aiter_lines()
+
+    Yields:
+        tuple: (event, data)
+    """
+    parser = SSEParser()
+    async for line in lines:
+        parsed = parser.feed(line.rstrip("\r\n"))
+        if parsed is not None:
+            yield parsed
+
+    parsed = parser.feed("")
+    if parsed is not None:
+        yield parsed
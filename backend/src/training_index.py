@@ -0,0 +1,211 @@
+"""
+In-memory listing index of the training data.
+
+Vanna's get_training_data() reads every document of the three
+collections into a DataFrame, and the API turns the whole frame into
+dicts, all on every request. The index keeps one lightweight row per
+item, sorted by (type, id). It is rebuilt only when the training
+generation has moved on since the last build. Pages are cut with a
+keyset cursor, so a cursor stays valid while items are added or removed.
+"""
+
+import base64
+import binascii
+import bisect
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Listing order and the type names used by get_training_data()
+TRAINING_TYPES = ("sql", "ddl", "documentation")
+TRAINING_FIELDS = ("id", "training_data_type", "question", "content")
+
+# (generation, rows, keys, {type: (start, end)}) of one index build
+Build = Tuple[int, Tuple["TrainingRow", ...], Tuple[Tuple[int, str], ...], Dict[str, Tuple[int, int]]]
+
+
+def encode_cursor(key: Tuple[int, str]) -> str:
+    """Opaque cursor for the row after which the next page starts."""
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[int, str]:
+    """
+    Read a cursor made by encode_cursor().
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        rank, item_id = json.loads(raw)
+    except (binascii.Error, ValueError, TypeError):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    if not isinstance(rank, int) or not isinstance(item_id, str):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return rank, item_id
+
+
+class TrainingRow:
+    """One training item as listed."""
+
+    __slots__ = ("key", "id", "training_data_type", "question", "content", "haystack")
+
+    def __init__(self, training_data_type: str, id: str, question: Optional[str], content: str):
+        self.key = (TRAINING_TYPES.index(training_data_type), id)
+        self.id = id
+        self.training_data_type = training_data_type
+        self.question = question
+        self.content = content
+        # Case-folded text the substring filter searches
+        self.haystack = f"{question or ''}\n{content}".casefold()
+
+    def project(self, fields: Iterable[str]) -> Dict[str, Any]:
+        return {field: getattr(self, field) for field in fields}
+
+
+def parse_fields(fields: Optional[str]) -> Tuple[str, ...]:
+    """
+    Parse a comma-separated field projection.
+
+    Args:
+        fields (str): e.g. "id,training_data_type" (None or "" = all fields)
+
+    Returns:
+        tuple: Field names in listing order
+
+    Raises:
+        ValueError: If a field is unknown
+    """
+    if not fields:
+        return TRAINING_FIELDS
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = requested - set(TRAINING_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields {sorted(unknown)}; choose from {list(TRAINING_FIELDS)}")
+    return tuple(field for field in TRAINING_FIELDS if field in requested)
+
+
+class TrainingIndex:
+    """
+    Sorted rows of all training items, rebuilt per training generation.
+
+    Example:
+        >>> index = TrainingIndex()
+        >>> page = index.list(loader, generation=7, limit=50, training_data_type="sql", fields="id,question")
+        >>> page["next_cursor"]
+        'WzAsICI0YzJk...'
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (generation, rows, keys, per-type bounds), replaced as a whole so
+        # a reader never mixes two builds
+        self._build: Optional[Build] = None
+
+        self.rebuilds = 0
+        self.build_ms = 0.0
+
+    def _ensure(self, load_rows: Callable[[], Iterable[TrainingRow]], generation: int) -> Build:
+        build = self._build
+        if build is not None and build[0] == generation:
+            return build
+        with self._lock:
+            build = self._build
+            if build is not None and build[0] == generation:
+                return build
+            start = time.perf_counter()
+            rows = tuple(sorted(load_rows(), key=lambda row: row.key))
+            keys = tuple(row.key for row in rows)
+            bounds = {}
+            for rank, training_type in enumerate(TRAINING_TYPES):
+                bounds[training_type] = (
+                    bisect.bisect_left(keys, (rank, "")),
+                    bisect.bisect_left(keys, (rank + 1, "")),
+                )
+            build = (generation, rows, keys, bounds)
+            self._build = build
+            self.rebuilds += 1
+            self.build_ms = round((time.perf_counter() - start) * 1000, 1)
+            return build
+
+    def list(
+        self,
+        load_rows: Callable[[], Iterable[TrainingRow]],
+        generation: int,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        training_data_type: Optional[str] = None,
+        search: Optional[str] = None,
+        fields: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        List a page of training items.
+
+        Args:
+            load_rows: Reads every item from the store (called on rebuild)
+            generation (int): Current training generation
+            limit (int): Page size (None returns every match)
+            cursor (str): next_cursor of the previous page
+            training_data_type (str): "sql", "ddl" or "documentation"
+            search (str): Case-insensitive substring of question or content
+            fields (str): Comma-separated fields to return
+
+        Returns:
+            dict: "training_data" (projected rows), "count" (rows on this
+                page), "total" (rows matching the filters) and
+                "next_cursor" (None on the last page)
+
+        Raises:
+            ValueError: If the type, fields, limit or cursor are invalid
+        """
+        if training_data_type is not None and training_data_type not in TRAINING_TYPES:
+            raise ValueError(f"Unknown training data type {training_data_type!r}; choose from {list(TRAINING_TYPES)}")
+        if limit is not None and limit < 1:
+            raise ValueError("limit must be at least 1")
+        projection = parse_fields(fields)
+        after = decode_cursor(cursor) if cursor else None
+
+        _, rows, keys, bounds = self._ensure(load_rows, generation)
+
+        lo, hi = bounds[training_data_type] if training_data_type else (0, len(rows))
+        needle = search.casefold() if search else None
+
+        def matches(row: TrainingRow) -> bool:
+            return needle is None or needle in row.haystack
+
+        if needle is None:
+            total = hi - lo
+        else:
+            total = sum(1 for row in rows[lo:hi] if needle in row.haystack)
+
+        start = max(lo, bisect.bisect_right(keys, after)) if after is not None else lo
+        page: List[TrainingRow] = []
+        next_cursor = None
+        for position in range(start, hi):
+            row = rows[position]
+            if not matches(row):
+                continue
+            if limit is not None and len(page) == limit:
+                next_cursor = encode_cursor(page[-1].key)
+                break
+            page.append(row)
+
+        return {
+            "training_data": [row.project(projection) for row in page],
+            "count": len(page),
+            "total": total,
+            "next_cursor": next_cursor,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Get index size, generation and rebuild count."""
+        with self._lock:
+            build = self._build
+            return {
+                "rows": len(build[1]) if build else 0,
+                "generation": build[0] if build else None,
+                "rebuilds": self.rebuilds,
+                "build_ms": self.build_ms,
+            }
@@ -0,0 +1,361 @@
+"""
+Incremental sync of training files into the vector store.
+
+A manifest, kept next to the vector store, records a content hash and a
+training data ID for every DDL file, documentation file and Q&A entry
+that was synced. A sync hashes the files again and compares:
+
+- New or changed items are embedded and stored (via `train_bulk`)
+- Items whose file or Q&A entry is gone, or whose content changed, have
+  their old ID removed
+- Everything else is left alone, so nothing is re-embedded
+
+Only IDs the manifest recorded are ever removed; training data added
+through the API is never touched. A file that can't be read or parsed
+keeps its previous entries, so a half-saved edit doesn't delete anything.
+
+`TrainingSync.start_watching()` polls the training directory and syncs
+when a file's size or modification time changes.
+
+Several worker processes may sync the same store at once (each runs the
+startup sync and may watch). A sync holds an exclusive lock on a
+".lock" file next to the manifest and re-reads the manifest under it, so
+syncs run one at a time and each starts from the last one's result.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+
+from .bulk_ingest import TrainingItem
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows: syncs are serialized per process only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+
+# Subdirectory, file pattern and item kind of each training source
+SOURCES = (
+    ("ddl", "*.sql", "ddl"),
+    ("documentation", "*.md", "documentation"),
+    ("questions", "*.json", "sql"),
+)
+
+
+def content_hash(document: str) -> str:
+    """SHA-256 of a stored training document."""
+    return hashlib.sha256(document.encode("utf-8")).hexdigest()
+
+
+def scan_training_files(root: Union[str, Path]) -> Tuple[Dict[str, Dict[str, Any]], Set[str]]:
+    """
+    Read every training item under a training data directory.
+
+    Items are keyed by source: "ddl/<file>", "documentation/<file>" or
+    "questions/<file>#<question>".
+
+    Args:
+        root (str | Path): Directory with ddl/, documentation/ and questions/
+
+    Returns:
+        tuple: ({key: {"item": train()-style dict, "id": ..., "hash": ...}},
+            set of files that couldn't be read, relative to root)
+    """
+    root = Path(root)
+    scanned: Dict[str, Dict[str, Any]] = {}
+    failed: Set[str] = set()
+
+    for subdir, pattern, kind in SOURCES:
+        for path in sorted((root / subdir).glob(pattern)):
+            relative = f"{subdir}/{path.name}"
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    text = f.read()
+                if kind == "sql":
+                    entries = [
+                        (f"{relative}#{pair['question']}", {"question": pair["question"], "sql": pair["sql"]})
+                        for pair in json.loads(text)
+                        if pair.get("question") and pair.get("sql")
+                    ]
+                else:
+                    entries = [(relative, {kind: text})] if text.strip() else []
+            except (OSError, ValueError, TypeError, AttributeError) as e:
+                logger.warning(f"Skipping unreadable training file {relative}: {e}")
+                failed.add(relative)
+                continue
+
+            for key, item in entries:
+                if key in scanned:
+                    logger.warning(f"Duplicate training item {key}, keeping the first")
+                    continue
+                training_item = TrainingItem.from_dict(item)
+                scanned[key] = {
+                    "item": item,
+                    "id": training_item.id,
+                    "hash": content_hash(training_item.document),
+                }
+    return scanned, failed
+
+
+def source_file(key: str) -> str:
+    """File a manifest key came from."""
+    return key.split("#", 1)[0]
+
+
+class TrainingManifest:
+    """
+    Content hashes and IDs of the synced training items, stored as JSON.
+
+    Example:
+        >>> manifest = TrainingManifest("detomo_vectordb/training_manifest.json")
+        >>> manifest.items["ddl/albums.sql"]
+        {'hash': '9f86d0...', 'id': '3b1e...-ddl'}
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.items: Dict[str, Dict[str, str]] = {}
+
+    def load(self) -> "TrainingManifest":
+        """Read the manifest; a missing or unreadable file starts empty."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == MANIFEST_VERSION:
+                self.items = dict(data.get("items", {}))
+        except FileNotFoundError:
+            self.items = {}
+        except (OSError, ValueError, AttributeError) as e:
+            logger.warning(f"Ignoring unreadable training manifest {self.path}: {e}")
+            self.items = {}
+        return self
+
+    def save(self) -> None:
+        """Write the manifest atomically, through a temp file no other writer shares."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = tempfile.NamedTemporaryFile(
+            "w", dir=self.path.parent, prefix=self.path.name, suffix=".tmp", delete=False, encoding="utf-8"
+        )
+        try:
+            with tmp:
+                json.dump(
+                    {"version": MANIFEST_VERSION, "items": self.items}, tmp, ensure_ascii=False, indent=1, sort_keys=True
+                )
+            os.replace(tmp.name, self.path)
+        except BaseException:
+            os.unlink(tmp.name)
+            raise
+
+    @contextmanager
+    def locked(self):
+        """Hold an exclusive lock shared with every process using this manifest."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path.with_name(self.path.name + ".lock"), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+
+class SyncPlan:
+    """What a sync has to add and remove."""
+
+    def __init__(self):
+        self.add: Dict[str, Dict[str, Any]] = {}
+        self.remove_ids: List[str] = []
+        self.unchanged = 0
+        self.manifest: Dict[str, Dict[str, str]] = {}
+
+
+def plan_sync(
+    scanned: Dict[str, Dict[str, Any]],
+    failed: Set[str],
+    manifest_items: Dict[str, Dict[str, str]],
+    stored_ids: Set[str]
+) -> SyncPlan:
+    """
+    Diff the training files against the manifest and the vector store.
+
+    An item is unchanged only if its hash matches the manifest and its ID
+    is still stored; otherwise it's (re-)added. A manifest ID is removed
+    when no scanned item has that ID any more and its file didn't fail.
+
+    Args:
+        scanned (dict): scan_training_files() items
+        failed (set): Files that couldn't be read
+        manifest_items (dict): Manifest entries of the last sync
+        stored_ids (set): IDs currently in the vector store
+
+    Returns:
+        SyncPlan: Items to add, IDs to remove and the next manifest
+    """
+    plan = SyncPlan()
+    current_ids = {entry["id"] for entry in scanned.values()}
+
+    for key, entry in scanned.items():
+        previous = manifest_items.get(key)
+        if previous is not None and previous.get("hash") == entry["hash"] and entry["id"] in stored_ids:
+            plan.unchanged += 1
+        else:
+            plan.add[key] = entry
+        plan.manifest[key] = {"hash": entry["hash"], "id": entry["id"]}
+
+    removed = set()
+    for key, previous in manifest_items.items():
+        if source_file(key) in failed:
+            # Keep what was synced from a file we couldn't read this time
+            if key not in plan.manifest:
+                plan.manifest[key] = previous
+            current_ids.add(previous["id"])
+            continue
+        old_id = previous.get("id")
+        if old_id and old_id not in current_ids and old_id in stored_ids:
+            removed.add(old_id)
+    plan.remove_ids = sorted(removed - current_ids)
+    return plan
+
+
+class TrainingSync:
+    """
+    Syncs a training data directory into a DetomoVanna instance.
+
+    Example:
+        >>> sync = TrainingSync(vn, "training_data/chinook", "detomo_vectordb/training_manifest.json")
+        >>> sync.sync()
+        {'added': 1, 'embedded': 1, 'removed': 1, 'unchanged': 92, 'failed_files': [], 'total_ms': 41.3}
+        >>> sync.start_watching(interval=2.0)
+    """
+
+    def __init__(self, vn, root: Union[str, Path], manifest_path: Union[str, Path]):
+        """
+        Initialize the sync.
+
+        Args:
+            vn: DetomoVanna instance (train_bulk, remove_training_data,
+                list_training_data)
+            root (str | Path): Training data directory
+            manifest_path (str | Path): Manifest file
+        """
+        self.vn = vn
+        self.root = Path(root)
+        self.manifest = TrainingManifest(manifest_path).load()
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.syncs = 0
+        self.last_report: Optional[Dict[str, Any]] = None
+
+    def _stored_ids(self) -> Set[str]:
+        listing = self.vn.list_training_data(fields="id")
+        return {row["id"] for row in listing["training_data"]}
+
+    def sync(self, force: bool = False) -> Dict[str, Any]:
+        """
+        Apply new, changed and removed training items to the vector store.
+
+        Args:
+            force (bool): Ignore the manifest and check every item against
+                the store (items already stored are still not re-embedded)
+
+        Returns:
+            dict: Items added (and how many of those weren't stored yet,
+                so were embedded), removed and unchanged, unreadable files
+                and the time taken
+        """
+        with self._lock, self.manifest.locked():
+            start = time.perf_counter()
+            # Another process may have synced since this one last did
+            self.manifest.load()
+            scanned, failed = scan_training_files(self.root)
+            plan = plan_sync(scanned, failed, {} if force else self.manifest.items, self._stored_ids())
+
+            stored = 0
+            if plan.add:
+                stored = self.vn.train_bulk([entry["item"] for entry in plan.add.values()])["total_added"]
+            for training_id in plan.remove_ids:
+                self.vn.remove_training_data(training_id)
+
+            self.manifest.items = plan.manifest
+            self.manifest.save()
+
+            self.syncs += 1
+            self.last_report = {
+                "added": len(plan.add),
+                "embedded": stored,
+                "removed": len(plan.remove_ids),
+                "unchanged": plan.unchanged,
+                "failed_files": sorted(failed),
+                "total_ms": round((time.perf_counter() - start) * 1000, 1),
+            }
+            return self.last_report
+
+    def fingerprint(self) -> Tuple[Tuple[str, int, int], ...]:
+        """Name, size and modification time of every training file."""
+        files = []
+        for subdir, pattern, _ in SOURCES:
+            for path in sorted((self.root / subdir).glob(pattern)):
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                files.append((f"{subdir}/{path.name}", stat.st_size, stat.st_mtime_ns))
+        return tuple(files)
+
+    def start_watching(self, interval: float = 2.0) -> None:
+        """
+        Sync in a background thread whenever the training files change.
+
+        Args:
+            interval (float): Seconds between checks
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._watch, args=(interval, self.fingerprint()), name="training-sync-watch", daemon=True
+        )
+        self._thread.start()
+        logger.info(f"Watching {self.root} for training data changes every {interval}s")
+
+    def stop_watching(self) -> None:
+        """Stop the watch thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _watch(self, interval: float, seen: Tuple[Tuple[str, int, int], ...]) -> None:
+        while not self._stop.wait(interval):
+            current = self.fingerprint()
+            if current == seen:
+                continue
+            seen = current
+            try:
+                report = self.sync()
+                logger.info(
+                    f"✓ Training data synced: +{report['added']} -{report['removed']} "
+                    f"({report['unchanged']} unchanged, {report['total_ms']}ms)"
+                )
+            except Exception as e:
+                logger.error(f"Training data sync failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Get manifest size, sync count and the last sync report."""
+        return {
+            "watching": self._thread is not None and self._thread.is_alive(),
+            "manifest_items": len(self.manifest.items),
+            "syncs": self.syncs,
+            "last_sync": self.last_report,
+        }
@@ -0,0 +1,194 @@
+"""
+In-memory NumPy snapshot of the vector collections.
+
+The training corpus is a few hundred items, yet every lookup goes through
+ChromaDB's client, HNSW index and SQLite metadata layer. A snapshot keeps
+each collection as one contiguous matrix and answers top-k with a single
+matrix-vector product.
+
+ChromaDB stays the durable source of truth: a snapshot is marked stale
+whenever training data changes, in this process or in another worker
+sharing the store (see retrieval_cache.SharedGeneration), and is rebuilt
+from the collection on the next lookup, then swapped in whole so readers
+never see a half-built one.
+Ranking uses the same squared L2 distance as ChromaDB's default space.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_DTYPES = ("float32", "float16")
+
+
+class CollectionSnapshot:
+    """Immutable matrix + documents of one collection."""
+
+    def __init__(self, ids: List[str], documents: List[str], matrix: np.ndarray):
+        self.ids = ids
+        self.documents = documents
+        self.matrix = matrix
+        # ||x||^2 per row, so L2 ranking needs only one dot product per query
+        self.sq_norms = np.einsum("ij,ij->i", matrix, matrix, dtype=np.float32) if len(ids) else np.zeros(0, np.float32)
+        self.built_at = time.time()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def top_k(self, vector: Any, k: int) -> List[str]:
+        """
+        Documents nearest to vector, closest first.
+
+        Args:
+            vector: Query embedding
+            k (int): Results wanted
+
+        Returns:
+            list: Up to k documents
+        """
+        if not self.ids or k <= 0:
+            return []
+        query = np.asarray(vector, dtype=np.float32).reshape(-1)
+        # ||q - x||^2 = ||q||^2 + ||x||^2 - 2 q.x; ||q||^2 doesn't change the order
+        distances = self.sq_norms - 2.0 * (self.matrix @ query)
+        k = min(k, len(self.ids))
+        if k < len(self.ids):
+            nearest = np.argpartition(distances, k - 1)[:k]
+            nearest = nearest[np.argsort(distances[nearest], kind="stable")]
+        else:
+            nearest = np.argsort(distances, kind="stable")
+        return [self.documents[i] for i in nearest]
+
+
+class VectorIndex:
+    """
+    Snapshots of several collections, rebuilt lazily after changes.
+
+    Example:
+        >>> index = VectorIndex(dtype="float32")
+        >>> index.query("ddl", vn.ddl_collection, embedding, 10)
+        ['CREATE TABLE customers (...)', ...]
+        >>> index.invalidate("ddl")  # after training
+    """
+
+    def __init__(self, dtype: str = "float32"):
+        """
+        Initialize the index.
+
+        Args:
+            dtype (str): Matrix storage type, "float32" or "float16"
+                (half the memory, slightly coarser scores)
+
+        Raises:
+            ValueError: If dtype is not supported
+        """
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"dtype must be one of {SUPPORTED_DTYPES}")
+
+        self.dtype = np.dtype(dtype)
+        self._lock = threading.Lock()
+        self._snapshots: Dict[str, CollectionSnapshot] = {}
+        self._stale: Dict[str, bool] = {}
+
+        self.rebuilds = 0
+        self.queries = 0
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        """
+        Mark a collection's snapshot stale (all collections if name is None).
+
+        Args:
+            name (str): Collection name
+        """
+        with self._lock:
+            names = [name] if name is not None else list(self._snapshots)
+            for key in names:
+                self._stale[key] = True
+
+    def _build(self, name: str, collection: Any) -> CollectionSnapshot:
+        start = time.perf_counter()
+        data = collection.get(include=["embeddings", "documents"])
+        ids = list(data.get("ids") or [])
+        documents = list(data.get("documents") or [])
+        embeddings = data.get("embeddings")
+        if ids and embeddings is not None and len(embeddings):
+            matrix = np.ascontiguousarray(np.asarray(embeddings, dtype=np.float32), dtype=self.dtype)
+        else:
+            ids, documents = [], []
+            matrix = np.zeros((0, 0), dtype=self.dtype)
+        snapshot = CollectionSnapshot(ids, documents, matrix)
+        logger.info(
+            f"Built {name} vector snapshot: {len(ids)} items, {matrix.nbytes} bytes "
+            f"({(time.perf_counter() - start) * 1000:.1f}ms)"
+        )
+        return snapshot
+
+    def snapshot(self, name: str, collection: Any) -> CollectionSnapshot:
+        """
+        Get a collection's current snapshot, rebuilding it if stale.
+
+        Args:
+            name (str): Collection name
+            collection: ChromaDB collection it mirrors
+
+        Returns:
+            CollectionSnapshot: Snapshot to query
+        """
+        snapshot = self._snapshots.get(name)
+        if snapshot is not None and not self._stale.get(name):
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshots.get(name)
+            if snapshot is None or self._stale.get(name):
+                # Clear the flag first: a change during the build marks it stale again
+                self._stale[name] = False
+                snapshot = self._build(name, collection)
+                self._snapshots[name] = snapshot
+                self.rebuilds += 1
+            return snapshot
+
+    def query(self, name: str, collection: Any, vector: Any, k: int) -> List[str]:
+        """
+        Top-k documents of a collection for an embedding.
+
+        Args:
+            name (str): Collection name
+            collection: ChromaDB collection it mirrors
+            vector: Query embedding
+            k (int): Results wanted
+
+        Returns:
+            list: Documents, closest first
+        """
+        self.queries += 1
+        return self.snapshot(name, collection).top_k(vector, k)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get snapshot metrics.
+
+        Returns:
+            dict: dtype, rebuild/query counters and per-collection size,
+                memory and build time
+        """
+        with self._lock:
+            return {
+                "dtype": self.dtype.name,
+                "rebuilds": self.rebuilds,
+                "queries": self.queries,
+                "collections": {
+                    name: {
+                        "items": len(snapshot),
+                        "bytes": int(snapshot.matrix.nbytes),
+                        "built_at": snapshot.built_at,
+                        "stale": bool(self._stale.get(name)),
+                    }
+                    for name, snapshot in self._snapshots.items()
+                },
+            }
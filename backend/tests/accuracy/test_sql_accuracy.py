@@ -64,6 +64,14 @@ def test_sql_accuracy():
     print(f"Loaded {len(test_cases)} test queries")
     print()
 
+    # Generate SQL for all questions in one concurrent batch
+    print(f"Generating SQL for {len(test_cases)} questions...")
+    start_time = time.time()
+    generated = vn.generate_sql_batch([test_case['question'] for test_case in test_cases])
+    batch_time = time.time() - start_time
+    print(f"✓ Generated in {batch_time:.2f}s")
+    print()
+
     # Run tests
     results = []
     passed = 0
@@ -74,10 +82,9 @@ def test_sql_accuracy():
         print(f"    Category: {test_case['category']} | Difficulty: {test_case['difficulty']}")
 
         try:
-            # Generate SQL
-            start_time = time.time()
-            generated_sql = vn.generate_sql(test_case['question'])
-            elapsed_time = time.time() - start_time
+            generated_sql = generated[i - 1]
+            if isinstance(generated_sql, Exception):
+                raise generated_sql
 
             # Check accuracy
             is_accurate = check_sql_accuracy(generated_sql, test_case['expected_keywords'])
@@ -90,17 +97,16 @@ def test_sql_accuracy():
                 'difficulty': test_case['difficulty'],
                 'expected_keywords': test_case['expected_keywords'],
                 'generated_sql': generated_sql,
-                'is_accurate': is_accurate,
-                'response_time': elapsed_time
+                'is_accurate': is_accurate
             }
             results.append(result)
 
             if is_accurate:
                 passed += 1
-                print(f"    ✓ PASS ({elapsed_time:.2f}s)")
+                print("    ✓ PASS")
             else:
                 failed += 1
-                print(f"    ✗ FAIL ({elapsed_time:.2f}s)")
+                print("    ✗ FAIL")
 
             print(f"    Generated: {generated_sql[:100]}...")
             print()
@@ -119,7 +125,7 @@ def test_sql_accuracy():
 
     # Calculate statistics
     accuracy_rate = (passed / len(test_cases)) * 100
-    avg_response_time = sum(r.get('response_time', 0) for r in results) / len(results)
+    avg_response_time = batch_time / len(test_cases)
 
     # Print summary
     print("=" * 80)
@@ -129,7 +135,7 @@ def test_sql_accuracy():
     print(f"Passed: {passed}")
     print(f"Failed: {failed}")
     print(f"Accuracy rate: {accuracy_rate:.1f}%")
-    print(f"Average response time: {avg_response_time:.2f}s")
+    print(f"Batch generation time: {batch_time:.2f}s ({avg_response_time:.2f}s per query)")
     print()
 
     # Breakdown by difficulty
@@ -185,6 +191,7 @@ def test_sql_accuracy():
                 'failed': failed,
                 'accuracy_rate': accuracy_rate,
                 'avg_response_time': avg_response_time,
+                'batch_time': batch_time,
                 'target_met': accuracy_rate >= target_accuracy
             },
             'results': results
@@ -1,5 +1,5 @@
 import pytest
-from unittest.mock import patch, MagicMock, AsyncMock
+from unittest.mock import patch, MagicMock, AsyncMock, ANY
 from fastapi.testclient import TestClient
 from claude_agent_server import app, call_claude_agent
 
@@ -125,15 +125,13 @@ async def test_call_claude_agent(mock_client_class):
     async def mock_receive_response():
         yield mock_message
 
-    # Create mock client
-    mock_client = MagicMock()
+    # Create mock client (pooled clients are connected once, then reused)
+    mock_client = mock_client_class.return_value
+    mock_client.connect = AsyncMock()
+    mock_client.disconnect = AsyncMock()
     mock_client.query = AsyncMock()
     mock_client.receive_response = mock_receive_response
 
-    # Mock the async context manager
-    mock_client_class.return_value.__aenter__ = AsyncMock(return_value=mock_client)
-    mock_client_class.return_value.__aexit__ = AsyncMock()
-
     # Call the function
     result = await call_claude_agent(
         prompt="Test prompt",
@@ -144,4 +142,34 @@ async def test_call_claude_agent(mock_client_class):
 
     assert result["text"] == "SELECT COUNT(*) FROM Customer"
     assert result["model"] == "claude-sonnet-4-5"
-    mock_client.query.assert_called_once_with("Test prompt")
+    mock_client.connect.assert_called_once()
+    mock_client.query.assert_called_once_with("Test prompt", session_id=ANY)
+
+
+@pytest.mark.asyncio
+@patch('claude_agent_server.ClaudeSDKClient')
+async def test_call_claude_agent_reuses_pooled_client(mock_client_class):
+    """Test consecutive calls reuse the same connected client"""
+    from claude_agent_sdk import AssistantMessage, TextBlock
+
+    mock_text_block = MagicMock(spec=TextBlock)
+    mock_text_block.text = "SELECT 1"
+    mock_message = MagicMock(spec=AssistantMessage)
+    mock_message.content = [mock_text_block]
+
+    async def mock_receive_response():
+        yield mock_message
+
+    mock_client = mock_client_class.return_value
+    mock_client.connect = AsyncMock()
+    mock_client.disconnect = AsyncMock()
+    mock_client.query = AsyncMock()
+    mock_client.receive_response = mock_receive_response
+
+    for _ in range(3):
+        result = await call_claude_agent("Test prompt", "claude-sonnet-4-5", 0.1, 2048)
+        assert result["text"] == "SELECT 1"
+
+    assert mock_client_class.call_count == 1
+    mock_client.connect.assert_called_once()
+    assert mock_client.query.call_count == 3
@@ -0,0 +1,117 @@
+"""Unit tests for bulk training ingestion"""
+
+import json
+from unittest.mock import MagicMock
+import pytest
+from vanna.utils import deterministic_uuid
+from src.bulk_ingest import TrainingItem, ingest
+
+
+def make_collections(existing=()):
+    collections = {}
+    for kind in ("sql", "ddl", "documentation"):
+        collection = MagicMock()
+        collection.get.side_effect = lambda ids, include: {"ids": [i for i in ids if i in existing]}
+        collections[kind] = collection
+    return collections
+
+
+def fake_embed(texts):
+    return [[float(len(text)), 1.0] for text in texts]
+
+
+class TestTrainingItem:
+    """Test items match Vanna's stored documents and IDs"""
+
+    def test_question_sql_matches_vanna(self):
+        """Test a Q&A pair gets Vanna's JSON document and -sql ID"""
+        item = TrainingItem.from_dict({"question": "顧客は何人?", "sql": "SELECT COUNT(*) FROM customers"})
+        document = json.dumps({"question": "顧客は何人?", "sql": "SELECT COUNT(*) FROM customers"}, ensure_ascii=False)
+
+        assert item.kind == "sql"
+        assert item.document == document
+        assert item.id == deterministic_uuid(document) + "-sql"
+
+    def test_ddl_and_documentation(self):
+        """Test DDL and documentation IDs use Vanna's suffixes"""
+        assert TrainingItem.from_dict({"ddl": "CREATE TABLE a (id INT)"}).id.endswith("-ddl")
+        assert TrainingItem.from_dict({"documentation": "Table a"}).id.endswith("-doc")
+
+    def test_malformed_items_rejected(self):
+        """Test items that aren't one of the train() shapes raise ValueError"""
+        with pytest.raises(ValueError):
+            TrainingItem.from_dict({"question": "No SQL"})
+        with pytest.raises(ValueError):
+            TrainingItem.from_dict({"plan": "x"})
+
+
+class TestIngest:
+    """Test batched embedding and one write per collection"""
+
+    def test_batches_and_single_write(self):
+        """Test documents are embedded in batches and each collection is added once"""
+        embed = MagicMock(side_effect=fake_embed)
+        collections = make_collections()
+        items = [{"question": f"Q{i}", "sql": f"SELECT {i}"} for i in range(5)]
+        items += [{"ddl": "CREATE TABLE a (id INT)"}, {"documentation": "Table a"}]
+
+        report = ingest(items, collections, embed, batch_size=2)
+
+        # 3 batches for the 5 Q&A pairs, 1 each for DDL and documentation
+        assert embed.call_count == 5
+        for collection in collections.values():
+            assert collection.add.call_count == 1
+        add = collections["sql"].add.call_args[1]
+        assert len(add["ids"]) == len(add["documents"]) == len(add["embeddings"]) == 5
+        assert add["embeddings"][0] == [float(len(add["documents"][0])), 1.0]
+
+        stats = report.to_dict()
+        assert stats["added"] == {"sql": 5, "ddl": 1, "documentation": 1}
+        assert stats["total_added"] == 7
+        assert stats["embed_batches"] == 5
+        assert stats["items_per_second"] > 0
+
+    def test_existing_and_duplicate_items_skipped(self):
+        """Test stored items and repeats in the input aren't embedded again"""
+        stored = TrainingItem.from_dict({"ddl": "CREATE TABLE a (id INT)"})
+        embed = MagicMock(side_effect=fake_embed)
+        collections = make_collections(existing={stored.id})
+        items = [
+            {"ddl": "CREATE TABLE a (id INT)"},
+            {"ddl": "CREATE TABLE b (id INT)"},
+            {"ddl": "CREATE TABLE b (id INT)"},
+        ]
+
+        report = ingest(items, collections, embed)
+
+        embed.assert_called_once_with(["CREATE TABLE b (id INT)"])
+        assert report.added["ddl"] == 1
+        assert report.skipped["ddl"] == 2
+        collections["sql"].add.assert_not_called()
+
+    def test_nothing_new_writes_nothing(self):
+        """Test a fully loaded store is neither embedded nor written"""
+        stored = TrainingItem.from_dict({"documentation": "Table a"})
+        embed = MagicMock(side_effect=fake_embed)
+        collections = make_collections(existing={stored.id})
+
+        report = ingest([stored], collections, embed)
+
+        embed.assert_not_called()
+        collections["documentation"].add.assert_not_called()
+        assert report.total_added == 0
+
+    def test_writes_chunked_to_store_limit(self):
+        """Test a collection bigger than the store's max batch is written in chunks"""
+        collections = make_collections()
+        items = [{"documentation": f"Doc {i}"} for i in range(5)]
+
+        ingest(items, collections, fake_embed, batch_size=10, max_write_size=2)
+
+        sizes = [len(call[1]["ids"]) for call in collections["documentation"].add.call_args_list]
+        assert sizes == [2, 2, 1]
+
+    def test_invalid_batch_size(self):
+        """Test a non-positive batch size raises ValueError"""
+        with pytest.raises(ValueError):
+            ingest([], make_collections(), fake_embed, batch_size=0)
@@ -0,0 +1,80 @@
+"""Unit tests for token-budgeted SQL prompt context packing"""
+
+import pytest
+from src.context_packer import ContextPacker, capture_context_reports, terms
+
+
+class TestTerms:
+    """Test match term extraction"""
+
+    def test_ascii_words_and_japanese_bigrams(self):
+        """Test ASCII words are lowercased and Japanese runs become bigrams"""
+        assert terms("Top Customers by country") == {"top", "customers", "by", "country"}
+        assert terms("顧客数") == {"顧客", "客数"}
+
+
+class TestContextPacker:
+    """Test budget filling and the dropped-item report"""
+
+    def test_everything_fits(self):
+        """Test nothing is dropped when the budget is large enough"""
+        packer = ContextPacker(budget_tokens=10000)
+        qa = [{"question": "How many albums?", "sql": "SELECT COUNT(*) FROM Album"}]
+
+        packed = packer.pack("How many customers?", qa, ["CREATE TABLE Customer (Id INT)"], ["doc"])
+
+        assert packed["question_sql_list"] == qa
+        assert packed["ddl_list"] == ["CREATE TABLE Customer (Id INT)"]
+        assert packed["doc_list"] == ["doc"]
+        assert packed["report"]["dropped"] == []
+        assert packed["report"]["dropped_tokens"] == 0
+
+    def test_drops_least_relevant_items_over_budget(self):
+        """Test a long, unrelated documentation chunk is dropped first"""
+        packer = ContextPacker(budget_tokens=60)
+        ddl = ["CREATE TABLE Customer (CustomerId INT, Country TEXT)", "CREATE TABLE Album (AlbumId INT)"]
+        docs = ["Business rules about invoices and refunds. " * 20]
+
+        packed = packer.pack("customers by country", [], ddl, docs)
+
+        assert packed["ddl_list"] == ddl
+        assert packed["doc_list"] == []
+        report = packed["report"]
+        assert report["used_tokens"] <= 60
+        assert report["kept"] == {"question_sql": 0, "ddl": 2, "documentation": 0}
+        assert [item["kind"] for item in report["dropped"]] == ["documentation"]
+        assert report["dropped"][0]["preview"].endswith("...")
+
+    def test_reserved_top_item_and_retrieval_order(self):
+        """Test the top-ranked example is always kept and order is preserved"""
+        packer = ContextPacker(budget_tokens=40, rank_weight=0.0)
+        qa = [
+            {"question": "Best selling tracks", "sql": "SELECT Name FROM Track"},
+            {"question": "Count customers", "sql": "SELECT COUNT(*) FROM Customer"},
+            {"question": "Count albums", "sql": "SELECT COUNT(*) FROM Album"},
+        ]
+
+        packed = packer.pack("count customers", qa, [], [])
+
+        # Rank 0 is reserved even though rank 1 overlaps the question better
+        assert packed["question_sql_list"] == qa[:2]
+        assert [item["rank"] for item in packed["report"]["dropped"]] == [2]
+
+    def test_reports_are_captured(self):
+        """Test capture_context_reports() collects reports inside the block"""
+        packer = ContextPacker(budget_tokens=100)
+
+        with capture_context_reports() as reports:
+            packer.pack("q", [], ["CREATE TABLE t (id INT)"], [])
+
+        assert len(reports) == 1
+        assert reports[0]["budget_tokens"] == 100
+
+        # Outside the block nothing is collected
+        packer.pack("q", [], [], [])
+        assert len(reports) == 1
+
+    def test_invalid_budget(self):
+        """Test a non-positive budget is rejected"""
+        with pytest.raises(ValueError):
+            ContextPacker(budget_tokens=0)
@@ -1,9 +1,14 @@
 """Unit tests for DetomoVanna classes"""
 
+import asyncio
 import pytest
-from unittest.mock import patch, MagicMock, Mock
+import pandas as pd
+from unittest.mock import patch, MagicMock, Mock, AsyncMock
 import requests
 from src.detomo_vanna import ClaudeAgentChat, DetomoVanna
+from src.embedding_cache import EmbeddingCache
+from src.retrieval_cache import RetrievalCache
+from src.single_flight import AsyncSingleFlight
 
 
 class TestClaudeAgentChatViaDetomoVanna:
@@ -65,7 +70,7 @@ class TestClaudeAgentChatViaDetomoVanna:
         assert msg["content"] == "test assistant message"
 
     @patch('src.detomo_vanna.ChromaDB_VectorStore.__init__', return_value=None)
-    @patch('src.detomo_vanna.requests.post')
+    @patch('src.llm_transport.requests.Session.post')
     def test_submit_prompt_with_string(self, mock_post, mock_chroma_init):
         """Test submit_prompt with string input"""
         # Mock response
@@ -85,10 +90,10 @@ class TestClaudeAgentChatViaDetomoVanna:
         assert call_args[0][0] == "http://localhost:8000/generate"
         assert call_args[1]["json"]["prompt"] == "Test prompt"
         assert call_args[1]["json"]["model"] == "claude-sonnet-4-5"
-        assert call_args[1]["timeout"] == 30
+        assert call_args[1]["timeout"] == (5, 30)
 
     @patch('src.detomo_vanna.ChromaDB_VectorStore.__init__', return_value=None)
-    @patch('src.detomo_vanna.requests.post')
+    @patch('src.llm_transport.requests.Session.post')
     def test_submit_prompt_with_messages(self, mock_post, mock_chroma_init):
         """Test submit_prompt with list of messages"""
         # Mock response
@@ -110,7 +115,7 @@ class TestClaudeAgentChatViaDetomoVanna:
         assert "user: Show customers" in call_args[1]["json"]["prompt"]
 
     @patch('src.detomo_vanna.ChromaDB_VectorStore.__init__', return_value=None)
-    @patch('src.detomo_vanna.requests.post')
+    @patch('src.llm_transport.requests.Session.post')
     def test_submit_prompt_with_multiple_messages(self, mock_post, mock_chroma_init):
         """Test submit_prompt with multiple messages"""
         # Mock response
@@ -135,7 +140,7 @@ class TestClaudeAgentChatViaDetomoVanna:
         assert "user: Show US customers" in prompt
 
     @patch('src.detomo_vanna.ChromaDB_VectorStore.__init__', return_value=None)
-    @patch('src.detomo_vanna.requests.post')
+    @patch('src.llm_transport.requests.Session.post')
     def test_submit_prompt_timeout(self, mock_post, mock_chroma_init):
         """Test submit_prompt handles timeout"""
         mock_post.side_effect = requests.exceptions.Timeout()
@@ -146,7 +151,7 @@ class TestClaudeAgentChatViaDetomoVanna:
             vn.submit_prompt("Test prompt")
 
     @patch('src.detomo_vanna.ChromaDB_VectorStore.__init__', return_value=None)
-    @patch('src.detomo_vanna.requests.post')
+    @patch('src.llm_transport.requests.Session.post')
     def test_submit_prompt_request_error(self, mock_post, mock_chroma_init):
         """Test submit_prompt handles request errors"""
         mock_post.side_effect = requests.exceptions.RequestException("Network error")
@@ -157,7 +162,7 @@ class TestClaudeAgentChatViaDetomoVanna:
             vn.submit_prompt("Test prompt")
 
     @patch('src.detomo_vanna.ChromaDB_VectorStore.__init__', return_value=None)
-    @patch('src.detomo_vanna.requests.post')
+    @patch('src.llm_transport.requests.Session.post')
     def test_submit_prompt_with_custom_temperature(self, mock_post, mock_chroma_init):
         """Test submit_prompt uses custom temperature"""
         # Mock response
@@ -174,7 +179,7 @@ class TestClaudeAgentChatViaDetomoVanna:
         assert call_args[1]["json"]["temperature"] == 0.5
 
     @patch('src.detomo_vanna.ChromaDB_VectorStore.__init__', return_value=None)
-    @patch('src.detomo_vanna.requests.post')
+    @patch('src.llm_transport.requests.Session.post')
     def test_submit_prompt_with_custom_max_tokens(self, mock_post, mock_chroma_init):
         """Test submit_prompt uses custom max_tokens"""
         # Mock response
@@ -191,7 +196,7 @@ class TestClaudeAgentChatViaDetomoVanna:
         assert call_args[1]["json"]["max_tokens"] == 4096
 
     @patch('src.detomo_vanna.ChromaDB_VectorStore.__init__', return_value=None)
-    @patch('src.detomo_vanna.requests.post')
+    @patch('src.llm_transport.requests.Session.post')
     def test_submit_prompt_empty_response(self, mock_post, mock_chroma_init):
         """Test submit_prompt handles empty text in response"""
         # Mock response with empty text
@@ -205,6 +210,21 @@ class TestClaudeAgentChatViaDetomoVanna:
 
         assert result == ""
 
+    @patch('src.detomo_vanna.ChromaDB_VectorStore.__init__', return_value=None)
+    @patch('src.llm_transport.requests.Session.post')
+    def test_submit_prompt_with_custom_transport(self, mock_post, mock_chroma_init):
+        """Test submit_prompt uses a transport passed in config instead of HTTP"""
+        transport = MagicMock()
+        transport.generate.return_value = "SELECT 1"
+        transport.describe.return_value = "in-process"
+
+        vn = DetomoVanna(config={"transport": transport, "model": "claude-haiku-4-5"})
+        result = vn.submit_prompt("Test prompt")
+
+        assert result == "SELECT 1"
+        transport.generate.assert_called_once_with("Test prompt", "claude-haiku-4-5", 0.1, 2048, purpose=None)
+        mock_post.assert_not_called()
+
 
 class TestDetomoVanna:
     """Test DetomoVanna class"""
@@ -244,3 +264,747 @@ class TestDetomoVanna:
         # Verify both parent classes were initialized
         assert mock_chroma_init.called
         assert mock_claude_init.called
+
+
+class TestClaudeAgentChatSingleFlight:
+    """Test coalescing of identical concurrent prompts"""
+
+    @pytest.mark.asyncio
+    @patch('src.detomo_vanna.ChromaDB_VectorStore.__init__', return_value=None)
+    async def test_submit_prompt_async_coalesces(self, mock_chroma_init):
+        """Test identical concurrent prompts share one transport call"""
+        transport = MagicMock()
+
+        async def slow_agenerate(*args, **kwargs):
+            await asyncio.sleep(0.01)
+            return "SELECT 1"
+
+        transport.agenerate = AsyncMock(side_effect=slow_agenerate)
+        chat = DetomoVanna(config={"transport": transport})
+
+        results = await asyncio.gather(*[chat.submit_prompt_async("Same prompt") for _ in range(3)])
+
+        assert results == ["SELECT 1"] * 3
+        assert transport.agenerate.await_count == 1
+        assert chat.llm_stats()["single_flight"]["async"]["coalesced"] == 2
+
+    @patch('src.detomo_vanna.ChromaDB_VectorStore.__init__', return_value=None)
+    def test_generate_plotly_code_tags_purpose(self, mock_chroma_init):
+        """Test Vanna's sync pipeline passes the call purpose to the transport"""
+        transport = MagicMock()
+        transport.generate.return_value = "```python\nfig = None\n```"
+        vn = DetomoVanna(config={"transport": transport})
+
+        vn.generate_plotly_code(question="Q", sql="SELECT 1", df_metadata="")
+
+        assert transport.generate.call_args[1]["purpose"] == "plotly"
+
+    @patch('src.detomo_vanna.ChromaDB_VectorStore.__init__', return_value=None)
+    def test_single_flight_can_be_disabled(self, mock_chroma_init):
+        """Test config["single_flight"]=False calls the transport every time"""
+        transport = MagicMock()
+        transport.generate.return_value = "SELECT 1"
+        chat = DetomoVanna(config={"transport": transport, "single_flight": False})
+
+        chat.submit_prompt("p")
+        chat.submit_prompt("p")
+
+        assert transport.generate.call_count == 2
+
+
+class TestClaudeAgentChatRouting:
+    """Test per-purpose model routing in ClaudeAgentChat"""
+
+    @patch('src.detomo_vanna.ChromaDB_VectorStore.__init__', return_value=None)
+    def test_plotly_uses_routed_model(self, mock_chroma_init):
+        """Test a plotly-tagged call uses the plotly route's model and max_tokens"""
+        transport = MagicMock()
+        transport.generate.return_value = "fig = px.bar(df)"
+        vn = DetomoVanna(config={
+            "transport": transport,
+            "model": "claude-sonnet-4-5",
+            "model_routes": {"plotly": {"model": "claude-haiku-4-5", "max_tokens": 1024}}
+        })
+
+        vn.submit_prompt("Chart this", purpose="plotly")
+        vn.submit_prompt("Count customers", purpose="sql")
+
+        assert transport.generate.call_args_list[0][0][1:] == ("claude-haiku-4-5", 0.1, 1024)
+        assert transport.generate.call_args_list[1][0][1:] == ("claude-sonnet-4-5", 0.1, 2048)
+        decisions = vn.llm_stats()["router"]["decisions"]
+        assert {"purpose": "plotly", "model": "claude-haiku-4-5", "reason": "route", "count": 1} in decisions
+
+    @patch('src.detomo_vanna.ChromaDB_VectorStore.__init__', return_value=None)
+    def test_failures_trigger_fallback(self, mock_chroma_init):
+        """Test repeated transport errors move later calls to the fallback model"""
+        transport = MagicMock()
+        transport.generate.side_effect = Exception("boom")
+        vn = DetomoVanna(config={
+            "transport": transport,
+            "model": "claude-sonnet-4-5",
+            "fallback_model": "claude-haiku-4-5",
+            "route_min_samples": 2
+        })
+
+        for _ in range(2):
+            with pytest.raises(Exception):
+                vn.submit_prompt("Count customers")
+
+        transport.generate.side_effect = None
+        transport.generate.return_value = "SELECT 1"
+        vn.submit_prompt("Count customers")
+
+        assert transport.generate.call_args[0][1] == "claude-haiku-4-5"
+
+
+class TestClaudeAgentChatHedging:
+    """Test hedged async submits"""
+
+    @pytest.mark.asyncio
+    @patch('src.detomo_vanna.ChromaDB_VectorStore.__init__', return_value=None)
+    async def test_hedge_cancels_losing_transport_call(self, mock_chroma_init):
+        """Test hedged attempts skip server coalescing so the slow one really is cancelled"""
+        transport = MagicMock()
+        transport.describe.return_value = "in-process"
+        flight = AsyncSingleFlight()
+        calls, cancelled = [], []
+
+        async def model_call(slow):
+            try:
+                await asyncio.sleep(5 if slow else 0.01)
+            except asyncio.CancelledError:
+                cancelled.append(slow)
+                raise
+            return "SELECT 1"
+
+        async def fake_agenerate(prompt, model, temperature, max_tokens, purpose=None, coalesce=True):
+            # Like the LLM service: coalesced calls run shielded in a shared task
+            slow = not calls
+            calls.append(coalesce)
+            if coalesce:
+                return await flight.do(prompt, lambda: model_call(slow))
+            return await model_call(slow)
+
+        transport.agenerate = fake_agenerate
+        vn = DetomoVanna(config={"transport": transport, "hedge": True, "hedge_min_samples": 1, "hedge_min_delay": 0.01})
+        vn.hedger._record("sql", 0.01)
+
+        result = await vn.submit_prompt_async("Count customers", purpose="sql")
+        await asyncio.sleep(0)
+
+        assert result == "SELECT 1"
+        assert calls == [False, False]
+        assert cancelled == [True]
+        assert vn.llm_stats()["hedging"]["won"] == 1
+
+
+class TestClaudeAgentChatBatch:
+    """Test submit_prompts and generate_sql_batch"""
+
+    @patch('src.detomo_vanna.ChromaDB_VectorStore.__init__', return_value=None)
+    def test_submit_prompts(self, mock_chroma_init):
+        """Test prompts are flattened and sent as one batch"""
+        transport = MagicMock()
+        transport.generate_batch.return_value = ["SELECT 1", "SELECT 2"]
+        vn = DetomoVanna(config={"transport": transport, "batch_concurrency": 4})
+
+        results = vn.submit_prompts([[{"role": "user", "content": "q1"}], "q2"])
+
+        assert results == ["SELECT 1", "SELECT 2"]
+        args, kwargs = transport.generate_batch.call_args
+        assert args[0] == ["user: q1", "q2"]
+        assert kwargs["max_concurrency"] == 4
+
+    @patch('src.detomo_vanna.ChromaDB_VectorStore.__init__', return_value=None)
+    def test_submit_prompts_errors(self, mock_chroma_init):
+        """Test failures raise unless return_exceptions is set"""
+        transport = MagicMock()
+        error = Exception("boom")
+        transport.generate_batch.return_value = ["SELECT 1", error]
+        vn = DetomoVanna(config={"transport": transport})
+
+        with pytest.raises(Exception, match="boom"):
+            vn.submit_prompts(["a", "b"])
+        assert vn.submit_prompts(["a", "b"], return_exceptions=True) == ["SELECT 1", error]
+
+    @patch('src.detomo_vanna.ChromaDB_VectorStore.__init__', return_value=None)
+    def test_generate_sql_batch(self, mock_chroma_init):
+        """Test generate_sql_batch extracts SQL per question in order"""
+        transport = MagicMock()
+        error = Exception("boom")
+        transport.generate_batch.return_value = ["```sql\nSELECT COUNT(*) FROM Customer\n```", error]
+        vn = DetomoVanna(config={"transport": transport})
+        vn.log = MagicMock()
+        vn.embedding_function = MagicMock(return_value=[[0.0, 1.0]])
+        vn.get_similar_question_sql = MagicMock(return_value=[])
+        vn.get_related_ddl = MagicMock(return_value=[])
+        vn.get_related_documentation = MagicMock(return_value=[])
+
+        results = vn.generate_sql_batch(["How many customers?", "Broken?"])
+
+        assert results == ["SELECT COUNT(*) FROM Customer", error]
+        assert transport.generate_batch.call_args[1]["purpose"] == "sql"
+
+
+class TestDetomoVannaAsync:
+    """Test the async DetomoVanna pipeline"""
+
+    def make_vanna(self, llm_text):
+        transport = MagicMock()
+        transport.agenerate = AsyncMock(return_value=llm_text)
+        transport.describe.return_value = "in-process"
+        vn = DetomoVanna(config={"transport": transport})
+        vn.log = MagicMock()
+        vn.embedding_function = MagicMock(return_value=[[0.0, 1.0]])
+        return vn, transport
+
+    @pytest.mark.asyncio
+    @patch('src.detomo_vanna.ChromaDB_VectorStore.__init__', return_value=None)
+    async def test_submit_prompt_async(self, mock_chroma_init):
+        """Test submit_prompt_async awaits the transport"""
+        vn, transport = self.make_vanna("SELECT 1")
+
+        result = await vn.submit_prompt_async([{"role": "user", "content": "Show customers"}])
+
+        assert result == "SELECT 1"
+        transport.agenerate.assert_awaited_once()
+        assert "user: Show customers" in transport.agenerate.call_args[0][0]
+        transport.generate.assert_not_called()
+
+    @pytest.mark.asyncio
+    @patch('src.detomo_vanna.ChromaDB_VectorStore.__init__', return_value=None)
+    async def test_generate_sql_async(self, mock_chroma_init):
+        """Test generate_sql_async retrieves context and extracts SQL"""
+        vn, transport = self.make_vanna("```sql\nSELECT COUNT(*) FROM Customer\n```")
+        vn.get_similar_question_sql = MagicMock(return_value=[
+            {"question": "How many albums?", "sql": "SELECT COUNT(*) FROM Album"}
+        ])
+        vn.get_related_ddl = MagicMock(return_value=["CREATE TABLE Customer (CustomerId INTEGER)"])
+        vn.get_related_documentation = MagicMock(return_value=[])
+
+        sql = await vn.generate_sql_async("How many customers?")
+
+        assert sql == "SELECT COUNT(*) FROM Customer"
+        vn.get_similar_question_sql.assert_called_once_with("How many customers?", embedding=[0.0, 1.0])
+        vn.get_related_ddl.assert_called_once_with("How many customers?", embedding=[0.0, 1.0])
+        prompt = transport.agenerate.call_args[0][0]
+        assert "CREATE TABLE Customer" in prompt
+        assert "user: How many customers?" in prompt
+
+    @patch('src.detomo_vanna.ChromaDB_VectorStore.__init__', return_value=None)
+    def test_retrieval_embeds_question_once(self, mock_chroma_init):
+        """Test one embedding serves all three collections and repeats hit the LRU"""
+        vn, _ = self.make_vanna("")
+        vn.embedding_cache = EmbeddingCache()
+        vn.n_results_sql = vn.n_results_ddl = vn.n_results_documentation = 10
+        for name in ("sql_collection", "ddl_collection", "documentation_collection"):
+            setattr(vn, name, MagicMock(**{"query.return_value": {"documents": [[]]}}))
+
+        vn._retrieve_sql_context("How many customers?")
+        vn._retrieve_sql_context("How many customers?")
+
+        vn.embedding_function.assert_called_once_with(["How many customers?"])
+        for collection in (vn.sql_collection, vn.ddl_collection, vn.documentation_collection):
+            assert collection.query.call_args[1]["query_embeddings"] == [[0.0, 1.0]]
+            assert "query_texts" not in collection.query.call_args[1]
+        assert vn.retrieval_stats()["embedding_cache"]["hits"] == 1
+
+    @patch('src.detomo_vanna.ChromaDB_VectorStore.add_ddl', return_value="d1-ddl")
+    @patch('src.detomo_vanna.ChromaDB_VectorStore.__init__', return_value=None)
+    def test_vector_snapshot_serves_lookups(self, mock_chroma_init, mock_add_ddl):
+        """Test lookups use the snapshot instead of querying Chroma, and training rebuilds it"""
+        transport = MagicMock()
+        vn = DetomoVanna(config={"transport": transport, "vector_snapshot": True})
+        vn.log = MagicMock()
+        vn.embedding_function = MagicMock(return_value=[[0.0, 1.0]])
+        vn.n_results_ddl = 10
+        vn.ddl_collection = MagicMock()
+        vn.ddl_collection.get.return_value = {
+            "ids": ["a-ddl", "b-ddl"],
+            "embeddings": [[1.0, 0.0], [0.0, 1.0]],
+            "documents": ["CREATE TABLE albums (AlbumId INTEGER)", "CREATE TABLE customers (CustomerId INTEGER)"],
+        }
+
+        assert vn.get_related_ddl("customers", embedding=[0.0, 1.0])[0].startswith("CREATE TABLE customers")
+        vn.get_related_ddl("customers", embedding=[0.0, 1.0])
+        vn.add_ddl("CREATE TABLE genres (GenreId INTEGER)")
+        vn.get_related_ddl("customers", embedding=[0.0, 1.0])
+
+        vn.ddl_collection.query.assert_not_called()
+        assert vn.ddl_collection.get.call_count == 2
+
+    @patch('src.detomo_vanna.ChromaDB_VectorStore.add_ddl', return_value="d1-ddl")
+    @patch('src.detomo_vanna.ChromaDB_VectorStore.__init__', return_value=None)
+    def test_ddl_graph_expansion(self, mock_chroma_init, mock_add_ddl):
+        """Test related DDL is expanded with bridge tables and the graph rebuilt after DDL training"""
+        customers = "CREATE TABLE customers (CustomerId INTEGER PRIMARY KEY)"
+        invoices = (
+            "CREATE TABLE invoices (InvoiceId INTEGER PRIMARY KEY, CustomerId INTEGER,\n"
+            "    FOREIGN KEY (CustomerId) REFERENCES customers (CustomerId))"
+        )
+        lines = (
+            "CREATE TABLE invoice_items (InvoiceId INTEGER REFERENCES invoices (InvoiceId),\n"
+            "    TrackId INTEGER REFERENCES tracks (TrackId))"
+        )
+        tracks = "CREATE TABLE tracks (TrackId INTEGER PRIMARY KEY)"
+        genres = "CREATE TABLE genres (GenreId INTEGER PRIMARY KEY)"
+        transport = MagicMock()
+        vn = DetomoVanna(config={"transport": transport, "ddl_graph_max_tables": 4, "ddl_graph_seed_tables": 2})
+        vn.n_results_ddl = 10
+        vn.ddl_collection = MagicMock()
+        vn.ddl_collection.query.return_value = {"documents": [[customers, tracks, genres]]}
+        vn.ddl_collection.get.return_value = {"documents": [customers, invoices, lines, tracks, genres]}
+
+        ddl_list = vn.get_related_ddl("Tracks bought by each customer", embedding=[0.0, 1.0])
+        vn.add_ddl("CREATE TABLE albums (AlbumId INTEGER PRIMARY KEY)")
+        vn.get_related_ddl("Tracks bought by each customer", embedding=[0.0, 1.0])
+
+        assert ddl_list[:4] == [customers, tracks, lines, invoices]
+        assert genres not in ddl_list
+        assert "invoice_items.TrackId = tracks.TrackId" in ddl_list[-1]
+        assert vn.ddl_collection.get.call_count == 2
+        assert vn.retrieval_stats()["ddl_graph"]["expansions"] == 2
+
+    @patch('src.detomo_vanna.ChromaDB_VectorStore.__init__', return_value=None)
+    def test_lexical_search_fused_with_vectors(self, mock_chroma_init):
+        """Test an exact-name match the vector search misses is brought in by BM25"""
+        acdc = '{"question": "Show all albums by AC/DC", "sql": "SELECT * FROM albums WHERE ArtistId = 1"}'
+        others = [
+            '{"question": "Show all albums", "sql": "SELECT * FROM albums"}',
+            '{"question": "Show all artists", "sql": "SELECT * FROM artists"}',
+        ]
+        transport = MagicMock()
+        vn = DetomoVanna(config={"transport": transport, "lexical_search": True})
+        vn.n_results_sql = 2
+        vn.sql_collection = MagicMock()
+        vn.sql_collection.query.return_value = {"documents": [others]}
+        vn.sql_collection.get.return_value = {"documents": others + [acdc]}
+
+        results = vn.get_similar_question_sql("AC/DC albums", embedding=[0.0, 1.0])
+
+        # Found by both rankings first, then the exact name only BM25 found
+        assert [r["question"] for r in results] == ["Show all albums", "Show all albums by AC/DC"]
+        assert vn.retrieval_stats()["lexical"]["queries"] == 1
+
+    @patch('src.detomo_vanna.ChromaDB_VectorStore.__init__', return_value=None)
+    def test_embedding_backend_and_warm_up(self, mock_chroma_init):
+        """Test the configured backend reaches the vector store and warm-up is reported"""
+        transport = MagicMock()
+        vn = DetomoVanna(config={"transport": transport, "embedding_backend": "onnx", "embedding_threads": 2})
+        ef = mock_chroma_init.call_args[1]["config"]["embedding_function"]
+        assert ef.threads == 2
+
+        vn.embedding_function = MagicMock(side_effect=lambda texts: [[0.0, 1.0]] * len(texts))
+        report = vn.warm_up_embeddings()
+
+        vn.embedding_function.warm_up.assert_called_once()
+        assert report["warmed_up"] is True
+        assert report["benchmark"]["single_per_second"] > 0
+        assert vn.retrieval_stats()["embedding_backend"]["backend"] == "onnx"
+
+    @patch('src.detomo_vanna.ChromaDB_VectorStore.add_ddl', return_value="d1-ddl")
+    @patch('src.detomo_vanna.ChromaDB_VectorStore.__init__', return_value=None)
+    def test_retrieval_cache_until_training_changes(self, mock_chroma_init, mock_add_ddl):
+        """Test a repeated question skips the lookups until training bumps the generation"""
+        transport = MagicMock()
+        vn = DetomoVanna(config={"transport": transport, "retrieval_cache_size": 16})
+        vn.embedding_function = MagicMock(return_value=[[0.0, 1.0]])
+        vn.get_similar_question_sql = MagicMock(return_value=[{"question": "Q", "sql": "SELECT 1"}])
+        vn.get_related_ddl = MagicMock(return_value=["DDL"])
+        vn.get_related_documentation = MagicMock(return_value=["Docs"])
+
+        first = vn._retrieve_sql_context("How many customers?")
+        second = vn._retrieve_sql_context("how many customers")
+        vn.add_ddl("CREATE TABLE genres (GenreId INTEGER)")
+        third = vn._retrieve_sql_context("How many customers?")
+
+        assert first == second == third == (None, [{"question": "Q", "sql": "SELECT 1"}], ["DDL"], ["Docs"])
+        assert vn.get_related_ddl.call_count == 2
+        stats = vn.retrieval_stats()["retrieval_cache"]
+        assert stats["hits"] == 1
+        assert stats["stale"] == 1
+        assert stats["training_generation"] == 1
+
+    @patch('src.detomo_vanna.ChromaDB_VectorStore.add_ddl', return_value="d1-ddl")
+    @patch('src.detomo_vanna.ChromaDB_VectorStore.__init__', return_value=None)
+    def test_training_change_in_another_process_is_seen(self, mock_chroma_init, mock_add_ddl, tmp_path):
+        """Test a change made through another instance sharing the generation file is applied on the next lookup"""
+        config = {
+            "transport": MagicMock(),
+            "vector_snapshot": True,
+            "shared_generation_path": str(tmp_path / "training_generation.json"),
+        }
+        writer = DetomoVanna(config=config)
+        reader = DetomoVanna(config=config)
+        reader.vector_index.query = MagicMock(return_value=["DDL"])
+        reader.vector_index.invalidate = MagicMock()
+
+        reader._query_collection("ddl", MagicMock(), "How many genres?", [0.0, 1.0], 5)
+        writer.add_ddl("CREATE TABLE genres (GenreId INTEGER)")
+        reader._query_collection("ddl", MagicMock(), "How many genres?", [0.0, 1.0], 5)
+        reader._query_collection("ddl", MagicMock(), "How many genres?", [0.0, 1.0], 5)
+
+        reader.vector_index.invalidate.assert_called_once_with("ddl")
+        stats = reader.retrieval_stats()["retrieval_cache"]
+        assert stats["training_generation"] == 1
+        assert stats["shared_generation"] == {"sql": 0, "ddl": 1, "documentation": 0}
+
+    @patch('src.detomo_vanna.ChromaDB_VectorStore.add_question_sql', return_value="q1-sql")
+    @patch('src.detomo_vanna.ChromaDB_VectorStore.__init__', return_value=None)
+    def test_retrieval_cache_retired_by_another_process(self, mock_chroma_init, mock_add_question_sql, tmp_path):
+        """Test cached retrievals are a miss once another instance sharing the generation file trains"""
+        config = {
+            "transport": MagicMock(),
+            "retrieval_cache_size": 16,
+            "shared_generation_path": str(tmp_path / "training_generation.json"),
+        }
+        writer = DetomoVanna(config=config)
+        reader = DetomoVanna(config=config)
+        reader.embedding_function = MagicMock(return_value=[[0.0, 1.0]])
+        reader.get_similar_question_sql = MagicMock(return_value=[])
+        reader.get_related_ddl = MagicMock(return_value=["DDL"])
+        reader.get_related_documentation = MagicMock(return_value=[])
+
+        reader._retrieve_sql_context("How many customers?")
+        reader._retrieve_sql_context("How many customers?")
+        writer.add_question_sql("How many customers?", "SELECT COUNT(*) FROM customers")
+        reader._retrieve_sql_context("How many customers?")
+
+        assert reader.get_similar_question_sql.call_count == 2
+        stats = reader.retrieval_stats()["retrieval_cache"]
+        assert stats["hits"] == 1
+        assert stats["stale"] == 1
+
+    @patch('src.detomo_vanna.ChromaDB_VectorStore.add_question_sql', return_value="q2-sql")
+    @patch('src.detomo_vanna.ChromaDB_VectorStore.__init__', return_value=None)
+    def test_lexical_index_rebuilt_after_another_process_trains(self, mock_chroma_init, mock_add_question_sql, tmp_path):
+        """Test the BM25 index picks up a pair added through another instance sharing the generation file"""
+        config = {
+            "transport": MagicMock(),
+            "lexical_search": True,
+            "shared_generation_path": str(tmp_path / "training_generation.json"),
+        }
+        writer = DetomoVanna(config=config)
+        reader = DetomoVanna(config=config)
+        old_pair = '{"question": "How many albums?", "sql": "SELECT COUNT(*) FROM albums"}'
+        new_pair = '{"question": "Albums by AC/DC", "sql": "SELECT * FROM albums WHERE ArtistId = 1"}'
+        collection = MagicMock()
+        collection.query.return_value = {"documents": [[]]}
+        collection.get.return_value = {"documents": [old_pair]}
+
+        before = reader._query_collection("sql", collection, "AC/DC", [0.0, 1.0], 5)
+        collection.get.return_value = {"documents": [old_pair, new_pair]}
+        writer.add_question_sql("Albums by AC/DC", "SELECT * FROM albums WHERE ArtistId = 1")
+        after = reader._query_collection("sql", collection, "AC/DC", [0.0, 1.0], 5)
+
+        assert before == []
+        assert after == [{"question": "Albums by AC/DC", "sql": "SELECT * FROM albums WHERE ArtistId = 1"}]
+        assert reader.lexical_index.stats()["rebuilds"] == 2
+
+    @patch('src.detomo_vanna.ChromaDB_VectorStore.add_ddl', return_value="t3-ddl")
+    @patch('src.detomo_vanna.ChromaDB_VectorStore.__init__', return_value=None)
+    def test_schema_graph_rebuilt_after_another_process_trains(self, mock_chroma_init, mock_add_ddl, tmp_path):
+        """Test the DDL expansion uses a bridge table added through another instance sharing the generation file"""
+        config = {
+            "transport": MagicMock(),
+            "ddl_graph_max_tables": 6,
+            "shared_generation_path": str(tmp_path / "training_generation.json"),
+        }
+        writer = DetomoVanna(config=config)
+        reader = DetomoVanna(config=config)
+        reader.n_results_ddl = 10
+        playlists = "CREATE TABLE playlists (PlaylistId INTEGER PRIMARY KEY)"
+        tracks = "CREATE TABLE tracks (TrackId INTEGER PRIMARY KEY)"
+        bridge = (
+            "CREATE TABLE playlist_track (PlaylistId INTEGER REFERENCES playlists (PlaylistId), "
+            "TrackId INTEGER REFERENCES tracks (TrackId))"
+        )
+        reader.ddl_collection = MagicMock()
+        reader.ddl_collection.query.return_value = {"documents": [[playlists, tracks]]}
+        reader.ddl_collection.get.return_value = {"documents": [playlists, tracks]}
+
+        before = reader.get_related_ddl("Tracks per playlist", embedding=[0.0, 1.0])
+        reader.ddl_collection.get.return_value = {"documents": [playlists, tracks, bridge]}
+        writer.add_ddl(bridge)
+        after = reader.get_related_ddl("Tracks per playlist", embedding=[0.0, 1.0])
+
+        assert bridge not in before
+        assert bridge in after
+        assert reader.ddl_expander.stats()["rebuilds"] == 2
+
+    @patch('src.detomo_vanna.ChromaDB_VectorStore.__init__', return_value=None)
+    def test_retrieval_cache_skips_degraded_results(self, mock_chroma_init):
+        """Test a retrieval with a failed lookup isn't cached"""
+        vn, _ = self.make_vanna("")
+        vn.retrieval_cache = RetrievalCache(max_size=16)
+        vn.get_similar_question_sql = MagicMock(return_value=[])
+        vn.get_related_ddl = MagicMock(side_effect=RuntimeError("ddl store down"))
+        vn.get_related_documentation = MagicMock(return_value=["Docs"])
+
+        vn._retrieve_sql_context("How many customers?")
+        vn._retrieve_sql_context("How many customers?")
+
+        assert vn.get_related_ddl.call_count == 2
+        assert vn.retrieval_stats()["retrieval_cache"]["entries"] == 0
+
+    @patch('src.detomo_vanna.ChromaDB_VectorStore.__init__', return_value=None)
+    def test_list_training_data(self, mock_chroma_init):
+        """Test listing reads the collections once per training generation"""
+        vn, _ = self.make_vanna("")
+        vn.sql_collection = MagicMock()
+        vn.sql_collection.get.return_value = {
+            "ids": ["q1-sql"], "documents": ['{"question": "How many customers?", "sql": "SELECT 1"}']
+        }
+        vn.ddl_collection = MagicMock()
+        vn.ddl_collection.get.return_value = {"ids": ["t1-ddl"], "documents": ["CREATE TABLE customers (Id INTEGER)"]}
+        vn.documentation_collection = MagicMock()
+        vn.documentation_collection.get.return_value = {"ids": [], "documents": []}
+
+        sql = vn.list_training_data(training_data_type="sql")
+        first = vn.list_training_data(limit=1, fields="id")
+        vn._training_changed("sql")
+        second = vn.list_training_data(limit=1, cursor=first["next_cursor"], fields="id")
+
+        assert sql["training_data"] == [{
+            "id": "q1-sql", "training_data_type": "sql", "question": "How many customers?", "content": "SELECT 1"
+        }]
+        assert first["training_data"] == [{"id": "q1-sql"}] and first["total"] == 2
+        assert second["training_data"] == [{"id": "t1-ddl"}] and second["next_cursor"] is None
+        assert vn.sql_collection.get.call_count == 2
+        vn.sql_collection.get.assert_called_with(include=["documents"])
+
+    @patch('src.detomo_vanna.ChromaDB_VectorStore.remove_training_data', return_value=True)
+    @patch('src.detomo_vanna.ChromaDB_VectorStore.__init__', return_value=None)
+    def test_list_training_data_after_another_process_trains(self, mock_chroma_init, mock_remove, tmp_path):
+        """Test listing rebuilds once another instance sharing the generation file removes an item"""
+        config = {"transport": MagicMock(), "shared_generation_path": str(tmp_path / "training_generation.json")}
+        writer = DetomoVanna(config=config)
+        reader = DetomoVanna(config=config)
+        reader.sql_collection = MagicMock()
+        reader.sql_collection.get.return_value = {"ids": [], "documents": []}
+        reader.ddl_collection = MagicMock()
+        reader.ddl_collection.get.return_value = {"ids": ["t1-ddl", "t2-ddl"], "documents": ["DDL 1", "DDL 2"]}
+        reader.documentation_collection = MagicMock()
+        reader.documentation_collection.get.return_value = {"ids": [], "documents": []}
+
+        before = reader.list_training_data(fields="id")
+        reader.ddl_collection.get.return_value = {"ids": ["t1-ddl"], "documents": ["DDL 1"]}
+        writer.remove_training_data("t2-ddl")
+        after = reader.list_training_data(fields="id")
+        again = reader.list_training_data(fields="id")
+
+        assert before["total"] == 2
+        assert after["training_data"] == again["training_data"] == [{"id": "t1-ddl"}]
+        assert reader.ddl_collection.get.call_count == 2
+
+    @patch('src.detomo_vanna.ChromaDB_VectorStore.__init__', return_value=None)
+    def test_train_bulk(self, mock_chroma_init):
+        """Test bulk training writes each collection once, mines templates and marks snapshots stale"""
+        transport = MagicMock()
+        vn = DetomoVanna(config={
+            "transport": transport, "vector_snapshot": True, "sql_templates": True, "ingest_batch_size": 2
+        })
+        vn.embedding_function = MagicMock(side_effect=lambda texts: [[0.0, 1.0]] * len(texts))
+        vn.chroma_client = MagicMock()
+        vn.chroma_client.get_max_batch_size.return_value = 5000
+        for name in ("sql_collection", "ddl_collection", "documentation_collection"):
+            collection = MagicMock()
+            collection.get.return_value = {"ids": []}
+            setattr(vn, name, collection)
+        vn.run_sql_is_set = True
+        vn.sql_templates.add = MagicMock(return_value=None)
+        vn.vector_index.invalidate = MagicMock()
+
+        report = vn.train_bulk([
+            {"ddl": "CREATE TABLE customers (CustomerId INTEGER)"},
+            {"question": "How many customers?", "sql": "SELECT COUNT(*) FROM customers"},
+            {"question": "How many albums?", "sql": "SELECT COUNT(*) FROM albums"},
+            {"question": "How many tracks?", "sql": "SELECT COUNT(*) FROM tracks"},
+        ])
+
+        assert report["added"] == {"sql": 3, "ddl": 1, "documentation": 0}
+        assert vn.embedding_function.call_count == 3
+        vn.sql_collection.add.assert_called_once()
+        vn.documentation_collection.add.assert_not_called()
+        assert vn.sql_templates.add.call_count == 3
+        invalidated = {call[0][0] for call in vn.vector_index.invalidate.call_args_list}
+        assert invalidated == {"sql", "ddl"}
+
+    @patch('src.detomo_vanna.ChromaDB_VectorStore.__init__', return_value=None)
+    def test_retrieval_degrades_on_failing_collection(self, mock_chroma_init):
+        """Test a failing lookup leaves its context out instead of failing the request"""
+        vn, _ = self.make_vanna("")
+        vn.get_similar_question_sql = MagicMock(return_value=[{"question": "Q", "sql": "SELECT 1"}])
+        vn.get_related_ddl = MagicMock(side_effect=RuntimeError("ddl store down"))
+        vn.get_related_documentation = MagicMock(return_value=["Docs"])
+
+        match, question_sql_list, ddl_list, doc_list = vn._retrieve_sql_context("How many customers?")
+
+        assert match is None
+        assert question_sql_list == [{"question": "Q", "sql": "SELECT 1"}]
+        assert ddl_list == []
+        assert doc_list == ["Docs"]
+        stages = vn.retrieval_stats()["retrieval"]["stages"]
+        assert stages["ddl"]["outcomes"]["error"] == 1
+        assert stages["documentation"]["outcomes"]["ok"] == 1
+
+    @pytest.mark.asyncio
+    @patch('src.detomo_vanna.ChromaDB_VectorStore.__init__', return_value=None)
+    async def test_stream_sql_async(self, mock_chroma_init):
+        """Test stream_sql_async forwards tokens then yields the extracted SQL"""
+        vn, transport = self.make_vanna("")
+
+        async def fake_astream(*args, **kwargs):
+            for chunk in ["```sql\nSELECT", " COUNT(*) FROM Customer", "\n```"]:
+                yield chunk
+
+        transport.astream = fake_astream
+        vn.get_similar_question_sql = MagicMock(return_value=[])
+        vn.get_related_ddl = MagicMock(return_value=[])
+        vn.get_related_documentation = MagicMock(return_value=[])
+
+        events = [event async for event in vn.stream_sql_async("How many customers?")]
+
+        assert [kind for kind, _ in events] == ["token", "token", "token", "sql"]
+        assert events[-1] == ("sql", "SELECT COUNT(*) FROM Customer")
+
+    @pytest.mark.asyncio
+    @patch('src.detomo_vanna.ChromaDB_VectorStore.__init__', return_value=None)
+    async def test_stream_sql_async_reports_packed_context(self, mock_chroma_init):
+        """Test a context_token_budget packs the prompt and reports dropped items"""
+        transport = MagicMock()
+        transport.describe.return_value = "in-process"
+
+        async def fake_astream(*args, **kwargs):
+            yield "SELECT 1"
+
+        transport.astream = fake_astream
+        vn = DetomoVanna(config={"transport": transport, "context_token_budget": 50})
+        vn.log = MagicMock()
+        vn.embedding_function = MagicMock(return_value=[[0.0, 1.0]])
+        vn.get_similar_question_sql = MagicMock(return_value=[])
+        vn.get_related_ddl = MagicMock(return_value=["CREATE TABLE Customer (CustomerId INTEGER)"])
+        vn.get_related_documentation = MagicMock(return_value=["Unrelated invoice rules. " * 40])
+
+        events = [event async for event in vn.stream_sql_async("How many customers?")]
+
+        assert [kind for kind, _ in events] == ["context", "token", "sql"]
+        report = events[0][1]
+        assert report["kept"]["ddl"] == 1
+        assert [item["kind"] for item in report["dropped"]] == ["documentation"]
+
+    @pytest.mark.asyncio
+    @patch('src.detomo_vanna.ChromaDB_VectorStore.__init__', return_value=None)
+    async def test_generate_sql_details_async_fast_path(self, mock_chroma_init):
+        """Test a near-verbatim training question skips the LLM and, with inline retrieval, the DDL lookup"""
+        transport = MagicMock()
+        transport.agenerate = AsyncMock(return_value="SELECT 1")
+        vn = DetomoVanna(config={"transport": transport, "fast_path_similarity": 0.9, "retrieval_workers": 0})
+        vn.log = MagicMock()
+        vn.embedding_function = MagicMock(return_value=[[0.0, 1.0]])
+        vn.get_similar_question_sql = MagicMock(return_value=[
+            {"question": "How many customers are there?", "sql": "SELECT COUNT(*) FROM Customer"}
+        ])
+        vn.get_related_ddl = MagicMock(return_value=[])
+        vn.get_related_documentation = MagicMock(return_value=[])
+
+        details = await vn.generate_sql_details_async("how many customers are there")
+
+        assert details["sql"] == "SELECT COUNT(*) FROM Customer"
+        assert details["from_template"] is True
+        assert details["template"]["question"] == "How many customers are there?"
+        transport.agenerate.assert_not_called()
+        vn.get_related_ddl.assert_not_called()
+
+    @pytest.mark.asyncio
+    @patch('src.detomo_vanna.ChromaDB_VectorStore.add_question_sql', return_value="q1-sql")
+    @patch('src.detomo_vanna.ChromaDB_VectorStore.__init__', return_value=None)
+    async def test_sql_template_answers_without_llm(self, mock_chroma_init, mock_add):
+        """Test a mined template fills its slot from live values and skips retrieval and the LLM"""
+        transport = MagicMock()
+        transport.agenerate = AsyncMock(return_value="SELECT 1")
+        vn = DetomoVanna(config={"transport": transport, "sql_templates": True})
+        vn.log = MagicMock()
+        vn.run_sql_is_set = True
+        vn.run_sql = MagicMock(return_value=pd.DataFrame({"Country": ["USA", "Germany"]}))
+        vn.get_similar_question_sql = MagicMock(return_value=[])
+
+        vn.add_question_sql("How many customers are from USA?", "SELECT COUNT(*) FROM customers WHERE Country = 'USA'")
+        details = await vn.generate_sql_details_async("How many customers are from Germany?")
+
+        assert details["sql"] == "SELECT COUNT(*) FROM customers WHERE Country = 'Germany'"
+        assert details["from_template"] is True
+        assert details["template"]["slots"] == {"Country": "Germany"}
+        transport.agenerate.assert_not_called()
+        vn.get_similar_question_sql.assert_not_called()
+
+    @pytest.mark.asyncio
+    @patch('src.detomo_vanna.ChromaDB_VectorStore.__init__', return_value=None)
+    async def test_fast_path_disabled_by_default(self, mock_chroma_init):
+        """Test the LLM is still called for matching questions unless enabled"""
+        vn, transport = self.make_vanna("SELECT 1")
+        vn.get_similar_question_sql = MagicMock(return_value=[
+            {"question": "How many customers are there?", "sql": "SELECT COUNT(*) FROM Customer"}
+        ])
+        vn.get_related_ddl = MagicMock(return_value=[])
+        vn.get_related_documentation = MagicMock(return_value=[])
+
+        details = await vn.generate_sql_details_async("how many customers are there")
+
+        assert details["sql"] == "SELECT 1"
+        assert details["from_template"] is False
+        transport.agenerate.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    @patch('src.detomo_vanna.ChromaDB_VectorStore.__init__', return_value=None)
+    async def test_stream_sql_async_fast_path(self, mock_chroma_init):
+        """Test the stream yields the matched template and SQL without tokens"""
+        transport = MagicMock()
+        vn = DetomoVanna(config={"transport": transport, "fast_path_similarity": 0.9})
+        vn.log = MagicMock()
+        vn.embedding_function = MagicMock(return_value=[[0.0, 1.0]])
+        vn.get_similar_question_sql = MagicMock(return_value=[
+            {"question": "How many customers are there?", "sql": "SELECT COUNT(*) FROM Customer"}
+        ])
+
+        events = [event async for event in vn.stream_sql_async("How many customers are there")]
+
+        assert [kind for kind, _ in events] == ["template", "sql"]
+        assert events[-1] == ("sql", "SELECT COUNT(*) FROM Customer")
+
+    @pytest.mark.asyncio
+    @patch('src.detomo_vanna.ChromaDB_VectorStore.__init__', return_value=None)
+    async def test_generate_sql_async_intermediate_sql_not_allowed(self, mock_chroma_init):
+        """Test intermediate SQL is refused unless the LLM may see data"""
+        vn, _ = self.make_vanna("-- intermediate_sql\nSELECT DISTINCT Country FROM Customer;")
+        vn.get_similar_question_sql = MagicMock(return_value=[])
+        vn.get_related_ddl = MagicMock(return_value=[])
+        vn.get_related_documentation = MagicMock(return_value=[])
+
+        result = await vn.generate_sql_async("Customers in France?")
+
+        assert "not allowed to see the data" in result
+
+    @pytest.mark.asyncio
+    @patch('src.detomo_vanna.ChromaDB_VectorStore.__init__', return_value=None)
+    async def test_generate_plotly_code_async(self, mock_chroma_init):
+        """Test generate_plotly_code_async extracts python code"""
+        vn, _ = self.make_vanna("```python\nfig = px.bar(df)\nfig.show()\n```")
+
+        code = await vn.generate_plotly_code_async("Q", "SELECT 1", "df info")
+
+        assert "fig = px.bar(df)" in code
+        assert "fig.show()" not in code
+
+    @pytest.mark.asyncio
+    @patch('src.detomo_vanna.ChromaDB_VectorStore.__init__', return_value=None)
+    async def test_generate_followup_questions_async(self, mock_chroma_init):
+        """Test followup questions are split and de-numbered"""
+        import pandas as pd
+        vn, _ = self.make_vanna("1. Top customers?\n2. Sales by country?")
+
+        questions = await vn.generate_followup_questions_async(
+            "How many customers?", "SELECT 1", pd.DataFrame([{"n": 1}])
+        )
+
+        assert questions == ["Top customers?", "Sales by country?"]
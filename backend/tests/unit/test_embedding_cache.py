@@ -0,0 +1,66 @@
+"""Unit tests for the question embedding cache"""
+
+from unittest.mock import MagicMock
+from src.embedding_cache import EmbeddingCache, embedding_namespace, shared_embedding_cache
+
+
+class TestEmbeddingCache:
+    """Test the embedding LRU"""
+
+    def test_embed_computes_once(self):
+        """Test repeated texts are served from the cache"""
+        cache = EmbeddingCache(max_size=4)
+        embed = MagicMock(return_value=[0.1, 0.2])
+
+        first = cache.embed("How many customers?", embed)
+        second = cache.embed("How many customers?", embed)
+
+        assert first == second == [0.1, 0.2]
+        embed.assert_called_once_with("How many customers?")
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["entries"] == 1
+
+    def test_namespaces_are_separate(self):
+        """Test embeddings from different functions don't mix"""
+        cache = EmbeddingCache()
+        cache.set("q", [1.0], namespace="a")
+
+        assert cache.get("q", namespace="b") is None
+        assert cache.get("q", namespace="a") == [1.0]
+
+    def test_evicts_least_recently_used(self):
+        """Test the oldest untouched entry is evicted first"""
+        cache = EmbeddingCache(max_size=2)
+        cache.set("a", [1.0])
+        cache.set("b", [2.0])
+        cache.get("a")
+        cache.set("c", [3.0])
+
+        assert cache.get("b") is None
+        assert cache.get("a") == [1.0]
+        assert cache.stats()["evictions"] == 1
+
+    def test_resize_evicts(self):
+        """Test shrinking the cache drops the oldest entries"""
+        cache = EmbeddingCache(max_size=3)
+        for text in ("a", "b", "c"):
+            cache.set(text, [0.0])
+
+        cache.resize(1)
+
+        assert cache.stats()["entries"] == 1
+        assert cache.get("c") == [0.0]
+
+    def test_namespace_includes_model_name(self):
+        """Test the namespace tells models of the same class apart"""
+        class Embedder:
+            def __init__(self, model_name):
+                self.model_name = model_name
+
+        assert embedding_namespace(Embedder("a")) != embedding_namespace(Embedder("b"))
+
+    def test_shared_cache_is_process_wide(self):
+        """Test every caller gets the same instance"""
+        assert shared_embedding_cache() is shared_embedding_cache()
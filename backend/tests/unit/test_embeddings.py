@@ -0,0 +1,92 @@
+"""Unit tests for the embedding backends"""
+
+from unittest.mock import MagicMock, patch
+import numpy as np
+import pytest
+from src.embedding_cache import embedding_namespace
+from src.embeddings import TunedONNXMiniLM, benchmark, make_embedding_function, warm_up
+
+
+def fake_forward(documents, batch_size=32):
+    return np.asarray([[float(len(d)), 1.0] for d in documents], dtype=np.float32)
+
+
+class TestMakeEmbeddingFunction:
+    """Test backend selection"""
+
+    def test_backends(self):
+        """Test each backend name builds its embedding function"""
+        onnx = make_embedding_function("onnx", threads=2)
+        int8 = make_embedding_function("onnx-int8")
+
+        assert isinstance(onnx, TunedONNXMiniLM)
+        assert onnx.threads == 2 and not onnx.quantize
+        assert int8.quantize
+        assert not isinstance(make_embedding_function("default"), TunedONNXMiniLM)
+
+    def test_unknown_backend(self):
+        """Test an unknown backend raises ValueError"""
+        with pytest.raises(ValueError):
+            make_embedding_function("tpu")
+
+    def test_int8_cached_separately(self):
+        """Test int8 and fp32 vectors don't share embedding cache entries"""
+        assert embedding_namespace(make_embedding_function("onnx")) != embedding_namespace(
+            make_embedding_function("onnx-int8")
+        )
+
+
+class TestTunedONNXMiniLM:
+    """Test length-aware batching"""
+
+    def test_batches_sorted_by_length_results_in_input_order(self):
+        """Test texts are embedded shortest first and returned in input order"""
+        ef = TunedONNXMiniLM()
+        texts = ["a much longer question text", "short", "medium text"]
+        with patch.object(TunedONNXMiniLM, "_download_model_if_not_exists"), \
+                patch.object(TunedONNXMiniLM, "_forward", side_effect=fake_forward) as forward:
+            embeddings = ef(texts)
+
+        assert forward.call_args[0][0] == ["short", "medium text", "a much longer question text"]
+        assert [e[0] for e in embeddings] == [float(len(t)) for t in texts]
+
+    def test_quantize_needs_onnx(self, tmp_path):
+        """Test a missing onnx package is reported as a ValueError"""
+        ef = TunedONNXMiniLM(quantize=True)
+        ef.DOWNLOAD_PATH = tmp_path
+        with patch.dict("sys.modules", {"onnxruntime.quantization": None}):
+            with pytest.raises(ValueError, match="onnx"):
+                ef._quantized_model()
+
+    def test_quantized_model_reused(self, tmp_path):
+        """Test an existing int8 model is used without quantizing again"""
+        ef = TunedONNXMiniLM(quantize=True)
+        ef.DOWNLOAD_PATH = tmp_path
+        (tmp_path / "onnx").mkdir()
+        (tmp_path / "onnx" / "model.int8.onnx").write_bytes(b"")
+
+        assert ef._quantized_model().endswith("model.int8.onnx")
+
+
+class TestWarmUpAndBenchmark:
+    """Test warm-up and throughput measurement"""
+
+    def test_warm_up_prefers_warm_up_method(self):
+        """Test warm_up() uses the function's own warm-up when it has one"""
+        ef = MagicMock()
+
+        assert warm_up(ef) >= 0
+        ef.warm_up.assert_called_once()
+        ef.assert_not_called()
+
+    def test_benchmark(self):
+        """Test single and batch throughput are measured over every text"""
+        ef = MagicMock(side_effect=lambda texts: [[0.0]] * len(texts))
+
+        stats = benchmark(ef, ["a", "b"], rounds=2)
+
+        # 2 rounds of 2 single calls, then 2 batch calls
+        assert ef.call_count == 6
+        assert stats["texts"] == 2
+        assert stats["single_per_second"] > 0
+        assert stats["batch_per_second"] > 0
@@ -0,0 +1,152 @@
+"""Unit tests for hedged LLM requests"""
+
+import asyncio
+import pytest
+from src.hedging import Hedger
+
+
+def primed(**kwargs):
+    """Hedger that already knows ~10ms is normal for key 'sql'."""
+    options = dict(percentile=0.9, budget=1.0, min_samples=3, min_delay=0.01)
+    options.update(kwargs)
+    hedger = Hedger(**options)
+    for _ in range(3):
+        hedger._record("sql", 0.01)
+    return hedger
+
+
+class TestHedger:
+    """Test hedge triggering, winners, cancellation and the budget"""
+
+    def test_no_delay_until_enough_samples(self):
+        """Test hedging waits for min_samples latencies"""
+        hedger = Hedger(min_samples=2, min_delay=0.5)
+        assert hedger.delay("sql") is None
+        hedger._record("sql", 0.1)
+        assert hedger.delay("sql") is None
+        hedger._record("sql", 2.0)
+        assert hedger.delay("sql") == 2.0
+        # Floored at min_delay
+        hedger._latencies["sql"] = type(hedger._latencies["sql"])([0.1, 0.1])
+        assert hedger.delay("sql") == 0.5
+
+    @pytest.mark.asyncio
+    async def test_fast_call_is_not_hedged(self):
+        """Test a call answering before the delay runs once"""
+        hedger = primed()
+        calls = []
+
+        async def call(hedged):
+            calls.append(hedged)
+            return "SELECT 1"
+
+        assert await hedger.run(call, key="sql") == "SELECT 1"
+        assert calls == [False]
+        assert hedger.stats()["fired"] == 0
+
+    @pytest.mark.asyncio
+    async def test_slow_call_is_hedged_and_loser_cancelled(self):
+        """Test a slow primary gets a hedge, the hedge wins and the primary is cancelled"""
+        hedger = primed()
+        cancelled = []
+
+        async def call(hedged):
+            try:
+                await asyncio.sleep(0.01 if hedged else 5)
+            except asyncio.CancelledError:
+                cancelled.append(hedged)
+                raise
+            return "hedge" if hedged else "primary"
+
+        assert await hedger.run(call, key="sql") == "hedge"
+        await asyncio.sleep(0)
+        assert cancelled == [False]
+        stats = hedger.stats()
+        assert stats["fired"] == 1
+        assert stats["won"] == 1
+
+    @pytest.mark.asyncio
+    async def test_primary_can_still_win(self):
+        """Test the primary's answer is used when it beats the hedge"""
+        hedger = primed()
+
+        async def call(hedged):
+            await asyncio.sleep(1 if hedged else 0.05)
+            return "hedge" if hedged else "primary"
+
+        assert await hedger.run(call, key="sql") == "primary"
+        assert hedger.stats()["fired"] == 1
+        assert hedger.stats()["won"] == 0
+
+    @pytest.mark.asyncio
+    async def test_failed_attempt_falls_back_to_the_other(self):
+        """Test a failing hedge doesn't fail the call, and all-failed raises the primary's error"""
+        hedger = primed()
+
+        async def call(hedged):
+            if hedged:
+                raise RuntimeError("hedge failed")
+            await asyncio.sleep(0.05)
+            return "primary"
+
+        assert await hedger.run(call, key="sql") == "primary"
+
+        async def failing(hedged):
+            await asyncio.sleep(0.05 if hedged else 0.03)
+            raise RuntimeError("hedge" if hedged else "primary")
+
+        with pytest.raises(RuntimeError, match="primary"):
+            await hedger.run(failing, key="sql")
+
+    @pytest.mark.asyncio
+    async def test_budget_caps_hedges(self):
+        """Test hedges stop once the budget share is used up"""
+        hedger = primed(budget=0.0)
+        hedger._tokens = 1.0
+        for _ in range(20):
+            hedger._record("sql", 0.01)
+        calls = []
+
+        async def call(hedged):
+            calls.append(hedged)
+            await asyncio.sleep(0.05)
+            return "ok"
+
+        await hedger.run(call, key="sql")
+        await hedger.run(call, key="sql")
+
+        assert calls.count(True) == 1
+        stats = hedger.stats()
+        assert stats["fired"] == 1
+        assert stats["skipped_budget"] == 1
+
+
+class TestCancelOnDisconnect:
+    """Test /generate drops the LLM call of a client that went away"""
+
+    @pytest.mark.asyncio
+    async def test_call_cancelled_when_client_disconnects(self, monkeypatch):
+        """Test a hedge loser's disconnect cancels the server-side call"""
+        from fastapi import HTTPException
+        from app.routers import llm as llm_router
+
+        cancelled = []
+
+        async def slow_call():
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        class DisconnectedRequest:
+            async def is_disconnected(self):
+                return True
+
+        monkeypatch.setattr(llm_router, "DISCONNECT_POLL_SECONDS", 0.01)
+        with pytest.raises(HTTPException) as error:
+            await llm_router._cancel_on_disconnect(DisconnectedRequest(), slow_call())
+        await asyncio.sleep(0)
+
+        assert error.value.status_code == 499
+        assert cancelled == [True]
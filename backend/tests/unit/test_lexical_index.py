@@ -0,0 +1,104 @@
+"""Unit tests for the BM25 lexical index"""
+
+import json
+from unittest.mock import MagicMock
+from src.lexical_index import BM25, LexicalIndex, fuse_rankings, tokenize
+
+
+def make_collection(documents):
+    collection = MagicMock()
+    collection.get.return_value = {"documents": documents}
+    return collection
+
+
+def pair(question, sql):
+    return json.dumps({"question": question, "sql": sql}, ensure_ascii=False)
+
+
+class TestTokenize:
+    """Test term extraction"""
+
+    def test_identifiers_kept_whole_and_split(self):
+        """Test camelCase, snake_case and symbol-joined names give whole and part terms"""
+        assert tokenize("BillingCountry") == ["billingcountry", "billing", "country"]
+        assert tokenize("invoice_items") == ["invoice_items", "invoice", "item"]
+        assert tokenize("AC/DC") == ["ac/dc", "ac", "dc"]
+
+    def test_plural_folding(self):
+        """Test singular and plural forms share a term"""
+        assert tokenize("customers") == tokenize("customer")
+        assert tokenize("address") == ["address"]
+
+    def test_japanese_script_runs(self):
+        """Test Japanese is cut at script changes and split into bigrams"""
+        assert tokenize("顧客は何人") == ["顧客", "は", "何人"]
+        assert tokenize("アルバム") == ["アル", "ルバ", "バム"]
+
+    def test_full_width_folded(self):
+        """Test full-width letters match half-width ones"""
+        assert tokenize("ＡＣ／ＤＣ") == tokenize("AC/DC")
+
+
+class TestBM25:
+    """Test scoring"""
+
+    def test_rare_terms_outrank_common_ones(self):
+        """Test a document with the rare query term ranks first"""
+        bm25 = BM25(["show all albums", "show all artists", "show all albums by ac/dc"])
+
+        assert bm25.search("albums by AC/DC", k=3)[0][0] == 2
+
+    def test_no_overlap_no_results(self):
+        """Test documents sharing no term are left out"""
+        bm25 = BM25(["show all albums"])
+
+        assert bm25.search("顧客", k=5) == []
+        assert BM25([]).search("albums", k=5) == []
+
+
+class TestFuseRankings:
+    """Test reciprocal rank fusion"""
+
+    def test_agreement_rises_to_top(self):
+        """Test an item ranked by both lists beats items ranked by one"""
+        fused = fuse_rankings([["a", "b", "c"], ["c", "d"]], [1.0, 1.0], 3)
+
+        assert fused[0] == "c"
+        assert set(fused) <= {"a", "b", "c", "d"}
+
+    def test_weights(self):
+        """Test a heavier ranking decides between two first places"""
+        assert fuse_rankings([["a"], ["b"]], [1.0, 2.0], 2) == ["b", "a"]
+
+
+class TestLexicalIndex:
+    """Test collection indexes"""
+
+    def test_finds_japanese_and_exact_names(self):
+        """Test Q&A pairs are found by their question text and SQL identifiers"""
+        collection = make_collection([
+            pair("顧客は何人いますか？", "SELECT COUNT(*) FROM customers"),
+            pair("国別の売上", "SELECT BillingCountry, SUM(Total) FROM invoices GROUP BY BillingCountry"),
+            pair("Show all albums by AC/DC", "SELECT * FROM albums WHERE ArtistId = 1"),
+        ])
+        index = LexicalIndex()
+
+        assert json.loads(index.query("sql", collection, "顧客は何人？", 1)[0])["sql"] == "SELECT COUNT(*) FROM customers"
+        assert "AC/DC" in index.query("sql", collection, "ac/dc albums", 1)[0]
+        assert "BillingCountry" in index.query("sql", collection, "sales by billing country", 1)[0]
+
+    def test_rebuilt_only_after_invalidate(self):
+        """Test the collection is reread once, then only after a change"""
+        collection = make_collection(["CREATE TABLE albums (AlbumId INTEGER)"])
+        index = LexicalIndex()
+
+        index.query("ddl", collection, "albums", 5)
+        index.query("ddl", collection, "albums", 5)
+        collection.get.return_value = {"documents": ["CREATE TABLE albums (AlbumId INTEGER)", "CREATE TABLE genres (GenreId INTEGER)"]}
+        index.invalidate("ddl")
+
+        assert index.query("ddl", collection, "genres", 5) == ["CREATE TABLE genres (GenreId INTEGER)"]
+        assert collection.get.call_count == 2
+        stats = index.stats()
+        assert stats["rebuilds"] == 2
+        assert stats["collections"]["ddl"]["items"] == 2
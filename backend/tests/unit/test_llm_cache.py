@@ -0,0 +1,102 @@
+"""Unit tests for the LLM prompt-response cache"""
+
+import time
+import pytest
+from src.llm_cache import ResponseCache, make_cache_key, normalize_prompt
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "llm_cache.db")
+
+
+class TestCacheKey:
+    """Test cache key construction"""
+
+    def test_normalizes_whitespace(self):
+        """Test prompts differing only in whitespace share a key"""
+        assert normalize_prompt("  SELECT\n\n  1 ") == "SELECT 1"
+        assert make_cache_key("SELECT\n 1", "m", 0.1, 10) == make_cache_key("SELECT 1", "m", 0.1, 10)
+
+    def test_parameters_change_key(self):
+        """Test model, temperature and max_tokens are part of the key"""
+        base = make_cache_key("p", "m", 0.1, 10)
+        assert base != make_cache_key("p", "other", 0.1, 10)
+        assert base != make_cache_key("p", "m", 0.0, 10)
+        assert base != make_cache_key("p", "m", 0.1, 20)
+
+
+class TestResponseCache:
+    """Test ResponseCache tiers, eviction and counters"""
+
+    def test_miss_then_memory_hit(self, cache_path):
+        """Test a stored response is served from memory"""
+        cache = ResponseCache(path=cache_path)
+
+        assert cache.get("k") is None
+        cache.set("k", "SELECT 1")
+        assert cache.get("k") == "SELECT 1"
+
+        stats = cache.stats()
+        assert stats["misses"] == 1
+        assert stats["memory_hits"] == 1
+        assert stats["entries"] == 1
+
+    def test_survives_restart(self, cache_path):
+        """Test entries persist in SQLite across instances"""
+        first = ResponseCache(path=cache_path)
+        first.set("k", "SELECT 1")
+        first.close()
+
+        second = ResponseCache(path=cache_path)
+        assert second.get("k") == "SELECT 1"
+        assert second.stats()["disk_hits"] == 1
+
+    def test_ttl_expiry(self, cache_path):
+        """Test expired entries are not served"""
+        cache = ResponseCache(path=cache_path, ttl=0.01)
+        cache.set("k", "SELECT 1")
+        time.sleep(0.02)
+
+        assert cache.get("k") is None
+        assert cache.stats()["entries"] == 0
+
+    def test_size_eviction(self, cache_path):
+        """Test the least recently used rows are evicted past max_entries"""
+        cache = ResponseCache(path=cache_path, memory_size=1, max_entries=2)
+        cache.set("a", "1")
+        cache.set("b", "2")
+        cache.set("c", "3")
+
+        stats = cache.stats()
+        assert stats["entries"] == 2
+        assert stats["evictions"] == 1
+        assert cache.get("a") is None
+        assert cache.get("c") == "3"
+
+    def test_memory_lru_bound(self):
+        """Test the memory tier keeps only memory_size entries"""
+        cache = ResponseCache(path=None, memory_size=2)
+        for key in ["a", "b", "c"]:
+            cache.set(key, key)
+
+        assert cache.get("a") is None
+        assert cache.get("c") == "c"
+        assert cache.stats()["memory_entries"] == 2
+
+    def test_temperature_threshold(self):
+        """Test only low-temperature generations are cacheable"""
+        cache = ResponseCache(path=None, max_temperature=0.2)
+
+        assert cache.is_cacheable(0.1)
+        assert cache.is_cacheable(0.2)
+        assert not cache.is_cacheable(0.7)
+
+    def test_clear(self, cache_path):
+        """Test clear empties both tiers"""
+        cache = ResponseCache(path=cache_path)
+        cache.set("k", "v")
+        cache.clear()
+
+        assert cache.get("k") is None
+        assert cache.stats()["entries"] == 0
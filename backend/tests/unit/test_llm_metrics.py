@@ -0,0 +1,98 @@
+"""Unit tests for per-call LLM metrics"""
+
+import time
+from src.llm_metrics import (
+    LLMMetrics, estimate_tokens, summarize,
+    OUTCOME_OK, OUTCOME_CACHE_HIT, OUTCOME_ERROR
+)
+
+
+class TestEstimateTokens:
+    """Test the prompt token estimate"""
+
+    def test_ascii_is_about_four_chars_per_token(self):
+        """Test English/SQL text counts ~4 characters per token"""
+        assert estimate_tokens("") == 0
+        assert estimate_tokens("a" * 400) == 100
+
+    def test_non_ascii_counts_one_token_per_char(self):
+        """Test Japanese characters are not under-counted"""
+        assert estimate_tokens("顧客数") == 3
+        assert estimate_tokens("顧客 count") == 2 + 2
+
+
+class TestSummarize:
+    """Test histogram summaries"""
+
+    def test_percentiles_and_buckets(self):
+        """Test percentiles use nearest rank and values land in buckets"""
+        values = list(range(1, 101))
+        summary = summarize(values, (10, 50))
+
+        assert summary["count"] == 100
+        assert summary["p50"] == 50
+        assert summary["p95"] == 95
+        assert summary["p99"] == 99
+        assert summary["max"] == 100
+        assert summary["buckets"] == {"10": 10, "50": 40, "+Inf": 50}
+
+    def test_empty(self):
+        """Test an empty sample set summarizes to zeros"""
+        summary = summarize([], (10,))
+        assert summary["count"] == 0
+        assert summary["p95"] == 0.0
+        assert summary["buckets"] == {"10": 0, "+Inf": 0}
+
+
+class TestLLMMetrics:
+    """Test call recording and rolling-window snapshots"""
+
+    def test_records_grouped_by_purpose_and_model(self):
+        """Test finished calls show up per purpose and per model"""
+        metrics = LLMMetrics(window=60)
+
+        record = metrics.start("sql", "model-a", "x" * 40)
+        record.mark_queued(0.25)
+        record.mark_first_token()
+        record.finish(OUTCOME_OK)
+
+        metrics.start("plotly", "model-b", "y" * 8).finish(OUTCOME_ERROR)
+        metrics.start("sql", "model-a", "x" * 40).finish(OUTCOME_CACHE_HIT)
+
+        snapshot = metrics.snapshot()
+
+        assert snapshot["total_calls"] == 3
+        assert snapshot["overall"]["calls"] == 3
+        sql = snapshot["by_purpose"]["sql"]
+        assert sql["outcomes"] == {"ok": 1, "cache_hit": 1}
+        # Cache hits are excluded from the model latency histograms
+        assert sql["latency_ms"]["count"] == 1
+        assert sql["ttft_ms"]["count"] == 1
+        assert sql["queue_wait_ms"]["max"] == 250.0
+        assert sql["prompt_chars"]["max"] == 40
+        assert sql["prompt_tokens"]["max"] == 10
+        assert snapshot["by_model"]["model-b"]["outcomes"] == {"error": 1}
+        assert [r["outcome"] for r in snapshot["recent"]] == ["ok", "error", "cache_hit"]
+
+    def test_finish_is_idempotent(self):
+        """Test a record is added only once"""
+        metrics = LLMMetrics()
+        record = metrics.start(None, "model-a", "prompt")
+        record.finish(OUTCOME_OK)
+        record.finish(OUTCOME_ERROR)
+
+        snapshot = metrics.snapshot()
+        assert snapshot["total_calls"] == 1
+        assert snapshot["by_purpose"]["unknown"]["outcomes"] == {"ok": 1}
+
+    def test_old_records_leave_the_window(self):
+        """Test records older than the window are not summarized"""
+        metrics = LLMMetrics(window=60)
+        record = metrics.start("sql", "model-a", "prompt")
+        record.finish(OUTCOME_OK)
+        record.started_at = time.time() - 120
+
+        snapshot = metrics.snapshot()
+        assert snapshot["total_calls"] == 1
+        assert snapshot["overall"]["calls"] == 0
+        assert snapshot["by_purpose"] == {}
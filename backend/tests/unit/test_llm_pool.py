@@ -0,0 +1,187 @@
+"""Unit tests for the warm Claude client pool"""
+
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from src.llm_pool import ClaudeClientPool, PoolClosedError, PoolTimeoutError, transport_is_ready
+
+
+def make_factory():
+    """Factory producing mock clients and recording every client created"""
+    created = []
+
+    def factory(model):
+        client = MagicMock()
+        client.model = model
+        client.connect = AsyncMock()
+        client.disconnect = AsyncMock()
+        created.append(client)
+        return client
+
+    return factory, created
+
+
+class TestClaudeClientPool:
+    """Test ClaudeClientPool"""
+
+    @pytest.mark.asyncio
+    async def test_reuses_idle_client(self):
+        """Test a released client is handed out again instead of spawning"""
+        factory, created = make_factory()
+        pool = ClaudeClientPool(factory, max_size=2, health_check=None)
+
+        async with pool.client("m1") as first:
+            pass
+        async with pool.client("m1") as second:
+            pass
+
+        assert first is second
+        assert len(created) == 1
+        stats = pool.stats()["models"]["m1"]
+        assert stats["spawned"] == 1
+        assert stats["reused"] == 1
+        assert stats["idle"] == 1
+
+    @pytest.mark.asyncio
+    async def test_per_model_sub_pools(self):
+        """Test each model gets its own clients"""
+        factory, created = make_factory()
+        pool = ClaudeClientPool(factory, health_check=None)
+
+        async with pool.client("m1") as a:
+            pass
+        async with pool.client("m2") as b:
+            pass
+
+        assert a is not b
+        assert a.model == "m1"
+        assert b.model == "m2"
+        assert set(pool.stats()["models"]) == {"m1", "m2"}
+
+    @pytest.mark.asyncio
+    async def test_recycles_after_max_uses(self):
+        """Test clients are closed once they reach max_uses"""
+        factory, created = make_factory()
+        pool = ClaudeClientPool(factory, max_uses=2, health_check=None)
+
+        for _ in range(3):
+            async with pool.client("m1"):
+                pass
+
+        assert len(created) == 2
+        created[0].disconnect.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_unhealthy_client_is_replaced(self):
+        """Test a client failing the health check is not reused"""
+        factory, created = make_factory()
+        pool = ClaudeClientPool(factory, health_check=lambda c: c is not created[0])
+
+        async with pool.client("m1"):
+            pass
+        async with pool.client("m1") as client:
+            pass
+
+        assert client is created[1]
+
+    @pytest.mark.asyncio
+    async def test_error_discards_client(self):
+        """Test a client that raised while in use is disconnected"""
+        factory, created = make_factory()
+        pool = ClaudeClientPool(factory, health_check=None)
+
+        with pytest.raises(RuntimeError):
+            async with pool.client("m1"):
+                raise RuntimeError("boom")
+
+        created[0].disconnect.assert_awaited_once()
+        assert pool.stats()["models"]["m1"]["size"] == 0
+
+    @pytest.mark.asyncio
+    async def test_waiter_gets_released_client(self):
+        """Test callers wait for a free client when the pool is full"""
+        factory, created = make_factory()
+        pool = ClaudeClientPool(factory, max_size=1, health_check=None)
+
+        first = await pool.acquire("m1")
+        waiter = asyncio.create_task(pool.acquire("m1"))
+        await asyncio.sleep(0)
+        assert pool.stats()["models"]["m1"]["waiters"] == 1
+
+        await pool.release(first)
+        second = await waiter
+
+        assert second is first
+        assert len(created) == 1
+
+    @pytest.mark.asyncio
+    async def test_acquire_timeout(self):
+        """Test acquire raises when no client frees up in time"""
+        factory, _ = make_factory()
+        pool = ClaudeClientPool(factory, max_size=1, acquire_timeout=0.01, health_check=None)
+
+        await pool.acquire("m1")
+        with pytest.raises(PoolTimeoutError):
+            await pool.acquire("m1")
+        assert pool.stats()["models"]["m1"]["timeouts"] == 1
+
+    @pytest.mark.asyncio
+    async def test_warm_up_and_close(self):
+        """Test warm_up pre-spawns clients and close disconnects them"""
+        factory, created = make_factory()
+        pool = ClaudeClientPool(factory, max_size=3, health_check=None)
+
+        assert await pool.warm_up("m1", 2) == 2
+        assert pool.stats()["models"]["m1"]["idle"] == 2
+
+        await pool.close()
+        for client in created:
+            client.disconnect.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_acquire_after_close_raises(self):
+        """Test a closed pool starts no new clients"""
+        factory, created = make_factory()
+        pool = ClaudeClientPool(factory, max_size=2, health_check=None)
+        await pool.close()
+
+        with pytest.raises(PoolClosedError):
+            await pool.acquire("m1")
+        assert await pool.warm_up("m1", 1) == 0
+        assert created == []
+
+    def test_new_loop_closes_clients_of_old_loop(self):
+        """Test switching event loops disconnects the clients left idle on the old one"""
+        factory, created = make_factory()
+        pool = ClaudeClientPool(factory, max_size=2, health_check=None)
+
+        asyncio.run(pool.warm_up("m1", 2))
+
+        async def on_new_loop():
+            async with pool.client("m1"):
+                pass
+            await asyncio.sleep(0)
+
+        asyncio.run(on_new_loop())
+
+        assert len(created) == 3
+        for client in created[:2]:
+            client.disconnect.assert_awaited_once()
+        created[2].disconnect.assert_not_awaited()
+
+    def test_transport_is_ready(self):
+        """Test the default health check inspects the client transport"""
+        client = MagicMock()
+        client._transport.is_ready.return_value = True
+        assert transport_is_ready(client)
+
+        client._transport.is_ready.return_value = False
+        assert not transport_is_ready(client)
+
+        client._transport = None
+        assert not transport_is_ready(client)
+
+    def test_invalid_max_size(self):
+        """Test max_size must be positive"""
+        with pytest.raises(ValueError):
+            ClaudeClientPool(lambda m: None, max_size=0)
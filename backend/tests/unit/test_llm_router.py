@@ -0,0 +1,89 @@
+"""Unit tests for purpose-based model routing"""
+
+import time
+from src.llm_router import (
+    ModelRouter, REASON_DEFAULT, REASON_ROUTE, REASON_FALLBACK_LATENCY, REASON_FALLBACK_ERRORS
+)
+
+
+def make_router(**kwargs):
+    options = dict(
+        routes={"plotly": {"model": "small", "max_tokens": 1024}, "followup": {"max_tokens": 512}},
+        fallback_model="fast",
+        p95_threshold_ms=1000,
+        error_rate_threshold=0.5,
+        min_samples=3,
+    )
+    options.update(kwargs)
+    return ModelRouter("big", 2048, **options)
+
+
+class TestModelRouter:
+    """Test routes, fallback and decision recording"""
+
+    def test_routes_by_purpose(self):
+        """Test purposes map to their model and max_tokens, others use defaults"""
+        router = make_router()
+
+        assert router.select("sql") == ("big", 2048)
+        assert router.select("plotly") == ("small", 1024)
+        assert router.select("followup") == ("big", 512)
+        assert router.select(None) == ("big", 2048)
+
+    def test_slow_model_falls_back(self):
+        """Test a p95 over the threshold sends calls to the fallback model"""
+        router = make_router()
+        for _ in range(3):
+            router.record("big", latency_ms=5000)
+
+        assert router.select("sql") == ("fast", 2048)
+        assert router.stats()["models"]["big"]["unhealthy"] == REASON_FALLBACK_LATENCY
+        # Routed to a healthy model: unaffected
+        assert router.select("plotly") == ("small", 1024)
+
+    def test_failing_model_falls_back(self):
+        """Test an error rate over the threshold triggers fallback"""
+        router = make_router()
+        router.record("big", latency_ms=100)
+        router.record("big", ok=False)
+        router.record("big", ok=False)
+
+        assert router.select("sql")[0] == "fast"
+        assert router.stats()["recent"][-1]["reason"] == REASON_FALLBACK_ERRORS
+
+    def test_needs_min_samples_and_recovers_after_window(self):
+        """Test a model isn't judged on too few samples and recovers when samples age out"""
+        router = make_router(window=60)
+        router.record("big", latency_ms=5000)
+        router.record("big", latency_ms=5000)
+        assert router.select("sql")[0] == "big"
+
+        router.record("big", latency_ms=5000)
+        assert router.select("sql")[0] == "fast"
+
+        # Age the samples out of the window
+        health = router._health["big"]
+        health._samples = type(health._samples)(
+            ((ts - 120, latency, ok) for ts, latency, ok in health._samples), maxlen=health._samples.maxlen
+        )
+        assert router.select("sql")[0] == "big"
+
+    def test_no_fallback_configured(self):
+        """Test an unhealthy model keeps serving when no fallback is set"""
+        router = make_router(fallback_model=None)
+        for _ in range(3):
+            router.record("big", ok=False)
+
+        assert router.select("sql")[0] == "big"
+
+    def test_decisions_are_counted(self):
+        """Test each decision is counted by purpose, model and reason"""
+        router = make_router()
+        router.select("sql")
+        router.select("sql")
+        router.select("plotly")
+
+        decisions = router.stats()["decisions"]
+        assert {"purpose": "sql", "model": "big", "reason": REASON_DEFAULT, "count": 2} in decisions
+        assert {"purpose": "plotly", "model": "small", "reason": REASON_ROUTE, "count": 1} in decisions
+        assert router.stats()["recent"][-1]["timestamp"] <= time.time()
@@ -0,0 +1,116 @@
+"""Unit tests for LLM admission control"""
+
+import asyncio
+import pytest
+from src.llm_scheduler import (
+    LLMScheduler, LLMOverloadedError, llm_purpose, current_purpose,
+    PURPOSE_SQL, PURPOSE_FOLLOWUP, PURPOSE_PLOTLY
+)
+
+
+class TestLLMScheduler:
+    """Test LLMScheduler priorities, limits and shedding"""
+
+    @pytest.mark.asyncio
+    async def test_admits_within_capacity(self):
+        """Test calls under the limits run without queueing"""
+        scheduler = LLMScheduler(max_concurrency=2)
+
+        async with scheduler.slot(PURPOSE_SQL) as waited:
+            assert waited == 0.0
+            assert scheduler.stats()["active"] == 1
+
+        assert scheduler.stats()["active"] == 0
+        assert scheduler.stats()["classes"]["sql"]["admitted"] == 1
+
+    @pytest.mark.asyncio
+    async def test_higher_priority_waiter_goes_first(self):
+        """Test a queued sql call is admitted before an earlier followup call"""
+        scheduler = LLMScheduler(max_concurrency=1)
+        order = []
+
+        await scheduler.acquire(PURPOSE_SQL)
+
+        async def run(purpose):
+            async with scheduler.slot(purpose):
+                order.append(purpose)
+
+        followup = asyncio.create_task(run(PURPOSE_FOLLOWUP))
+        await asyncio.sleep(0)
+        sql = asyncio.create_task(run(PURPOSE_SQL))
+        await asyncio.sleep(0)
+        assert scheduler.stats()["queue_depth"] == 2
+
+        scheduler.release(PURPOSE_SQL)
+        await asyncio.gather(followup, sql)
+
+        assert order == [PURPOSE_SQL, PURPOSE_FOLLOWUP]
+
+    @pytest.mark.asyncio
+    async def test_class_limit_lets_other_classes_through(self):
+        """Test a class at its limit queues while other classes still run"""
+        scheduler = LLMScheduler(max_concurrency=3, class_limits={"followup": 1})
+
+        await scheduler.acquire(PURPOSE_FOLLOWUP)
+        blocked = asyncio.create_task(scheduler.acquire(PURPOSE_FOLLOWUP))
+        await asyncio.sleep(0)
+
+        assert await scheduler.acquire(PURPOSE_PLOTLY) == 0.0
+        assert not blocked.done()
+
+        scheduler.release(PURPOSE_FOLLOWUP)
+        await blocked
+        assert scheduler.stats()["classes"]["followup"]["active"] == 1
+
+    @pytest.mark.asyncio
+    async def test_queue_timeout_sheds_with_retry_after(self):
+        """Test a call queued past the timeout raises LLMOverloadedError"""
+        scheduler = LLMScheduler(max_concurrency=1, queue_timeout=0.01)
+        await scheduler.acquire(PURPOSE_SQL)
+
+        with pytest.raises(LLMOverloadedError) as exc_info:
+            await scheduler.acquire(PURPOSE_FOLLOWUP)
+
+        assert exc_info.value.retry_after >= 1
+        assert exc_info.value.retry_after_header.isdigit()
+        stats = scheduler.stats()
+        assert stats["queue_depth"] == 0
+        assert stats["classes"]["followup"]["shed"] == 1
+
+    @pytest.mark.asyncio
+    async def test_full_queue_sheds_immediately(self):
+        """Test arrivals beyond max_queue are rejected without waiting"""
+        scheduler = LLMScheduler(max_concurrency=1, max_queue=1, queue_timeout=5)
+        await scheduler.acquire(PURPOSE_SQL)
+        waiter = asyncio.create_task(scheduler.acquire(PURPOSE_SQL))
+        await asyncio.sleep(0)
+
+        with pytest.raises(LLMOverloadedError, match="queue full"):
+            await scheduler.acquire(PURPOSE_SQL)
+
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert scheduler.stats()["queue_depth"] == 0
+
+    @pytest.mark.asyncio
+    async def test_unknown_purpose_uses_default_class(self):
+        """Test untagged and unknown purposes are scheduled as sql"""
+        scheduler = LLMScheduler()
+
+        async with scheduler.slot(None):
+            pass
+        async with scheduler.slot("unknown"):
+            pass
+
+        assert scheduler.stats()["classes"]["sql"]["admitted"] == 2
+
+    def test_llm_purpose_context(self):
+        """Test llm_purpose() sets and restores the current purpose"""
+        assert current_purpose() is None
+        with llm_purpose(PURPOSE_PLOTLY):
+            assert current_purpose() == PURPOSE_PLOTLY
+            with llm_purpose(PURPOSE_FOLLOWUP):
+                assert current_purpose() == PURPOSE_FOLLOWUP
+            assert current_purpose() == PURPOSE_PLOTLY
+        assert current_purpose() is None
@@ -0,0 +1,385 @@
+"""Unit tests for LLM transports"""
+
+import asyncio
+import threading
+import pytest
+import requests
+from unittest.mock import patch, MagicMock
+from src.llm_transport import InProcessTransport, HTTPTransport, CircuitBreaker, CircuitOpenError
+from src.llm_scheduler import LLMOverloadedError
+
+
+def make_response(status_code=200, text="SELECT 1"):
+    """Build a mock requests.Response"""
+    response = MagicMock()
+    response.status_code = status_code
+    response.json.return_value = {"text": text}
+    if status_code >= 400:
+        error = requests.exceptions.HTTPError(f"{status_code} Error")
+        error.response = response
+        response.raise_for_status.side_effect = error
+    else:
+        response.raise_for_status.return_value = None
+    return response
+
+
+@pytest.fixture
+def background_loop():
+    """Event loop running in a background thread, like the uvicorn loop"""
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield loop
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+
+class TestInProcessTransport:
+    """Test InProcessTransport"""
+
+    def test_generate_runs_coroutine_on_loop(self, background_loop):
+        """Test generate() bridges a worker thread onto the event loop"""
+        calls = []
+
+        async def fake_generate(prompt, model, temperature, max_tokens, purpose=None, coalesce=True):
+            calls.append((prompt, model, temperature, max_tokens, asyncio.get_running_loop()))
+            return {"text": "SELECT 1", "model": model}
+
+        transport = InProcessTransport(fake_generate, loop=background_loop)
+        result = transport.generate("Test prompt", "claude-sonnet-4-5", 0.1, 2048)
+
+        assert result == "SELECT 1"
+        assert calls[0][:4] == ("Test prompt", "claude-sonnet-4-5", 0.1, 2048)
+        assert calls[0][4] is background_loop
+
+    def test_generate_propagates_errors(self, background_loop):
+        """Test errors raised by the LLM service reach the caller"""
+        async def failing_generate(*args, **kwargs):
+            raise ValueError("LLM failed")
+
+        transport = InProcessTransport(failing_generate, loop=background_loop)
+
+        with pytest.raises(ValueError, match="LLM failed"):
+            transport.generate("Test prompt", "m", 0.1, 10)
+
+    def test_generate_timeout(self, background_loop):
+        """Test slow calls time out and are cancelled"""
+        cancelled = threading.Event()
+
+        async def slow_generate(*args, **kwargs):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        transport = InProcessTransport(slow_generate, loop=background_loop, timeout=0.05)
+
+        with pytest.raises(Exception, match="timeout"):
+            transport.generate("Test prompt", "m", 0.1, 10)
+        assert cancelled.wait(1)
+
+    @pytest.mark.asyncio
+    async def test_generate_on_loop_thread_raises(self):
+        """Test calling generate() from the loop thread fails instead of deadlocking"""
+        async def fake_generate(*args, **kwargs):
+            return {"text": ""}
+
+        transport = InProcessTransport(fake_generate, loop=asyncio.get_running_loop())
+
+        with pytest.raises(RuntimeError, match="event loop thread"):
+            transport.generate("Test prompt", "m", 0.1, 10)
+
+    @pytest.mark.asyncio
+    async def test_agenerate_on_service_loop_awaits_directly(self):
+        """Test agenerate() awaits the coroutine when already on the service loop"""
+        async def fake_generate(prompt, model, temperature, max_tokens, purpose=None, coalesce=True):
+            return {"text": f"echo {prompt}"}
+
+        transport = InProcessTransport(fake_generate, loop=asyncio.get_running_loop())
+
+        assert await transport.agenerate("p", "m", 0.1, 10) == "echo p"
+
+    @pytest.mark.asyncio
+    async def test_agenerate_from_other_loop(self, background_loop):
+        """Test agenerate() bridges to the service loop from a different loop"""
+        async def fake_generate(prompt, model, temperature, max_tokens, purpose=None, coalesce=True):
+            assert asyncio.get_running_loop() is background_loop
+            return {"text": "SELECT 1"}
+
+        transport = InProcessTransport(fake_generate, loop=background_loop)
+
+        assert await transport.agenerate("p", "m", 0.1, 10) == "SELECT 1"
+
+    def test_stream_bridges_chunks_to_thread(self, background_loop):
+        """Test stream() yields chunks produced on the service loop"""
+        async def fake_stream(prompt, model, temperature, max_tokens, purpose=None):
+            assert asyncio.get_running_loop() is background_loop
+            for chunk in ["SELECT", " 1"]:
+                yield chunk
+
+        transport = InProcessTransport(None, loop=background_loop, stream_fn=fake_stream)
+
+        assert list(transport.stream("p", "m", 0.1, 10)) == ["SELECT", " 1"]
+
+    def test_stream_propagates_errors(self, background_loop):
+        """Test errors raised mid-stream reach the consuming thread"""
+        async def failing_stream(*args, **kwargs):
+            yield "SELECT"
+            raise ValueError("stream failed")
+
+        transport = InProcessTransport(None, loop=background_loop, stream_fn=failing_stream)
+        chunks = transport.stream("p", "m", 0.1, 10)
+
+        assert next(chunks) == "SELECT"
+        with pytest.raises(ValueError, match="stream failed"):
+            next(chunks)
+
+    def test_stream_without_stream_fn_yields_full_text(self, background_loop):
+        """Test stream() falls back to a single chunk from generate()"""
+        async def fake_generate(*args, **kwargs):
+            return {"text": "SELECT 1"}
+
+        transport = InProcessTransport(fake_generate, loop=background_loop)
+
+        assert list(transport.stream("p", "m", 0.1, 10)) == ["SELECT 1"]
+
+    @pytest.mark.asyncio
+    async def test_astream_on_service_loop(self):
+        """Test astream() iterates the service stream directly on its loop"""
+        async def fake_stream(prompt, model, temperature, max_tokens, purpose=None):
+            yield "a"
+            yield "b"
+
+        transport = InProcessTransport(None, loop=asyncio.get_running_loop(), stream_fn=fake_stream)
+
+        assert [chunk async for chunk in transport.astream("p", "m", 0.1, 10)] == ["a", "b"]
+
+    def test_generate_batch_runs_concurrently_on_loop(self, background_loop):
+        """Test generate_batch() overlaps prompts and keeps per-item errors"""
+        active = []
+        peak = []
+
+        async def fake_generate(prompt, model, temperature, max_tokens, purpose=None, coalesce=True):
+            active.append(prompt)
+            peak.append(len(active))
+            await asyncio.sleep(0.01)
+            active.remove(prompt)
+            if prompt == "bad":
+                raise ValueError("LLM failed")
+            return {"text": prompt.upper()}
+
+        transport = InProcessTransport(fake_generate, loop=background_loop)
+        results = transport.generate_batch(["a", "bad", "c"], "m", 0.1, 10, max_concurrency=3)
+
+        assert results[0] == "A"
+        assert isinstance(results[1], ValueError)
+        assert results[2] == "C"
+        assert max(peak) == 3
+
+    def test_describe(self, background_loop):
+        """Test describe() reports in-process mode"""
+        transport = InProcessTransport(None, loop=background_loop)
+        assert transport.describe() == "in-process"
+
+
+class TestHTTPTransport:
+    """Test HTTPTransport retries and circuit breaking"""
+
+    def make_transport(self, **kwargs):
+        kwargs.setdefault("retry_backoff", 0)
+        return HTTPTransport("http://test:8000/generate", **kwargs)
+
+    def test_uses_keep_alive_session_with_split_timeouts(self):
+        """Test requests go through the pooled session with (connect, read) timeouts"""
+        transport = self.make_transport(timeout=45, connect_timeout=2)
+
+        with patch.object(transport.session, "post", return_value=make_response()) as mock_post:
+            assert transport.generate("p", "m", 0.1, 10) == "SELECT 1"
+
+        assert mock_post.call_args[1]["timeout"] == (2, 45)
+
+    def test_retries_connection_errors(self):
+        """Test connection errors are retried until success"""
+        transport = self.make_transport(max_retries=2)
+        side_effect = [requests.exceptions.ConnectionError(), make_response()]
+
+        with patch.object(transport.session, "post", side_effect=side_effect) as mock_post:
+            assert transport.generate("p", "m", 0.1, 10) == "SELECT 1"
+
+        assert mock_post.call_count == 2
+        assert transport.stats()["retries"] == 1
+
+    def test_retries_gateway_errors(self):
+        """Test 503 responses are retried"""
+        transport = self.make_transport(max_retries=2)
+        side_effect = [make_response(503), make_response(502), make_response()]
+
+        with patch.object(transport.session, "post", side_effect=side_effect) as mock_post:
+            assert transport.generate("p", "m", 0.1, 10) == "SELECT 1"
+
+        assert mock_post.call_count == 3
+
+    def test_does_not_retry_client_errors(self):
+        """Test 4xx responses fail immediately without tripping the breaker"""
+        transport = self.make_transport(max_retries=2, circuit_failure_threshold=1)
+
+        with patch.object(transport.session, "post", return_value=make_response(422)) as mock_post:
+            with pytest.raises(Exception, match="Error calling Claude Agent SDK"):
+                transport.generate("p", "m", 0.1, 10)
+
+        assert mock_post.call_count == 1
+        assert transport.breaker.state == CircuitBreaker.CLOSED
+
+    def test_overloaded_endpoint_raises_with_retry_after(self):
+        """Test a 429 maps to LLMOverloadedError without tripping the breaker"""
+        transport = self.make_transport(max_retries=2, circuit_failure_threshold=1)
+        response = make_response(429)
+        response.headers = {"Retry-After": "7"}
+
+        with patch.object(transport.session, "post", return_value=response) as mock_post:
+            with pytest.raises(LLMOverloadedError) as exc_info:
+                transport.generate("p", "m", 0.1, 10, purpose="followup")
+
+        assert exc_info.value.retry_after == 7
+        assert mock_post.call_count == 1
+        assert mock_post.call_args[1]["json"]["purpose"] == "followup"
+        assert transport.breaker.state == CircuitBreaker.CLOSED
+
+    def test_circuit_opens_and_fails_fast(self):
+        """Test the circuit opens after repeated failures and rejects calls"""
+        transport = self.make_transport(max_retries=0, circuit_failure_threshold=2)
+
+        with patch.object(transport.session, "post", side_effect=requests.exceptions.ConnectionError()) as mock_post:
+            for _ in range(2):
+                with pytest.raises(Exception, match="Error calling Claude Agent SDK"):
+                    transport.generate("p", "m", 0.1, 10)
+
+            with pytest.raises(CircuitOpenError):
+                transport.generate("p", "m", 0.1, 10)
+
+        assert mock_post.call_count == 2
+        assert transport.stats()["circuit"]["state"] == "open"
+
+    @pytest.mark.asyncio
+    async def test_agenerate_retries_then_succeeds(self):
+        """Test the async path applies the same retry policy"""
+        import httpx
+        responses = iter([httpx.Response(503), httpx.Response(200, json={"text": "SELECT 1"})])
+        seen = []
+
+        def handler(request):
+            seen.append(request)
+            return next(responses)
+
+        transport = self.make_transport(max_retries=2)
+        transport._async_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        transport._async_loop = asyncio.get_running_loop()
+
+        assert await transport.agenerate("p", "m", 0.1, 10) == "SELECT 1"
+        assert len(seen) == 2
+
+    @pytest.mark.asyncio
+    async def test_agenerate_circuit_open(self):
+        """Test the async path fails fast when the shared circuit is open"""
+        transport = self.make_transport(circuit_failure_threshold=1)
+        transport.breaker.record_failure()
+
+        with pytest.raises(CircuitOpenError):
+            await transport.agenerate("p", "m", 0.1, 10)
+
+
+    def test_generate_batch_posts_once(self):
+        """Test generate_batch() sends one request and maps per-item errors"""
+        transport = self.make_transport(timeout=10)
+        response = make_response()
+        response.json.return_value = {"results": [
+            {"index": 1, "text": None, "error": "shed", "retry_after": 3},
+            {"index": 0, "text": "SELECT 1", "error": None},
+            {"index": 2, "text": None, "error": "boom"},
+        ]}
+
+        with patch.object(transport.session, "post", return_value=response) as mock_post:
+            results = transport.generate_batch(["a", "b", "c"], "m", 0.1, 10, max_concurrency=2)
+
+        assert mock_post.call_count == 1
+        assert mock_post.call_args[0][0] == "http://test:8000/generate/batch"
+        assert mock_post.call_args[1]["json"]["prompts"] == ["a", "b", "c"]
+        # Two waves of prompts get twice the read timeout
+        assert mock_post.call_args[1]["timeout"] == (5, 20)
+        assert results[0] == "SELECT 1"
+        assert isinstance(results[1], LLMOverloadedError)
+        assert "boom" in str(results[2])
+
+    def test_stream_parses_sse_tokens(self):
+        """Test stream() yields token events from the /stream endpoint"""
+        transport = self.make_transport()
+        response = MagicMock()
+        response.__enter__.return_value = response
+        response.iter_lines.return_value = [
+            "event: token", 'data: {"text": "SELECT"}', "",
+            "event: token", 'data: {"text": " 1"}', "",
+            "event: done", 'data: {"text": "SELECT 1"}', "",
+        ]
+
+        with patch.object(transport.session, "post", return_value=response) as mock_post:
+            assert list(transport.stream("p", "m", 0.1, 10)) == ["SELECT", " 1"]
+
+        assert mock_post.call_args[0][0] == "http://test:8000/generate/stream"
+        assert mock_post.call_args[1]["stream"] is True
+
+    @pytest.mark.asyncio
+    async def test_astream_raises_on_error_event(self):
+        """Test an error event from the server surfaces as an exception"""
+        import httpx
+        body = 'event: token\ndata: {"text": "SEL"}\n\nevent: error\ndata: {"detail": "boom"}\n\n'
+
+        def handler(request):
+            return httpx.Response(200, text=body, headers={"content-type": "text/event-stream"})
+
+        transport = self.make_transport()
+        transport._async_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        transport._async_loop = asyncio.get_running_loop()
+
+        chunks = []
+        with pytest.raises(Exception, match="boom"):
+            async for chunk in transport.astream("p", "m", 0.1, 10):
+                chunks.append(chunk)
+        assert chunks == ["SEL"]
+
+
+class TestCircuitBreaker:
+    """Test CircuitBreaker state transitions"""
+
+    def test_half_open_probe_closes_circuit(self):
+        """Test a successful probe after reset_timeout closes the circuit"""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+
+        assert breaker.allow_request()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert not breaker.allow_request()  # only one probe at a time
+
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert breaker.allow_request()
+
+    def test_failed_probe_reopens_circuit(self):
+        """Test a failed probe re-opens the circuit"""
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0)
+        for _ in range(3):
+            breaker.record_failure()
+
+        assert breaker.allow_request()
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+
+    def test_stays_open_until_reset_timeout(self):
+        """Test calls are rejected while the circuit is open"""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+        breaker.record_failure()
+
+        assert not breaker.allow_request()
+        assert breaker.stats()["rejected"] == 1
@@ -0,0 +1,68 @@
+"""Unit tests for near-exact question matching against training data"""
+
+from src.question_match import find_training_match, normalize_question, surface_similarity
+
+
+class TestNormalizeQuestion:
+    """Test question normalization"""
+
+    def test_case_punctuation_and_spacing(self):
+        """Test case, punctuation and whitespace are dropped"""
+        assert normalize_question("  How many Customers are there?? ") == "how many customers are there"
+
+    def test_full_width_and_japanese_punctuation(self):
+        """Test full-width characters and Japanese punctuation normalize away"""
+        assert normalize_question("顧客は何人いますか？") == normalize_question("顧客は何人いますか")
+        assert normalize_question("ＳＱＬ　ｔｅｓｔ") == "sql test"
+
+    def test_comparison_and_math_symbols_kept(self):
+        """Test operators survive normalization, spaced consistently"""
+        assert normalize_question("Which invoices have a total<10?") == "which invoices have a total < 10"
+        assert normalize_question("Tracks over 1.99") != normalize_question("Tracks over 199")
+        assert normalize_question("Top 10% of sales") != normalize_question("Top 10 of sales")
+
+
+class TestFindTrainingMatch:
+    """Test the training fast path match"""
+
+    CANDIDATES = [
+        {"question": "How many customers are there?", "sql": "SELECT COUNT(*) FROM Customer"},
+        {"question": "How many albums are there?", "sql": "SELECT COUNT(*) FROM Album"},
+    ]
+
+    def test_matches_normalization_noise(self):
+        """Test a question differing only in case and punctuation matches"""
+        match = find_training_match("how many customers are there", self.CANDIDATES, 0.9)
+
+        assert match["sql"] == "SELECT COUNT(*) FROM Customer"
+        assert match["question"] == "How many customers are there?"
+        assert 0.9 <= match["similarity"] < 1.0
+
+    def test_comparison_operators_do_not_match_each_other(self):
+        """Test <, > and = variants of a question never share SQL"""
+        candidates = [{"question": "Which invoices have a total > 10?", "sql": "SELECT * FROM invoices WHERE Total > 10"}]
+
+        assert find_training_match("Which invoices have a total < 10?", candidates, 0.5) is None
+        assert find_training_match("Which invoices have a total = 10?", candidates, 0.5) is None
+        assert find_training_match("which invoices have a total > 10", candidates, 0.9)["sql"] == candidates[0]["sql"]
+
+    def test_different_question_does_not_match(self):
+        """Test a semantically different question never matches"""
+        assert find_training_match("How many customers are in France?", self.CANDIDATES, 0.5) is None
+
+    def test_threshold_applies(self):
+        """Test heavy punctuation noise falls below a strict threshold"""
+        noisy = "!!! how ;;; many customers ... are there ???"
+
+        assert find_training_match(noisy, self.CANDIDATES, 0.95) is None
+        assert find_training_match(noisy, self.CANDIDATES, 0.5) is not None
+
+    def test_skips_malformed_candidates(self):
+        """Test candidates without question or SQL are ignored"""
+        candidates = [None, {"question": "How many customers are there?"}, {"sql": "SELECT 1"}]
+
+        assert find_training_match("How many customers are there?", candidates, 0.9) is None
+
+    def test_surface_similarity_identical(self):
+        """Test identical questions score 1.0 regardless of case"""
+        assert surface_similarity("Top Artists", "top artists") == 1.0
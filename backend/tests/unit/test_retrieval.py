@@ -0,0 +1,97 @@
+"""Unit tests for concurrent retrieval stages"""
+
+import threading
+import time
+import pytest
+from src.retrieval import ParallelRetriever
+
+
+@pytest.fixture
+def retriever():
+    retriever = ParallelRetriever(workers=4, timeout=0.5)
+    yield retriever
+    retriever.shutdown()
+
+
+class TestParallelRetriever:
+    """Test stage execution, timeouts and metrics"""
+
+    def test_stages_run_concurrently(self, retriever):
+        """Test stages overlap instead of running one after another"""
+        barrier = threading.Barrier(3, timeout=1.0)
+
+        def stage(value):
+            def run():
+                barrier.wait()
+                return value
+            return run
+
+        run = retriever.submit({"sql": stage("a"), "ddl": stage("b"), "documentation": stage("c")})
+
+        assert [run.result(name) for name in ("sql", "ddl", "documentation")] == ["a", "b", "c"]
+
+    def test_timeout_returns_default(self, retriever):
+        """Test a slow stage is left out after the timeout"""
+        release = threading.Event()
+        run = retriever.submit({"slow": lambda: release.wait(2.0), "fast": lambda: ["ddl"]})
+
+        start = time.monotonic()
+        assert run.result("slow", default=[]) == []
+        assert time.monotonic() - start < 1.0
+        assert run.result("fast", default=[]) == ["ddl"]
+        release.set()
+
+        outcomes = retriever.stats()["stages"]["slow"]["outcomes"]
+        assert outcomes["timeout"] == 1
+
+    def test_error_returns_default(self, retriever):
+        """Test a failing stage is recorded and replaced by the default"""
+        def fail():
+            raise RuntimeError("collection unavailable")
+
+        run = retriever.submit({"documentation": fail})
+
+        assert run.result("documentation", default=[]) == []
+        assert retriever.stats()["stages"]["documentation"]["outcomes"]["error"] == 1
+
+    def test_latency_recorded_per_stage(self, retriever):
+        """Test each stage gets its own latency histogram"""
+        run = retriever.submit({"sql": lambda: time.sleep(0.02), "ddl": lambda: None})
+        run.result("sql")
+        run.result("ddl")
+
+        stages = retriever.stats()["stages"]
+        assert stages["sql"]["latency_ms"]["count"] == 1
+        assert stages["sql"]["latency_ms"]["max"] >= 20
+        assert stages["ddl"]["latency_ms"]["count"] == 1
+
+    def test_inline_mode_skips_cancelled_stages(self):
+        """Test without a pool stages run on demand and cancelled ones never run"""
+        retriever = ParallelRetriever(workers=0)
+        calls = []
+        run = retriever.submit({
+            "sql": lambda: calls.append("sql") or ["pair"],
+            "ddl": lambda: calls.append("ddl") or ["table"],
+        })
+
+        assert run.result("sql") == ["pair"]
+        run.cancel()
+
+        assert calls == ["sql"]
+        assert retriever.stats()["stages"]["ddl"]["outcomes"]["cancelled"] == 1
+
+    def test_all_ok(self, retriever):
+        """Test a run is complete only once every stage has delivered"""
+        def fail():
+            raise RuntimeError("collection unavailable")
+
+        run = retriever.submit({"sql": lambda: ["pair"], "ddl": lambda: ["table"]})
+        run.result("sql")
+        assert not run.all_ok()
+        run.result("ddl")
+        assert run.all_ok()
+
+        degraded = retriever.submit({"sql": lambda: ["pair"], "ddl": fail})
+        degraded.result("sql")
+        degraded.result("ddl", default=[])
+        assert not degraded.all_ok()
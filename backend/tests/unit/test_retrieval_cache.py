@@ -0,0 +1,97 @@
+"""Unit tests for the retrieval cache"""
+
+import multiprocessing
+from src.retrieval_cache import RetrievalCache, SharedGeneration, TrainingGeneration
+
+
+def bump_shared(path, name, times):
+    """Bump a shared generation file from a separate process"""
+    shared = SharedGeneration(path)
+    for _ in range(times):
+        shared.bump(name)
+
+
+class TestTrainingGeneration:
+    """Test the training change counter"""
+
+    def test_bump_is_monotonic(self):
+        """Test each bump returns a higher generation"""
+        generation = TrainingGeneration()
+
+        assert generation.value == 0
+        assert generation.bump() == 1
+        assert generation.bump() == 2
+        assert generation.value == 2
+
+
+class TestSharedGeneration:
+    """Test the per-collection counters shared through a file"""
+
+    def test_bump_and_read(self, tmp_path):
+        """Test another instance on the same file sees each bump"""
+        writer = SharedGeneration(tmp_path / "store" / "training_generation.json")
+        reader = SharedGeneration(tmp_path / "store" / "training_generation.json")
+
+        assert reader.read() == {"sql": 0, "ddl": 0, "documentation": 0}
+        assert writer.bump("ddl") == {"sql": 0, "ddl": 1, "documentation": 0}
+        assert writer.bump() == {"sql": 1, "ddl": 2, "documentation": 1}
+        assert reader.read() == {"sql": 1, "ddl": 2, "documentation": 1}
+        assert sorted(p.name for p in (tmp_path / "store").iterdir()) == [
+            "training_generation.json", "training_generation.json.lock"
+        ]
+
+    def test_concurrent_processes_lose_no_bump(self, tmp_path):
+        """Test bumps from several processes at once all land"""
+        path = str(tmp_path / "training_generation.json")
+        context = multiprocessing.get_context("spawn")
+        processes = [context.Process(target=bump_shared, args=(path, "sql", 20)) for _ in range(4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        assert SharedGeneration(path).read()["sql"] == 80
+
+    def test_unreadable_file_reads_as_zero(self, tmp_path):
+        """Test a corrupt file reads as all zeros, which still differs from what was seen"""
+        path = tmp_path / "training_generation.json"
+        path.write_text("{not json")
+
+        assert SharedGeneration(path).read() == {"sql": 0, "ddl": 0, "documentation": 0}
+
+
+class TestRetrievalCache:
+    """Test lookups, generations and eviction"""
+
+    def test_near_repeats_share_an_entry(self):
+        """Test questions differing in case, punctuation and width hit the same entry"""
+        cache = RetrievalCache()
+        cache.set("How many customers are there?", 0, (["pair"], ["ddl"], ["doc"]))
+
+        assert cache.get("how many customers are there", 0) == (["pair"], ["ddl"], ["doc"])
+        assert cache.get("Ｈｏｗ ｍａｎｙ customers  are there？", 0) is not None
+        assert cache.get("How many albums are there?", 0) is None
+
+    def test_older_generation_is_a_miss(self):
+        """Test an entry retrieved before a training change is never served"""
+        cache = RetrievalCache()
+        cache.set("How many customers?", 3, "context")
+
+        assert cache.get("How many customers?", 4) is None
+        # Dropped, so going back doesn't resurrect it either
+        assert cache.get("How many customers?", 3) is None
+        stats = cache.stats()
+        assert stats["stale"] == 1
+        assert stats["entries"] == 0
+
+    def test_lru_eviction(self):
+        """Test the least recently used question is evicted when full"""
+        cache = RetrievalCache(max_size=2)
+        cache.set("a", 0, 1)
+        cache.set("b", 0, 2)
+        cache.get("a", 0)
+        cache.set("c", 0, 3)
+
+        assert cache.get("b", 0) is None
+        assert cache.get("a", 0) == 1
+        assert cache.stats()["evictions"] == 1
@@ -0,0 +1,136 @@
+"""Unit tests for foreign-key DDL expansion"""
+
+from pathlib import Path
+from unittest.mock import MagicMock
+import pytest
+from src.schema_graph import DDLExpander, JOIN_HINT_HEADER, SchemaGraph, parse_ddl
+
+CHINOOK_DDL = Path(__file__).resolve().parents[2] / "training_data" / "chinook" / "ddl"
+
+
+def chinook_documents():
+    return [path.read_text(encoding="utf-8") for path in sorted(CHINOOK_DDL.glob("*.sql"))]
+
+
+def ddl(table):
+    return (CHINOOK_DDL / f"{table}.sql").read_text(encoding="utf-8")
+
+
+class TestParseDDL:
+    """Test table and foreign key extraction"""
+
+    def test_table_level_foreign_keys(self):
+        """Test FOREIGN KEY clauses of the Chinook DDL are found"""
+        table, foreign_keys = parse_ddl(ddl("invoice_items"))
+
+        assert table == "invoice_items"
+        assert [str(fk) for fk in foreign_keys] == [
+            "invoice_items.InvoiceId = invoices.InvoiceId",
+            "invoice_items.TrackId = tracks.TrackId",
+        ]
+
+    def test_inline_references_and_quoting(self):
+        """Test column-level REFERENCES with quoted, schema-qualified names"""
+        table, foreign_keys = parse_ddl(
+            'CREATE TABLE IF NOT EXISTS "main"."Albums" (\n'
+            '    AlbumId INTEGER PRIMARY KEY,\n'
+            '    Price NUMERIC(10,2),\n'
+            '    ArtistId INTEGER NOT NULL REFERENCES "artists" ("ArtistId")\n'
+            ')'
+        )
+
+        assert table == "albums"
+        assert [str(fk) for fk in foreign_keys] == ["albums.ArtistId = artists.ArtistId"]
+
+    def test_relationship_comments(self):
+        """Test "Foreign Key: a.col -> b.col" comments outside any CREATE TABLE"""
+        table, foreign_keys = parse_ddl(ddl("relationships"))
+
+        assert table is None
+        assert "playlist_track.TrackId = tracks.TrackId" in [str(fk) for fk in foreign_keys]
+
+
+class TestSchemaGraph:
+    """Test join paths over the Chinook schema"""
+
+    def test_builds_chinook_graph(self):
+        """Test every table is a node and duplicate keys are merged"""
+        graph = SchemaGraph.from_documents(chinook_documents())
+
+        assert len(graph) == 11
+        assert len(graph.foreign_keys) == 11
+
+    def test_shortest_path_through_bridge_tables(self):
+        """Test the path from customers to tracks goes through invoices and invoice_items"""
+        graph = SchemaGraph.from_documents(chinook_documents())
+
+        assert graph.shortest_path("customers", "tracks") == ["customers", "invoices", "invoice_items", "tracks"]
+        assert graph.shortest_path("playlists", {"tracks", "genres"}) == ["playlists", "playlist_track", "tracks"]
+
+    def test_expand_adds_only_path_tables(self):
+        """Test expansion adds the bridges between seeds and nothing else"""
+        graph = SchemaGraph.from_documents(chinook_documents())
+
+        assert graph.expand(["playlists", "genres"], max_tables=6) == ["playlists", "genres", "tracks", "playlist_track"]
+
+    def test_expand_respects_cap(self):
+        """Test a seed whose path doesn't fit under the cap is skipped"""
+        graph = SchemaGraph.from_documents(chinook_documents())
+
+        assert graph.expand(["customers", "tracks", "albums"], max_tables=3) == ["customers"]
+        assert graph.expand(["tracks", "albums", "customers"], max_tables=3) == ["tracks", "albums"]
+
+    def test_join_hint_covers_chosen_tables(self):
+        """Test the hint lists only keys between chosen tables"""
+        graph = SchemaGraph.from_documents(chinook_documents())
+
+        hint = graph.join_hint(["tracks", "albums", "artists"])
+
+        assert hint.splitlines() == [
+            JOIN_HINT_HEADER,
+            "-- albums.ArtistId = artists.ArtistId",
+            "-- tracks.AlbumId = albums.AlbumId",
+        ]
+        assert graph.join_hint(["genres", "customers"]) is None
+
+
+class TestDDLExpander:
+    """Test expansion of retrieved DDL"""
+
+    def test_expands_retrieved_ddl(self):
+        """Test seeds come from the ranked DDL and the join path is filled in"""
+        expander = DDLExpander(seed_tables=2, max_tables=6)
+        retrieved = [ddl("customers"), ddl("relationships"), ddl("tracks"), ddl("genres"), ddl("media_types")]
+
+        expanded = expander.expand(retrieved, chinook_documents)
+
+        assert expanded[:4] == [ddl("customers"), ddl("tracks"), ddl("invoice_items"), ddl("invoices")]
+        assert expanded[-1].startswith(JOIN_HINT_HEADER)
+        assert ddl("relationships") not in expanded
+        stats = expander.stats()
+        assert stats["expansions"] == 1
+        assert stats["bridges_added"] == 2
+        assert stats["ddl_sent_avg"] == 5
+
+    def test_unknown_ddl_passes_through(self):
+        """Test DDL that maps to no known table is returned unchanged"""
+        expander = DDLExpander()
+
+        assert expander.expand(["-- notes only"], chinook_documents) == ["-- notes only"]
+
+    def test_graph_rebuilt_only_after_invalidate(self):
+        """Test the DDL collection is reread once, then only after a change"""
+        expander = DDLExpander()
+        load = MagicMock(side_effect=chinook_documents)
+
+        expander.expand([ddl("albums")], load)
+        expander.expand([ddl("albums")], load)
+        expander.invalidate()
+        expander.expand([ddl("albums")], load)
+
+        assert load.call_count == 2
+
+    def test_invalid_limits(self):
+        """Test limits below 1 raise ValueError"""
+        with pytest.raises(ValueError):
+            DDLExpander(max_tables=0)
@@ -0,0 +1,112 @@
+"""Unit tests for single-flight coalescing"""
+
+import asyncio
+import threading
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from src.single_flight import SingleFlight, AsyncSingleFlight
+
+
+class TestSingleFlight:
+    """Test thread-based SingleFlight"""
+
+    def test_concurrent_callers_share_one_call(self):
+        """Test threads with the same key run the work once"""
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def work():
+            calls.append(1)
+            started.set()
+            release.wait(1)
+            return "SELECT 1"
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            leader = pool.submit(flight.do, "k", work)
+            started.wait(1)
+            followers = [pool.submit(flight.do, "k", work) for _ in range(3)]
+            while flight.stats()["coalesced"] < 3:
+                time.sleep(0.001)
+            release.set()
+            results = [leader.result()] + [f.result() for f in followers]
+
+        assert results == ["SELECT 1"] * 4
+        assert len(calls) == 1
+        assert flight.stats() == {"calls": 1, "coalesced": 3, "in_flight": 0}
+
+    def test_errors_are_shared_and_key_is_released(self):
+        """Test followers receive the leader's exception and later calls retry"""
+        flight = SingleFlight()
+
+        def failing():
+            raise ValueError("LLM failed")
+
+        with pytest.raises(ValueError):
+            flight.do("k", failing)
+        assert flight.do("k", lambda: "ok") == "ok"
+        assert flight.stats()["calls"] == 2
+
+    def test_different_keys_do_not_coalesce(self):
+        """Test distinct keys run independently"""
+        flight = SingleFlight()
+
+        assert flight.do("a", lambda: 1) == 1
+        assert flight.do("b", lambda: 2) == 2
+        assert flight.stats()["coalesced"] == 0
+
+
+class TestAsyncSingleFlight:
+    """Test event-loop AsyncSingleFlight"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_callers_share_one_call(self):
+        """Test concurrent awaits with the same key run the coroutine once"""
+        flight = AsyncSingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"text": "SELECT 1"}
+
+        results = await asyncio.gather(*[flight.do("k", work) for _ in range(5)])
+
+        assert all(r == {"text": "SELECT 1"} for r in results)
+        assert len(calls) == 1
+        assert flight.stats() == {"calls": 1, "coalesced": 4, "in_flight": 0}
+
+    @pytest.mark.asyncio
+    async def test_cancelled_caller_does_not_cancel_shared_call(self):
+        """Test cancelling the first caller leaves the call running for others"""
+        flight = AsyncSingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.02)
+            return "done"
+
+        first = asyncio.create_task(flight.do("k", work))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(flight.do("k", work))
+        await asyncio.sleep(0)
+        first.cancel()
+
+        assert await second == "done"
+
+    @pytest.mark.asyncio
+    async def test_errors_propagate_to_all_callers(self):
+        """Test every coalesced caller sees the exception"""
+        flight = AsyncSingleFlight()
+
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise ValueError("LLM failed")
+
+        results = await asyncio.gather(
+            flight.do("k", failing), flight.do("k", failing), return_exceptions=True
+        )
+
+        assert all(isinstance(r, ValueError) for r in results)
+        assert flight.stats()["in_flight"] == 0
@@ -0,0 +1,169 @@
+"""Unit tests for parameterized SQL templates"""
+
+import pytest
+from src.sql_templates import ColumnValues, TemplateStore
+
+COLUMN_VALUES = {
+    ("customers", "Country"): ["USA", "Germany", "United Kingdom", "Brazil"],
+    ("tracks", "UnitPrice"): [0.99, 1.99],
+    ("genres", "Name"): ["Rock", "Jazz", "Heavy Metal"],
+}
+
+
+def load_values(table, column):
+    return COLUMN_VALUES.get((table, column))
+
+
+@pytest.fixture
+def store():
+    store = TemplateStore(value_loader=load_values)
+    store.add("How many customers are from USA?", "SELECT COUNT(*) FROM customers WHERE Country = 'USA'", "q1-sql")
+    store.add("List first 10 customers", "SELECT * FROM customers LIMIT 10", "q2-sql")
+    store.add("List tracks with price 0.99", "SELECT * FROM tracks WHERE UnitPrice = 0.99", "q3-sql")
+    store.add(
+        "Show all Rock tracks",
+        "SELECT t.* FROM tracks t JOIN genres g ON t.GenreId = g.GenreId WHERE g.Name = 'Rock'",
+        "q4-sql"
+    )
+    return store
+
+
+class TestMining:
+    """Test template mining from training pairs"""
+
+    def test_mines_each_slot_kind(self, store):
+        """Test text, number and limit literals become slots"""
+        kinds = {t["question"]: [s["kind"] for s in t["slots"]] for t in store.stats()["templates"]}
+
+        assert kinds == {
+            "How many customers are from USA?": ["text"],
+            "List first 10 customers": ["limit"],
+            "List tracks with price 0.99": ["number"],
+            "Show all Rock tracks": ["text"],
+        }
+
+    def test_alias_resolves_to_table(self, store):
+        """Test an aliased column is validated against its table"""
+        template = store.stats()["templates"][-1]
+
+        assert template["slots"][0]["table"] == "genres"
+        assert template["skeleton"] == "show all {} tracks"
+
+    def test_literal_not_in_question_stays_fixed(self):
+        """Test a literal the question doesn't mention is not a slot"""
+        store = TemplateStore(value_loader=load_values)
+
+        assert store.add("American customers", "SELECT * FROM customers WHERE Country = 'USA'") is None
+
+    def test_value_missing_from_column_is_rejected(self):
+        """Test a literal that isn't a live column value is not a slot"""
+        store = TemplateStore(value_loader=load_values)
+
+        assert store.add("Customers from Mars", "SELECT * FROM customers WHERE Country = 'Mars'") is None
+
+    def test_unbounded_column_is_rejected(self):
+        """Test a column without a value list can't be a slot"""
+        store = TemplateStore(value_loader=lambda table, column: None)
+
+        assert store.add("Customers from USA", "SELECT * FROM customers WHERE Country = 'USA'") is None
+
+    def test_remove_by_source_id(self, store):
+        """Test templates are dropped with their training pair"""
+        assert store.remove("q1-sql") == 1
+        assert store.match("How many customers are from Germany?") is None
+
+
+class TestMatching:
+    """Test answering questions from templates"""
+
+    def test_fills_text_slot_with_canonical_value(self, store):
+        """Test a differently cased value is filled with the column's spelling"""
+        match = store.match("how many customers are from united kingdom")
+
+        assert match["sql"] == "SELECT COUNT(*) FROM customers WHERE Country = 'United Kingdom'"
+        assert match["slots"] == {"Country": "United Kingdom"}
+
+    def test_fills_limit_and_number_slots(self, store):
+        """Test numeric slots are filled from the question"""
+        assert store.match("List first 25 customers")["sql"] == "SELECT * FROM customers LIMIT 25"
+        assert store.match("List tracks with price 1.99")["sql"] == "SELECT * FROM tracks WHERE UnitPrice = 1.99"
+
+    def test_invalid_slot_value_falls_back(self, store):
+        """Test values absent from the live column don't match"""
+        assert store.match("List tracks with price 2.99") is None
+        assert store.match("Show all Polka tracks") is None
+        assert store.match("List first 5000 customers") is None
+
+    @pytest.mark.parametrize("question", [
+        "How many customers are not from Germany?",
+        "How many customers aren't from Germany?",
+        "How many customers isn't from Germany?",
+        "How many customers don't come from Germany?",
+        "How many customers are from non-Germany countries?",
+        "How many customers are from everywhere except Germany?",
+        "How many customers are there from Germany?",
+    ])
+    def test_changed_wording_falls_back(self, store, question):
+        """Test negations, contractions and any other extra word around a valid value don't match"""
+        assert store.match(question) is None
+
+    def test_punctuation_and_width_still_match(self, store):
+        """Test differences removed by normalization still match"""
+        match = store.match("ＨＯＷ many customers are from Germany!!")
+
+        assert match["sql"] == "SELECT COUNT(*) FROM customers WHERE Country = 'Germany'"
+
+    def test_operator_is_part_of_the_wording(self):
+        """Test a template mined from "= value" doesn't answer "< value" or "> value" """
+        store = TemplateStore(value_loader=load_values)
+        store.add("List tracks with price = 0.99", "SELECT * FROM tracks WHERE UnitPrice = 0.99")
+
+        assert store.match("List tracks with price = 1.99") is not None
+        assert store.match("List tracks with price < 1.99") is None
+        assert store.match("List tracks with price > 1.99") is None
+
+
+class TestColumnValues:
+    """Test loading and refreshing slot column values"""
+
+    def test_values_loaded_once_and_refreshed(self):
+        """Test a column is loaded once until refresh_values() or the TTL expires"""
+        calls = []
+
+        def loader(table, column):
+            calls.append((table, column))
+            return COLUMN_VALUES.get((table, column))
+
+        store = TemplateStore(value_loader=loader, values_ttl=0)
+        store.add("How many customers are from USA?", "SELECT COUNT(*) FROM customers WHERE Country = 'USA'")
+        store.match("How many customers are from Germany?")
+        store.match("How many customers are from Brazil?")
+        assert len(calls) == 1
+
+        store.refresh_values()
+        store.match("How many customers are from Germany?")
+        assert len(calls) == 2
+
+        store.values_ttl = 1e-9
+        store.match("How many customers are from Germany?")
+        assert len(calls) == 3
+
+    def test_new_column_value_matches_after_refresh(self):
+        """Test a value added to the live column is picked up on refresh"""
+        values = {("customers", "Country"): ["USA"]}
+        store = TemplateStore(value_loader=lambda table, column: values.get((table, column)), values_ttl=0)
+        store.add("How many customers are from USA?", "SELECT COUNT(*) FROM customers WHERE Country = 'USA'")
+
+        assert store.match("How many customers are from Chile?") is None
+        values[("customers", "Country")] = ["USA", "Chile"]
+        store.refresh_values()
+
+        assert store.match("How many customers are from Chile?")["slots"] == {"Country": "Chile"}
+
+    def test_longest_leftmost_value_wins(self):
+        """Test the indexed search prefers the earliest, then the longest, value"""
+        values = ColumnValues(["Rock", "Rock And Roll", "Jazz", 1.5])
+
+        assert values.find_text("rock and roll or jazz") == ("Rock And Roll", (0, 13))
+        assert values.find_text("jazz then rock", 1) == ("Rock", (10, 14))
+        assert values.has_number("1.50") and "Jazz" in values
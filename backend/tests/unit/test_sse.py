@@ -0,0 +1,49 @@
+"""Unit tests for Server-Sent Events helpers"""
+
+import pytest
+from src.sse import format_sse, SSEParser, iter_sse_events, aiter_sse_events
+
+
+class TestSSE:
+    """Test SSE formatting and parsing"""
+
+    def test_format_sse(self):
+        """Test events are framed with event/data lines and a blank line"""
+        assert format_sse("token", {"text": "SELECT"}) == 'event: token\ndata: {"text": "SELECT"}\n\n'
+
+    def test_format_sse_keeps_unicode(self):
+        """Test Japanese text is not escaped"""
+        assert "顧客" in format_sse("token", {"text": "顧客"})
+
+    def test_round_trip(self):
+        """Test formatted events parse back to the same payloads"""
+        wire = format_sse("token", {"text": "a"}) + format_sse("done", {"text": "a", "model": "m"})
+
+        events = list(iter_sse_events(wire.split("\n")))
+
+        assert events == [("token", {"text": "a"}), ("done", {"text": "a", "model": "m"})]
+
+    def test_parser_ignores_comments_and_defaults_event(self):
+        """Test keep-alive comments are skipped and unnamed events are 'message'"""
+        parser = SSEParser()
+
+        assert parser.feed(": keep-alive") is None
+        assert parser.feed('data: {"x": 1}') is None
+        assert parser.feed("") == ("message", {"x": 1})
+        assert parser.feed("") is None
+
+    def test_flushes_unterminated_event(self):
+        """Test a final event without a trailing blank line is still yielded"""
+        events = list(iter_sse_events(["event: done", "data: {}"]))
+        assert events == [("done", {})]
+
+    @pytest.mark.asyncio
+    async def test_aiter_sse_events(self):
+        """Test the async parser over an async line iterator"""
+        async def lines():
+            for line in format_sse("token", {"text": "x"}).split("\n"):
+                yield line
+
+        events = [event async for event in aiter_sse_events(lines())]
+
+        assert events == [("token", {"text": "x"})]
@@ -0,0 +1,113 @@
+"""Unit tests for the training data listing index"""
+
+import pytest
+from src.training_index import TrainingIndex, TrainingRow, decode_cursor, encode_cursor, parse_fields
+
+
+def make_rows():
+    return [
+        TrainingRow("ddl", "b-ddl", None, "CREATE TABLE customers (CustomerId INTEGER)"),
+        TrainingRow("sql", "b-sql", "How many customers?", "SELECT COUNT(*) FROM customers"),
+        TrainingRow("documentation", "a-doc", None, "Customers buy tracks"),
+        TrainingRow("sql", "a-sql", "Show all albums", "SELECT * FROM albums"),
+        TrainingRow("ddl", "a-ddl", None, "CREATE TABLE albums (AlbumId INTEGER)"),
+    ]
+
+
+class TestCursor:
+    """Test cursor encoding"""
+
+    def test_round_trip(self):
+        """Test a cursor decodes to the key it was made from"""
+        assert decode_cursor(encode_cursor((1, "abc-ddl"))) == (1, "abc-ddl")
+
+    @pytest.mark.parametrize("cursor", ["not base64!", "e30", encode_cursor(("x", 1))])
+    def test_invalid(self, cursor):
+        """Test malformed cursors raise ValueError"""
+        with pytest.raises(ValueError):
+            decode_cursor(cursor)
+
+
+class TestParseFields:
+    """Test field projection parsing"""
+
+    def test_listing_order(self):
+        """Test fields come back in listing order, whatever the request order"""
+        assert parse_fields("question, id") == ("id", "question")
+        assert parse_fields(None) == ("id", "training_data_type", "question", "content")
+
+    def test_unknown_field(self):
+        """Test an unknown field raises ValueError"""
+        with pytest.raises(ValueError):
+            parse_fields("id,embedding")
+
+
+class TestTrainingIndex:
+    """Test listing, filters and pagination"""
+
+    def test_lists_everything_by_default(self):
+        """Test no arguments lists every item, ordered by type then id"""
+        page = TrainingIndex().list(make_rows, 0)
+
+        assert [row["id"] for row in page["training_data"]] == ["a-sql", "b-sql", "a-ddl", "b-ddl", "a-doc"]
+        assert page["count"] == page["total"] == 5
+        assert page["next_cursor"] is None
+
+    def test_pages_cover_all_matches(self):
+        """Test following next_cursor visits each item exactly once"""
+        index = TrainingIndex()
+        ids, cursor = [], None
+        while True:
+            page = index.list(make_rows, 0, limit=2, cursor=cursor, fields="id")
+            ids.extend(row["id"] for row in page["training_data"])
+            assert page["total"] == 5
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+
+        assert ids == ["a-sql", "b-sql", "a-ddl", "b-ddl", "a-doc"]
+
+    def test_type_search_and_projection(self):
+        """Test the type filter, case-insensitive search and projected fields"""
+        index = TrainingIndex()
+
+        ddl = index.list(make_rows, 0, training_data_type="ddl", fields="id")
+        found = index.list(make_rows, 0, search="CUSTOMER", fields="id,training_data_type")
+
+        assert ddl["training_data"] == [{"id": "a-ddl"}, {"id": "b-ddl"}]
+        assert [row["id"] for row in found["training_data"]] == ["b-sql", "b-ddl", "a-doc"]
+        assert set(found["training_data"][0]) == {"id", "training_data_type"}
+        assert found["total"] == 3
+
+    def test_rebuilt_only_on_new_generation(self):
+        """Test the store is read once per training generation"""
+        index = TrainingIndex()
+        calls = []
+
+        def load():
+            calls.append(1)
+            return make_rows()
+
+        index.list(load, 0)
+        index.list(load, 0, limit=1)
+        index.list(load, 1)
+
+        assert len(calls) == 2
+        assert index.stats()["rebuilds"] == 2
+
+    def test_cursor_survives_removal(self):
+        """Test a cursor still resumes after the item it points at is removed"""
+        index = TrainingIndex()
+        first = index.list(make_rows, 0, limit=1)
+
+        remaining = [row for row in make_rows() if row.id != "a-sql"]
+        second = index.list(lambda: remaining, 1, limit=10, cursor=first["next_cursor"], fields="id")
+
+        assert [row["id"] for row in second["training_data"]] == ["b-sql", "a-ddl", "b-ddl", "a-doc"]
+
+    def test_invalid_arguments(self):
+        """Test an unknown type or a zero limit raise ValueError"""
+        with pytest.raises(ValueError):
+            TrainingIndex().list(make_rows, 0, training_data_type="csv")
+        with pytest.raises(ValueError):
+            TrainingIndex().list(make_rows, 0, limit=0)
@@ -0,0 +1,157 @@
+"""Unit tests for incremental training data sync"""
+
+import json
+from unittest.mock import MagicMock
+from src.training_sync import TrainingManifest, TrainingSync, plan_sync, scan_training_files
+
+
+def write_training_dir(root, pairs=None, docs="Customers buy tracks"):
+    (root / "ddl").mkdir(exist_ok=True)
+    (root / "documentation").mkdir(exist_ok=True)
+    (root / "questions").mkdir(exist_ok=True)
+    (root / "ddl" / "albums.sql").write_text("CREATE TABLE albums (AlbumId INTEGER)", encoding="utf-8")
+    (root / "documentation" / "customers.md").write_text(docs, encoding="utf-8")
+    pairs = pairs if pairs is not None else [
+        {"question": "How many customers?", "sql": "SELECT COUNT(*) FROM customers"},
+        {"question": "Show all albums", "sql": "SELECT * FROM albums"},
+    ]
+    (root / "questions" / "basic.json").write_text(json.dumps(pairs), encoding="utf-8")
+
+
+def make_vn():
+    """Fake Vanna whose store is a set of IDs"""
+    from src.bulk_ingest import TrainingItem
+
+    store = set()
+    vn = MagicMock()
+
+    def train_bulk(items):
+        ids = {TrainingItem.from_dict(item).id for item in items}
+        added = len(ids - store)
+        store.update(ids)
+        return {"total_added": added}
+
+    vn.train_bulk.side_effect = train_bulk
+    vn.remove_training_data.side_effect = lambda training_id: store.discard(training_id) or True
+    vn.list_training_data.side_effect = lambda fields=None: {"training_data": [{"id": i} for i in store]}
+    return vn, store
+
+
+class TestScanAndPlan:
+    """Test scanning files and diffing against the manifest"""
+
+    def test_scan_keys_and_ids(self, tmp_path):
+        """Test every DDL, documentation file and Q&A entry gets a keyed, hashed item"""
+        write_training_dir(tmp_path)
+
+        scanned, failed = scan_training_files(tmp_path)
+
+        assert sorted(scanned) == [
+            "ddl/albums.sql",
+            "documentation/customers.md",
+            "questions/basic.json#How many customers?",
+            "questions/basic.json#Show all albums",
+        ]
+        assert scanned["ddl/albums.sql"]["id"].endswith("-ddl")
+        assert len(scanned["ddl/albums.sql"]["hash"]) == 64
+        assert failed == set()
+
+    def test_unreadable_file_keeps_its_items(self, tmp_path):
+        """Test a half-written questions file neither re-adds nor removes its entries"""
+        write_training_dir(tmp_path)
+        scanned, _ = scan_training_files(tmp_path)
+        manifest = {key: {"hash": e["hash"], "id": e["id"]} for key, e in scanned.items()}
+        stored = {e["id"] for e in scanned.values()}
+
+        (tmp_path / "questions" / "basic.json").write_text('[{"question": "How', encoding="utf-8")
+        scanned, failed = scan_training_files(tmp_path)
+        plan = plan_sync(scanned, failed, manifest, stored)
+
+        assert failed == {"questions/basic.json"}
+        assert plan.add == {} and plan.remove_ids == []
+        assert plan.manifest == manifest
+
+    def test_only_manifest_ids_are_removed(self, tmp_path):
+        """Test training data added outside the files is never removed"""
+        write_training_dir(tmp_path)
+        scanned, failed = scan_training_files(tmp_path)
+
+        plan = plan_sync(scanned, failed, {}, {"added-by-api-sql"})
+
+        assert plan.remove_ids == []
+        assert len(plan.add) == 4
+
+
+class TestTrainingSync:
+    """Test syncing into the store"""
+
+    def test_only_changes_are_applied(self, tmp_path):
+        """Test a second sync embeds only the edited and new entries and removes the deleted one"""
+        write_training_dir(tmp_path)
+        vn, store = make_vn()
+        sync = TrainingSync(vn, tmp_path, tmp_path / "store" / "manifest.json")
+
+        first = sync.sync()
+        write_training_dir(tmp_path, pairs=[
+            {"question": "How many customers?", "sql": "SELECT COUNT(*) FROM customers"},
+            {"question": "Show all artists", "sql": "SELECT * FROM artists"},
+        ], docs="Customers buy tracks and albums")
+        second = sync.sync()
+        third = sync.sync()
+
+        assert first["added"] == first["embedded"] == 4
+        assert (second["added"], second["removed"], second["unchanged"]) == (2, 2, 2)
+        assert (third["added"], third["removed"], third["unchanged"]) == (0, 0, 4)
+        assert len(store) == 4
+        assert vn.train_bulk.call_count == 2
+
+    def test_manifest_persists_and_store_loss_resyncs(self, tmp_path):
+        """Test a new sync reuses the saved manifest but re-adds items missing from the store"""
+        write_training_dir(tmp_path)
+        vn, store = make_vn()
+        manifest_path = tmp_path / "store" / "manifest.json"
+        TrainingSync(vn, tmp_path, manifest_path).sync()
+
+        assert len(TrainingManifest(manifest_path).load().items) == 4
+        store.clear()
+        report = TrainingSync(vn, tmp_path, manifest_path).sync()
+
+        assert report["added"] == 4
+        assert len(store) == 4
+
+    def test_syncs_from_two_processes_share_the_manifest(self, tmp_path):
+        """Test a sync starts from the manifest another process saved, leaving no temp files behind"""
+        write_training_dir(tmp_path)
+        vn, store = make_vn()
+        manifest_path = tmp_path / "store" / "manifest.json"
+        first_worker = TrainingSync(vn, tmp_path, manifest_path)
+        second_worker = TrainingSync(vn, tmp_path, manifest_path)
+
+        first_worker.sync()
+        (tmp_path / "documentation" / "customers.md").unlink()
+        report = second_worker.sync()
+
+        assert (report["added"], report["removed"], report["unchanged"]) == (0, 1, 3)
+        assert len(store) == 3
+        assert sorted(p.name for p in manifest_path.parent.iterdir()) == ["manifest.json", "manifest.json.lock"]
+
+    def test_watch_syncs_changed_files(self, tmp_path):
+        """Test the watch thread syncs after a file changes"""
+        write_training_dir(tmp_path)
+        vn, store = make_vn()
+        sync = TrainingSync(vn, tmp_path, tmp_path / "manifest.json")
+        sync.sync()
+
+        sync.start_watching(interval=0.01)
+        try:
+            (tmp_path / "ddl" / "artists.sql").write_text("CREATE TABLE artists (ArtistId INTEGER)", encoding="utf-8")
+            for _ in range(200):
+                if sync.syncs >= 2:
+                    break
+                sync._stop.wait(0.01)
+        finally:
+            sync.stop_watching()
+
+        assert sync.syncs == 2
+        assert len(store) == 5
+        assert sync.stats()["watching"] is False
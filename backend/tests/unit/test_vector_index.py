@@ -0,0 +1,75 @@
+"""Unit tests for the in-memory vector snapshot"""
+
+from unittest.mock import MagicMock
+import numpy as np
+import pytest
+from src.vector_index import VectorIndex
+
+
+def make_collection(vectors, documents):
+    collection = MagicMock()
+    collection.get.return_value = {
+        "ids": [f"id-{i}" for i in range(len(documents))],
+        "embeddings": np.asarray(vectors, dtype=np.float32),
+        "documents": documents,
+    }
+    return collection
+
+
+class TestVectorIndex:
+    """Test top-k lookups and rebuilds"""
+
+    def test_top_k_by_l2_distance(self):
+        """Test results come back nearest first, by squared L2 distance"""
+        collection = make_collection([[1, 0], [0, 1], [0.9, 0.1], [5, 5]], ["a", "b", "c", "far"])
+        index = VectorIndex()
+
+        assert index.query("ddl", collection, [1.0, 0.0], 2) == ["a", "c"]
+        assert index.query("ddl", collection, [1.0, 0.0], 10) == ["a", "c", "b", "far"]
+
+    def test_l2_not_dot_product(self):
+        """Test a long vector in the same direction doesn't outrank a close one"""
+        collection = make_collection([[10, 0], [0.9, 0.2]], ["long", "close"])
+
+        assert VectorIndex().query("sql", collection, [1.0, 0.0], 1) == ["close"]
+
+    def test_snapshot_reused_until_invalidated(self):
+        """Test the collection is read once, then again only after a change"""
+        collection = make_collection([[1, 0]], ["a"])
+        index = VectorIndex()
+
+        index.query("ddl", collection, [1.0, 0.0], 1)
+        index.query("ddl", collection, [1.0, 0.0], 1)
+        assert collection.get.call_count == 1
+
+        collection.get.return_value = {
+            "ids": ["id-0", "id-1"],
+            "embeddings": np.asarray([[1, 0], [0.99, 0]], dtype=np.float32),
+            "documents": ["a", "b"],
+        }
+        index.invalidate("ddl")
+
+        assert index.query("ddl", collection, [1.0, 0.0], 5) == ["a", "b"]
+        assert collection.get.call_count == 2
+        assert index.stats()["rebuilds"] == 2
+
+    def test_empty_collection(self):
+        """Test an empty collection returns no documents"""
+        collection = MagicMock()
+        collection.get.return_value = {"ids": [], "embeddings": [], "documents": []}
+
+        assert VectorIndex().query("documentation", collection, [1.0, 0.0], 10) == []
+
+    def test_float16_storage(self):
+        """Test float16 snapshots halve memory and keep the ranking"""
+        vectors = [[1, 0, 0, 0], [0, 1, 0, 0], [0.8, 0.2, 0, 0]]
+        collection = make_collection(vectors, ["a", "b", "c"])
+        index = VectorIndex(dtype="float16")
+
+        assert index.query("ddl", collection, [1.0, 0.0, 0.0, 0.0], 3) == ["a", "c", "b"]
+        assert index.stats()["collections"]["ddl"]["bytes"] == 3 * 4 * 2
+
+    def test_rejects_unknown_dtype(self):
+        """Test only float32 and float16 are accepted"""
+        with pytest.raises(ValueError):
+            VectorIndex(dtype="int8")